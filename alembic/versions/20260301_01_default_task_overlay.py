@@ -0,0 +1,112 @@
+"""Overlay default tasks per user instead of copying them.
+
+Revision ID: 20260301_01
+Revises: 20260227_02
+Create Date: 2026-03-01 09:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "20260301_01"
+down_revision: Union[str, Sequence[str], None] = "20260227_02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    if "task_with_examples" not in tables or "users" not in tables:
+        return
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_default_task_states (
+            user_id INT NOT NULL,
+            default_task_id INT NOT NULL,
+            display_order INT NULL,
+            is_hidden BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (user_id, default_task_id),
+            CONSTRAINT fk_default_task_state_user
+                FOREIGN KEY (user_id)
+                REFERENCES users(id)
+                ON DELETE CASCADE,
+            CONSTRAINT fk_default_task_state_task
+                FOREIGN KEY (default_task_id)
+                REFERENCES task_with_examples(id)
+                ON DELETE CASCADE
+        )
+        """
+    )
+
+    # 未編集のコピーを削除する前に、ユーザーが変更した並び順だけ状態テーブルへ退避する。
+    op.execute(
+        """
+        INSERT INTO user_default_task_states (user_id, default_task_id, display_order)
+        SELECT u.user_id, d.id, u.display_order
+          FROM task_with_examples u
+          JOIN task_with_examples d
+            ON d.user_id IS NULL
+           AND d.name = u.name
+         WHERE u.user_id IS NOT NULL
+           AND u.prompt_template = d.prompt_template
+           AND u.input_examples IS NOT DISTINCT FROM d.input_examples
+           AND u.output_examples IS NOT DISTINCT FROM d.output_examples
+           AND u.display_order IS DISTINCT FROM d.display_order
+        ON CONFLICT (user_id, default_task_id) DO NOTHING
+        """
+    )
+    # 共通タスクと内容が完全一致するコピーは共通タスクの参照で代替できるため削除する。
+    op.execute(
+        """
+        DELETE FROM task_with_examples u
+         USING task_with_examples d
+         WHERE u.user_id IS NOT NULL
+           AND d.user_id IS NULL
+           AND d.name = u.name
+           AND u.prompt_template = d.prompt_template
+           AND u.input_examples IS NOT DISTINCT FROM d.input_examples
+           AND u.output_examples IS NOT DISTINCT FROM d.output_examples
+        """
+    )
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    if "task_with_examples" not in tables or "user_default_task_states" not in tables:
+        return
+
+    # 表示中の共通タスクを従来どおり各ユーザーの行として複製し直す。
+    op.execute(
+        """
+        INSERT INTO task_with_examples
+              (user_id, name, prompt_template, input_examples, output_examples, display_order)
+        SELECT usr.id,
+               d.name,
+               d.prompt_template,
+               d.input_examples,
+               d.output_examples,
+               COALESCE(s.display_order, d.display_order)
+          FROM users usr
+          CROSS JOIN task_with_examples d
+          LEFT JOIN user_default_task_states s
+            ON s.user_id = usr.id
+           AND s.default_task_id = d.id
+         WHERE d.user_id IS NULL
+           AND NOT COALESCE(s.is_hidden, FALSE)
+           AND NOT EXISTS (
+               SELECT 1
+                 FROM task_with_examples u
+                WHERE u.user_id = usr.id
+                  AND u.name = d.name
+           )
+        """
+    )
+    op.execute("DROP TABLE IF EXISTS user_default_task_states")
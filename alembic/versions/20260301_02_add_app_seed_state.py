@@ -0,0 +1,31 @@
+"""Add app_seed_state for fingerprinted startup seeding.
+
+Revision ID: 20260301_02
+Revises: 20260301_01
+Create Date: 2026-03-01 10:30:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "20260301_02"
+down_revision: Union[str, Sequence[str], None] = "20260301_01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS app_seed_state (
+            name VARCHAR(64) PRIMARY KEY,
+            fingerprint VARCHAR(64) NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS app_seed_state")
@@ -0,0 +1,71 @@
+"""Track last message time on chat rooms for activity-ordered sidebar paging.
+
+Revision ID: 20260301_03
+Revises: 20260301_02
+Create Date: 2026-03-01 11:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "20260301_03"
+down_revision: Union[str, Sequence[str], None] = "20260301_02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    if "chat_rooms" not in tables:
+        return
+
+    op.execute("ALTER TABLE chat_rooms ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP")
+    # 既存ルームは最終メッセージ時刻、履歴が無ければ作成時刻で埋める。
+    if "chat_history" in tables:
+        op.execute(
+            """
+            UPDATE chat_rooms r
+               SET last_message_at = h.last_at
+              FROM (
+                    SELECT chat_room_id, MAX(timestamp) AS last_at
+                      FROM chat_history
+                     GROUP BY chat_room_id
+                   ) h
+             WHERE h.chat_room_id = r.id
+               AND r.last_message_at IS NULL
+            """
+        )
+    op.execute(
+        """
+        UPDATE chat_rooms
+           SET last_message_at = COALESCE(created_at, CURRENT_TIMESTAMP)
+         WHERE last_message_at IS NULL
+        """
+    )
+    op.execute(
+        "ALTER TABLE chat_rooms ALTER COLUMN last_message_at SET DEFAULT CURRENT_TIMESTAMP"
+    )
+    op.execute("ALTER TABLE chat_rooms ALTER COLUMN last_message_at SET NOT NULL")
+    # キーセットページングの (last_message_at, id) 順をそのまま索引で辿れるようにする。
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_rooms_user_last_message_at
+            ON chat_rooms (user_id, last_message_at DESC, id DESC)
+        """
+    )
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    if "chat_rooms" not in tables:
+        return
+
+    op.execute("DROP INDEX IF EXISTS idx_chat_rooms_user_last_message_at")
+    op.execute("ALTER TABLE chat_rooms DROP COLUMN IF EXISTS last_message_at")
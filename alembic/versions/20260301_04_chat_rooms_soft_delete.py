@@ -0,0 +1,48 @@
+"""Soft-delete chat rooms and purge their history in the background.
+
+Revision ID: 20260301_04
+Revises: 20260301_03
+Create Date: 2026-03-01 13:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "20260301_04"
+down_revision: Union[str, Sequence[str], None] = "20260301_03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    if "chat_rooms" not in tables:
+        return
+
+    op.execute("ALTER TABLE chat_rooms ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP NULL")
+    # 削除待ちルームだけを載せる部分索引で、パージ対象の検索を常に小さく保つ。
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_rooms_pending_purge
+            ON chat_rooms (deleted_at, id)
+         WHERE deleted_at IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    if "chat_rooms" not in tables:
+        return
+
+    # 未パージのルームは旧スキーマでは表示されてしまうため、ここで物理削除する。
+    op.execute("DELETE FROM chat_rooms WHERE deleted_at IS NOT NULL")
+    op.execute("DROP INDEX IF EXISTS idx_chat_rooms_pending_purge")
+    op.execute("ALTER TABLE chat_rooms DROP COLUMN IF EXISTS deleted_at")
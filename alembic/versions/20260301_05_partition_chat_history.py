@@ -0,0 +1,179 @@
+"""Range-partition chat_history by the month each room was created.
+
+Revision ID: 20260301_05
+Revises: 20260301_04
+Create Date: 2026-03-01 15:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "20260301_05"
+down_revision: Union[str, Sequence[str], None] = "20260301_04"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 現在月から何ヶ月先までパーティションを作っておくか（以降はアプリの定期処理が作成する）。
+PARTITIONS_AHEAD = 2
+
+
+def _existing_tables() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return set(inspector.get_table_names())
+
+
+def _is_partitioned() -> bool:
+    relkind = op.get_bind().execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('chat_history')")
+    ).scalar()
+    return relkind == "p"
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    if "chat_history" not in tables or "chat_rooms" not in tables or _is_partitioned():
+        return
+
+    # パーティションキーとして複製するため、ルーム作成時刻を必須にする。
+    op.execute(
+        """
+        UPDATE chat_rooms
+           SET created_at = COALESCE(last_message_at, CURRENT_TIMESTAMP)
+         WHERE created_at IS NULL
+        """
+    )
+    op.execute("ALTER TABLE chat_rooms ALTER COLUMN created_at SET NOT NULL")
+
+    # 既存テーブルを退避し、名前の衝突する索引・制約・シーケンスの所有を付け替える。
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS chat_history_pkey RENAME TO chat_history_unpartitioned_pkey")
+    op.execute(
+        "ALTER INDEX IF EXISTS idx_chat_history_room_id_id "
+        "RENAME TO idx_chat_history_unpartitioned_room_id_id"
+    )
+    op.execute(
+        "ALTER TABLE chat_history_unpartitioned "
+        "RENAME CONSTRAINT fk_chat_history_room TO fk_chat_history_unpartitioned_room"
+    )
+    op.execute("ALTER SEQUENCE chat_history_id_seq AS BIGINT")
+
+    op.execute(
+        """
+        CREATE TABLE chat_history (
+            id BIGINT NOT NULL DEFAULT nextval('chat_history_id_seq'),
+            chat_room_id VARCHAR(255) NOT NULL,
+            room_created_at TIMESTAMP NOT NULL,
+            message TEXT,
+            sender VARCHAR(20) CHECK (sender IN ('user','assistant')),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, room_created_at),
+            CONSTRAINT fk_chat_history_room
+                FOREIGN KEY (chat_room_id)
+                REFERENCES chat_rooms(id)
+                ON DELETE CASCADE
+        ) PARTITION BY RANGE (room_created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id")
+
+    # 最古のルーム作成月から現在月 + PARTITIONS_AHEAD までの月次パーティションを作成する。
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month_start DATE;
+        BEGIN
+            FOR month_start IN
+                SELECT generate_series(
+                           date_trunc('month', COALESCE(MIN(created_at), CURRENT_TIMESTAMP)),
+                           date_trunc('month', CURRENT_TIMESTAMP)
+                               + INTERVAL '{PARTITIONS_AHEAD} months',
+                           INTERVAL '1 month'
+                       )::date
+                  FROM chat_rooms
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_history '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'chat_history_p' || to_char(month_start, 'YYYYMM'),
+                    month_start,
+                    (month_start + INTERVAL '1 month')::date
+                );
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_history_room_id_id
+            ON chat_history (chat_room_id, id)
+        """
+    )
+
+    # 各行へルーム作成時刻を付与して新テーブルへ移し替える（行はパーティションへ自動振り分け）。
+    op.execute(
+        """
+        INSERT INTO chat_history (id, chat_room_id, room_created_at, message, sender, timestamp)
+        SELECT h.id, h.chat_room_id, r.created_at, h.message, h.sender, h.timestamp
+          FROM chat_history_unpartitioned h
+          JOIN chat_rooms r ON r.id = h.chat_room_id
+        """
+    )
+    op.execute("DROP TABLE chat_history_unpartitioned")
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    if "chat_history" not in tables or not _is_partitioned():
+        return
+
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_partitioned")
+    op.execute(
+        "ALTER INDEX IF EXISTS idx_chat_history_room_id_id "
+        "RENAME TO idx_chat_history_partitioned_room_id_id"
+    )
+    op.execute(
+        "ALTER TABLE chat_history_partitioned "
+        "RENAME CONSTRAINT fk_chat_history_room TO fk_chat_history_partitioned_room"
+    )
+    op.execute(
+        """
+        CREATE TABLE chat_history (
+            id SERIAL PRIMARY KEY,
+            chat_room_id VARCHAR(255) NOT NULL,
+            message TEXT,
+            sender VARCHAR(20) CHECK (sender IN ('user','assistant')),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT fk_chat_history_room
+                FOREIGN KEY (chat_room_id)
+                REFERENCES chat_rooms(id)
+                ON DELETE CASCADE
+        )
+        """
+    )
+    # 切り離し済みのアーカイブパーティションは戻さない（必要なら手動で再投入する）。
+    op.execute(
+        """
+        INSERT INTO chat_history (id, chat_room_id, message, sender, timestamp)
+        SELECT id, chat_room_id, message, sender, timestamp
+          FROM chat_history_partitioned
+        """
+    )
+    op.execute("DROP TABLE chat_history_partitioned CASCADE")
+    op.execute(
+        """
+        SELECT setval(
+            pg_get_serial_sequence('chat_history', 'id'),
+            COALESCE((SELECT MAX(id) FROM chat_history), 0) + 1,
+            false
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_chat_history_room_id_id
+            ON chat_history (chat_room_id, id)
+        """
+    )
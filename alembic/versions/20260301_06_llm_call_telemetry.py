@@ -0,0 +1,59 @@
+"""Add the append-only LLM call telemetry table.
+
+Revision ID: 20260301_06
+Revises: 20260301_05
+Create Date: 2026-03-01 15:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "20260301_06"
+down_revision: Union[str, Sequence[str], None] = "20260301_05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return set(inspector.get_table_names())
+
+
+def upgrade() -> None:
+    if "llm_call_telemetry" in _existing_tables():
+        return
+
+    # ルーム・ユーザー削除後も集計に使えるよう、外部キーは張らない追記専用テーブルにする。
+    op.execute(
+        """
+        CREATE TABLE llm_call_telemetry (
+            id BIGSERIAL PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            model VARCHAR(255) NOT NULL,
+            provider VARCHAR(32) NOT NULL,
+            streamed BOOLEAN NOT NULL,
+            outcome VARCHAR(16) NOT NULL,
+            prompt_tokens INT NULL,
+            completion_tokens INT NULL,
+            tokens_estimated BOOLEAN NOT NULL DEFAULT FALSE,
+            ttft_ms INT NULL,
+            duration_ms INT NOT NULL,
+            chunk_count INT NOT NULL DEFAULT 0,
+            chat_room_id VARCHAR(255) NULL,
+            user_id INT NULL
+        )
+        """
+    )
+    # 期間指定の集計は常に created_at の範囲検索なので、追記順と相関する BRIN で十分小さく保つ。
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_llm_call_telemetry_created_at
+            ON llm_call_telemetry USING BRIN (created_at)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS llm_call_telemetry")
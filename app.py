@@ -7,15 +7,36 @@ from datetime import timedelta
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
+from fastapi.responses import Response
 
 from blueprints.chat import cleanup_ephemeral_chats
-from services.db import close_db_pool
+from services.chat_partitions import (
+    run_chat_history_partition_maintenance,
+    run_partition_maintenance_loop,
+)
+from services.async_utils import run_blocking
+from services.db import (
+    ReadYourWritesMiddleware,
+    close_db_pool,
+    get_db_connection,
+    is_replica_configured,
+    run_db_pool_maintenance,
+)
 from services.default_tasks import ensure_default_tasks_seeded
 from services.default_shared_prompts import ensure_default_shared_prompts
-from services.health import get_liveness_status, get_readiness_status
+from services.health import get_liveness_status, get_readiness_status, run_health_prober
+from services.llm_telemetry import run_llm_telemetry_writer
+from services.load_shedding import LoadSheddingMiddleware, is_load_shedding_enabled
 from services.logging_config import configure_logging
+from services.loop_monitor import start_loop_monitor, stop_loop_monitor
+from services.metrics import CONTENT_TYPE_LATEST, is_scrape_authorized, render_metrics
+from services.profiling import ProfilingMiddleware, is_profiling_enabled
+from services.query_stats import run_explain_worker
+from services.compression import DEFAULT_MINIMUM_SIZE, CompressionMiddleware
+from services.cpu_pool import shutdown_cpu_pool
 from services.csrf import get_or_create_csrf_token
 from services.request_context import RequestContextMiddleware
+from services.room_purge import request_room_purge, run_room_purge_loop
 from services.runtime_config import get_session_secret_key, is_production_env
 from services.session_middleware import PermanentSessionMiddleware
 from services.web import DEFAULT_INTERNAL_ERROR_MESSAGE, jsonify
@@ -58,8 +79,8 @@ def periodic_cleanup(stop_event: threading.Event) -> None:
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    # 起動時にデフォルトタスクを投入する（未投入分のみ）
-    # Seed default tasks on startup (insert only missing rows).
+    # 起動時にデフォルトタスクを投入する（内容ハッシュが変わった時のみ）
+    # Seed default tasks on startup (only when the content fingerprint changed).
     try:
         inserted = ensure_default_tasks_seeded()
         if inserted > 0:
@@ -68,8 +89,8 @@ async def lifespan(_: FastAPI):
         logger.exception("Failed to seed default tasks.")
         raise
 
-    # 起動時に共有サンプルプロンプトを投入する（未投入分のみ）
-    # Seed sample shared prompts on startup (insert only missing rows).
+    # 起動時に共有サンプルプロンプトを投入する（内容ハッシュが変わった時のみ）
+    # Seed sample shared prompts on startup (only when the content fingerprint changed).
     try:
         inserted = ensure_default_shared_prompts()
         if inserted > 0:
@@ -78,6 +99,14 @@ async def lifespan(_: FastAPI):
         logger.exception("Failed to seed sample shared prompts.")
         raise
 
+    # chat_history の今月以降のパーティション作成と、保持期間外パーティションの切り離しを行う
+    # Create chat_history partitions for upcoming months and detach ones past retention.
+    try:
+        run_chat_history_partition_maintenance()
+    except Exception:
+        logger.exception("Failed to maintain chat_history partitions.")
+        raise
+
     cleanup_stop_event = threading.Event()
     cleanup_thread = threading.Thread(
         target=periodic_cleanup,
@@ -87,16 +116,115 @@ async def lifespan(_: FastAPI):
     )
     cleanup_thread.start()
 
+    # 論理削除したチャットルームの履歴を小分けに物理削除する（再起動後は残件から再開）
+    # Purge soft-deleted rooms in bounded batches; after a restart it resumes from what remains.
+    purge_stop_event = threading.Event()
+    purge_thread = threading.Thread(
+        target=run_room_purge_loop,
+        args=(purge_stop_event,),
+        daemon=True,
+        name="chat-room-purge",
+    )
+    purge_thread.start()
+
+    partition_stop_event = threading.Event()
+    partition_thread = threading.Thread(
+        target=run_partition_maintenance_loop,
+        args=(partition_stop_event,),
+        daemon=True,
+        name="chat-history-partitions",
+    )
+    partition_thread.start()
+
+    # LLM 呼び出しテレメトリをまとめて DB へ書き込む
+    # Batch-write LLM call telemetry to the database.
+    telemetry_stop_event = threading.Event()
+    telemetry_thread = threading.Thread(
+        target=run_llm_telemetry_writer,
+        args=(telemetry_stop_event,),
+        daemon=True,
+        name="llm-telemetry-writer",
+    )
+    telemetry_thread.start()
+
+    # 遅いクエリのサンプルに対する EXPLAIN (ANALYZE, BUFFERS) を別スレッドで取得する
+    # Capture EXPLAIN (ANALYZE, BUFFERS) for sampled slow queries on a separate thread.
+    explain_stop_event = threading.Event()
+    explain_thread = threading.Thread(
+        target=run_explain_worker,
+        args=(explain_stop_event, get_db_connection),
+        daemon=True,
+        name="slow-query-explain",
+    )
+    explain_thread.start()
+
+    # プール接続の寿命・アイドル回収と死活確認
+    # Pool connection lifetime/idle recycling and liveness checks.
+    pool_stop_event = threading.Event()
+    pool_thread = threading.Thread(
+        target=run_db_pool_maintenance,
+        args=(pool_stop_event,),
+        daemon=True,
+        name="db-pool-maintenance",
+    )
+    pool_thread.start()
+
+    # /readyz が返す依存先の状態をバックグラウンドで定期確認する
+    # Probe dependencies in the background; /readyz serves the cached result.
+    health_stop_event = threading.Event()
+    health_thread = threading.Thread(
+        target=run_health_prober,
+        args=(health_stop_event,),
+        daemon=True,
+        name="health-prober",
+    )
+    health_thread.start()
+
+    # イベントループの遅延を計測し、ループを止めたコードのスタックを記録する
+    # Measure event loop lag and log the stack of any code that holds the loop.
+    start_loop_monitor()
+
     try:
         yield
     finally:
+        stop_loop_monitor()
         cleanup_stop_event.set()
+        purge_stop_event.set()
+        partition_stop_event.set()
+        telemetry_stop_event.set()
+        explain_stop_event.set()
+        pool_stop_event.set()
+        health_stop_event.set()
+        request_room_purge()
         cleanup_thread.join(timeout=1)
+        purge_thread.join(timeout=1)
+        partition_thread.join(timeout=1)
+        explain_thread.join(timeout=1)
+        pool_thread.join(timeout=1)
+        health_thread.join(timeout=1)
+        # 残りのテレメトリを書き切ってからプールを閉じる
+        # Let the writer flush remaining telemetry before the pool closes.
+        telemetry_thread.join(timeout=5)
+        shutdown_cpu_pool()
         close_db_pool()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# 管理者向けオンデマンドプロファイラ。セッションを読むのでセッションより内側（先に追加）に置き、
+# 無効時は組み込まないためリクエストごとのコストは発生しない
+# On-demand profiler for admins. It reads the session, so it is added first (inside the session
+# middleware); when disabled it is not installed at all and costs nothing per request.
+if is_profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+# レプリカ構成時のみ、書き込み直後の読み取りをプライマリへ寄せる（セッションを読むため内側に置く）
+# With a replica configured, keep reads right after a write on the primary (reads the session).
+if is_replica_configured():
+    app.add_middleware(ReadYourWritesMiddleware)
+# 過負荷時に低優先のリクエストを早期に 503 で断る。ログイン状態を見るためセッションより内側に置く
+# Shed low-priority requests with an early 503 under overload; inside the session to see who is signed in.
+if is_load_shedding_enabled():
+    app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(
     PermanentSessionMiddleware,
     secret_key=secret_key,
@@ -106,6 +234,12 @@ app.add_middleware(
     https_only=https_only,
 )
 app.add_middleware(RequestContextMiddleware)
+# nginx は上流レスポンスを圧縮しないため、アプリ側で最外周のミドルウェアとして圧縮する
+# nginx does not compress upstream responses, so compress here as the outermost middleware.
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", str(DEFAULT_MINIMUM_SIZE))),
+)
 
 app.state.session_secret = secret_key
 app.state.session_cookie = "session"
@@ -124,10 +258,23 @@ async def healthz():
 
 @app.get("/readyz")
 async def readyz():
+    # バックグラウンドの確認結果を返すだけで、ここでは I/O を行わない
+    # Serve the background prober's cached result; no I/O happens here.
     payload, status_code = get_readiness_status()
     return jsonify(payload, status_code=status_code)
 
 
+@app.get("/metrics")
+async def prometheus_metrics(request: Request):
+    client_host = request.client.host if request.client else None
+    if not is_scrape_authorized(request.headers.get("authorization"), client_host):
+        return jsonify({"error": "Unauthorized"}, status_code=401)
+    # ゲージの収集で Redis などの I/O が発生するためスレッドで実行する
+    # Gauge collection may touch Redis, so render off the event loop.
+    body = await run_blocking(render_metrics)
+    return Response(content=body, media_type=CONTENT_TYPE_LATEST)
+
+
 # 各 Router を読み込んでエンドポイント定義を登録可能にする
 # Import routers so endpoint definitions are attached.
 from blueprints.auth import auth_bp
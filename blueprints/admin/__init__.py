@@ -4,6 +4,6 @@ from services.csrf import require_csrf
 
 admin_bp = APIRouter(prefix="/admin", dependencies=[Depends(require_csrf)])
 
-from . import views  # noqa: F401
+from . import tables, views  # noqa: F401
 
 __all__ = ["admin_bp"]
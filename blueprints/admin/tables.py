@@ -0,0 +1,424 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import logging
+import re
+import time
+import uuid
+from datetime import date, datetime, time as dt_time
+from typing import Any, Iterator, Optional
+
+from fastapi import Request
+from starlette.responses import StreamingResponse
+
+from services.async_utils import run_blocking
+from services.db import Error, get_db_connection
+from services.web import dumps_json, jsonify, log_and_internal_server_error
+
+from . import admin_bp
+from .views import _admin_guard, _require_pg_sql, _sql_identifier
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 2000
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+logger = logging.getLogger(__name__)
+
+# 列・型・NOT NULL・主キーと pg_class.reltuples（ANALYZE 時点の推定行数）を1回で取得する。
+# COUNT(*) と違い表を走査しないので、数百万行の表でも即座に返る
+# Fetch columns, types, NOT NULL, primary key membership and pg_class.reltuples (the row
+# estimate as of the last ANALYZE) in one query. Unlike COUNT(*) it never scans the table.
+_TABLE_METADATA_SQL = """
+    SELECT attr.attname,
+           pg_catalog.format_type(attr.atttypid, attr.atttypmod),
+           attr.attnotnull,
+           COALESCE(attr.attnum = ANY(pk.indkey), FALSE),
+           rel.reltuples
+      FROM pg_catalog.pg_class rel
+      JOIN pg_catalog.pg_attribute attr
+        ON attr.attrelid = rel.oid
+      LEFT JOIN pg_catalog.pg_index pk
+        ON pk.indrelid = rel.oid
+       AND pk.indisprimary
+     WHERE rel.oid = to_regclass(quote_ident(current_schema()) || '.' || quote_ident(%s))
+       AND rel.relkind IN ('r', 'p')
+       AND attr.attnum > 0
+       AND NOT attr.attisdropped
+     ORDER BY attr.attnum
+"""
+
+
+class TableNotFoundError(LookupError):
+    pass
+
+
+def _fetch_table_metadata(cursor, table_name: str) -> dict[str, Any]:
+    cursor.execute(_TABLE_METADATA_SQL, (table_name,))
+    rows = cursor.fetchall()
+    if not rows:
+        raise TableNotFoundError(table_name)
+    # reltuples は未 ANALYZE の表で -1（PostgreSQL 14 以降）または 0 になる
+    # reltuples is -1 (PostgreSQL 14+) or 0 for a table that was never analyzed.
+    reltuples = rows[0][4]
+    return {
+        "columns": [row[0] for row in rows],
+        "types": {row[0]: row[1] for row in rows},
+        "not_null": {row[0] for row in rows if row[2]},
+        "primary_key": [row[0] for row in rows if row[3]],
+        "approximate_count": int(reltuples) if reltuples is not None and reltuples >= 0 else None,
+    }
+
+
+def _plan_order(metadata: dict[str, Any], sort: Optional[str]) -> tuple[list[str], bool]:
+    # 並び順に使う列と、キーセット方式が使えるかを返す。キーセットは行を一意に決める必要があるため、
+    # 主キーがあり、かつソート列が NOT NULL のときだけ使う。それ以外は ctid で順序を固定した OFFSET 方式
+    # Return the ordering columns and whether keyset paging applies. Keyset paging needs a unique,
+    # non-null ordering, so it requires a primary key and a NOT NULL sort column; anything else
+    # falls back to OFFSET with ctid as the final tiebreaker.
+    primary_key = metadata["primary_key"]
+    if sort is None:
+        if primary_key:
+            return list(primary_key), True
+        return ["ctid"], False
+    if sort not in metadata["columns"]:
+        raise ValueError(f"Unknown sort column: {sort}")
+    order_columns = [sort] + [column for column in primary_key if column != sort]
+    if primary_key and sort in metadata["not_null"]:
+        return order_columns, True
+    return order_columns + ["ctid"], False
+
+
+def _cursor_value(value: Any) -> str:
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    # bytea は memoryview/bytes で返るため 16 進文字列にし、SQL 側で decode(%s, 'hex') で戻す
+    # bytea arrives as memoryview/bytes; send it as hex and turn it back with decode(%s, 'hex').
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def _encode_page_cursor(sort: Optional[str], descending: bool, values: list[Any]) -> str:
+    raw = json.dumps(
+        {"sort": sort, "desc": descending, "values": [_cursor_value(value) for value in values]},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_page_cursor(cursor: str, sort: Optional[str], descending: bool, width: int) -> list[str]:
+    # 不正なカーソルや、別の並び順で発行されたカーソルは ValueError として 400 に変換する
+    # Malformed cursors, or cursors issued for another ordering, raise ValueError (answered as 400).
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(decoded, dict):
+        raise ValueError("invalid cursor")
+    values = decoded.get("values")
+    if decoded.get("sort") != sort or decoded.get("desc") != descending:
+        raise ValueError("cursor does not match the requested sort order")
+    if not isinstance(values, list) or len(values) != width:
+        raise ValueError("invalid cursor")
+    return [str(value) for value in values]
+
+
+def _build_select_sql(
+    table_name: str,
+    metadata: dict[str, Any],
+    order_columns: list[str],
+    *,
+    descending: bool,
+    after: bool = False,
+    paginate: bool = True,
+):
+    psql = _require_pg_sql()
+    statement = psql.SQL("SELECT * FROM {}").format(_sql_identifier(table_name))
+    if after:
+        # 行値比較 (a, b) > (x, y) は複合インデックスの範囲走査にそのまま使える。
+        # カーソルの値は文字列で渡し、列の型へキャストする（型名はカタログ由来）
+        # A row comparison (a, b) > (x, y) maps straight onto a composite index range scan.
+        # Cursor values arrive as text and are cast to each column's type (names come from the catalog).
+        comparison = psql.SQL(" < ") if descending else psql.SQL(" > ")
+        statement += psql.SQL(" WHERE ({}){}({})").format(
+            psql.SQL(", ").join(_sql_identifier(column) for column in order_columns),
+            comparison,
+            psql.SQL(", ").join(
+                psql.SQL("decode(%s, 'hex')")
+                if metadata["types"][column] == "bytea"
+                else psql.SQL("CAST(%s AS {})").format(psql.SQL(metadata["types"][column]))
+                for column in order_columns
+            ),
+        )
+    if order_columns:
+        direction = psql.SQL(" DESC") if descending else psql.SQL(" ASC")
+        statement += psql.SQL(" ORDER BY ") + psql.SQL(", ").join(
+            _sql_identifier(column) + direction for column in order_columns
+        )
+    if paginate:
+        statement += psql.SQL(" LIMIT %s OFFSET %s")
+    return statement
+
+
+def _fetch_rows_page(
+    table_name: str,
+    *,
+    sort: Optional[str],
+    descending: bool,
+    limit: int,
+    cursor_token: Optional[str] = None,
+    offset: int = 0,
+) -> dict[str, Any]:
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True)
+        cursor = connection.cursor()
+        metadata = _fetch_table_metadata(cursor, table_name)
+        order_columns, keyset = _plan_order(metadata, sort)
+
+        params: list[Any] = []
+        if cursor_token is not None:
+            if not keyset:
+                raise ValueError("cursor paging needs a primary key and a NOT NULL sort column")
+            params.extend(_decode_page_cursor(cursor_token, sort, descending, len(order_columns)))
+        # 次ページの有無を知るため 1 行多く読む
+        # Read one extra row to learn whether another page exists.
+        params.extend([limit + 1, offset])
+        cursor.execute(
+            _build_select_sql(
+                table_name,
+                metadata,
+                order_columns,
+                descending=descending,
+                after=cursor_token is not None,
+            ),
+            params,
+        )
+        rows = cursor.fetchall()
+        column_names = [description[0] for description in cursor.description]
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection is not None:
+            connection.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    next_offset = None
+    if has_more and keyset:
+        positions = [column_names.index(column) for column in order_columns]
+        next_cursor = _encode_page_cursor(sort, descending, [rows[-1][i] for i in positions])
+    elif has_more:
+        next_offset = offset + limit
+    return {
+        "columns": column_names,
+        "rows": rows,
+        "paging": "keyset" if keyset else "offset",
+        "next_cursor": next_cursor,
+        "next_offset": next_offset,
+        "approximate_count": metadata["approximate_count"],
+    }
+
+
+def _parse_sort_params(request: Request):
+    sort = request.query_params.get("sort") or None
+    order = request.query_params.get("order", "asc")
+    if order not in ("asc", "desc"):
+        return None, None, jsonify(
+            {"status": "fail", "error": "order must be 'asc' or 'desc'."}, status_code=400
+        )
+    return sort, order == "desc", None
+
+
+@admin_bp.get("/api/tables/{table_name}/rows", name="admin.api_table_rows")
+async def api_table_rows(request: Request, table_name: str):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    sort, descending, error_response = _parse_sort_params(request)
+    if error_response is not None:
+        return error_response
+    cursor_token = request.query_params.get("cursor") or None
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        offset = max(int(request.query_params.get("offset", "0")), 0)
+    except ValueError:
+        return jsonify(
+            {"status": "fail", "error": "limit and offset must be integers."}, status_code=400
+        )
+    if cursor_token is not None and offset:
+        return jsonify(
+            {"status": "fail", "error": "Use either cursor or offset, not both."}, status_code=400
+        )
+
+    try:
+        page = await run_blocking(
+            _fetch_rows_page,
+            table_name,
+            sort=sort,
+            descending=descending,
+            limit=limit,
+            cursor_token=cursor_token,
+            offset=offset,
+        )
+    except TableNotFoundError:
+        return jsonify({"status": "fail", "error": "Table not found."}, status_code=404)
+    except ValueError as exc:
+        return jsonify({"status": "fail", "error": str(exc)}, status_code=400)
+    except Error:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to load admin table rows.",
+            status="fail",
+        )
+
+    return jsonify(
+        {
+            "status": "success",
+            "table": table_name,
+            "sort": sort,
+            "order": "desc" if descending else "asc",
+            "limit": limit,
+            "offset": offset,
+            **page,
+        }
+    )
+
+
+def _load_export_plan(table_name: str, sort: Optional[str]) -> tuple[dict[str, Any], list[str]]:
+    connection = None
+    cursor = None
+    try:
+        connection = get_db_connection(read_only=True)
+        cursor = connection.cursor()
+        metadata = _fetch_table_metadata(cursor, table_name)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection is not None:
+            connection.close()
+    # 並び順の指定がなければ ORDER BY を付けず、単純な順次走査で書き出す
+    # Without a requested sort, skip ORDER BY and export with a plain sequential scan.
+    if sort is None:
+        return metadata, []
+    order_columns, _ = _plan_order(metadata, sort)
+    return metadata, order_columns
+
+
+def _encode_export_batch(output_format: str, column_names: list[str], rows: list[tuple]) -> bytes:
+    if output_format == "ndjson":
+        return b"".join(dumps_json(dict(zip(column_names, row))) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _iter_table_export(
+    table_name: str,
+    metadata: dict[str, Any],
+    order_columns: list[str],
+    *,
+    descending: bool,
+    output_format: str,
+) -> Iterator[bytes]:
+    # 名前付き（サーバーサイド）カーソルで EXPORT_BATCH_SIZE 行ずつ取り出し、その都度送り出す。
+    # ワーカーが保持するのは常に 1 バッチ分だけなので、表の大きさによらずメモリ使用量は一定
+    # Pull EXPORT_BATCH_SIZE rows at a time through a named (server-side) cursor and send each batch
+    # on. The worker only ever holds one batch, so memory stays flat regardless of table size.
+    started_at = time.perf_counter()
+    exported = 0
+    connection = get_db_connection(read_only=True)
+    cursor = None
+    try:
+        cursor = connection.cursor(name=f"admin_export_{uuid.uuid4().hex}")
+        cursor.execute(
+            _build_select_sql(
+                table_name, metadata, order_columns, descending=descending, paginate=False
+            )
+        )
+        rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        # 名前付きカーソルの description は最初の FETCH 後に確定する
+        # A named cursor's description is only available after the first FETCH.
+        column_names = [description[0] for description in cursor.description]
+        if output_format == "csv":
+            header = io.StringIO()
+            csv.writer(header).writerow(column_names)
+            yield header.getvalue().encode("utf-8")
+        while rows:
+            exported += len(rows)
+            yield _encode_export_batch(output_format, column_names, rows)
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                logger.warning("Failed to close export cursor.", exc_info=True)
+        connection.close()
+        logger.info(
+            "Admin table export finished.",
+            extra={
+                "event": "admin_table_export",
+                "table": table_name,
+                "format": output_format,
+                "rows": exported,
+                "duration_ms": int((time.perf_counter() - started_at) * 1000),
+            },
+        )
+
+
+@admin_bp.get("/api/tables/{table_name}/export", name="admin.api_table_export")
+async def api_table_export(request: Request, table_name: str):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    output_format = request.query_params.get("format", "csv")
+    if output_format not in EXPORT_MEDIA_TYPES:
+        return jsonify(
+            {"status": "fail", "error": "format must be 'csv' or 'ndjson'."}, status_code=400
+        )
+    sort, descending, error_response = _parse_sort_params(request)
+    if error_response is not None:
+        return error_response
+
+    try:
+        metadata, order_columns = await run_blocking(_load_export_plan, table_name, sort)
+    except TableNotFoundError:
+        return jsonify({"status": "fail", "error": "Table not found."}, status_code=404)
+    except ValueError as exc:
+        return jsonify({"status": "fail", "error": str(exc)}, status_code=400)
+    except Error:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to prepare admin table export.",
+            status="fail",
+        )
+
+    filename = re.sub(r"[^A-Za-z0-9_.-]", "_", table_name) or "table"
+    return StreamingResponse(
+        _iter_table_export(
+            table_name,
+            metadata,
+            order_columns,
+            descending=descending,
+            output_format=output_format,
+        ),
+        media_type=EXPORT_MEDIA_TYPES[output_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{output_format}"',
+            "Cache-Control": "no-store",
+        },
+    )
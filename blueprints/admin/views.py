@@ -6,10 +6,24 @@ from typing import Optional
 from urllib.parse import urlencode
 
 from fastapi import Request
-from starlette.responses import RedirectResponse
+from starlette.responses import PlainTextResponse, RedirectResponse
 
 from services.async_utils import run_blocking
+from services.cpu_pool import CpuPoolBusyError, run_cpu_bound
 from services.db import Error, get_db_connection
+from services.db_insights import (
+    STATEMENT_ORDERS,
+    fetch_activity,
+    fetch_bloat_estimates,
+    fetch_cache_hit_ratio,
+    fetch_index_usage,
+    fetch_statement_stats,
+)
+from services.llm_telemetry import fetch_daily_rollups, fetch_model_latency_percentiles
+from services.login_throttle import consume_admin_login_attempt, reset_admin_login_attempts
+from services.profiling import list_profiles, load_profile, render_folded
+from services.query_stats import get_top_queries
+from services.room_purge import get_room_purge_status
 from services.security import verify_password
 from services.web import (
     flash,
@@ -34,10 +48,12 @@ ADMIN_PASSWORD_HASH = (os.getenv("ADMIN_PASSWORD_HASH") or "").strip()
 logger = logging.getLogger(__name__)
 
 
-def _verify_admin_password(password: str) -> bool:
+async def _verify_admin_password(password: str) -> bool:
     if not ADMIN_PASSWORD_HASH:
         return False
-    return verify_password(password, ADMIN_PASSWORD_HASH)
+    # PBKDF2 は数百ミリ秒 CPU を占有するため、イベントループ外の専用プロセスで検証する
+    # PBKDF2 holds a CPU for hundreds of milliseconds, so verify on a dedicated process.
+    return await run_cpu_bound(verify_password, password, ADMIN_PASSWORD_HASH)
 
 
 def _require_pg_sql():
@@ -116,7 +132,32 @@ async def api_login(request: Request):
     password = payload.get("password") or ""
     next_url = sanitize_next_path(payload.get("next"), default="/admin")
 
-    if _verify_admin_password(password):
+    # uvicorn は FORWARDED_ALLOW_IPS のプロキシから来た X-Forwarded-For だけを反映するため、
+    # それ以外では接続元ソケットのアドレスになり、ヘッダー偽装で別枠を得られない
+    # uvicorn only applies X-Forwarded-For from FORWARDED_ALLOW_IPS proxies; otherwise this is the
+    # socket peer, so a spoofed header cannot buy a fresh budget or lock out another address.
+    client_ip = request.client.host if request.client else "unknown"
+    allowed, retry_after = await run_blocking(consume_admin_login_attempt, client_ip)
+    if not allowed:
+        response = jsonify(
+            {"status": "fail", "error": "Too many login attempts. Please try again later."},
+            status_code=429,
+        )
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    try:
+        verified = await _verify_admin_password(password)
+    except CpuPoolBusyError:
+        response = jsonify(
+            {"status": "fail", "error": "Server is busy. Please try again shortly."},
+            status_code=503,
+        )
+        response.headers["Retry-After"] = "1"
+        return response
+
+    if verified:
+        await run_blocking(reset_admin_login_attempts, client_ip)
         request.session["is_admin"] = True
         flash(request, "Logged in as administrator.", "success")
         redirect_url = frontend_url(next_url)
@@ -444,6 +485,274 @@ async def api_dashboard(request: Request):
     )
 
 
+@admin_bp.get("/api/room-purge-status", name="admin.api_room_purge_status")
+async def api_room_purge_status(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    try:
+        status = await run_blocking(get_room_purge_status)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to load chat room purge status.",
+            status="fail",
+        )
+    return jsonify({"status": "success", **status})
+
+
+def _parse_days_param(request: Request, default: int):
+    raw_days = request.query_params.get("days")
+    if raw_days is None:
+        return default, None
+    try:
+        days = int(raw_days)
+    except ValueError:
+        days = 0
+    if days < 1:
+        return None, jsonify(
+            {"status": "fail", "error": "days must be a positive integer."}, status_code=400
+        )
+    return days, None
+
+
+@admin_bp.get("/api/llm-latency", name="admin.api_llm_latency")
+async def api_llm_latency(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    days, error_response = _parse_days_param(request, default=7)
+    if error_response is not None:
+        return error_response
+
+    try:
+        models = await run_blocking(fetch_model_latency_percentiles, days)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to load LLM latency percentiles.",
+            status="fail",
+        )
+    return jsonify({"status": "success", "days": days, "models": models})
+
+
+@admin_bp.get("/api/llm-usage-daily", name="admin.api_llm_usage_daily")
+async def api_llm_usage_daily(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    days, error_response = _parse_days_param(request, default=30)
+    if error_response is not None:
+        return error_response
+
+    try:
+        rollups = await run_blocking(fetch_daily_rollups, days)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to load LLM daily usage.",
+            status="fail",
+        )
+    return jsonify({"status": "success", "days": days, "rollups": rollups})
+
+
+@admin_bp.get("/api/top-queries", name="admin.api_top_queries")
+async def api_top_queries(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    order_by = request.query_params.get("order", "total")
+    if order_by not in ("total", "mean", "max", "calls"):
+        return jsonify(
+            {"status": "fail", "error": "order must be one of total, mean, max, calls."},
+            status_code=400,
+        )
+    try:
+        limit = min(max(int(request.query_params.get("limit", "20")), 1), 200)
+    except ValueError:
+        return jsonify(
+            {"status": "fail", "error": "limit must be an integer."}, status_code=400
+        )
+    include_plans = request.query_params.get("plans") == "1"
+
+    # 集計はこのワーカープロセス内のもの
+    # Statistics cover this worker process only.
+    queries = get_top_queries(limit=limit, order_by=order_by, include_plans=include_plans)
+    return jsonify(
+        {"status": "success", "pid": os.getpid(), "order": order_by, "queries": queries}
+    )
+
+
+def _parse_limit_param(request: Request, default: int, maximum: int):
+    raw_limit = request.query_params.get("limit")
+    if raw_limit is None:
+        return default, None
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return None, jsonify(
+            {"status": "fail", "error": "limit must be a positive integer."}, status_code=400
+        )
+    return min(limit, maximum), None
+
+
+async def _db_insight_response(loader, *args, error_message: str):
+    # 結果はサービス側で短時間キャッシュされる。age_seconds はキャッシュされてからの経過秒数
+    # Results are cached briefly by the service; age_seconds is how long ago they were fetched.
+    try:
+        report, age_seconds = await run_blocking(loader, *args)
+    except Exception:
+        return log_and_internal_server_error(logger, error_message, status="fail")
+    return jsonify({"status": "success", "age_seconds": round(age_seconds, 1), **report})
+
+
+@admin_bp.get("/api/db-insights/statements", name="admin.api_db_statements")
+async def api_db_statements(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    order_by = request.query_params.get("order", "total")
+    if order_by not in STATEMENT_ORDERS:
+        return jsonify(
+            {"status": "fail", "error": "order must be one of total, mean, max, calls."},
+            status_code=400,
+        )
+    limit, error_response = _parse_limit_param(request, default=20, maximum=100)
+    if error_response is not None:
+        return error_response
+    return await _db_insight_response(
+        fetch_statement_stats,
+        order_by,
+        limit,
+        error_message="Failed to load pg_stat_statements.",
+    )
+
+
+@admin_bp.get("/api/db-insights/indexes", name="admin.api_db_indexes")
+async def api_db_indexes(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    limit, error_response = _parse_limit_param(request, default=50, maximum=500)
+    if error_response is not None:
+        return error_response
+    return await _db_insight_response(
+        fetch_index_usage, limit, error_message="Failed to load index usage."
+    )
+
+
+@admin_bp.get("/api/db-insights/bloat", name="admin.api_db_bloat")
+async def api_db_bloat(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    limit, error_response = _parse_limit_param(request, default=20, maximum=200)
+    if error_response is not None:
+        return error_response
+    return await _db_insight_response(
+        fetch_bloat_estimates, limit, error_message="Failed to load bloat estimates."
+    )
+
+
+@admin_bp.get("/api/db-insights/cache-hit", name="admin.api_db_cache_hit")
+async def api_db_cache_hit(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    limit, error_response = _parse_limit_param(request, default=20, maximum=200)
+    if error_response is not None:
+        return error_response
+    return await _db_insight_response(
+        fetch_cache_hit_ratio, limit, error_message="Failed to load cache hit ratio."
+    )
+
+
+@admin_bp.get("/api/db-insights/activity", name="admin.api_db_activity")
+async def api_db_activity(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    try:
+        min_seconds = float(request.query_params.get("min_seconds", "60"))
+    except ValueError:
+        min_seconds = -1.0
+    if not 0 <= min_seconds <= 86400:
+        return jsonify(
+            {"status": "fail", "error": "min_seconds must be between 0 and 86400."},
+            status_code=400,
+        )
+    limit, error_response = _parse_limit_param(request, default=50, maximum=200)
+    if error_response is not None:
+        return error_response
+    return await _db_insight_response(
+        fetch_activity,
+        min_seconds,
+        limit,
+        error_message="Failed to load database activity.",
+    )
+
+
+@admin_bp.get("/api/profiles", name="admin.api_profiles")
+async def api_profiles(request: Request):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    try:
+        profiles = await run_blocking(list_profiles)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to list request profiles.",
+            status="fail",
+        )
+    return jsonify({"status": "success", "profiles": profiles})
+
+
+@admin_bp.get("/api/profiles/{profile_id}", name="admin.api_profile_download")
+async def api_profile_download(request: Request, profile_id: str):
+    guard = _admin_guard(request)
+    if guard is not None:
+        return guard
+
+    output_format = request.query_params.get("format", "folded")
+    if output_format not in ("folded", "json"):
+        return jsonify(
+            {"status": "fail", "error": "format must be 'folded' or 'json'."}, status_code=400
+        )
+
+    try:
+        profile = await run_blocking(load_profile, profile_id)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to load request profile.",
+            status="fail",
+        )
+    if profile is None:
+        return jsonify({"status": "fail", "error": "Profile not found."}, status_code=404)
+
+    if output_format == "json":
+        return jsonify({"status": "success", "profile": profile})
+    # 折りたたみスタックは flamegraph.pl / speedscope にそのまま読み込める
+    # Folded stacks load directly into flamegraph.pl or speedscope.
+    return PlainTextResponse(
+        render_folded(profile),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+    )
+
+
 @admin_bp.post("/create-table", name="admin.create_table")
 @admin_required
 async def create_table(request: Request):
@@ -34,7 +34,6 @@ from services.users import (
     get_user_by_id,
     create_user,
     set_user_verified,
-    copy_default_tasks_for_user,
 )
 from services.email_service import send_email
 from services.llm_daily_limit import consume_auth_email_daily_quota
@@ -215,7 +214,6 @@ async def google_callback(request: Request):
     else:
         user_id = user["id"]
 
-    await run_blocking(copy_default_tasks_for_user, user_id)
     session["user_id"] = user_id
     session["user_email"] = email
     set_session_permanent(session, True)
@@ -341,7 +339,6 @@ async def api_verify_login_code(request: Request):
         session.pop("login_temp_user_id", None)
         session.pop("login_verification_code_issued_at", None)
         session.pop("login_verification_code_attempts", None)
-        await run_blocking(copy_default_tasks_for_user, user_id)
         return jsonify({"status": "success", "message": "ログインに成功しました"})
     else:
         attempts += 1
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 import uuid
 
+from services import metrics
 from services.csrf import require_csrf
 from services.ephemeral_store import EphemeralChatStore
 
@@ -14,6 +15,13 @@ EXPIRATION_TIME = 3600  # 1時間
 # Store for guest (non-authenticated) ephemeral chat rooms.
 ephemeral_store = EphemeralChatStore(EXPIRATION_TIME)
 
+metrics.gauge_function(
+    "chatcore_ephemeral_store_rooms",
+    "Guest ephemeral chat rooms currently held, by backend.",
+    ("backend",),
+    lambda: [((ephemeral_store.backend,), ephemeral_store.room_count())],
+)
+
 
 # セッションIDを取得/生成するヘルパー関数
 # Helper to get or create session ID for guest chat isolation.
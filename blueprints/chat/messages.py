@@ -9,7 +9,9 @@ from typing import Any
 from fastapi import Request
 from starlette.responses import StreamingResponse
 
+from services import metrics
 from services.async_utils import run_blocking
+from services.chat_partitions import ROOM_PARTITION_KEY_SQL
 from services.db import get_db_connection
 from services.chat_service import (
     save_message_to_db,
@@ -27,6 +29,7 @@ from services.llm import (
 )
 from services.request_models import ChatMessageRequest
 from services.web import (
+    dumps_json,
     jsonify,
     log_and_internal_server_error,
     require_json_dict,
@@ -42,6 +45,11 @@ from . import (
 
 logger = logging.getLogger(__name__)
 
+_streams_in_flight = metrics.in_flight_gauge(
+    "chatcore_llm_streams_in_flight",
+    "SSE chat streams currently being served by this process.",
+)
+
 BASE_SYSTEM_PROMPT = """
 あなたは、ユーザーをサポートする優秀なAIアシスタントです。
 以下のガイドラインに従って、視覚的に分かりやすく、構造化された回答を生成してください。
@@ -70,8 +78,7 @@ BASE_SYSTEM_PROMPT = """
 def _sse_event(event: str, payload: dict[str, Any]) -> bytes:
     # SSE 形式で JSON ペイロードを1イベントとして返す
     # Encode one JSON payload as an SSE event.
-    body = json.dumps(payload, ensure_ascii=False)
-    return f"event: {event}\ndata: {body}\n\n".encode("utf-8")
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps_json(payload) + b"\n\n"
 
 
 def _iter_llm_stream_events(
@@ -81,12 +88,40 @@ def _iter_llm_stream_events(
     chat_room_id: str,
     is_authenticated: bool,
     sid: str | None,
+    user_id: int | None = None,
+) -> Iterator[bytes]:
+    # LLM 応答を SSE で配信し、配信中のストリーム数をプロセス単位で数える
+    # Stream LLM output via SSE while counting in-flight streams for this process.
+    _streams_in_flight.inc()
+    try:
+        yield from _stream_llm_events(
+            conversation_messages,
+            model,
+            chat_room_id=chat_room_id,
+            is_authenticated=is_authenticated,
+            sid=sid,
+            user_id=user_id,
+        )
+    finally:
+        _streams_in_flight.dec()
+
+
+def _stream_llm_events(
+    conversation_messages: list[dict[str, str]],
+    model: str,
+    *,
+    chat_room_id: str,
+    is_authenticated: bool,
+    sid: str | None,
+    user_id: int | None,
 ) -> Iterator[bytes]:
-    # LLM 応答を SSE で配信し、配信完了後に履歴へ保存する
-    # Stream LLM output via SSE and persist the final message on completion.
+    # 配信完了後に履歴へ保存する
+    # Persist the final message once streaming completes.
     chunks: list[str] = []
     try:
-        for chunk in get_llm_response_stream(conversation_messages, model):
+        for chunk in get_llm_response_stream(
+            conversation_messages, model, chat_room_id=chat_room_id, user_id=user_id
+        ):
             chunks.append(chunk)
             yield _sse_event("chunk", {"text": chunk})
     except LlmServiceError:
@@ -115,6 +150,7 @@ def _build_llm_stream_response(
     chat_room_id: str,
     is_authenticated: bool,
     sid: str | None,
+    user_id: int | None = None,
 ) -> StreamingResponse:
     # 同期ジェネレータを StreamingResponse でラップして SSE 配信する
     # Wrap the sync generator with StreamingResponse for SSE delivery.
@@ -126,6 +162,7 @@ def _build_llm_stream_response(
             chat_room_id=chat_room_id,
             is_authenticated=is_authenticated,
             sid=sid,
+            user_id=user_id,
         ),
         media_type="text/event-stream",
         headers={
@@ -163,15 +200,16 @@ def _fetch_chat_history(chat_room_id: str) -> list[dict[str, str]]:
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         cursor = conn.cursor()
-        query = """
+        query = f"""
             SELECT message, sender, timestamp
             FROM chat_history
-            WHERE chat_room_id = %s
+            WHERE chat_room_id = %(room_id)s
+              AND room_created_at = {ROOM_PARTITION_KEY_SQL}
             ORDER BY id ASC
         """
-        cursor.execute(query, (chat_room_id,))
+        cursor.execute(query, {"room_id": chat_room_id})
         rows = cursor.fetchall()
         messages = []
         for (msg, sender, ts) in rows:
@@ -338,10 +376,17 @@ async def chat(request: Request):
             chat_room_id=chat_room_id,
             is_authenticated="user_id" in session,
             sid=sid,
+            user_id=session.get("user_id"),
         )
 
     try:
-        bot_reply = await run_blocking(get_llm_response, conversation_messages, model)
+        bot_reply = await run_blocking(
+            get_llm_response,
+            conversation_messages,
+            model,
+            chat_room_id=chat_room_id,
+            user_id=session.get("user_id"),
+        )
     except LlmInvalidModelError as exc:
         return jsonify({"error": str(exc)}, status_code=400)
     except LlmServiceError:
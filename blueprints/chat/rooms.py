@@ -1,25 +1,31 @@
-from datetime import date
+import base64
+import binascii
+from datetime import date, datetime
 import logging
 from typing import Any
 
 from fastapi import Request
 
 from services.async_utils import run_blocking
-from services.db import get_db_connection
+from services.db import ROW_VERSION_COLUMNS, fetch_if_modified, get_db_connection
 from services.chat_service import (
     create_chat_room_in_db,
     rename_chat_room_in_db,
     validate_room_owner,
 )
 
+from services.room_purge import request_room_purge
 from services.request_models import (
     ChatRoomIdRequest,
     NewChatRoomRequest,
     RenameChatRoomRequest,
 )
 from services.web import (
+    compute_etag,
+    etag_matches,
     jsonify,
     log_and_internal_server_error,
+    not_modified,
     require_json_dict,
     validate_payload_model,
 )
@@ -29,48 +35,155 @@ from . import chat_bp, cleanup_ephemeral_chats, ephemeral_store, get_session_id
 logger = logging.getLogger(__name__)
 
 
-def _fetch_user_rooms(user_id: int) -> list[dict[str, Any]]:
-    # 認証ユーザーのチャットルーム一覧を新しい順で取得する
-    # Fetch authenticated user's chat rooms ordered by newest first.
-    conn = None
-    cursor = None
+DEFAULT_ROOM_PAGE_SIZE = 50
+MAX_ROOM_PAGE_SIZE = 100
+ROOM_PREVIEW_CHARS = 80
+
+# 最終メッセージ時刻の新しい順に (last_message_at, id) のキーセットでページングし、
+# 各ルームの最新メッセージ1件を LATERAL JOIN で同じクエリ内に取得する
+# Keyset-page by (last_message_at, id) newest first and pull each room's latest
+# message through a LATERAL join in the same query.
+_USER_ROOMS_SQL = """
+    SELECT r.id,
+           r.title,
+           r.created_at,
+           r.last_message_at,
+           m.sender AS last_sender,
+           m.preview AS last_preview
+      FROM chat_rooms r
+      LEFT JOIN LATERAL (
+            SELECT h.sender, LEFT(h.message, %(preview_chars)s) AS preview
+              FROM chat_history h
+             WHERE h.chat_room_id = r.id
+               AND h.room_created_at = r.created_at
+             ORDER BY h.id DESC
+             LIMIT 1
+      ) m ON TRUE
+     WHERE r.user_id = %(user_id)s
+       AND r.deleted_at IS NULL
+       {keyset_condition}
+     ORDER BY r.last_message_at DESC, r.id DESC
+     LIMIT %(limit)s
+"""
+_ROOMS_KEYSET_CONDITION = "AND (r.last_message_at, r.id) < (%(cursor_at)s, %(cursor_id)s)"
+
+
+def _encode_room_cursor(last_message_at: datetime, room_id: str) -> str:
+    raw = f"{last_message_at.isoformat()}|{room_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_room_cursor(cursor: str) -> tuple[datetime, str]:
+    # 不正なカーソルは ValueError として呼び出し側で 400 に変換する
+    # Invalid cursors raise ValueError so the caller can answer 400.
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        query = """
-            SELECT id, title, created_at
-            FROM chat_rooms
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    timestamp, separator, room_id = raw.partition("|")
+    if not separator or not room_id:
+        raise ValueError("invalid cursor")
+    return datetime.fromisoformat(timestamp), room_id
+
+
+def _format_room_timestamp(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _fetch_user_rooms(
+    conn: Any,
+    user_id: int,
+    limit: int = DEFAULT_ROOM_PAGE_SIZE,
+    cursor: tuple[datetime, str] | None = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    # 認証ユーザーのチャットルームを最終メッセージの新しい順に1ページ分取得する
+    # Fetch one page of the user's rooms ordered by most recent activity.
+    db_cursor = None
+    try:
+        db_cursor = conn.cursor()
+        params: dict[str, Any] = {
+            "user_id": user_id,
+            "preview_chars": ROOM_PREVIEW_CHARS,
+            # 次ページの有無を判定するため1件多く取得する
+            # Fetch one extra row to learn whether another page exists.
+            "limit": limit + 1,
+        }
+        keyset_condition = ""
+        if cursor is not None:
+            keyset_condition = _ROOMS_KEYSET_CONDITION
+            params["cursor_at"], params["cursor_id"] = cursor
+        db_cursor.execute(_USER_ROOMS_SQL.format(keyset_condition=keyset_condition), params)
+        rows = db_cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         rooms = []
-        for (room_id, title, created_at) in rows:
+        for (room_id, title, created_at, last_message_at, last_sender, last_preview) in rows:
             rooms.append(
                 {
                     "id": room_id,
                     "title": title,
-                    "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    "created_at": _format_room_timestamp(created_at),
+                    "last_message_at": _format_room_timestamp(last_message_at),
+                    "last_message": (
+                        {"sender": last_sender, "preview": last_preview}
+                        if last_sender is not None
+                        else None
+                    ),
                 }
             )
-        return rooms
+        next_cursor = None
+        if has_more and rows:
+            last_row = rows[-1]
+            next_cursor = _encode_room_cursor(last_row[3], last_row[0])
+        return rooms, next_cursor
     finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
+        if db_cursor is not None:
+            db_cursor.close()
+
+
+# ルーム一覧の ETag 用に件数と行バージョンだけを集計する
+# Aggregate only the row count and row versions for the room-list ETag.
+_USER_ROOMS_VERSION_SQL = (
+    f"SELECT {ROW_VERSION_COLUMNS} FROM chat_rooms "
+    "WHERE user_id = %s AND deleted_at IS NULL"
+)
+
+
+def _fetch_user_rooms_if_modified(
+    user_id: int,
+    limit: int,
+    raw_cursor: str | None,
+    page_cursor: tuple[datetime, str] | None,
+    request: Request,
+) -> tuple[str | None, tuple[list[dict[str, Any]], str | None] | None]:
+    # 検証値と本文をレプリカの同じ接続で読み、If-None-Match と一致すれば本文は None を返す
+    # Read validators and body on one (replica) connection; the body is None on an If-None-Match hit.
+    def room_list_etag(version: tuple[Any, ...]) -> str:
+        return compute_etag("chat_rooms", user_id, limit, raw_cursor, version)
+
+    version, page = fetch_if_modified(
+        _USER_ROOMS_VERSION_SQL,
+        (user_id,),
+        lambda version: etag_matches(request, room_list_etag(version)),
+        lambda conn: _fetch_user_rooms(conn, user_id, limit, page_cursor),
+        read_only=True,
+    )
+    return (room_list_etag(version) if version is not None else None), page
 
 
 def _delete_room_for_user(room_id: str, user_id: int) -> tuple[dict[str, str], int]:
-    # 所有者確認後に履歴→ルームの順で削除し、整合性を保つ
-    # Validate owner, then delete history and room to keep data consistent.
+    # 所有者確認後にルームを論理削除するだけで即座に返し、履歴の物理削除はバックグラウンドで行う
+    # Validate owner and only soft-delete; history rows are purged in the background.
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        check_q = "SELECT user_id FROM chat_rooms WHERE id = %s"
+        check_q = "SELECT user_id FROM chat_rooms WHERE id = %s AND deleted_at IS NULL"
         cursor.execute(check_q, (room_id,))
         result = cursor.fetchone()
         if not result:
@@ -78,10 +191,13 @@ def _delete_room_for_user(room_id: str, user_id: int) -> tuple[dict[str, str], i
         if result[0] != user_id:
             return {"error": "他ユーザーのチャットルームは削除できません"}, 403
 
-        del_history_q = "DELETE FROM chat_history WHERE chat_room_id = %s"
-        cursor.execute(del_history_q, (room_id,))
-        del_room_q = "DELETE FROM chat_rooms WHERE id = %s"
-        cursor.execute(del_room_q, (room_id,))
+        soft_delete_q = """
+            UPDATE chat_rooms
+               SET deleted_at = CURRENT_TIMESTAMP
+             WHERE id = %s
+               AND deleted_at IS NULL
+        """
+        cursor.execute(soft_delete_q, (room_id,))
         conn.commit()
         return {"message": "削除しました"}, 200
     finally:
@@ -161,9 +277,23 @@ async def get_chat_rooms(request: Request):
         # ログインユーザー：DBから取得
         # Authenticated users read room list from DB.
         user_id = session["user_id"]
+        raw_limit = request.query_params.get("limit")
+        raw_cursor = request.query_params.get("cursor") or None
+        try:
+            limit = int(raw_limit) if raw_limit else DEFAULT_ROOM_PAGE_SIZE
+            page_cursor = _decode_room_cursor(raw_cursor) if raw_cursor else None
+        except ValueError:
+            return jsonify({"error": "limit または cursor が不正です"}, status_code=400)
+        limit = max(1, min(limit, MAX_ROOM_PAGE_SIZE))
+
         try:
-            rooms = await run_blocking(_fetch_user_rooms, user_id)
-            return jsonify({"rooms": rooms})
+            etag, page = await run_blocking(
+                _fetch_user_rooms_if_modified, user_id, limit, raw_cursor, page_cursor, request
+            )
+            if page is None:
+                return not_modified(etag)
+            rooms, next_cursor = page
+            return jsonify({"rooms": rooms, "next_cursor": next_cursor}, etag=etag)
         except Exception:
             return log_and_internal_server_error(
                 logger,
@@ -172,7 +302,7 @@ async def get_chat_rooms(request: Request):
     else:
         # 非ログインユーザーにはサイドバー上でチャットルーム一覧は表示しない
         # Do not show sidebar room list for guests.
-        return jsonify({"rooms": []})
+        return jsonify({"rooms": [], "next_cursor": None})
 
 
 @chat_bp.post("/api/delete_chat_room", name="chat.delete_chat_room")
@@ -198,6 +328,8 @@ async def delete_chat_room(request: Request):
             payload, status_code = await run_blocking(
                 _delete_room_for_user, room_id, session["user_id"]
             )
+            if status_code == 200:
+                request_room_purge()
             return jsonify(payload, status_code=status_code)
         except Exception:
             return log_and_internal_server_error(
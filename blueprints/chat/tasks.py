@@ -4,17 +4,25 @@ from typing import Any
 from fastapi import Request
 
 from services.async_utils import run_blocking
-from services.db import get_db_connection
-from services.default_tasks import default_task_payloads
+from services.db import ROW_VERSION_COLUMNS, fetch_if_modified, get_db_connection
+from services.default_tasks import (
+    USER_TASK_ROWS_SQL,
+    USER_TASKS_VERSION_SQL,
+    default_task_payloads,
+)
 from services.request_models import (
     AddTaskRequest,
     DeleteTaskRequest,
     EditTaskRequest,
+    MoveTaskRequest,
     UpdateTasksOrderRequest,
 )
 from services.web import (
+    compute_etag,
+    etag_matches,
     jsonify,
     log_and_internal_server_error,
+    not_modified,
     require_json_dict,
     validate_payload_model,
 )
@@ -24,30 +32,28 @@ from . import chat_bp
 logger = logging.getLogger(__name__)
 
 
-def _fetch_tasks_from_db(user_id: int | None) -> list[dict[str, Any]]:
-    # ログイン時はユーザー個別タスク、未ログイン時は共通タスクを取得する
-    # Fetch user-specific tasks when logged in, otherwise shared default tasks.
-    conn = None
+# ログインユーザーのタスク一覧（共通タスクにユーザー差分を重ねた行）を表示順に並べる
+# Logged-in task view: the per-user overlay of shared defaults, in display order.
+_USER_TASKS_SQL = f"""
+    SELECT name,
+           prompt_template,
+           input_examples,
+           output_examples,
+           FALSE AS is_default
+      FROM ({USER_TASK_ROWS_SQL}) merged
+     ORDER BY COALESCE(display_order, 99999), id
+"""
+
+
+def _fetch_tasks_from_db(conn: Any, user_id: int | None) -> list[dict[str, Any]]:
+    # ログイン時は共通タスクにユーザー差分を重ねた一覧、未ログイン時は共通タスクを取得する
+    # Fetch defaults overlaid with the user's overrides when logged in, otherwise shared defaults.
     cursor = None
     try:
-        conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
         if user_id:
-            cursor.execute(
-                """
-              SELECT name,
-                     prompt_template,
-                     input_examples,
-                     output_examples,
-                     FALSE AS is_default
-                FROM task_with_examples
-               WHERE user_id = %s
-               ORDER BY COALESCE(display_order, 99999),
-                        id
-            """,
-                (user_id,),
-            )
+            cursor.execute(_USER_TASKS_SQL, {"user_id": user_id})
         else:
             cursor.execute(
                 """
@@ -66,28 +72,134 @@ def _fetch_tasks_from_db(user_id: int | None) -> list[dict[str, Any]]:
     finally:
         if cursor is not None:
             cursor.close()
+
+
+# 未ログイン時の一覧は共通タスクだけから作られる
+# The guest list is built from the shared defaults alone.
+_DEFAULT_TASKS_VERSION_SQL = f"""
+    SELECT {ROW_VERSION_COLUMNS}
+      FROM task_with_examples
+     WHERE user_id IS NULL
+"""
+
+
+def _tasks_etag(user_id: int | None, version: tuple[Any, ...] | None) -> str | None:
+    # 共通タスクが DB に無いゲストは同梱タスクを返すため、ETag は付けない
+    # Guests without DB defaults get bundled tasks, so skip the ETag there.
+    if not version or not (user_id or version[0]):
+        return None
+    return compute_etag("tasks", user_id, version)
+
+
+def _fetch_tasks_if_modified(
+    user_id: int | None, request: Request
+) -> tuple[str | None, list[dict[str, Any]] | None]:
+    # 検証値と本文をレプリカの同じ接続で読み、If-None-Match と一致すれば本文は None を返す
+    # Read validators and body on one (replica) connection; the body is None on an If-None-Match hit.
+    if user_id:
+        query, params = USER_TASKS_VERSION_SQL, {"user_id": user_id}
+    else:
+        query, params = _DEFAULT_TASKS_VERSION_SQL, None
+
+    def is_current(version: tuple[Any, ...]) -> bool:
+        etag = _tasks_etag(user_id, version)
+        return etag is not None and etag_matches(request, etag)
+
+    version, tasks = fetch_if_modified(
+        query,
+        params,
+        is_current,
+        lambda conn: _fetch_tasks_from_db(conn, user_id),
+        read_only=True,
+    )
+    return _tasks_etag(user_id, version), tasks
+
+
+# unnest(... WITH ORDINALITY) で並び順全体を1文で適用し、値が変わる行だけを書き換える
+# Apply the whole permutation in one statement and rewrite only rows whose order changes.
+# ユーザー所有行は直接更新し、共通タスクの並び順は状態テーブルへ upsert する
+# User-owned rows are updated in place; default-task order is upserted into the state table.
+_BULK_REORDER_SQL = """
+    WITH new_order AS (
+        SELECT o.name, (o.position - 1)::int AS display_order
+          FROM unnest(%(names)s::text[]) WITH ORDINALITY AS o(name, position)
+    ),
+    owned AS (
+        UPDATE task_with_examples AS t
+           SET display_order = n.display_order
+          FROM new_order n
+         WHERE t.user_id = %(user_id)s
+           AND t.name = n.name
+           AND t.display_order IS DISTINCT FROM n.display_order
+    )
+    INSERT INTO user_default_task_states (user_id, default_task_id, display_order)
+    SELECT %(user_id)s, d.id, n.display_order
+      FROM new_order n
+      JOIN task_with_examples d
+        ON d.user_id IS NULL
+       AND d.name = n.name
+     WHERE NOT EXISTS (
+           SELECT 1
+             FROM task_with_examples u
+            WHERE u.user_id = %(user_id)s
+              AND u.name = n.name
+     )
+    ON CONFLICT (user_id, default_task_id) DO UPDATE
+       SET display_order = EXCLUDED.display_order
+     WHERE user_default_task_states.display_order IS DISTINCT FROM EXCLUDED.display_order
+"""
+
+
+# 並び替えはユーザー単位のトランザクションロックで直列化し、同時の移動が互いの結果を上書きしないようにする
+# Serialize reorders per user with a transaction-scoped lock so concurrent moves cannot drop each other.
+_TASK_ORDER_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('task_order'), %(user_id)s)"
+
+
+def _update_tasks_order_for_user(user_id: int, new_order: list[str]) -> None:
+    # 受け取った順序配列で display_order を一括更新する
+    # Bulk-update display_order according to the provided order list.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(_TASK_ORDER_LOCK_SQL, {"user_id": user_id})
+        cursor.execute(_BULK_REORDER_SQL, {"names": list(new_order), "user_id": user_id})
+        conn.commit()
+    finally:
+        if cursor is not None:
+            cursor.close()
         if conn is not None:
             conn.close()
 
 
-def _update_tasks_order_for_user(user_id: int, new_order: list[str]) -> None:
-    # 受け取った順序配列で display_order を更新する
-    # Update display_order according to the provided order list.
+def _move_task_for_user(user_id: int, task_name: str, before_task: str | None) -> bool:
+    # 1件のタスクを before_task の直前（未指定なら末尾）へ移動し、影響行のみ更新する
+    # Move one task before `before_task` (or to the end) and rewrite only affected rows.
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        for index, task_name in enumerate(new_order):
-            cursor.execute(
-                """
-                UPDATE task_with_examples
-                   SET display_order=%s
-                 WHERE name=%s AND user_id=%s
-            """,
-                (index, task_name, user_id),
-            )
+        # 読み取り前にロックを取り、別の移動がコミットした順序を基に並べ替える
+        # Lock before reading so the permutation is built on any concurrently committed order.
+        cursor.execute(_TASK_ORDER_LOCK_SQL, {"user_id": user_id})
+        cursor.execute(_USER_TASKS_SQL, {"user_id": user_id})
+        names = [row[0] for row in cursor.fetchall()]
+        if task_name not in names:
+            return False
+        if before_task is not None and (before_task == task_name or before_task not in names):
+            return False
+
+        names.remove(task_name)
+        if before_task is None:
+            names.append(task_name)
+        else:
+            names.insert(names.index(before_task), task_name)
+
+        cursor.execute(_BULK_REORDER_SQL, {"names": names, "user_id": user_id})
         conn.commit()
+        return True
     finally:
         if cursor is not None:
             cursor.close()
@@ -96,15 +208,30 @@ def _update_tasks_order_for_user(user_id: int, new_order: list[str]) -> None:
 
 
 def _delete_task_for_user(user_id: int, task_name: str) -> None:
-    # ユーザー所有タスクを1件削除する
-    # Delete a single user-owned task.
+    # ユーザー所有タスクを削除し、同名の共通タスクはこのユーザーに対して非表示にする
+    # Delete the user-owned task and hide the same-name default for this user.
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        query = "DELETE FROM task_with_examples WHERE name=%s AND user_id=%s"
-        cursor.execute(query, (task_name, user_id))
+        cursor.execute(
+            """
+            WITH deleted AS (
+                DELETE FROM task_with_examples
+                 WHERE name = %(name)s
+                   AND user_id = %(user_id)s
+            )
+            INSERT INTO user_default_task_states (user_id, default_task_id, is_hidden)
+            SELECT %(user_id)s, d.id, TRUE
+              FROM task_with_examples d
+             WHERE d.user_id IS NULL
+               AND d.name = %(name)s
+            ON CONFLICT (user_id, default_task_id) DO UPDATE
+               SET is_hidden = TRUE
+            """,
+            {"name": task_name, "user_id": user_id},
+        )
         conn.commit()
     finally:
         if cursor is not None:
@@ -113,6 +240,61 @@ def _delete_task_for_user(user_id: int, task_name: str) -> None:
             conn.close()
 
 
+def _materialize_default_task(
+    cursor: Any,
+    user_id: int,
+    old_task: str,
+    new_task: str,
+    prompt_template: str | None,
+    input_examples: str | None,
+    output_examples: str | None,
+) -> bool:
+    # 表示中の共通タスクを編集内容でユーザー行として実体化し、元の共通タスクは非表示にする
+    # Materialize a visible default as a user row with the edits and hide the original default.
+    cursor.execute(
+        """
+        WITH source AS (
+            SELECT d.id,
+                   COALESCE(s.display_order, d.display_order) AS display_order
+              FROM task_with_examples d
+              LEFT JOIN user_default_task_states s
+                ON s.default_task_id = d.id
+               AND s.user_id = %(user_id)s
+             WHERE d.user_id IS NULL
+               AND d.name = %(old_task)s
+               AND NOT COALESCE(s.is_hidden, FALSE)
+             LIMIT 1
+        ),
+        hidden AS (
+            INSERT INTO user_default_task_states (user_id, default_task_id, is_hidden)
+            SELECT %(user_id)s, source.id, TRUE
+              FROM source
+            ON CONFLICT (user_id, default_task_id) DO UPDATE
+               SET is_hidden = TRUE
+        )
+        INSERT INTO task_with_examples
+              (user_id, name, prompt_template, input_examples, output_examples, display_order)
+        SELECT %(user_id)s,
+               %(new_task)s,
+               %(prompt_template)s,
+               %(input_examples)s,
+               %(output_examples)s,
+               source.display_order
+          FROM source
+        RETURNING id
+        """,
+        {
+            "user_id": user_id,
+            "old_task": old_task,
+            "new_task": new_task,
+            "prompt_template": prompt_template,
+            "input_examples": input_examples,
+            "output_examples": output_examples,
+        },
+    )
+    return cursor.fetchone() is not None
+
+
 def _edit_task_for_user(
     user_id: int,
     old_task: str,
@@ -121,8 +303,8 @@ def _edit_task_for_user(
     input_examples: str | None,
     output_examples: str | None,
 ) -> bool:
-    # 対象タスク存在確認後に内容を更新し、更新可否を返す
-    # Update task after existence check and return whether update succeeded.
+    # 所有タスクなら更新し、共通タスクなら初回編集時にユーザー行として実体化する
+    # Update an owned task, or materialize a default task on its first edit.
     conn = None
     sel_cursor = None
     upd_cursor = None
@@ -139,10 +321,23 @@ def _edit_task_for_user(
             (old_task, user_id),
         )
         exists = sel_cursor.fetchone()
-        if not exists:
-            return False
 
         upd_cursor = conn.cursor()
+        if not exists:
+            materialized = _materialize_default_task(
+                upd_cursor,
+                user_id,
+                old_task,
+                new_task,
+                prompt_template,
+                input_examples,
+                output_examples,
+            )
+            if not materialized:
+                return False
+            conn.commit()
+            return True
+
         upd_cursor.execute(
             """
             UPDATE task_with_examples
@@ -207,7 +402,7 @@ def _add_task_for_user(
 async def get_tasks(request: Request):
     """
     ログインしている場合:
-        ・自分のタスクのみ返す（共通タスクは登録時に複製されているため不要）
+        ・共通タスクに自分の編集・非表示・並び順を重ねた一覧を返す
     未ログインの場合:
         ・共通タスク (user_id IS NULL) のみ返す
     """
@@ -219,10 +414,12 @@ async def get_tasks(request: Request):
         if not user_id:
             user_id = None
 
+        etag = None
         tasks = []
         try:
-            tasks = await run_blocking(_fetch_tasks_from_db, user_id)
-
+            etag, tasks = await run_blocking(_fetch_tasks_if_modified, user_id, request)
+            if tasks is None:
+                return not_modified(etag)
         except Exception:
             logger.exception("Database error while loading tasks.")
             # ログインユーザーの場合、DBエラーはそのままエラーとして扱う（または空リスト？）
@@ -242,8 +439,9 @@ async def get_tasks(request: Request):
         # Use bundled default tasks when guest tasks could not be loaded.
         if not user_id and not tasks:
             tasks = default_task_payloads()
+            etag = None
 
-        return jsonify({"tasks": tasks})
+        return jsonify({"tasks": tasks}, etag=etag)
 
     except Exception:
         return log_and_internal_server_error(
@@ -282,6 +480,39 @@ async def update_tasks_order(request: Request):
         )
 
 
+# タスクカード1件の移動（ドラッグ&ドロップ1回分）
+# Move a single task card (one drag-and-drop step).
+@chat_bp.post("/api/move_task", name="chat.move_task")
+async def move_task(request: Request):
+    data, error_response = await require_json_dict(request)
+    if error_response is not None:
+        return error_response
+
+    user_id = request.session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "ログインが必要です"}, status_code=403)
+    payload, validation_error = validate_payload_model(
+        data,
+        MoveTaskRequest,
+        error_message="task is required",
+    )
+    if validation_error is not None:
+        return validation_error
+
+    try:
+        moved = await run_blocking(
+            _move_task_for_user, user_id, payload.task, payload.before_task
+        )
+        if not moved:
+            return jsonify({"error": "対象のタスクが見つかりません"}, status_code=404)
+        return jsonify({"message": "Order updated"}, status_code=200)
+    except Exception:
+        return log_and_internal_server_error(
+            logger,
+            "Failed to move task.",
+        )
+
+
 @chat_bp.post("/api/delete_task", name="chat.delete_task")
 async def delete_task(request: Request):
     data, error_response = await require_json_dict(request)
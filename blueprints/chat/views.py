@@ -1,5 +1,6 @@
 from fastapi import Request
 
+from services.async_utils import run_blocking
 from services.web import redirect_to_frontend
 
 from . import chat_bp, cleanup_ephemeral_chats
@@ -7,7 +8,7 @@ from . import chat_bp, cleanup_ephemeral_chats
 
 @chat_bp.get("/", name="chat.index")
 async def index(request: Request):
-    cleanup_ephemeral_chats()
+    await run_blocking(cleanup_ephemeral_chats)
     return redirect_to_frontend(request)
 
 
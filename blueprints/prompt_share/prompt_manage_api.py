@@ -1,16 +1,20 @@
 # prompt_manage_api.py
 import logging
-from typing import Any
+from typing import Any, Callable
 
 from fastapi import APIRouter, Depends, Request
 
 from services.async_utils import run_blocking
 from services.csrf import require_csrf
-from services.db import get_db_connection
+from services.db import ROW_VERSION_COLUMNS, fetch_validator_row, get_db_connection
+from services.default_tasks import USER_TASK_ROWS_SQL, USER_TASKS_VERSION_SQL
 from services.request_models import PromptUpdateRequest
 from services.web import (
+    compute_etag,
+    etag_matches,
     jsonify,
     log_and_internal_server_error,
+    not_modified,
     require_json_dict,
     validate_payload_model,
 )
@@ -41,18 +45,25 @@ def _fetch_my_prompts(user_id: int) -> list[dict[str, Any]]:
 
 
 def _fetch_saved_prompts(user_id: int) -> list[dict[str, Any]]:
+    # チャット画面と同じ重ね合わせから作り、未編集の共通タスクも一覧に含める
+    # Build from the same overlay as the chat task list so unedited defaults are listed too.
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT id, name, prompt_template, input_examples, output_examples, created_at
-            FROM task_with_examples
-            WHERE user_id = %s
-            ORDER BY created_at DESC, id DESC
+        query = f"""
+            SELECT id,
+                   name,
+                   prompt_template,
+                   input_examples,
+                   output_examples,
+                   created_at,
+                   is_shared AS is_default
+              FROM ({USER_TASK_ROWS_SQL}) merged
+             ORDER BY created_at DESC, id DESC
         """
-        cursor.execute(query, (user_id,))
+        cursor.execute(query, {"user_id": user_id})
         return cursor.fetchall()
     finally:
         if cursor is not None:
@@ -82,6 +93,47 @@ def _fetch_prompt_list(user_id: int) -> list[dict[str, Any]]:
             conn.close()
 
 
+# 管理画面の各一覧はユーザー単位の1テーブルから作られるため、その件数と行バージョンを検証値にする
+# Each manage list is built from one per-user table, so its count and row versions are the validators.
+# 保存済みプロンプトだけはタスクの重ね合わせなので、その全ソースを検証値にする
+# Saved prompts are the task overlay instead, so every source of that overlay is validated.
+_MANAGE_LIST_TABLES = {
+    "my_prompts": "prompts",
+    "prompt_list": "prompt_list_entries",
+}
+
+
+def _fetch_manage_list_version(list_name: str, user_id: int) -> tuple[Any, ...]:
+    if list_name == "saved_prompts":
+        return fetch_validator_row(USER_TASKS_VERSION_SQL, {"user_id": user_id})
+    table = _MANAGE_LIST_TABLES[list_name]
+    query = f"SELECT {ROW_VERSION_COLUMNS} FROM {table} WHERE user_id = %s"
+    return fetch_validator_row(query, (user_id,))
+
+
+async def _manage_list_response(
+    request: Request,
+    list_name: str,
+    fetch_list: Callable[[int], list[dict[str, Any]]],
+    error_context: str,
+):
+    # 検証値が一致すれば一覧を取得せずに 304 を返す
+    # Answer 304 without loading the list when the validators still match.
+    if "user_id" not in request.session:
+        return jsonify({"error": "ログインしていません"}, status_code=401)
+
+    user_id = request.session["user_id"]
+    try:
+        version = await run_blocking(_fetch_manage_list_version, list_name, user_id)
+        etag = compute_etag(list_name, user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        prompts = await run_blocking(fetch_list, user_id)
+        return jsonify({"prompts": prompts}, etag=etag)
+    except Exception:
+        return log_and_internal_server_error(logger, error_context)
+
+
 def _delete_prompt_list_entry_for_user(user_id: int, entry_id: int) -> int:
     conn = None
     cursor = None
@@ -100,15 +152,39 @@ def _delete_prompt_list_entry_for_user(user_id: int, entry_id: int) -> int:
 
 
 def _delete_saved_prompt_for_user(user_id: int, prompt_id: int) -> int:
+    # 自分の行は削除して同名の共通タスクも隠し、共通タスク自体はこのユーザーに対して非表示にする
+    # Delete an own row (hiding its same-name default); a shared default is hidden for this user.
     conn = None
     cursor = None
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        query = "DELETE FROM task_with_examples WHERE id = %s AND user_id = %s"
-        cursor.execute(query, (prompt_id, user_id))
+        cursor.execute(
+            """
+            DELETE FROM task_with_examples
+             WHERE id = %(id)s
+               AND user_id = %(user_id)s
+            RETURNING name
+            """,
+            {"id": prompt_id, "user_id": user_id},
+        )
+        deleted = cursor.fetchone()
+        cursor.execute(
+            """
+            INSERT INTO user_default_task_states (user_id, default_task_id, is_hidden)
+            SELECT %(user_id)s, d.id, TRUE
+              FROM task_with_examples d
+             WHERE d.user_id IS NULL
+               AND (d.name = %(name)s OR d.id = %(id)s)
+            ON CONFLICT (user_id, default_task_id) DO UPDATE
+               SET is_hidden = TRUE
+             WHERE NOT user_default_task_states.is_hidden
+            """,
+            {"id": prompt_id, "name": deleted[0] if deleted else None, "user_id": user_id},
+        )
+        hidden = cursor.rowcount
         conn.commit()
-        return cursor.rowcount
+        return 1 if deleted else hidden
     finally:
         if cursor is not None:
             cursor.close()
@@ -176,51 +252,25 @@ def _delete_prompt_for_user(user_id: int, prompt_id: int) -> int:
 @prompt_manage_api_bp.get("/my_prompts", name="prompt_manage_api.get_my_prompts")
 async def get_my_prompts(request: Request):
     """ログインユーザーが投稿したプロンプト一覧を取得するエンドポイント"""
-    if "user_id" not in request.session:
-        return jsonify({"error": "ログインしていません"}, status_code=401)
-    user_id = request.session["user_id"]
-    try:
-        prompts = await run_blocking(_fetch_my_prompts, user_id)
-        return jsonify({"prompts": prompts})
-    except Exception:
-        return log_and_internal_server_error(
-            logger,
-            "Failed to load my prompts.",
-        )
+    return await _manage_list_response(
+        request, "my_prompts", _fetch_my_prompts, "Failed to load my prompts."
+    )
 
 
 @prompt_manage_api_bp.get("/saved_prompts", name="prompt_manage_api.get_saved_prompts")
 async def get_saved_prompts(request: Request):
     """ログインユーザーが保存したプロンプト（ブックマーク）一覧を取得するエンドポイント"""
-    if "user_id" not in request.session:
-        return jsonify({"error": "ログインしていません"}, status_code=401)
-
-    user_id = request.session["user_id"]
-    try:
-        prompts = await run_blocking(_fetch_saved_prompts, user_id)
-        return jsonify({"prompts": prompts})
-    except Exception:
-        return log_and_internal_server_error(
-            logger,
-            "Failed to load saved prompts.",
-        )
+    return await _manage_list_response(
+        request, "saved_prompts", _fetch_saved_prompts, "Failed to load saved prompts."
+    )
 
 
 @prompt_manage_api_bp.get("/prompt_list", name="prompt_manage_api.get_prompt_list")
 async def get_prompt_list(request: Request):
     """ログインユーザーのプロンプトリストを取得するエンドポイント"""
-    if "user_id" not in request.session:
-        return jsonify({"error": "ログインしていません"}, status_code=401)
-
-    user_id = request.session["user_id"]
-    try:
-        prompts = await run_blocking(_fetch_prompt_list, user_id)
-        return jsonify({"prompts": prompts})
-    except Exception:
-        return log_and_internal_server_error(
-            logger,
-            "Failed to load prompt list.",
-        )
+    return await _manage_list_response(
+        request, "prompt_list", _fetch_prompt_list, "Failed to load prompt list."
+    )
 
 
 @prompt_manage_api_bp.delete(
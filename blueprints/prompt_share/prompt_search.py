@@ -18,7 +18,7 @@ def _search_public_prompts(query):
     conn = None
     cursor = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(read_only=True)
         cursor = conn.cursor(dictionary=True)
         if not query:
             return []
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, Request
 
 from services.async_utils import run_blocking
 from services.csrf import require_csrf
-from services.db import get_db_connection
+from services.db import ROW_VERSION_COLUMNS, fetch_validator_row, get_db_connection
 from services.request_models import (
     BookmarkCreateRequest,
     BookmarkDeleteRequest,
@@ -14,8 +14,11 @@ from services.request_models import (
     SharedPromptCreateRequest,
 )
 from services.web import (
+    compute_etag,
+    etag_matches,
     jsonify,
     log_and_internal_server_error,
+    not_modified,
     require_json_dict,
     validate_payload_model,
 )
@@ -74,10 +77,9 @@ def _get_prompts_with_flags(user_id: int | None) -> list[dict[str, Any]]:
                 if entry["title"]:
                     saved_prompt_titles.add(entry["title"])
 
+        # created_at は datetime のまま返し、レスポンス直列化時に ISO 8601 へ変換する
+        # Keep created_at as datetime; the response encoder renders it as ISO 8601.
         for prompt in prompts:
-            created_at = prompt.get("created_at")
-            if created_at is not None and hasattr(created_at, "isoformat"):
-                prompt["created_at"] = created_at.isoformat()
             prompt["bookmarked"] = prompt["title"] in bookmark_titles
             prompt["saved_to_list"] = (
                 prompt["id"] in saved_prompt_ids
@@ -91,6 +93,23 @@ def _get_prompts_with_flags(user_id: int | None) -> list[dict[str, Any]]:
             conn.close()
 
 
+# 公開プロンプトと、フラグ計算に使うユーザーのブックマーク・リストの件数と行バージョン
+# Row counts and versions of public prompts plus the user's bookmarks and list used for flags.
+_PUBLIC_PROMPTS_VERSION_SQL = f"SELECT {ROW_VERSION_COLUMNS} FROM prompts WHERE is_public = TRUE"
+_USER_PROMPT_FLAGS_VERSION_SQL = f"""
+    SELECT p.*, b.*, l.*
+      FROM (SELECT {ROW_VERSION_COLUMNS} FROM prompts WHERE is_public = TRUE) AS p,
+           (SELECT {ROW_VERSION_COLUMNS} FROM task_with_examples WHERE user_id = %(user_id)s) AS b,
+           (SELECT {ROW_VERSION_COLUMNS} FROM prompt_list_entries WHERE user_id = %(user_id)s) AS l
+"""
+
+
+def _fetch_prompts_version(user_id: int | None) -> tuple[Any, ...]:
+    if user_id:
+        return fetch_validator_row(_USER_PROMPT_FLAGS_VERSION_SQL, {"user_id": user_id})
+    return fetch_validator_row(_PUBLIC_PROMPTS_VERSION_SQL)
+
+
 def _create_prompt_for_user(
     user_id: int,
     title: str,
@@ -256,8 +275,13 @@ async def get_prompts(request: Request):
     session = getattr(request, "session", {}) or {}
     user_id = session.get("user_id")
     try:
+        etag = compute_etag(
+            "shared_prompts", user_id, await run_blocking(_fetch_prompts_version, user_id)
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
         prompts = await run_blocking(_get_prompts_with_flags, user_id)
-        return jsonify({"prompts": prompts})
+        return jsonify({"prompts": prompts}, etag=etag)
     except Exception:
         return log_and_internal_server_error(
             logger,
@@ -14,7 +14,6 @@ from services.users import (
     get_user_by_email,
     set_user_verified,
     get_user_by_id,
-    copy_default_tasks_for_user,
 )
 from services.web import (
     jsonify,
@@ -105,11 +104,9 @@ async def api_verify_registration_code(request: Request):
     register.html の「認証する」ボタンで呼ばれる。
     ・セッション保存の認証コードと照合
     ・一致すればユーザーを is_verified=True にしログイン状態へ
-    ・このタイミングで初期タスクをユーザー専用に複製
     Called by "Verify" action on register page.
     - Compare submitted code with session code
     - Mark user as verified and log them in
-    - Copy default tasks for the verified user
     """
     data, error_response = await require_json_dict(request, status="fail")
     if error_response is not None:
@@ -165,8 +162,6 @@ async def api_verify_registration_code(request: Request):
     # Success path starts here.
     await run_blocking(set_user_verified, user_id)                 # ユーザーを認証済みに
     # Mark user as verified.
-    await run_blocking(copy_default_tasks_for_user, user_id)       # ★ 共通タスクを複製 ★
-    # Copy shared default tasks to this user.
 
     # ログイン状態にセット
     # Set authenticated session fields.
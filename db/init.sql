@@ -16,25 +16,56 @@ CREATE TABLE chat_rooms (
     id VARCHAR(255) PRIMARY KEY,
     user_id INT NOT NULL,
     title VARCHAR(255) DEFAULT '新規チャット',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- chat_history のパーティションキーとして複製されるため NOT NULL
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- 最終メッセージ時刻（メッセージ追加時に同じ文で更新する）
+    last_message_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- 論理削除時刻（履歴はバックグラウンドで分割削除し、完了後に行ごと削除する）
+    deleted_at TIMESTAMP NULL,
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
 CREATE INDEX IF NOT EXISTS idx_chat_rooms_user_created_at
     ON chat_rooms (user_id, created_at DESC);
 
+CREATE INDEX IF NOT EXISTS idx_chat_rooms_user_last_message_at
+    ON chat_rooms (user_id, last_message_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_chat_rooms_pending_purge
+    ON chat_rooms (deleted_at, id)
+    WHERE deleted_at IS NOT NULL;
+
 -- chat_historyテーブル
+-- ルーム作成月 (room_created_at) でレンジ分割し、1ルームの履歴を1パーティションに収める。
+-- パーティションはアプリ起動時と定期処理で先の月まで自動作成される。
 CREATE TABLE chat_history (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     chat_room_id VARCHAR(255) NOT NULL,
+    room_created_at TIMESTAMP NOT NULL,
     message TEXT,
     sender VARCHAR(20) CHECK (sender IN ('user','assistant')),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, room_created_at),
     CONSTRAINT fk_chat_history_room
         FOREIGN KEY (chat_room_id)
         REFERENCES chat_rooms(id)
         ON DELETE CASCADE
-);
+) PARTITION BY RANGE (room_created_at);
+
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR offset_months IN 0..2 LOOP
+        month_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::date;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_history FOR VALUES FROM (%L) TO (%L)',
+            'chat_history_p' || to_char(month_start, 'YYYYMM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
 
 CREATE INDEX IF NOT EXISTS idx_chat_history_room_id_id
     ON chat_history (chat_room_id, id);
@@ -67,6 +98,24 @@ CREATE INDEX IF NOT EXISTS idx_task_with_examples_user_order
 CREATE INDEX IF NOT EXISTS idx_task_with_examples_user_created_at
     ON task_with_examples (user_id, created_at DESC, id DESC);
 
+-- 共通タスク（user_id IS NULL）に対するユーザーごとの並び順・非表示状態
+-- 共通タスクはユーザーが編集した時にのみ task_with_examples へ実体化する
+CREATE TABLE IF NOT EXISTS user_default_task_states (
+    user_id INT NOT NULL,
+    default_task_id INT NOT NULL,
+    display_order INT NULL,
+    is_hidden BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (user_id, default_task_id),
+    CONSTRAINT fk_default_task_state_user
+        FOREIGN KEY (user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_default_task_state_task
+        FOREIGN KEY (default_task_id)
+        REFERENCES task_with_examples(id)
+        ON DELETE CASCADE
+);
+
 -- プロンプト共有のためのテーブル
 CREATE TABLE IF NOT EXISTS prompts (
     id SERIAL PRIMARY KEY,
@@ -176,5 +225,35 @@ BEFORE UPDATE ON memo_entries
 FOR EACH ROW
 EXECUTE FUNCTION set_updated_at();
 
+-- 起動時シード処理の内容ハッシュ（一致時は投入をスキップする）
+CREATE TABLE IF NOT EXISTS app_seed_state (
+    name VARCHAR(64) PRIMARY KEY,
+    fingerprint VARCHAR(64) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- LLM 呼び出しごとのレイテンシ・トークン使用量（追記専用、バッチ書き込み）
+-- ルーム・ユーザー削除後も集計できるよう外部キーは張らない
+CREATE TABLE IF NOT EXISTS llm_call_telemetry (
+    id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    model VARCHAR(255) NOT NULL,
+    provider VARCHAR(32) NOT NULL,
+    streamed BOOLEAN NOT NULL,
+    outcome VARCHAR(16) NOT NULL,
+    prompt_tokens INT NULL,
+    completion_tokens INT NULL,
+    tokens_estimated BOOLEAN NOT NULL DEFAULT FALSE,
+    ttft_ms INT NULL,
+    duration_ms INT NOT NULL,
+    chunk_count INT NOT NULL DEFAULT 0,
+    chat_room_id VARCHAR(255) NULL,
+    user_id INT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_call_telemetry_created_at
+    ON llm_call_telemetry USING BRIN (created_at);
+
 -- 既定タスクは frontend/data/default_tasks.json を単一ソースとして
 -- アプリ起動時（services.default_tasks.ensure_default_tasks_seeded）に投入する。
+-- 内容ハッシュは app_seed_state に保存され、変更がない起動では投入処理を行わない。
@@ -4,30 +4,64 @@
 type ChatRoom = {
   id: string;
   title?: string;
+  last_message_at?: string;
+  last_message?: { sender: string; preview: string } | null;
 };
 
-/* サイドバーにルーム一覧を描画 */
+type ChatRoomPage = {
+  rooms?: ChatRoom[];
+  next_cursor?: string | null;
+  error?: string;
+};
+
+/* サイドバーにルーム一覧を描画（最終メッセージの新しい順・ページ単位） */
 function loadChatRooms() {
-  fetch("/api/get_chat_rooms")
-    .then((r) => r.json())
+  const chatRoomListEl = window.chatRoomListEl;
+  if (!chatRoomListEl) return;
+  fetchChatRoomPage(null)
     .then((data) => {
-      if (data.error) {
-        console.error("get_chat_rooms:", data.error);
-        return;
-      }
-      const chatRoomListEl = window.chatRoomListEl;
-      if (!chatRoomListEl) return;
-      const rooms: ChatRoom[] = Array.isArray(data.rooms) ? data.rooms : [];
       chatRoomListEl.innerHTML = "";
-
-      rooms.forEach((room) => {
-        const card = createRoomCard(room);
-        chatRoomListEl.appendChild(card);
-      });
+      appendChatRoomPage(chatRoomListEl, data);
     })
     .catch((err) => console.error("ルーム一覧取得失敗:", err));
 }
 
+/* 1ページ分のルームを取得（内部 util） */
+function fetchChatRoomPage(cursor: string | null): Promise<ChatRoomPage> {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  return fetch(`/api/get_chat_rooms${query}`).then((r) => r.json());
+}
+
+/* ルームを追記し、続きがあれば「さらに表示」を置く（内部 util） */
+function appendChatRoomPage(listEl: HTMLElement, data: ChatRoomPage) {
+  if (data.error) {
+    console.error("get_chat_rooms:", data.error);
+    return;
+  }
+  const rooms: ChatRoom[] = Array.isArray(data.rooms) ? data.rooms : [];
+  rooms.forEach((room) => listEl.appendChild(createRoomCard(room)));
+
+  const nextCursor = data.next_cursor;
+  if (!nextCursor) return;
+  const more = document.createElement("button");
+  more.type = "button";
+  more.className = "chat-room-load-more";
+  more.textContent = "さらに表示";
+  more.addEventListener("click", () => {
+    more.disabled = true;
+    fetchChatRoomPage(nextCursor)
+      .then((page) => {
+        more.remove();
+        appendChatRoomPage(listEl, page);
+      })
+      .catch((err) => {
+        more.disabled = false;
+        console.error("ルーム一覧取得失敗:", err);
+      });
+  });
+  listEl.appendChild(more);
+}
+
 /* ルームカード生成（内部 util） */
 function createRoomCard(room: ChatRoom) {
   const card = document.createElement("div");
@@ -36,6 +70,7 @@ function createRoomCard(room: ChatRoom) {
 
   const title = document.createElement("span");
   title.textContent = room.title || "新規チャット";
+  if (room.last_message?.preview) card.title = room.last_message.preview;
 
   // 3点アイコン
   const icon = document.createElement("i");
@@ -135,6 +135,12 @@ let isEditingOrder = false;
 let editButton: HTMLButtonElement | null;
 let draggingTask: HTMLElement | null = null;
 let taskPlaceholder: HTMLElement | null = null;
+// ドラッグ開始時の次の要素（位置が変わったかの判定用）
+let dragOriginNext: Element | null = null;
+// 1件移動の保存を順番に送るためのキュー
+let pendingTaskMove: Promise<void> = Promise.resolve();
+// 1件移動の保存に失敗したら、編集完了時に全体の並び順をまとめて送る
+let taskOrderNeedsSync = false;
 let taskOffsetX = 0;
 let taskOffsetY = 0;
 
@@ -370,7 +376,12 @@ function toggleTaskOrderEditing() {
     document.querySelectorAll(".edit-container").forEach((container) => container.remove());
 
     disableTaskDragAndDrop();
-    saveTaskOrder();
+    // ドラッグごとに保存済みなので、送信中の移動を待ち、失敗が残っているときだけ全体を送り直す
+    pendingTaskMove = pendingTaskMove.then(() => {
+      if (taskOrderNeedsSync) {
+        saveTaskOrder();
+      }
+    });
 
     // 編集モードで変更した表示をリセットし、折り畳みボタンを再生成
     document.querySelectorAll<HTMLElement>(".task-selection .prompt-card").forEach((card) => {
@@ -458,6 +469,8 @@ function onTaskPointerDown(e: PointerEvent) {
   draggingTask.style.left = e.clientX - containerRect.left - rect.width / 2 + "px";
   draggingTask.style.top = e.clientY - containerRect.top - rect.height / 2 + "px";
 
+  dragOriginNext = draggingTask.nextElementSibling;
+
   // プレースホルダーを作成（task-wrapper 用）
   taskPlaceholder = document.createElement("div");
   taskPlaceholder.className = "task-wrapper placeholder";
@@ -514,23 +527,64 @@ function onTaskPointerUp() {
   draggingTask.style.zIndex = "";
   taskPlaceholder.remove();
   taskPlaceholder = null;
+  // 位置が変わったときだけ、そのカード1件の移動として保存する
+  if (draggingTask.nextElementSibling !== dragOriginNext) {
+    saveTaskMove(draggingTask);
+  }
   draggingTask = null;
+  dragOriginNext = null;
   document.removeEventListener("pointermove", onTaskPointerMove);
   document.removeEventListener("pointerup", onTaskPointerUp);
 }
 
-// 並び順をサーバーに保存する関数
-function saveTaskOrder() {
-  const wrappers = document.querySelectorAll<HTMLElement>(".task-wrapper");
-  const newOrder = Array.from(wrappers)
-    .map((wrapper) => {
-      const card = wrapper.querySelector<HTMLElement>(".prompt-card");
-      if (!card || card.dataset.is_default === "true") {
-        return null;
+// 並べ替え対象のタスク名（共通タスクは対象外）
+function movableTaskName(wrapper: Element | null): string | null {
+  const card = wrapper?.querySelector<HTMLElement>(".prompt-card");
+  if (!card || card.dataset.is_default === "true") {
+    return null;
+  }
+  return card.getAttribute("data-task");
+}
+
+// ドラッグ1回分を「task を before_task の直前へ」としてサーバーに保存する関数
+function saveTaskMove(wrapper: HTMLElement) {
+  const task = movableTaskName(wrapper);
+  if (!task) return;
+  let next = wrapper.nextElementSibling;
+  while (next && !(next.classList.contains("task-wrapper") && movableTaskName(next))) {
+    next = next.nextElementSibling;
+  }
+  const beforeTask = movableTaskName(next);
+  const body = beforeTask ? { task, before_task: beforeTask } : { task };
+
+  // 前の移動の保存が終わってから送り、サーバー側の適用順をドラッグ順にそろえる
+  pendingTaskMove = pendingTaskMove
+    .then(() =>
+      fetch("/api/move_task", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(body)
+      })
+    )
+    .then((res) => res.json())
+    .then((data) => {
+      if (data.error) {
+        taskOrderNeedsSync = true;
+        alert("並び順の保存に失敗: " + data.error);
+      } else if (window.invalidateTasksCache) {
+        window.invalidateTasksCache();
       }
-      return card.getAttribute("data-task");
     })
-    .filter(Boolean);
+    .catch((err) => {
+      taskOrderNeedsSync = true;
+      alert("並び順の保存に失敗: " + err.toString());
+    });
+}
+
+// 並び順全体をサーバーに保存する関数（まとめて並べ替えたときや、1件移動の保存に失敗したとき用）
+function saveTaskOrder() {
+  const wrappers = document.querySelectorAll<HTMLElement>(".task-wrapper");
+  const newOrder = Array.from(wrappers).map(movableTaskName).filter(Boolean);
 
   if (newOrder.length === 0) {
     return;
@@ -545,8 +599,9 @@ function saveTaskOrder() {
     .then((data) => {
       if (data.error) {
         alert("並び順の保存に失敗: " + data.error);
-      } else if (window.invalidateTasksCache) {
-        window.invalidateTasksCache();
+      } else {
+        taskOrderNeedsSync = false;
+        if (window.invalidateTasksCache) window.invalidateTasksCache();
       }
     })
     .catch((err) => {
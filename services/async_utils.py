@@ -1,10 +1,15 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import threading
+import time
 from functools import partial
 from typing import Any, Callable, TypeVar
 
+from services.profiling import current_profile
+from services.request_context import current_spans
+
 T = TypeVar("T")
 
 
@@ -14,14 +19,29 @@ async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
     loop = asyncio.get_running_loop()
     result_future: asyncio.Future[T] = loop.create_future()
     bound = partial(func, *args, **kwargs) if kwargs else partial(func, *args)
+    # 呼び出し元の contextvars（リクエストID・計測スパン）をスレッドへ引き継ぐ
+    # Carry the caller's contextvars (request id, timing spans) into the worker thread.
+    context = contextvars.copy_context()
+    spans = current_spans()
+    profile = current_profile()
+    submitted_at = time.perf_counter()
 
     def runner() -> None:
+        if spans is not None:
+            spans.add("queue_wait", time.perf_counter() - submitted_at)
+        # プロファイル中のリクエストから起動されたスレッドはサンプリング対象に加える
+        # Threads started by a request under profiling are sampled as well.
+        if profile is not None:
+            profile.add_thread(threading.get_ident())
         try:
-            result = bound()
+            result = context.run(bound)
         except BaseException as exc:
             loop.call_soon_threadsafe(result_future.set_exception, exc)
         else:
             loop.call_soon_threadsafe(result_future.set_result, result)
+        finally:
+            if profile is not None:
+                profile.remove_thread(threading.get_ident())
 
     threading.Thread(target=runner, daemon=True).start()
     return await result_future
@@ -3,6 +3,9 @@ import os
 import time
 from typing import Any
 
+from . import metrics
+from .request_context import record_span
+
 try:
     import redis
 except ModuleNotFoundError:  # pragma: no cover - optional for test envs
@@ -16,6 +19,57 @@ DEFAULT_REDIS_RETRY_COOLDOWN_SECONDS = 5
 
 logger = logging.getLogger(__name__)
 
+_redis_command_seconds = metrics.histogram(
+    "chatcore_redis_command_duration_seconds",
+    "Redis command latency by command name.",
+    ("command",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+_redis_command_errors_total = metrics.counter(
+    "chatcore_redis_command_errors_total",
+    "Redis commands that raised, by command name.",
+    ("command",),
+)
+_redis_unavailable_total = metrics.counter(
+    "chatcore_redis_unavailable_total",
+    "Times Redis was marked unavailable and callers fell back to local behaviour.",
+)
+
+
+def _collect_redis_fallback() -> list[tuple[tuple[str, ...], float]]:
+    # 設定済みなのにクライアントが無い（クールダウン中）ならフォールバック中とみなす
+    # Configured but without a live client means callers are currently on the fallback path.
+    if not is_redis_configured():
+        return []
+    return [((), 1 if _redis_client is None else 0)]
+
+
+metrics.gauge_function(
+    "chatcore_redis_fallback_active",
+    "1 while Redis is configured but unavailable and local fallbacks are in use.",
+    (),
+    _collect_redis_fallback,
+)
+
+
+if redis is not None:
+
+    class _InstrumentedRedis(redis.Redis):
+        # 全コマンドが通る execute_command で所要時間と失敗を記録する
+        # Time every command (and count failures) at the single execute_command entry point.
+        def execute_command(self, *args: Any, **options: Any) -> Any:
+            command = str(args[0]).lower() if args else "unknown"
+            start = time.perf_counter()
+            try:
+                return super().execute_command(*args, **options)
+            except Exception:
+                _redis_command_errors_total.inc(command)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                _redis_command_seconds.observe(elapsed, command)
+                record_span("redis", elapsed)
+
 
 def is_redis_configured() -> bool:
     return bool(os.environ.get("REDIS_URL") or os.environ.get("REDIS_HOST"))
@@ -25,6 +79,7 @@ def mark_redis_unavailable(exc: Exception | None = None) -> None:
     global _redis_client, _redis_retry_after
     _redis_client = None
     _redis_retry_after = time.monotonic() + DEFAULT_REDIS_RETRY_COOLDOWN_SECONDS
+    _redis_unavailable_total.inc()
     if exc is not None:
         logger.warning(
             "Redis is unavailable; falling back to local session/cache behavior for %s seconds.",
@@ -51,13 +106,13 @@ def get_redis_client() -> Any | None:
     # Prefer REDIS_URL, otherwise build client from host/port/db settings.
     url = os.environ.get("REDIS_URL")
     if url:
-        candidate = redis.Redis.from_url(url, decode_responses=True)
+        candidate = _InstrumentedRedis.from_url(url, decode_responses=True)
     else:
         host = os.environ.get("REDIS_HOST")
         port = int(os.environ.get("REDIS_PORT", "6379"))
         db = int(os.environ.get("REDIS_DB", "0"))
         password = os.environ.get("REDIS_PASSWORD")
-        candidate = redis.Redis(
+        candidate = _InstrumentedRedis(
             host=host,
             port=port,
             db=db,
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime
+from typing import Any
+
+from .db import get_db_connection
+
+# chat_history はルーム作成時刻 (room_created_at) の月単位でレンジ分割する。
+# 1ルームの履歴は必ず1パーティションに収まるため、ルーム単位のクエリは1パーティションに絞り込める
+# chat_history is range-partitioned by month of the room's creation time (room_created_at).
+# A room's whole history lives in one partition, so per-room queries prune to exactly one.
+PARTITION_PREFIX = "chat_history_p"
+ARCHIVE_PREFIX = "chat_history_archive_"
+DEFAULT_PARTITIONS_AHEAD = 2
+DEFAULT_MAINTENANCE_INTERVAL_SECONDS = 6 * 3600
+_PARTITION_NAME_RE = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+_MAINTENANCE_LOCK_KEY = "chatcore:chat_history_partitions"
+
+# ルームIDだけを受け取るクエリで、パーティションキーをルーム行から引いて実行時に1パーティションへ絞り込む
+# For queries that only know the room id, look up the partition key so run-time pruning keeps one partition.
+ROOM_PARTITION_KEY_SQL = "(SELECT created_at FROM chat_rooms WHERE id = %(room_id)s)"
+
+logger = logging.getLogger(__name__)
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}{month.month:02d}"
+
+
+def parse_partition_month(name: str) -> date | None:
+    match = _PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def _is_partitioned(cursor: Any) -> bool:
+    # マイグレーション未適用（通常テーブル）の環境では何もしない
+    # Do nothing while chat_history is still a plain table (migration not applied).
+    cursor.execute(
+        """
+        SELECT c.relkind
+          FROM pg_class c
+         WHERE c.oid = to_regclass('chat_history')
+        """
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _attached_partitions(cursor: Any) -> list[str]:
+    cursor.execute(
+        """
+        SELECT child.relname
+          FROM pg_inherits i
+          JOIN pg_class child ON child.oid = i.inhrelid
+         WHERE i.inhparent = to_regclass('chat_history')
+         ORDER BY child.relname
+        """
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _lock_maintenance(cursor: Any) -> None:
+    # 複数ワーカーが同時に同じパーティションを作成・切り離さないようにする
+    # Keep concurrent workers from creating or detaching the same partition.
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (_MAINTENANCE_LOCK_KEY,))
+
+
+def ensure_chat_history_partitions(
+    today: date | None = None, months_ahead: int | None = None
+) -> list[str]:
+    # 今月から months_ahead ヶ月先までのパーティションを用意し、作成した名前を返す
+    # Create partitions from this month through months_ahead months ahead; return the new names.
+    current = month_start(today or date.today())
+    ahead = DEFAULT_PARTITIONS_AHEAD if months_ahead is None else max(0, months_ahead)
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if not _is_partitioned(cursor):
+            conn.rollback()
+            return []
+        _lock_maintenance(cursor)
+        existing = set(_attached_partitions(cursor))
+        created = []
+        for offset in range(ahead + 1):
+            month = _add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {name}
+                    PARTITION OF chat_history
+                    FOR VALUES FROM (%s) TO (%s)
+                """,
+                (month, _add_months(month, 1)),
+            )
+            created.append(name)
+        conn.commit()
+        return created
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def _close_inactive_rooms(cursor: Any, month: date, cutoff: date) -> bool:
+    # その月に作成された未削除ルームをロックし、保持期間内に発言があれば False を返す。
+    # 全て休眠中なら論理削除して一覧・投稿の対象から外す（履歴はアーカイブ側に残る）
+    # Lock the month's live rooms; return False if any had a message inside the retention window.
+    # Otherwise soft-delete them so they drop out of listings and posting (history stays archived).
+    cursor.execute(
+        """
+        SELECT id, last_message_at >= %(cutoff)s AS is_active
+          FROM chat_rooms
+         WHERE created_at >= %(start)s
+           AND created_at < %(end)s
+           AND deleted_at IS NULL
+           FOR UPDATE
+        """,
+        {"start": month, "end": _add_months(month, 1), "cutoff": cutoff},
+    )
+    rooms = cursor.fetchall()
+    if any(is_active for _, is_active in rooms):
+        return False
+    if rooms:
+        cursor.execute(
+            """
+            UPDATE chat_rooms
+               SET deleted_at = CURRENT_TIMESTAMP
+             WHERE id = ANY(%s)
+            """,
+            ([room_id for room_id, _ in rooms],),
+        )
+    return True
+
+
+def _drop_foreign_keys(cursor: Any, table: str) -> None:
+    # 切り離し後も複製された外部キーが残るため、ルーム削除の CASCADE がアーカイブへ及ばないよう外す
+    # Detaching keeps the cloned foreign key; drop it so purging rooms never cascades into the archive.
+    cursor.execute(
+        """
+        SELECT conname
+          FROM pg_constraint
+         WHERE conrelid = to_regclass(%s)
+           AND contype = 'f'
+        """,
+        (table,),
+    )
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"')
+
+
+def archive_old_chat_history_partitions(
+    retention_months: int, today: date | None = None
+) -> list[str]:
+    # retention_months より前に作成され、保持期間内に発言の無いルームだけのパーティションを切り離し、
+    # アーカイブ名へ変更する。切り離したテーブルは残るので、pg_dump やコールドストレージへの退避は運用側で行う
+    # Detach partitions whose rooms were created before the retention window and have been quiet
+    # since, and rename them as archives. The detached tables are kept so operators can dump or
+    # move them to cold storage.
+    if retention_months <= 0:
+        return []
+    cutoff = _add_months(month_start(today or date.today()), -retention_months)
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if not _is_partitioned(cursor):
+            conn.rollback()
+            return []
+        _lock_maintenance(cursor)
+        archived = []
+        for name in _attached_partitions(cursor):
+            month = parse_partition_month(name)
+            if month is None or month >= cutoff:
+                continue
+            # ルームは作成月のパーティションに書き続けるため、まだ使われている月は切り離さない
+            # Rooms keep writing into their creation month, so months still in use stay attached.
+            if not _close_inactive_rooms(cursor, month, cutoff):
+                logger.info(
+                    "Kept chat_history partition with recently active rooms.",
+                    extra={"partition": name},
+                )
+                continue
+            archive_name = f"{ARCHIVE_PREFIX}{month.year:04d}{month.month:02d}"
+            cursor.execute(f"ALTER TABLE chat_history DETACH PARTITION {name}")
+            cursor.execute(f"ALTER TABLE {name} RENAME TO {archive_name}")
+            _drop_foreign_keys(cursor, archive_name)
+            archived.append(archive_name)
+        conn.commit()
+        return archived
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def run_chat_history_partition_maintenance() -> None:
+    created = ensure_chat_history_partitions(
+        months_ahead=_int_env("CHAT_HISTORY_PARTITIONS_AHEAD", DEFAULT_PARTITIONS_AHEAD)
+    )
+    if created:
+        logger.info("Created chat_history partitions.", extra={"partitions": created})
+    archived = archive_old_chat_history_partitions(
+        _int_env("CHAT_HISTORY_RETENTION_MONTHS", 0)
+    )
+    if archived:
+        logger.info("Archived chat_history partitions.", extra={"partitions": archived})
+
+
+def run_partition_maintenance_loop(
+    stop_event: threading.Event,
+    *,
+    interval_seconds: float = DEFAULT_MAINTENANCE_INTERVAL_SECONDS,
+) -> None:
+    # 月替わりより十分前に次のパーティションが存在するよう定期的に確認する
+    # Re-check periodically so next month's partition exists well before it is needed.
+    while not stop_event.wait(timeout=interval_seconds):
+        try:
+            run_chat_history_partition_maintenance()
+        except Exception:
+            logger.exception("Failed to maintain chat_history partitions.")
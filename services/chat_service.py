@@ -1,14 +1,33 @@
+from .chat_partitions import ROOM_PARTITION_KEY_SQL
 from .db import get_db_connection
 
 
 def save_message_to_db(chat_room_id: str, message: str, sender: str) -> None:
-    # チャットメッセージを履歴テーブルへ追加する
-    # Insert a chat message into the history table.
+    # チャットメッセージを履歴テーブルへ追加し、同じ文でルームの最終メッセージ時刻を進める。
+    # パーティションキー room_created_at はルーム行から引き継ぐ
+    # Insert a chat message and advance the room's last_message_at in the same statement;
+    # the room_created_at partition key is copied from the room row.
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        query = "INSERT INTO chat_history (chat_room_id, message, sender) VALUES (%s, %s, %s)"
-        cursor.execute(query, (chat_room_id, message, sender))
+        query = """
+            WITH inserted AS (
+                INSERT INTO chat_history (chat_room_id, room_created_at, message, sender)
+                SELECT r.id, r.created_at, %(message)s, %(sender)s
+                  FROM chat_rooms r
+                 WHERE r.id = %(room_id)s
+                RETURNING chat_room_id, timestamp
+            )
+            UPDATE chat_rooms r
+               SET last_message_at = GREATEST(r.last_message_at, inserted.timestamp)
+              FROM inserted
+             WHERE r.id = inserted.chat_room_id
+        """
+        cursor.execute(
+            query, {"room_id": chat_room_id, "message": message, "sender": sender}
+        )
+        if cursor.rowcount == 0:
+            raise LookupError(f"chat room {chat_room_id!r} does not exist")
         conn.commit()
     finally:
         cursor.close()
@@ -51,10 +70,14 @@ def get_chat_room_messages(chat_room_id: str) -> list[dict[str, str]]:
     cursor = conn.cursor()
     messages = []
     try:
-        query = (
-            "SELECT message, sender FROM chat_history WHERE chat_room_id = %s ORDER BY id ASC"
-        )
-        cursor.execute(query, (chat_room_id,))
+        query = f"""
+            SELECT message, sender
+              FROM chat_history
+             WHERE chat_room_id = %(room_id)s
+               AND room_created_at = {ROOM_PARTITION_KEY_SQL}
+             ORDER BY id ASC
+        """
+        cursor.execute(query, {"room_id": chat_room_id})
         rows = cursor.fetchall()
         for (message, sender) in rows:
             role = 'user' if sender == 'user' else 'assistant'
@@ -75,7 +98,9 @@ def validate_room_owner(
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        check_q = "SELECT user_id FROM chat_rooms WHERE id = %s"
+        # 論理削除済みのルームは存在しないものとして扱う
+        # Treat soft-deleted rooms as missing.
+        check_q = "SELECT user_id FROM chat_rooms WHERE id = %s AND deleted_at IS NULL"
         cursor.execute(check_q, (room_id,))
         result = cursor.fetchone()
         if not result:
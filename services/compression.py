@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli / zstandard は任意依存。未導入なら gzip のみで動作する
+# brotli / zstandard are optional; without them only gzip is offered.
+try:
+    import brotli
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+DEFAULT_MINIMUM_SIZE = 1024
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# SSE はトークン単位の低遅延配信が目的のため圧縮しない（バッファリングで初回表示が遅れる）
+# SSE exists for low-latency token delivery, so it is never compressed (buffering delays first paint).
+_NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self) -> None:
+        # 動的レスポンス向けに速度重視の品質を使う
+        # Use a speed-oriented quality suited to dynamic responses.
+        self._compressor = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> list[str]:
+    # サーバー側の優先順（圧縮率と速度のバランス順）
+    # Server preference order, balancing ratio and speed.
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def _new_encoder(name: str) -> Any:
+    if name == "zstd":
+        return _ZstdEncoder()
+    if name == "br":
+        return _BrotliEncoder()
+    return _GzipEncoder()
+
+
+def select_encoding(accept_encoding: str, supported: list[str]) -> str | None:
+    # Accept-Encoding の q 値を解釈し、q=0 を除外したうえで最も高い q の候補を選ぶ
+    # Parse q-values, drop q=0 and pick the highest-q candidate (server order breaks ties).
+    qualities: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[token] = quality
+
+    best: str | None = None
+    best_quality = 0.0
+    for name in supported:
+        quality = qualities.get(name, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _is_compressible(content_type: str, allowed_types: tuple[str, ...]) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if not media_type or media_type in _NEVER_COMPRESS_TYPES:
+        return False
+    return any(
+        media_type.startswith(allowed) if allowed.endswith("/") else media_type == allowed
+        for allowed in allowed_types
+    )
+
+
+class CompressionMiddleware:
+    # 小さいレスポンス・対象外の Content-Type・SSE はそのまま返し、それ以外を圧縮する
+    # Pass small bodies, non-allowlisted types and SSE through untouched; compress everything else.
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        compressible_types: tuple[str, ...] = DEFAULT_COMPRESSIBLE_TYPES,
+        encodings: list[str] | None = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressible_types = tuple(compressible_types)
+        self.encodings = encodings if encodings is not None else available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = select_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), self.encodings
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            send,
+            encoding=encoding,
+            minimum_size=self.minimum_size,
+            compressible_types=self.compressible_types,
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(
+        self,
+        send: Send,
+        *,
+        encoding: str,
+        minimum_size: int,
+        compressible_types: tuple[str, ...],
+    ) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._compressible_types = compressible_types
+        self._start_message: Message | None = None
+        self._encoder: Any | None = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # 本文の最初のチャンクを見るまで圧縮可否を決められないため保留する
+            # Hold the start message until the first body chunk decides whether to compress.
+            self._start_message = message
+            headers = Headers(raw=message.get("headers", []))
+            status = int(message["status"])
+            if (
+                status < 200
+                or status in (204, 304)
+                or "content-encoding" in headers
+                or not _is_compressible(headers.get("content-type", ""), self._compressible_types)
+            ):
+                self._passthrough = True
+                await self._flush_start()
+            return
+
+        if message_type != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._encoder is None:
+            if not more_body and len(body) < self._minimum_size:
+                # しきい値未満の単発レスポンスは圧縮コストに見合わない
+                # Single small bodies are not worth the compression overhead.
+                self._passthrough = True
+                self._add_vary()
+                await self._flush_start()
+                await self._send(message)
+                return
+            self._begin_compression(streaming=more_body)
+            if not more_body:
+                # 単発レスポンスは圧縮後の長さを Content-Length に設定できる
+                # Single-message bodies can advertise their compressed length.
+                compressed = self._encoder.compress(body) + self._encoder.finish()
+                MutableHeaders(scope=self._start_message)["Content-Length"] = str(len(compressed))
+                await self._flush_start()
+                await self._send(
+                    {"type": "http.response.body", "body": compressed, "more_body": False}
+                )
+                return
+            await self._flush_start()
+
+        encoder = self._encoder
+        if more_body:
+            # ストリーミング本文はチャンクごとに同期フラッシュし、受信側が即座に展開できるようにする
+            # Sync-flush each streamed chunk so the client can decode it without waiting.
+            chunk = encoder.compress(body) + encoder.flush() if body else b""
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+            return
+
+        await self._send(
+            {
+                "type": "http.response.body",
+                "body": encoder.compress(body) + encoder.finish(),
+                "more_body": False,
+            }
+        )
+
+    def _add_vary(self, headers: MutableHeaders | None = None) -> None:
+        # MutableHeaders(scope=...) はヘッダーリストを複製して差し替えるため、同じインスタンスを使い回す
+        # MutableHeaders(scope=...) swaps in a copied header list, so reuse one instance per message.
+        if headers is None:
+            headers = MutableHeaders(scope=self._start_message)
+        vary = headers.get("vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding"
+
+    def _begin_compression(self, *, streaming: bool) -> None:
+        self._encoder = _new_encoder(self._encoding)
+        headers = MutableHeaders(scope=self._start_message)
+        headers["Content-Encoding"] = self._encoding
+        self._add_vary(headers)
+        if "content-length" in headers:
+            del headers["content-length"]
+        # 圧縮後の表現はバイト単位で異なるため、強い ETag は弱い ETag に変換する
+        # The encoded representation differs byte-for-byte, so demote strong ETags to weak ones.
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if streaming:
+            headers.setdefault("X-Accel-Buffering", "no")
+
+    async def _flush_start(self) -> None:
+        if self._start_message is not None:
+            start_message, self._start_message = self._start_message, None
+            await self._send(start_message)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+
+from . import metrics
+from .async_utils import run_blocking
+from .request_context import record_span
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_cpu_tasks_total = metrics.counter(
+    "chatcore_cpu_pool_tasks_total",
+    "CPU-bound tasks by outcome (ok, error, rejected).",
+    ("outcome",),
+)
+_cpu_task_seconds = metrics.histogram(
+    "chatcore_cpu_pool_task_seconds",
+    "Wall time of CPU-bound tasks, including time queued for a worker process.",
+)
+_cpu_in_flight = metrics.in_flight_gauge(
+    "chatcore_cpu_pool_in_flight",
+    "CPU-bound tasks submitted and not yet finished in this worker.",
+)
+
+_executor_lock = threading.Lock()
+_executor: ProcessPoolExecutor | None = None
+_pending_lock = threading.Lock()
+_pending = 0
+
+
+class CpuPoolBusyError(RuntimeError):
+    pass
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def get_cpu_pool_workers() -> int:
+    # 0 なら専用プロセスを使わずスレッドで実行する
+    # 0 runs tasks on threads instead of dedicated processes.
+    return max(0, _int_env("CPU_POOL_WORKERS", min(2, os.cpu_count() or 1)))
+
+
+def get_cpu_pool_max_pending() -> int:
+    # 同時に受け付ける件数の上限。超えた分は待たせずに CpuPoolBusyError で断る
+    # Cap on accepted tasks; anything beyond is refused with CpuPoolBusyError instead of queueing.
+    return max(1, _int_env("CPU_POOL_MAX_PENDING", max(get_cpu_pool_workers(), 1) * 2))
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # スレッドを抱えた親プロセスを fork するとロックが壊れうるため spawn で起動する
+            # Use spawn: forking a process that already runs threads can leave locks broken.
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    # PBKDF2 などの CPU 負荷の高い処理を専用プロセスで実行し、イベントループとワーカースレッドを空ける。
+    # func と引数は pickle 可能なモジュールレベルの関数・値であること
+    # Run CPU-heavy work such as PBKDF2 on dedicated processes, keeping the event loop and worker
+    # threads free. func and its arguments must be picklable (module-level functions and values).
+    global _pending
+    with _pending_lock:
+        if _pending >= get_cpu_pool_max_pending():
+            _cpu_tasks_total.inc("rejected")
+            raise CpuPoolBusyError("CPU pool is at its concurrency limit.")
+        _pending += 1
+
+    start = time.perf_counter()
+    _cpu_in_flight.inc()
+    try:
+        workers = get_cpu_pool_workers()
+        if workers == 0:
+            result = await run_blocking(func, *args)
+        else:
+            executor = _get_executor(workers)
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                # 子プロセスが異常終了したプールは捨て、次回作り直す
+                # Drop a pool whose child died; the next call builds a fresh one.
+                logger.warning("CPU process pool broke; it will be recreated.")
+                _discard_executor(executor)
+                raise
+    except Exception:
+        _cpu_tasks_total.inc("error")
+        raise
+    finally:
+        _cpu_in_flight.dec()
+        with _pending_lock:
+            _pending -= 1
+        elapsed = time.perf_counter() - start
+        _cpu_task_seconds.observe(elapsed)
+        record_span("cpu_pool", elapsed)
+    _cpu_tasks_total.inc("ok")
+    return result
+
+
+def shutdown_cpu_pool() -> None:
+    global _executor
+    with _executor_lock:
+        executor = _executor
+        _executor = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,28 +1,126 @@
 import atexit
+import logging
 import os
+import sys
 import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
 from types import TracebackType
-from typing import Any
+from typing import Any, Callable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # テスト環境では psycopg2 が未導入の場合があるため遅延フォールバックする
 # Allow graceful fallback when psycopg2 is unavailable in test environments.
 try:
     import psycopg2
     from psycopg2 import Error, extras
-    from psycopg2.pool import ThreadedConnectionPool
 except ModuleNotFoundError:  # pragma: no cover - optional for test envs
     psycopg2 = None
     Error = Exception
     extras = None
-    ThreadedConnectionPool = None
 
 
+from . import metrics
+from .db_pool import (
+    DEFAULT_CHECKOUT_TIMEOUT_SECONDS,
+    DEFAULT_LIVENESS_INTERVAL_SECONDS,
+    DEFAULT_MAX_IDLE_SECONDS,
+    DEFAULT_MAX_LIFETIME_SECONDS,
+    ManagedConnectionPool,
+    PoolTimeoutError,
+)
+from .query_stats import caller_label, record_query
+from .request_context import record_span
+
+logger = logging.getLogger(__name__)
+
 _pool_lock = threading.Lock()
 DbConfig = dict[str, str | int]
-PoolKey = tuple[tuple[str, ...], str, str, str, int, int, int]
 
-_connection_pool: Any | None = None
-_connection_pool_key: PoolKey | None = None
+# 行数と xmin（行バージョン）の合計。挿入・更新・削除のいずれでも値が変わる安価な検証値
+# Row count plus the sum of xmin row versions; any insert, update or delete changes it.
+ROW_VERSION_COLUMNS = "COUNT(*), COALESCE(SUM(xmin::text::bigint), 0)"
+
+_connection_pool: ManagedConnectionPool | None = None
+_replica_pool: ManagedConnectionPool | None = None
+
+DEFAULT_REPLICA_MAX_LAG_SECONDS = 5.0
+DEFAULT_REPLICA_LAG_CHECK_SECONDS = 2.0
+DEFAULT_REPLICA_RETRY_SECONDS = 30.0
+DEFAULT_READ_YOUR_WRITES_SECONDS = 10.0
+# 最後に書き込みをコミットした時刻（epoch 秒）を保持するセッションキー
+# Session key holding the epoch time of the user's last committed write.
+LAST_WRITE_SESSION_KEY = "_db_last_write_at"
+
+# レプリカの遅延（秒）。受信済み WAL をすべて適用済みなら 0、プライマリ上なら 0
+# Replica lag in seconds: 0 once every received WAL record is replayed, and 0 on a primary.
+_REPLICA_LAG_SQL = """
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+_replica_lag_lock = threading.Lock()
+_replica_lag_seconds: float | None = None
+_replica_lag_checked_at = 0.0
+_replica_retry_after = 0.0
+
+# リクエスト単位の書き込み状態 {"recent": 直近に書き込んだか, "wrote": このリクエストでコミットしたか}。
+# run_blocking はコンテキストをコピーするが dict は共有されるため、ワーカースレッドの commit も見える
+# Per-request write state {"recent": wrote within the window, "wrote": committed in this request}.
+# run_blocking copies the context but shares the dict, so commits on worker threads are visible.
+_write_state_var: ContextVar[dict[str, bool] | None] = ContextVar("db_write_state", default=None)
+
+
+class _InstrumentedCursor:
+    # execute/executemany の所要時間をリクエストの db スパンとクエリ統計（呼び出し元付き）へ記録する。
+    # その他の属性は元のカーソルへ委譲する
+    # Record execute/executemany time in the request's db span and in the query stats, tagged
+    # with the calling function. Everything else is delegated to the real cursor.
+    def __init__(self, cursor: Any) -> None:
+        self._cursor = cursor
+
+    def _record(self, query: Any, params: Any, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        record_span("db", elapsed)
+        # 0: _record, 1: execute/executemany, 2: 呼び出し元 / the caller
+        record_query(self._cursor, query, params, elapsed, caller_label(sys._getframe(2)))
+
+    def execute(self, query: Any, params: Any = None) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params)
+        finally:
+            self._record(query, params, start)
+
+    def executemany(self, query: Any, params_seq: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, params_seq)
+        finally:
+            self._record(query, None, start)
+
+    def __iter__(self) -> Any:
+        return iter(self._cursor)
+
+    def __enter__(self) -> "_InstrumentedCursor":
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> Any:
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
 
 
 class _ConnectionProxy:
@@ -30,10 +128,11 @@ class _ConnectionProxy:
     # Lightweight wrapper that prevents reuse after returning to the pool.
     """Pooled connection wrapper with dictionary=True cursor support."""
 
-    def __init__(self, connection: Any, connection_pool: Any) -> None:
+    def __init__(self, connection: Any, connection_pool: Any, *, replica: bool = False) -> None:
         self._connection = connection
         self._connection_pool = connection_pool
         self._returned = False
+        self.replica = replica
 
     def _ensure_open(self) -> None:
         if self._returned or self._connection is None:
@@ -48,7 +147,16 @@ class _ConnectionProxy:
             if extras is None:
                 raise RuntimeError("psycopg2 extras are required for dictionary cursors.")
             kwargs["cursor_factory"] = extras.RealDictCursor
-        return self._connection.cursor(*args, **kwargs)
+        return _InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def commit(self) -> None:
+        self._ensure_open()
+        self._connection.commit()
+        # プライマリへのコミットを記録し、直後の読み取りをプライマリへ寄せる
+        # Note commits on the primary so the user's next reads stick to it.
+        state = _write_state_var.get()
+        if state is not None and not self.replica:
+            state["wrote"] = True
 
     def close(self) -> None:
         if self._returned or self._connection is None:
@@ -152,113 +260,466 @@ def _get_pool_bounds() -> tuple[int, int]:
     return min_conn, max_conn
 
 
-def _build_pool_key(
-    config: DbConfig, hosts: list[str], min_conn: int, max_conn: int
-) -> PoolKey:
-    return (
-        tuple(hosts),
-        config["user"],
-        config["password"],
-        config["dbname"],
-        config["port"],
-        min_conn,
-        max_conn,
-    )
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@lru_cache(maxsize=1)
+def _get_pool_options() -> dict[str, float]:
+    # プール作成時に1度だけ読む。close_db_pool() でキャッシュを捨てる
+    # Read once when pools are built; close_db_pool() drops the cache.
+    return {
+        "checkout_timeout": _float_env(
+            "DB_POOL_CHECKOUT_TIMEOUT_SECONDS", DEFAULT_CHECKOUT_TIMEOUT_SECONDS
+        ),
+        "max_lifetime": _float_env("DB_POOL_MAX_LIFETIME_SECONDS", DEFAULT_MAX_LIFETIME_SECONDS),
+        "max_idle": _float_env("DB_POOL_MAX_IDLE_SECONDS", DEFAULT_MAX_IDLE_SECONDS),
+        "liveness_interval": _float_env(
+            "DB_POOL_LIVENESS_INTERVAL_SECONDS", DEFAULT_LIVENESS_INTERVAL_SECONDS
+        ),
+    }
+
+
+def _failover_connect(config: DbConfig, hosts: list[str]) -> Callable[[], Any]:
+    # 直近に接続できたホストから順に試し、失敗したら残りのホストへ切り替える
+    # Try the host that last worked first and fail over to the others in order.
+    preferred = [0]
+
+    def connect() -> Any:
+        first_exc = None
+        start = preferred[0]
+        for offset in range(len(hosts)):
+            index = (start + offset) % len(hosts)
+            try:
+                connection = psycopg2.connect(**{**config, "host": hosts[index]})
+            except Exception as exc:  # pragma: no cover - depends on env
+                if first_exc is None:
+                    first_exc = exc
+                continue
+            preferred[0] = index
+            return connection
+        if first_exc is not None:
+            raise first_exc
+        raise RuntimeError("No database hosts configured.")
+
+    return connect
 
 
 def _build_connection_pool(
-    config: DbConfig, hosts: list[str], min_conn: int, max_conn: int
-) -> Any:
-    if ThreadedConnectionPool is None:
-        raise RuntimeError("psycopg2 ThreadedConnectionPool is required to connect to the database.")
-
-    first_exc = None
-    # 複数ホストを順に試し、最初に接続成功したプールを採用する
-    # Try hosts in order and keep the first successfully validated pool.
-    for host in hosts:
-        candidate_config = dict(config)
-        candidate_config["host"] = host
-        pool_instance = None
-        try:
-            pool_instance = ThreadedConnectionPool(min_conn, max_conn, **candidate_config)
-            validation_conn = pool_instance.getconn()
-            pool_instance.putconn(validation_conn)
-            return pool_instance
-        except Exception as exc:  # pragma: no cover - depends on env
-            if first_exc is None:
-                first_exc = exc
-            if pool_instance is not None:
-                try:
-                    pool_instance.closeall()
-                except Exception:
-                    pass
-            continue
+    config: DbConfig, hosts: list[str], min_conn: int, max_conn: int, *, name: str = "primary"
+) -> ManagedConnectionPool:
+    if psycopg2 is None:
+        raise RuntimeError("psycopg2 is required to connect to the database.")
 
-    if first_exc is not None:
-        raise first_exc
-    raise RuntimeError("Database connection pool initialization failed without an exception.")
+    pool_instance = ManagedConnectionPool(
+        min_conn, max_conn, _failover_connect(config, hosts), name=name, **_get_pool_options()
+    )
+    # 最小接続数まで開いておき、接続できない設定はここで失敗させる
+    # Open the minimum connections up front so an unreachable database fails here.
+    try:
+        pool_instance.fill()
+    except Exception:
+        pool_instance.closeall()
+        raise
+    return pool_instance
 
 
-def _get_connection_pool() -> Any:
-    global _connection_pool, _connection_pool_key
+def _get_connection_pool() -> ManagedConnectionPool:
+    global _connection_pool
 
-    config = _get_db_config()
-    hosts = _get_db_hosts()
-    min_conn, max_conn = _get_pool_bounds()
-    pool_key = _build_pool_key(config, hosts, min_conn, max_conn)
-    old_pool = None
-    new_pool = None
+    # 作成済みなら環境変数を読み直さずにそのまま返す
+    # Once built, return the pool without re-reading the environment.
+    pool_instance = _connection_pool
+    if pool_instance is not None:
+        return pool_instance
 
     with _pool_lock:
-        if _connection_pool is not None and _connection_pool_key == pool_key:
-            return _connection_pool
+        if _connection_pool is None:
+            min_conn, max_conn = _get_pool_bounds()
+            _connection_pool = _build_connection_pool(
+                _get_db_config(), _get_db_hosts(), min_conn, max_conn
+            )
+        return _connection_pool
 
-        # 設定が変わった場合は新プールへ差し替え、旧プールはロック外で閉じる
-        # Replace pool on config change and close previous pool outside the lock.
-        old_pool = _connection_pool
-        new_pool = _build_connection_pool(config, hosts, min_conn, max_conn)
-        _connection_pool = new_pool
-        _connection_pool_key = pool_key
 
-    if old_pool is not None:
-        try:
-            old_pool.closeall()
-        except Exception:
-            pass
+@lru_cache(maxsize=1)
+def _get_replica_settings() -> dict[str, Any]:
+    env_host = os.environ.get("POSTGRES_REPLICA_HOST", "")
+    return {
+        "hosts": [host.strip() for host in env_host.split(",") if host.strip()],
+        "max_lag": _float_env("DB_REPLICA_MAX_LAG_SECONDS", DEFAULT_REPLICA_MAX_LAG_SECONDS),
+        "lag_check_interval": _float_env(
+            "DB_REPLICA_LAG_CHECK_SECONDS", DEFAULT_REPLICA_LAG_CHECK_SECONDS
+        ),
+        "retry_seconds": _float_env("DB_REPLICA_RETRY_SECONDS", DEFAULT_REPLICA_RETRY_SECONDS),
+    }
+
+
+def is_replica_configured() -> bool:
+    return bool(_get_replica_settings()["hosts"])
+
+
+def _get_replica_pool_bounds() -> tuple[int, int]:
+    # 未指定ならプライマリと同じ上下限を使う
+    # Default to the primary's bounds when not set.
+    min_conn, max_conn = _get_pool_bounds()
+    min_conn = int(os.environ.get("DB_REPLICA_POOL_MIN_CONN", str(min_conn)))
+    max_conn = int(os.environ.get("DB_REPLICA_POOL_MAX_CONN", str(max_conn)))
+    if min_conn < 1:
+        raise ValueError("DB_REPLICA_POOL_MIN_CONN must be >= 1.")
+    if max_conn < min_conn:
+        raise ValueError("DB_REPLICA_POOL_MAX_CONN must be >= DB_REPLICA_POOL_MIN_CONN.")
+    return min_conn, max_conn
+
+
+def _get_replica_pool() -> ManagedConnectionPool:
+    global _replica_pool
 
-    return new_pool
+    pool_instance = _replica_pool
+    if pool_instance is not None:
+        return pool_instance
+
+    with _pool_lock:
+        if _replica_pool is None:
+            # 認証情報と DB 名はプライマリと共通。ホストとポートだけ差し替える
+            # Credentials and database name are shared with the primary; only host and port differ.
+            config = _get_db_config()
+            config["port"] = int(os.environ.get("POSTGRES_REPLICA_PORT") or config["port"])
+            min_conn, max_conn = _get_replica_pool_bounds()
+            _replica_pool = _build_connection_pool(
+                config, _get_replica_settings()["hosts"], min_conn, max_conn, name="replica"
+            )
+        return _replica_pool
 
 
 def close_db_pool() -> None:
     # プロセス終了時やシャットダウン時に全コネクションを確実に解放する
     # Ensure all pooled connections are released on shutdown/exit.
     """Close all pooled DB connections."""
-    global _connection_pool, _connection_pool_key
+    global _connection_pool, _replica_pool
+    global _replica_lag_seconds, _replica_lag_checked_at, _replica_retry_after
 
     with _pool_lock:
-        pool_instance = _connection_pool
+        pool_instances = [_connection_pool, _replica_pool]
         _connection_pool = None
-        _connection_pool_key = None
+        _replica_pool = None
+        _replica_lag_seconds = None
+        _replica_lag_checked_at = 0.0
+        _replica_retry_after = 0.0
+        # 次にプールを作るときに設定を読み直す
+        # Settings are re-read the next time a pool is built.
+        _get_pool_options.cache_clear()
+        _get_replica_settings.cache_clear()
+
+    for pool_instance in pool_instances:
+        if pool_instance is None:
+            continue
+        try:
+            pool_instance.closeall()
+        except Exception:  # pragma: no cover - depends on env
+            pass
 
-    if pool_instance is None:
-        return
 
-    try:
-        pool_instance.closeall()
-    except Exception:  # pragma: no cover - depends on env
-        pass
+def get_db_pool_stats() -> dict[str, dict[str, Any]]:
+    # 作成済みプールの利用状況（貸出中・待機中・待ち時間など）
+    # Utilization of the pools built so far (in use, waiting, wait time, ...).
+    pools = {"primary": _connection_pool, "replica": _replica_pool}
+    return {name: pool.stats() for name, pool in pools.items() if pool is not None}
+
+
+def run_db_pool_maintenance(stop_event: threading.Event, *, interval_seconds: float = 5.0) -> None:
+    # 寿命・アイドル超過の接続の入れ替え、死活確認、最小接続数への補充をバックグラウンドで行う
+    # Recycle expired/idle connections, run liveness checks and refill to the minimum in the background.
+    while not stop_event.wait(interval_seconds):
+        for pool_instance in (_connection_pool, _replica_pool):
+            if pool_instance is None:
+                continue
+            try:
+                pool_instance.maintain()
+            except Exception:
+                logger.exception("Database pool maintenance failed.", extra={"pool": pool_instance.name})
 
 
 atexit.register(close_db_pool)
 
 
-def get_db_connection() -> _ConnectionProxy:
-    # プールから 1 接続を貸し出し、close() 時に自動返却されるプロキシを返す
+_pool_checkout_seconds = metrics.histogram(
+    "chatcore_db_pool_checkout_seconds",
+    "Time spent borrowing a connection from the pool (includes queueing and new connection setup).",
+)
+_pool_checkout_failures_total = metrics.counter(
+    "chatcore_db_pool_checkout_failures_total",
+    "Failed pool checkouts, e.g. wait queue timeout or database unreachable.",
+)
+
+
+def _collect_pool_connections() -> list[tuple[tuple[str, ...], float]]:
+    samples: list[tuple[tuple[str, ...], float]] = []
+    for name, stats in get_db_pool_stats().items():
+        for state in ("in_use", "idle", "opening", "waiting", "max"):
+            samples.append(((name, state), stats[state]))
+    return samples
+
+
+def _collect_pool_utilization() -> list[tuple[tuple[str, ...], float]]:
+    return [
+        ((name,), stats["in_use"] / stats["max"] if stats["max"] else 0.0)
+        for name, stats in get_db_pool_stats().items()
+    ]
+
+
+metrics.gauge_function(
+    "chatcore_db_pool_connections",
+    "Pooled database connections by pool and state (in_use, idle, opening, waiting, max).",
+    ("pool", "state"),
+    _collect_pool_connections,
+)
+metrics.gauge_function(
+    "chatcore_db_pool_utilization",
+    "Fraction of each pool's max connections currently checked out.",
+    ("pool",),
+    _collect_pool_utilization,
+)
+
+_read_routes_total = metrics.counter(
+    "chatcore_db_read_routes_total",
+    "Read-only checkouts by target pool and reason "
+    "(replica, not_configured, recent_write, replica_lag, replica_busy, replica_unavailable).",
+    ("target", "reason"),
+)
+
+
+def _collect_replica_lag() -> list[tuple[tuple[str, ...], float]]:
+    if _replica_lag_seconds is None:
+        return []
+    return [((), _replica_lag_seconds)]
+
+
+metrics.gauge_function(
+    "chatcore_db_replica_lag_seconds",
+    "Replication lag last measured on the read replica.",
+    (),
+    _collect_replica_lag,
+)
+
+
+def has_recent_write() -> bool:
+    # 現在のリクエストのユーザーが直近に書き込んだか、このリクエスト内で既にコミットしたか
+    # Whether the current request's user wrote recently or already committed in this request.
+    state = _write_state_var.get()
+    return state is not None and (state["recent"] or state["wrote"])
+
+
+def _mark_replica_unavailable(exc: Exception) -> None:
+    global _replica_retry_after
+    retry_seconds = _get_replica_settings()["retry_seconds"]
+    _replica_retry_after = time.monotonic() + retry_seconds
+    logger.warning(
+        "Read replica is unavailable; routing reads to the primary for %s seconds.",
+        retry_seconds,
+        extra={"error_class": exc.__class__.__name__},
+    )
+
+
+def _measure_replica_lag(connection: Any) -> float:
+    # 計測用のクエリはクエリ統計に載せないよう、生の接続で実行する
+    # Run the probe on the raw connection so it stays out of the query stats.
+    cursor = connection.cursor()
+    try:
+        cursor.execute(_REPLICA_LAG_SQL)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    connection.rollback()
+    return float(row[0] or 0) if row else 0.0
+
+
+def _replica_lag_for(connection: Any) -> float | None:
+    # 遅延は一定間隔でのみ計測し、他のスレッドが計測中なら直近の値を使う
+    # Measure lag at most once per interval; while another thread measures, reuse the last value.
+    global _replica_lag_seconds, _replica_lag_checked_at
+    interval = _get_replica_settings()["lag_check_interval"]
+    if time.monotonic() - _replica_lag_checked_at < interval:
+        return _replica_lag_seconds
+    if not _replica_lag_lock.acquire(blocking=False):
+        return _replica_lag_seconds
+    try:
+        _replica_lag_seconds = _measure_replica_lag(connection)
+        _replica_lag_checked_at = time.monotonic()
+        return _replica_lag_seconds
+    finally:
+        _replica_lag_lock.release()
+
+
+def _checkout_replica() -> _ConnectionProxy | None:
+    # レプリカを使えない理由があれば None を返し、呼び出し側はプライマリを使う
+    # Return None whenever the replica should not serve this read; the caller uses the primary.
+    if not is_replica_configured():
+        _read_routes_total.inc("primary", "not_configured")
+        return None
+    if has_recent_write():
+        _read_routes_total.inc("primary", "recent_write")
+        return None
+    if time.monotonic() < _replica_retry_after:
+        _read_routes_total.inc("primary", "replica_unavailable")
+        return None
+
+    max_lag = _get_replica_settings()["max_lag"]
+    start = time.perf_counter()
+    try:
+        replica_pool = _get_replica_pool()
+        connection = replica_pool.getconn()
+    except PoolTimeoutError:
+        # 混雑はレプリカの障害ではないので、この読み取りだけプライマリへ回す
+        # Saturation is not an outage, so only this read goes to the primary.
+        _read_routes_total.inc("primary", "replica_busy")
+        return None
+    except Exception as exc:
+        _mark_replica_unavailable(exc)
+        _read_routes_total.inc("primary", "replica_unavailable")
+        return None
+    finally:
+        record_span("db_checkout", time.perf_counter() - start)
+
+    proxy = _ConnectionProxy(connection, replica_pool, replica=True)
+    try:
+        lag = _replica_lag_for(connection)
+    except Exception as exc:
+        proxy.close()
+        _mark_replica_unavailable(exc)
+        _read_routes_total.inc("primary", "replica_unavailable")
+        return None
+    if lag is not None and lag > max_lag:
+        proxy.close()
+        _read_routes_total.inc("primary", "replica_lag")
+        return None
+    _read_routes_total.inc("replica", "replica")
+    return proxy
+
+
+def get_db_connection(
+    read_only: bool = False, *, checkout_timeout: float | None = None
+) -> _ConnectionProxy:
+    # プールから 1 接続を貸し出し、close() 時に自動返却されるプロキシを返す。
+    # read_only=True の読み取りはレプリカが使える場合だけレプリカへ回す。
+    # checkout_timeout を指定するとプライマリの貸し出し待ちをその秒数で打ち切る（既定はプール設定）
     # Borrow a pooled connection and return a proxy that puts it back on close().
+    # read_only=True reads go to the replica whenever it is usable.
+    # checkout_timeout caps the wait for a primary connection (defaults to the pool setting).
     """PostgreSQL への接続を返す (connection pool backed)."""
     if psycopg2 is None:
         raise RuntimeError("psycopg2 is required to connect to the database.")
 
-    connection_pool = _get_connection_pool()
-    connection = connection_pool.getconn()
+    if read_only:
+        replica_connection = _checkout_replica()
+        if replica_connection is not None:
+            return replica_connection
+
+    start = time.perf_counter()
+    try:
+        connection_pool = _get_connection_pool()
+        connection = connection_pool.getconn(checkout_timeout)
+    except Exception:
+        _pool_checkout_failures_total.inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _pool_checkout_seconds.observe(elapsed)
+        record_span("db_checkout", elapsed)
     return _ConnectionProxy(connection, connection_pool)
+
+
+def fetch_validator_row(query: str, params: Any = None) -> tuple[Any, ...]:
+    # ETag 用の集計クエリを 1 行だけ実行し、タプルで返す
+    # Run a single-row aggregate used as an ETag validator and return it as a tuple.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        return tuple(row) if row is not None else ()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def fetch_if_modified(
+    validator_query: str,
+    validator_params: Any,
+    is_current: Callable[[tuple[Any, ...]], bool],
+    fetch_body: Callable[[Any], Any],
+    *,
+    read_only: bool = False,
+) -> tuple[tuple[Any, ...] | None, Any]:
+    # 検証値と本文を同じ接続で、検証値を先に読む。レプリカ遅延中でも ETag が本文より新しくならず、
+    # 競合する書き込みがあっても古い ETag が付くだけで次回は 200 になる。
+    # is_current が真なら本文は読まずに (検証値, None) を返す。検証値の取得失敗は None として本文だけ返す
+    # Read the validators, then the body, on one connection. Even while the replica lags the ETag
+    # can never be newer than the body, and a racing write only yields an older ETag.
+    # Returns (validators, None) without loading the body when is_current accepts them;
+    # a validator failure is logged and reported as None alongside the body.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection(read_only=read_only)
+        cursor = conn.cursor()
+        version = None
+        try:
+            cursor.execute(validator_query, validator_params)
+            row = cursor.fetchone()
+            version = tuple(row) if row is not None else ()
+        except Exception:
+            logger.warning("Failed to read ETag validators.", exc_info=True)
+            conn.rollback()
+        if version is not None and is_current(version):
+            return version, None
+        return version, fetch_body(conn)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+class ReadYourWritesMiddleware:
+    # レプリカ構成時だけ app.py で組み込む。書き込みをコミットしたリクエストはセッションへ時刻を残し、
+    # その後 DB_READ_YOUR_WRITES_SECONDS の間は同じユーザーの読み取りをプライマリへ寄せる。
+    # セッションに保存するので複数ワーカーでも効く。セッションミドルウェアより内側に置く
+    # Installed by app.py only when a replica is configured. Requests that commit a write stamp the
+    # session, and the same user's reads then stick to the primary for DB_READ_YOUR_WRITES_SECONDS.
+    # Keeping it in the session makes it work across workers; it must sit inside the session middleware.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.window_seconds = _float_env(
+            "DB_READ_YOUR_WRITES_SECONDS", DEFAULT_READ_YOUR_WRITES_SECONDS
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        session = scope.get("session")
+        if scope["type"] != "http" or session is None:
+            return await self.app(scope, receive, send)
+
+        last_write_at = session.get(LAST_WRITE_SESSION_KEY)
+        state = {
+            "recent": isinstance(last_write_at, (int, float))
+            and time.time() - last_write_at < self.window_seconds,
+            "wrote": False,
+        }
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and state["wrote"]:
+                session[LAST_WRITE_SESSION_KEY] = round(time.time(), 3)
+            await send(message)
+
+        token = _write_state_var.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _write_state_var.reset(token)
@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from services.db import Error, get_db_connection
+
+DEFAULT_INSIGHTS_CACHE_SECONDS = 30.0
+DEFAULT_ACTIVITY_CACHE_SECONDS = 5.0
+DEFAULT_INSIGHTS_TIMEOUT_MS = 5000
+QUERY_TEXT_LIMIT = 500
+STATEMENT_ORDERS = ("total", "mean", "max", "calls")
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL 13 で total_time などが total_exec_time などへ改名された
+# PostgreSQL 13 renamed total_time and friends to total_exec_time and friends.
+_STATEMENT_TIME_COLUMNS = {
+    True: {"total": "total_exec_time", "mean": "mean_exec_time", "max": "max_exec_time"},
+    False: {"total": "total_time", "mean": "mean_time", "max": "max_time"},
+}
+
+_STATEMENTS_SQL = """
+    SELECT queryid,
+           LEFT(query, {text_limit}) AS query,
+           calls,
+           ROUND({total}::numeric, 2)::float8 AS total_ms,
+           ROUND({mean}::numeric, 3)::float8 AS mean_ms,
+           ROUND({max}::numeric, 2)::float8 AS max_ms,
+           rows,
+           shared_blks_hit,
+           shared_blks_read,
+           ROUND(100.0 * shared_blks_hit
+                 / NULLIF(shared_blks_hit + shared_blks_read, 0), 2)::float8 AS hit_percent
+      FROM pg_stat_statements
+     WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+     ORDER BY {order} DESC
+     LIMIT %(limit)s
+"""
+
+_INDEX_USAGE_SQL = """
+    SELECT s.schemaname,
+           s.relname AS table_name,
+           s.indexrelname AS index_name,
+           s.idx_scan,
+           s.idx_tup_read,
+           s.idx_tup_fetch,
+           pg_relation_size(s.indexrelid) AS size_bytes,
+           i.indisunique AS is_unique,
+           i.indisprimary AS is_primary
+      FROM pg_stat_user_indexes s
+      JOIN pg_index i
+        ON i.indexrelid = s.indexrelid
+     ORDER BY s.idx_scan ASC, size_bytes DESC
+     LIMIT %(limit)s
+"""
+
+# 一度も使われていない索引。一意制約・主キーは制約として働いているので候補から外す
+# Indexes never scanned. Unique and primary key indexes enforce constraints, so they are excluded.
+_UNUSED_INDEXES_SQL = """
+    SELECT s.schemaname,
+           s.relname AS table_name,
+           s.indexrelname AS index_name,
+           pg_relation_size(s.indexrelid) AS size_bytes,
+           pg_get_indexdef(s.indexrelid) AS definition
+      FROM pg_stat_user_indexes s
+      JOIN pg_index i
+        ON i.indexrelid = s.indexrelid
+     WHERE s.idx_scan = 0
+       AND NOT i.indisunique
+       AND NOT i.indisprimary
+     ORDER BY size_bytes DESC
+     LIMIT %(limit)s
+"""
+
+# 索引が足りない兆候として、逐次走査で読んだ行数の多い表
+# Tables reading the most rows through sequential scans, a hint of missing indexes.
+_SEQ_SCAN_TABLES_SQL = """
+    SELECT schemaname,
+           relname AS table_name,
+           seq_scan,
+           seq_tup_read,
+           COALESCE(idx_scan, 0) AS idx_scan,
+           n_live_tup
+      FROM pg_stat_user_tables
+     WHERE seq_tup_read > 0
+     ORDER BY seq_tup_read DESC
+     LIMIT %(limit)s
+"""
+
+_STATS_RESET_SQL = """
+    SELECT stats_reset
+      FROM pg_stat_database
+     WHERE datname = current_database()
+"""
+
+# pg_stats の平均列幅から「詰まっていれば何ページか」を見積もり、実サイズとの差を膨張とみなす。
+# タプルヘッダ 24 バイト + 行ポインタ 4 バイト、ページヘッダ 24 バイトで概算し、fillfactor は無視する
+# Estimate how many pages the rows would need when tightly packed (from average column widths in
+# pg_stats) and treat the difference from the actual size as bloat. Uses 24-byte tuple headers,
+# 4-byte line pointers and 24-byte page headers, and ignores fillfactor.
+_TABLE_BLOAT_SQL = """
+    WITH widths AS (
+        SELECT c.oid,
+               n.nspname AS schemaname,
+               c.relname AS table_name,
+               c.reltuples::numeric AS reltuples,
+               c.relpages,
+               current_setting('block_size')::numeric AS block_size,
+               SUM((1 - s.null_frac) * s.avg_width)::numeric AS row_width
+          FROM pg_class c
+          JOIN pg_namespace n
+            ON n.oid = c.relnamespace
+          JOIN pg_stats s
+            ON s.schemaname = n.nspname
+           AND s.tablename = c.relname
+         WHERE c.relkind = 'r'
+           AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+         GROUP BY c.oid, n.nspname, c.relname, c.reltuples, c.relpages
+    ), estimates AS (
+        SELECT w.*,
+               w.relpages * w.block_size AS size_bytes,
+               CEIL(GREATEST(w.reltuples, 0) * (w.row_width + 28) / (w.block_size - 24))
+                   * w.block_size AS expected_bytes
+          FROM widths w
+    )
+    SELECT e.schemaname,
+           e.table_name,
+           e.size_bytes::bigint AS size_bytes,
+           GREATEST(e.size_bytes - e.expected_bytes, 0)::bigint AS bloat_bytes,
+           ROUND(100 * GREATEST(e.size_bytes - e.expected_bytes, 0)
+                 / NULLIF(e.size_bytes, 0), 1)::float8 AS bloat_percent,
+           t.n_dead_tup,
+           t.n_live_tup,
+           t.last_autovacuum,
+           t.last_vacuum
+      FROM estimates e
+      LEFT JOIN pg_stat_user_tables t
+        ON t.relid = e.oid
+     ORDER BY bloat_bytes DESC
+     LIMIT %(limit)s
+"""
+
+# B-tree 索引も同様に、索引列の平均幅 + IndexTuple ヘッダ 8 バイト + 行ポインタ 4 バイトで見積もる。
+# ページは 24 バイトのヘッダと 16 バイトの特殊領域を除き、既定の fillfactor 90% で埋まるとみなす
+# B-tree indexes are estimated the same way from the indexed columns' widths plus an 8-byte
+# IndexTuple header and a 4-byte line pointer, with 24-byte page headers, a 16-byte special area
+# and the default 90% fillfactor.
+_INDEX_BLOAT_SQL = """
+    WITH widths AS (
+        SELECT n.nspname AS schemaname,
+               tc.relname AS table_name,
+               ic.relname AS index_name,
+               ic.reltuples::numeric AS reltuples,
+               ic.relpages,
+               current_setting('block_size')::numeric AS block_size,
+               SUM((1 - s.null_frac) * s.avg_width)::numeric AS key_width
+          FROM pg_index i
+          JOIN pg_class ic
+            ON ic.oid = i.indexrelid
+          JOIN pg_class tc
+            ON tc.oid = i.indrelid
+          JOIN pg_namespace n
+            ON n.oid = ic.relnamespace
+          JOIN pg_am am
+            ON am.oid = ic.relam
+           AND am.amname = 'btree'
+          JOIN pg_attribute a
+            ON a.attrelid = i.indrelid
+           AND a.attnum = ANY(i.indkey)
+          JOIN pg_stats s
+            ON s.schemaname = n.nspname
+           AND s.tablename = tc.relname
+           AND s.attname = a.attname
+         WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+         GROUP BY ic.oid, n.nspname, tc.relname, ic.relname, ic.reltuples, ic.relpages
+    ), estimates AS (
+        SELECT w.*,
+               w.relpages * w.block_size AS size_bytes,
+               (CEIL(GREATEST(w.reltuples, 0) * (w.key_width + 12)
+                     / ((w.block_size - 40) * 0.9)) + 1) * w.block_size AS expected_bytes
+          FROM widths w
+    )
+    SELECT schemaname,
+           table_name,
+           index_name,
+           size_bytes::bigint AS size_bytes,
+           GREATEST(size_bytes - expected_bytes, 0)::bigint AS bloat_bytes,
+           ROUND(100 * GREATEST(size_bytes - expected_bytes, 0)
+                 / NULLIF(size_bytes, 0), 1)::float8 AS bloat_percent
+      FROM estimates
+     ORDER BY bloat_bytes DESC
+     LIMIT %(limit)s
+"""
+
+_CACHE_HIT_SQL = """
+    SELECT ROUND(100.0 * d.blks_hit / NULLIF(d.blks_hit + d.blks_read, 0), 2)::float8
+               AS database_hit_percent,
+           (SELECT ROUND(100.0 * SUM(heap_blks_hit)
+                         / NULLIF(SUM(heap_blks_hit) + SUM(heap_blks_read), 0), 2)::float8
+              FROM pg_statio_user_tables) AS table_hit_percent,
+           (SELECT ROUND(100.0 * SUM(idx_blks_hit)
+                         / NULLIF(SUM(idx_blks_hit) + SUM(idx_blks_read), 0), 2)::float8
+              FROM pg_statio_user_indexes) AS index_hit_percent,
+           d.blks_hit,
+           d.blks_read,
+           d.stats_reset
+      FROM pg_stat_database d
+     WHERE d.datname = current_database()
+"""
+
+# ディスクから読んだブロックの多い表。ヒット率が低い順に並べるより、実害の大きさが分かる
+# Tables reading the most blocks from outside shared buffers; shows impact better than raw ratios.
+_TABLE_CACHE_HIT_SQL = """
+    SELECT schemaname,
+           relname AS table_name,
+           heap_blks_read,
+           heap_blks_hit,
+           ROUND(100.0 * heap_blks_hit
+                 / NULLIF(heap_blks_hit + heap_blks_read, 0), 2)::float8 AS hit_percent
+      FROM pg_statio_user_tables
+     WHERE heap_blks_read > 0
+     ORDER BY heap_blks_read DESC
+     LIMIT %(limit)s
+"""
+
+_LONG_TRANSACTIONS_SQL = f"""
+    SELECT pid,
+           usename,
+           application_name,
+           client_addr::text AS client_addr,
+           state,
+           wait_event_type,
+           wait_event,
+           EXTRACT(EPOCH FROM now() - xact_start)::float8 AS transaction_seconds,
+           EXTRACT(EPOCH FROM now() - query_start)::float8 AS query_seconds,
+           LEFT(query, {QUERY_TEXT_LIMIT}) AS query
+      FROM pg_stat_activity
+     WHERE datname = current_database()
+       AND pid <> pg_backend_pid()
+       AND xact_start IS NOT NULL
+       AND xact_start <= now() - make_interval(secs => %(min_seconds)s)
+     ORDER BY xact_start
+     LIMIT %(limit)s
+"""
+
+# pg_blocking_pids でロック待ちのセッションと、それを塞いでいるセッションを組にする
+# Pair each session waiting on a lock with the sessions blocking it via pg_blocking_pids.
+_LOCK_WAITS_SQL = f"""
+    SELECT waiting.pid AS waiting_pid,
+           waiting.usename AS waiting_user,
+           waiting.wait_event_type,
+           waiting.wait_event,
+           EXTRACT(EPOCH FROM now() - waiting.query_start)::float8 AS waiting_seconds,
+           LEFT(waiting.query, {QUERY_TEXT_LIMIT}) AS waiting_query,
+           blocking.pid AS blocking_pid,
+           blocking.usename AS blocking_user,
+           blocking.state AS blocking_state,
+           EXTRACT(EPOCH FROM now() - blocking.xact_start)::float8 AS blocking_transaction_seconds,
+           LEFT(blocking.query, {QUERY_TEXT_LIMIT}) AS blocking_query
+      FROM pg_stat_activity waiting
+      CROSS JOIN LATERAL unnest(pg_blocking_pids(waiting.pid)) AS blocker(pid)
+      JOIN pg_stat_activity blocking
+        ON blocking.pid = blocker.pid
+     WHERE waiting.datname = current_database()
+     ORDER BY waiting_seconds DESC NULLS LAST
+     LIMIT %(limit)s
+"""
+
+_cache_lock = threading.Lock()
+# (レポート名, 引数) -> (取得時刻 monotonic, 結果)
+# (report name, arguments) -> (fetched at, monotonic; result).
+_cache: dict[tuple[Any, ...], tuple[float, dict[str, Any]]] = {}
+_key_locks: dict[tuple[Any, ...], threading.Lock] = {}
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _run_report(loader: Callable[[Any], dict[str, Any]]) -> dict[str, Any]:
+    # 統計ビューの読み取りでも重くなりうるため、statement_timeout を付けて実行し必ずロールバックする
+    # Even statistics views can be slow to read, so run under a statement_timeout and always roll back.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        timeout_ms = int(_float_env("DB_INSIGHTS_TIMEOUT_MS", DEFAULT_INSIGHTS_TIMEOUT_MS))
+        cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+        return loader(cursor)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def _cached_report(
+    key: tuple[Any, ...], ttl_seconds: float, loader: Callable[[Any], dict[str, Any]]
+) -> tuple[dict[str, Any], float]:
+    # 結果を ttl_seconds だけ保持し、(結果, 経過秒数) を返す。同じキーの同時ミスは 1 回の取得にまとめる
+    # Keep results for ttl_seconds and return (result, age in seconds). Concurrent misses on the same
+    # key collapse into a single fetch.
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < ttl_seconds:
+            return entry[1], time.monotonic() - entry[0]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry is None or time.monotonic() - entry[0] >= ttl_seconds:
+            entry = (time.monotonic(), _run_report(loader))
+            with _cache_lock:
+                _cache[key] = entry
+    return entry[1], time.monotonic() - entry[0]
+
+
+def _cache_seconds() -> float:
+    return _float_env("DB_INSIGHTS_CACHE_SECONDS", DEFAULT_INSIGHTS_CACHE_SECONDS)
+
+
+def reset_db_insights_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+        _key_locks.clear()
+
+
+def _load_statements(cursor: Any, order_by: str, limit: int) -> dict[str, Any]:
+    cursor.execute(
+        """
+        SELECT extversion,
+               current_setting('server_version_num')::int AS server_version_num
+          FROM pg_extension
+         WHERE extname = 'pg_stat_statements'
+        """
+    )
+    extension = cursor.fetchone()
+    if extension is None:
+        return {"available": False, "reason": "pg_stat_statements extension is not installed."}
+
+    columns = _STATEMENT_TIME_COLUMNS[extension["server_version_num"] >= 130000]
+    order_column = "calls" if order_by == "calls" else columns[order_by]
+    sql = _STATEMENTS_SQL.format(text_limit=QUERY_TEXT_LIMIT, order=order_column, **columns)
+    # 拡張があっても shared_preload_libraries に無ければ参照時にエラーになる
+    # With the extension created but not in shared_preload_libraries, reading it raises.
+    cursor.execute("SAVEPOINT db_insights_statements")
+    try:
+        cursor.execute(sql, {"limit": limit})
+    except Error as exc:
+        cursor.execute("ROLLBACK TO SAVEPOINT db_insights_statements")
+        logger.warning("pg_stat_statements is not readable.", exc_info=True)
+        return {"available": False, "reason": str(exc).strip().splitlines()[0]}
+    return {
+        "available": True,
+        "extension_version": extension["extversion"],
+        "statements": cursor.fetchall(),
+    }
+
+
+def fetch_statement_stats(order_by: str = "total", limit: int = 20) -> tuple[dict[str, Any], float]:
+    # サーバー全体（全ワーカー・全接続）の集計。/admin/api/top-queries はこのプロセス分だけ
+    # Server-wide statistics (every worker and connection); /admin/api/top-queries is per process.
+    return _cached_report(
+        ("statements", order_by, limit),
+        _cache_seconds(),
+        lambda cursor: _load_statements(cursor, order_by, limit),
+    )
+
+
+def _load_index_usage(cursor: Any, limit: int) -> dict[str, Any]:
+    report: dict[str, Any] = {}
+    cursor.execute(_STATS_RESET_SQL)
+    row = cursor.fetchone()
+    # 使用回数は統計リセット以降の値
+    # Usage counts are since the last statistics reset.
+    report["stats_reset"] = row["stats_reset"] if row else None
+    for name, sql in (
+        ("indexes", _INDEX_USAGE_SQL),
+        ("unused_indexes", _UNUSED_INDEXES_SQL),
+        ("seq_scan_tables", _SEQ_SCAN_TABLES_SQL),
+    ):
+        cursor.execute(sql, {"limit": limit})
+        report[name] = cursor.fetchall()
+    return report
+
+
+def fetch_index_usage(limit: int = 50) -> tuple[dict[str, Any], float]:
+    return _cached_report(
+        ("indexes", limit), _cache_seconds(), lambda cursor: _load_index_usage(cursor, limit)
+    )
+
+
+def _load_bloat(cursor: Any, limit: int) -> dict[str, Any]:
+    cursor.execute(_TABLE_BLOAT_SQL, {"limit": limit})
+    tables = cursor.fetchall()
+    cursor.execute(_INDEX_BLOAT_SQL, {"limit": limit})
+    return {"estimated": True, "tables": tables, "indexes": cursor.fetchall()}
+
+
+def fetch_bloat_estimates(limit: int = 20) -> tuple[dict[str, Any], float]:
+    return _cached_report(
+        ("bloat", limit), _cache_seconds(), lambda cursor: _load_bloat(cursor, limit)
+    )
+
+
+def _load_cache_hit(cursor: Any, limit: int) -> dict[str, Any]:
+    cursor.execute(_CACHE_HIT_SQL)
+    report = dict(cursor.fetchone() or {})
+    cursor.execute(_TABLE_CACHE_HIT_SQL, {"limit": limit})
+    report["tables"] = cursor.fetchall()
+    return report
+
+
+def fetch_cache_hit_ratio(limit: int = 20) -> tuple[dict[str, Any], float]:
+    return _cached_report(
+        ("cache_hit", limit), _cache_seconds(), lambda cursor: _load_cache_hit(cursor, limit)
+    )
+
+
+def _load_activity(cursor: Any, min_seconds: float, limit: int) -> dict[str, Any]:
+    cursor.execute(_LONG_TRANSACTIONS_SQL, {"min_seconds": min_seconds, "limit": limit})
+    long_transactions = cursor.fetchall()
+    cursor.execute(_LOCK_WAITS_SQL, {"limit": limit})
+    return {"long_transactions": long_transactions, "lock_waits": cursor.fetchall()}
+
+
+def fetch_activity(min_seconds: float = 60.0, limit: int = 50) -> tuple[dict[str, Any], float]:
+    # 長時間トランザクションとロック待ちは今起きていることなので、短い間だけキャッシュする
+    # Long transactions and lock waits describe the present, so they are cached only briefly.
+    ttl_seconds = _float_env("DB_INSIGHTS_ACTIVITY_CACHE_SECONDS", DEFAULT_ACTIVITY_CACHE_SECONDS)
+    return _cached_report(
+        ("activity", min_seconds, limit),
+        ttl_seconds,
+        lambda cursor: _load_activity(cursor, min_seconds, limit),
+    )
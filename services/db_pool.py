@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from . import metrics
+
+DEFAULT_CHECKOUT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_LIFETIME_SECONDS = 1800.0
+DEFAULT_MAX_IDLE_SECONDS = 300.0
+DEFAULT_LIVENESS_INTERVAL_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+_wait_seconds = metrics.histogram(
+    "chatcore_db_pool_wait_seconds",
+    "Time checkouts spent queued for a connection because the pool was at its limit.",
+    ("pool",),
+)
+_checkout_timeouts_total = metrics.counter(
+    "chatcore_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_CHECKOUT_TIMEOUT_SECONDS in the wait queue.",
+    ("pool",),
+)
+_connections_closed_total = metrics.counter(
+    "chatcore_db_pool_connections_closed_total",
+    "Pooled connections closed by reason (lifetime, idle, broken, discarded).",
+    ("pool", "reason"),
+)
+
+
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+class PoolClosedError(RuntimeError):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used_at", "last_checked_at")
+
+    def __init__(self, connection: Any, now: float) -> None:
+        self.connection = connection
+        self.created_at = now
+        self.last_used_at = now
+        self.last_checked_at = now
+
+
+class _Waiter:
+    # 返却された接続 (entry) か、新規接続を開く枠 (may_open) のどちらかを受け取る
+    # Receives either a returned connection (entry) or a slot to open a new one (may_open).
+    __slots__ = ("event", "entry", "may_open", "queued_at")
+
+    def __init__(self, now: float) -> None:
+        self.event = threading.Event()
+        self.entry: _PooledConnection | None = None
+        self.may_open = False
+        self.queued_at = now
+
+
+def _ping(connection: Any) -> None:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    finally:
+        cursor.close()
+    connection.rollback()
+
+
+def _close_quietly(connection: Any) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ManagedConnectionPool:
+    # ThreadedConnectionPool 互換 (getconn/putconn/closeall) のプール。上限に達したら例外にせず
+    # FIFO の待ち行列で待ち、checkout_timeout を過ぎたら PoolTimeoutError を送出する。
+    # 返却された接続は先頭の待機者へ直接渡すので、後から来たスレッドが割り込むことはない。
+    # 寿命・アイドル時間による入れ替えと死活確認は maintain() で行う
+    # ThreadedConnectionPool-compatible pool (getconn/putconn/closeall). At the limit, checkouts
+    # queue FIFO instead of failing and raise PoolTimeoutError after checkout_timeout. Returned
+    # connections are handed straight to the head waiter, so late arrivals cannot barge in.
+    # Lifetime/idle recycling and liveness checks happen in maintain().
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        connect: Callable[[], Any],
+        *,
+        name: str = "primary",
+        checkout_timeout: float = DEFAULT_CHECKOUT_TIMEOUT_SECONDS,
+        max_lifetime: float = DEFAULT_MAX_LIFETIME_SECONDS,
+        max_idle: float = DEFAULT_MAX_IDLE_SECONDS,
+        liveness_interval: float = DEFAULT_LIVENESS_INTERVAL_SECONDS,
+        ping: Callable[[Any], None] = _ping,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.name = name
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.liveness_interval = liveness_interval
+        self._connect = connect
+        self._ping = ping
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 右端が直近に返却された接続。取り出しも右端から行い、左端の古いものをアイドル回収に回す
+        # The right end holds the most recently returned connection; checkouts pop from the right so
+        # the left end ages out through idle recycling.
+        self._idle: deque[_PooledConnection] = deque()
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._opening = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds_total = 0.0
+        self._timeouts = 0
+
+    def _size_locked(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_expired(self, entry: _PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - entry.created_at >= self.max_lifetime
+
+    def _release_slot_locked(self) -> None:
+        # 接続を1本閉じた枠は、待機者がいればその待機者に新規接続を開かせる
+        # A slot freed by closing a connection goes to the head waiter, which opens a new one.
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.may_open = True
+            self._opening += 1
+            waiter.event.set()
+
+    def _discard(self, entry: _PooledConnection, reason: str) -> None:
+        with self._lock:
+            self._in_use.pop(id(entry.connection), None)
+            self._release_slot_locked()
+        _close_quietly(entry.connection)
+        _connections_closed_total.inc(self.name, reason)
+
+    def _open_reserved(self) -> _PooledConnection:
+        # 呼び出し前に _opening で枠を確保済み
+        # The caller has already reserved a slot through _opening.
+        try:
+            connection = self._connect()
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+                self._release_slot_locked()
+            raise
+        with self._lock:
+            self._opening -= 1
+            if self._closed:
+                self._release_slot_locked()
+                closed = True
+            else:
+                entry = _PooledConnection(connection, self._clock())
+                self._in_use[id(connection)] = entry
+                closed = False
+        if closed:
+            _close_quietly(connection)
+            raise PoolClosedError(f"Connection pool '{self.name}' is closed.")
+        return entry
+
+    def _wait(self, waiter: _Waiter, timeout: float) -> _PooledConnection | None:
+        waiter.event.wait(timeout)
+        with self._lock:
+            granted = waiter.entry is not None or waiter.may_open
+            if not granted:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                if not self._closed:
+                    self._timeouts += 1
+            waited = self._clock() - waiter.queued_at
+            self._waits += 1
+            self._wait_seconds_total += waited
+        _wait_seconds.observe(waited, self.name)
+        if granted:
+            return waiter.entry
+        if self._closed:
+            raise PoolClosedError(f"Connection pool '{self.name}' is closed.")
+        _checkout_timeouts_total.inc(self.name)
+        raise PoolTimeoutError(
+            f"Timed out after {timeout:.1f}s waiting for a connection from pool '{self.name}' "
+            f"({self.maxconn} connections in use)."
+        )
+
+    def getconn(self, timeout: float | None = None) -> Any:
+        timeout = self.checkout_timeout if timeout is None else timeout
+        waiter = None
+        entry = None
+        with self._lock:
+            if self._closed:
+                raise PoolClosedError(f"Connection pool '{self.name}' is closed.")
+            self._checkouts += 1
+            # 待機者がいる間は空き接続があっても割り込まない
+            # Never jump the queue while others are waiting.
+            if not self._waiters and self._idle:
+                entry = self._idle.pop()
+                self._in_use[id(entry.connection)] = entry
+            elif not self._waiters and self._size_locked() < self.maxconn:
+                self._opening += 1
+            else:
+                waiter = _Waiter(self._clock())
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            entry = self._wait(waiter, timeout)
+        if entry is None:
+            entry = self._open_reserved()
+
+        # 寿命切れ・切断済みの接続は貸し出さず、同じ枠で開き直す
+        # Never hand out expired or closed connections; reopen in the same slot instead.
+        if getattr(entry.connection, "closed", 0) or self._is_expired(entry, self._clock()):
+            reason = "broken" if getattr(entry.connection, "closed", 0) else "lifetime"
+            with self._lock:
+                self._in_use.pop(id(entry.connection), None)
+                self._opening += 1
+            _close_quietly(entry.connection)
+            _connections_closed_total.inc(self.name, reason)
+            entry = self._open_reserved()
+
+        entry.last_used_at = self._clock()
+        return entry.connection
+
+    def _return_locked(self, entry: _PooledConnection) -> None:
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.entry = entry
+            self._in_use[id(entry.connection)] = entry
+            waiter.event.set()
+        else:
+            self._idle.append(entry)
+
+    def putconn(self, connection: Any, close: bool = False) -> None:
+        reason = None
+        with self._lock:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                reason = "discarded"
+            elif self._closed or close or getattr(connection, "closed", 0):
+                reason = "discarded"
+                self._release_slot_locked()
+            elif self._is_expired(entry, self._clock()):
+                reason = "lifetime"
+                self._release_slot_locked()
+            else:
+                entry.last_used_at = self._clock()
+                self._return_locked(entry)
+        if reason is not None:
+            _close_quietly(connection)
+            _connections_closed_total.inc(self.name, reason)
+
+    def fill(self) -> None:
+        # minconn まで接続を開く。最初の失敗はそのまま送出する
+        # Open connections up to minconn; the first failure propagates.
+        while True:
+            with self._lock:
+                if self._closed or self._size_locked() >= self.minconn:
+                    return
+                self._opening += 1
+            entry = self._open_reserved()
+            with self._lock:
+                self._in_use.pop(id(entry.connection), None)
+                self._return_locked(entry)
+
+    def maintain(self) -> None:
+        # 寿命切れとアイドル超過（minconn を超える分）の接続を閉じ、しばらく使われていない接続は
+        # SELECT 1 で死活確認する。最後に minconn まで補充する
+        # Close expired connections and idle ones beyond minconn, ping connections that have sat
+        # unused for liveness_interval, then top the pool back up to minconn.
+        now = self._clock()
+        to_close: list[tuple[_PooledConnection, str]] = []
+        to_check: list[_PooledConnection] = []
+        with self._lock:
+            if self._closed:
+                return
+            kept: deque[_PooledConnection] = deque()
+            size = self._size_locked()
+            for entry in self._idle:
+                if self._is_expired(entry, now):
+                    to_close.append((entry, "lifetime"))
+                    size -= 1
+                elif self.max_idle > 0 and now - entry.last_used_at >= self.max_idle and size > self.minconn:
+                    to_close.append((entry, "idle"))
+                    size -= 1
+                elif now - max(entry.last_used_at, entry.last_checked_at) >= self.liveness_interval:
+                    to_check.append(entry)
+                else:
+                    kept.append(entry)
+            self._idle = kept
+            # 確認中の接続は貸し出し中として数え、上限を超えて開かないようにする
+            # Connections under check count as in use so the pool never exceeds maxconn.
+            for entry in to_check:
+                self._in_use[id(entry.connection)] = entry
+            for _ in to_close:
+                self._release_slot_locked()
+
+        for entry, reason in to_close:
+            _close_quietly(entry.connection)
+            _connections_closed_total.inc(self.name, reason)
+
+        for entry in to_check:
+            try:
+                self._ping(entry.connection)
+            except Exception:
+                logger.warning(
+                    "Discarding a pooled connection that failed its liveness check.",
+                    extra={"pool": self.name},
+                )
+                self._discard(entry, "broken")
+                continue
+            entry.last_checked_at = self._clock()
+            with self._lock:
+                self._in_use.pop(id(entry.connection), None)
+                if self._closed:
+                    closed = True
+                else:
+                    closed = False
+                    self._return_locked(entry)
+            if closed:
+                _close_quietly(entry.connection)
+
+        try:
+            self.fill()
+        except Exception:
+            logger.warning(
+                "Failed to refill the connection pool to its minimum size.",
+                extra={"pool": self.name},
+                exc_info=True,
+            )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            oldest_wait = self._clock() - self._waiters[0].queued_at if self._waiters else 0.0
+            return {
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "waiting": len(self._waiters),
+                "oldest_wait_seconds": oldest_wait,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_seconds_total": self._wait_seconds_total,
+                "timeouts": self._timeouts,
+            }
+
+    def closeall(self) -> None:
+        # 待機者は PoolClosedError で起こし、貸し出し中の接続は返却時に閉じる
+        # Wake waiters with PoolClosedError; checked-out connections close when returned.
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        for waiter in waiters:
+            waiter.event.set()
+        for entry in idle:
+            _close_quietly(entry.connection)
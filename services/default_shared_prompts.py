@@ -1,6 +1,7 @@
 from typing import Any
 
 from .db import get_db_connection
+from .seed_state import compute_seed_fingerprint, run_fingerprinted_seed
 
 SAMPLE_PROMPT_OWNER_EMAIL = "sample-prompts@chat-core.local"
 SAMPLE_PROMPT_OWNER_NAME = "運営サンプル"
@@ -68,89 +69,104 @@ DEFAULT_SHARED_PROMPTS = [
 ]
 
 
-def _extract_id(
-    row: dict[str, Any] | tuple[Any, ...] | None, key_name: str = "id"
-) -> Any:
-    # DB結果が dict/tuple どちらでもIDを取り出せるようにする
-    # Extract ID from DB rows regardless of dict or tuple shape.
-    if row is None:
-        return None
-    if isinstance(row, dict):
-        return row.get(key_name)
-    return row[0]
+DEFAULT_SHARED_PROMPTS_SEED_NAME = "default_shared_prompts"
+
+# サンプル投稿者の確保と公開プロンプトの upsert を1文で行う
+# Ensure the sample owner and upsert public prompts in a single statement.
+_UPSERT_DEFAULT_SHARED_PROMPTS_SQL = """
+    WITH owner AS (
+        INSERT INTO users (email, username, is_verified)
+        VALUES (%(owner_email)s, %(owner_name)s, TRUE)
+        ON CONFLICT (email) DO UPDATE
+           SET email = EXCLUDED.email
+        RETURNING id
+    ),
+    incoming AS (
+        SELECT *
+          FROM unnest(
+                   %(titles)s::text[],
+                   %(categories)s::text[],
+                   %(contents)s::text[],
+                   %(inputs)s::text[],
+                   %(outputs)s::text[]
+               ) AS i(title, category, content, input_examples, output_examples)
+    ),
+    updated AS (
+        UPDATE prompts AS p
+           SET category = i.category,
+               content = i.content,
+               input_examples = i.input_examples,
+               output_examples = i.output_examples
+          FROM incoming i, owner
+         WHERE p.user_id = owner.id
+           AND p.title = i.title
+           AND (p.category, p.content, p.input_examples, p.output_examples)
+               IS DISTINCT FROM
+               (i.category, i.content, i.input_examples, i.output_examples)
+        RETURNING p.id
+    ),
+    inserted AS (
+        INSERT INTO prompts
+            (user_id, is_public, title, category, content, author, input_examples, output_examples, created_at)
+        SELECT owner.id, TRUE, i.title, i.category, i.content, %(owner_name)s,
+               i.input_examples, i.output_examples, NOW()
+          FROM incoming i, owner
+         WHERE NOT EXISTS (
+               SELECT 1
+                 FROM prompts p
+                WHERE p.user_id = owner.id
+                  AND p.title = i.title
+         )
+        RETURNING id
+    )
+    SELECT (SELECT COUNT(*) FROM inserted) + (SELECT COUNT(*) FROM updated)
+"""
 
 
-def _ensure_sample_owner(cursor: Any) -> int:
-    # サンプル投稿者ユーザーを再利用し、未作成なら作成してIDを返す
-    # Reuse sample owner user or create it when missing, then return its ID.
-    cursor.execute(
-        "SELECT id FROM users WHERE email = %s",
-        (SAMPLE_PROMPT_OWNER_EMAIL,),
+def default_shared_prompts_fingerprint() -> str:
+    # 投稿者情報も含めてフィンガープリントを計算し、変更時のみ再投入させる
+    # Include owner identity in the fingerprint so owner changes also trigger a reseed.
+    return compute_seed_fingerprint(
+        {
+            "owner_email": SAMPLE_PROMPT_OWNER_EMAIL,
+            "owner_name": SAMPLE_PROMPT_OWNER_NAME,
+            "prompts": DEFAULT_SHARED_PROMPTS,
+        }
     )
-    row = cursor.fetchone()
-    owner_id = _extract_id(row)
-    if owner_id is not None:
-        return owner_id
 
+
+def _upsert_default_shared_prompts(cursor: Any) -> int:
     cursor.execute(
-        """
-        INSERT INTO users (email, username, is_verified)
-        VALUES (%s, %s, TRUE)
-        RETURNING id
-        """,
-        (SAMPLE_PROMPT_OWNER_EMAIL, SAMPLE_PROMPT_OWNER_NAME),
+        _UPSERT_DEFAULT_SHARED_PROMPTS_SQL,
+        {
+            "owner_email": SAMPLE_PROMPT_OWNER_EMAIL,
+            "owner_name": SAMPLE_PROMPT_OWNER_NAME,
+            "titles": [prompt["title"] for prompt in DEFAULT_SHARED_PROMPTS],
+            "categories": [prompt["category"] for prompt in DEFAULT_SHARED_PROMPTS],
+            "contents": [prompt["content"] for prompt in DEFAULT_SHARED_PROMPTS],
+            "inputs": [prompt["input_examples"] for prompt in DEFAULT_SHARED_PROMPTS],
+            "outputs": [prompt["output_examples"] for prompt in DEFAULT_SHARED_PROMPTS],
+        },
     )
     row = cursor.fetchone()
-    owner_id = _extract_id(row)
-    if owner_id is None:
-        raise RuntimeError("Failed to create sample prompt owner.")
-    return owner_id
+    if row is None:
+        return 0
+    return int(row[0])
 
 
 def ensure_default_shared_prompts() -> int:
-    # サンプル投稿者配下に標準公開プロンプトを不足分だけ投入する
-    # Seed missing public sample prompts under the sample owner account.
+    # フィンガープリントが変わった時だけサンプル投稿者配下の公開プロンプトを一括反映する
+    # Apply public sample prompts in bulk only when their fingerprint changed.
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        owner_user_id = _ensure_sample_owner(cursor)
-        inserted = 0
-
-        for prompt in DEFAULT_SHARED_PROMPTS:
-            cursor.execute(
-                """
-                SELECT 1
-                  FROM prompts
-                 WHERE user_id = %s
-                   AND title = %s
-                """,
-                (owner_user_id, prompt["title"]),
-            )
-            if cursor.fetchone():
-                continue
-
-            cursor.execute(
-                """
-                INSERT INTO prompts
-                    (user_id, is_public, title, category, content, author, input_examples, output_examples, created_at)
-                VALUES (%s, TRUE, %s, %s, %s, %s, %s, %s, NOW())
-                """,
-                (
-                    owner_user_id,
-                    prompt["title"],
-                    prompt["category"],
-                    prompt["content"],
-                    SAMPLE_PROMPT_OWNER_NAME,
-                    prompt["input_examples"],
-                    prompt["output_examples"],
-                ),
-            )
-            inserted += 1
-
-        if inserted > 0:
-            conn.commit()
-
-        return inserted
+        return run_fingerprinted_seed(
+            conn,
+            cursor,
+            DEFAULT_SHARED_PROMPTS_SEED_NAME,
+            default_shared_prompts_fingerprint(),
+            _upsert_default_shared_prompts,
+        )
     except Exception:
         conn.rollback()
         raise
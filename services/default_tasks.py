@@ -3,7 +3,8 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-from .db import get_db_connection
+from .db import ROW_VERSION_COLUMNS, get_db_connection
+from .seed_state import compute_seed_fingerprint, run_fingerprinted_seed
 
 DEFAULT_TASKS_JSON = (
     Path(__file__).resolve().parent.parent / "frontend" / "data" / "default_tasks.json"
@@ -71,54 +72,139 @@ def default_task_rows() -> list[tuple]:
     return rows
 
 
-def _extract_name(row: dict[str, Any] | tuple[Any, ...] | None) -> str | None:
-    # dict/tuple どちらの fetch 結果でも name を取り出せるようにする
-    # Extract "name" from either dict-based or tuple-based DB rows.
+DEFAULT_TASKS_SEED_NAME = "default_tasks"
+
+# ユーザーから見えるタスク行 = ユーザー所有行 + 非表示でない共通タスク（同名の所有行があれば上書き）
+# Rows a user sees: own rows + visible shared defaults (shadowed by same-name own rows).
+# 共通タスクは編集時にのみユーザー行として実体化し、並び順・非表示は状態テーブルに保持する
+# Defaults are materialized only on edit; per-user order/hide state lives in a side table.
+USER_TASK_ROWS_SQL = """
+    SELECT t.id,
+           t.name,
+           t.prompt_template,
+           t.input_examples,
+           t.output_examples,
+           t.display_order,
+           t.created_at,
+           FALSE AS is_shared
+      FROM task_with_examples t
+     WHERE t.user_id = %(user_id)s
+    UNION ALL
+    SELECT d.id,
+           d.name,
+           d.prompt_template,
+           d.input_examples,
+           d.output_examples,
+           COALESCE(s.display_order, d.display_order) AS display_order,
+           d.created_at,
+           TRUE AS is_shared
+      FROM task_with_examples d
+      LEFT JOIN user_default_task_states s
+        ON s.default_task_id = d.id
+       AND s.user_id = %(user_id)s
+     WHERE d.user_id IS NULL
+       AND NOT COALESCE(s.is_hidden, FALSE)
+       AND NOT EXISTS (
+           SELECT 1
+             FROM task_with_examples u
+            WHERE u.user_id = %(user_id)s
+              AND u.name = d.name
+       )
+"""
+
+# 上記の行の元になる全ソース（共通タスク・自分の行・状態テーブル）の件数と行バージョン
+# Row counts and row versions of every source feeding the rows above (defaults, own rows, state).
+USER_TASKS_VERSION_SQL = f"""
+    SELECT t.*, s.*
+      FROM (SELECT {ROW_VERSION_COLUMNS}
+              FROM task_with_examples
+             WHERE user_id = %(user_id)s OR user_id IS NULL) AS t,
+           (SELECT {ROW_VERSION_COLUMNS}
+              FROM user_default_task_states
+             WHERE user_id = %(user_id)s) AS s
+"""
+
+# 共通タスクを1文で upsert する（同名は内容差分がある時だけ更新、未登録は追加）
+# Upsert shared tasks in one statement: update changed rows, insert missing ones.
+_UPSERT_DEFAULT_TASKS_SQL = """
+    WITH incoming AS (
+        SELECT *
+          FROM unnest(
+                   %(names)s::text[],
+                   %(templates)s::text[],
+                   %(inputs)s::text[],
+                   %(outputs)s::text[],
+                   %(orders)s::int[]
+               ) AS i(name, prompt_template, input_examples, output_examples, display_order)
+    ),
+    updated AS (
+        UPDATE task_with_examples AS t
+           SET prompt_template = i.prompt_template,
+               input_examples = i.input_examples,
+               output_examples = i.output_examples,
+               display_order = i.display_order
+          FROM incoming i
+         WHERE t.user_id IS NULL
+           AND t.name = i.name
+           AND (t.prompt_template, t.input_examples, t.output_examples, t.display_order)
+               IS DISTINCT FROM
+               (i.prompt_template, i.input_examples, i.output_examples, i.display_order)
+        RETURNING t.id
+    ),
+    inserted AS (
+        INSERT INTO task_with_examples
+              (user_id, name, prompt_template, input_examples, output_examples, display_order)
+        SELECT NULL, i.name, i.prompt_template, i.input_examples, i.output_examples, i.display_order
+          FROM incoming i
+         WHERE NOT EXISTS (
+               SELECT 1
+                 FROM task_with_examples t
+                WHERE t.user_id IS NULL
+                  AND t.name = i.name
+         )
+        RETURNING id
+    )
+    SELECT (SELECT COUNT(*) FROM inserted) + (SELECT COUNT(*) FROM updated)
+"""
+
+
+def default_tasks_fingerprint() -> str:
+    # 正規化済みのデフォルトタスク内容からフィンガープリントを計算する
+    # Compute the seed fingerprint from normalized default task content.
+    return compute_seed_fingerprint(load_default_tasks())
+
+
+def _upsert_default_tasks(cursor: Any) -> int:
+    rows = default_task_rows()
+    cursor.execute(
+        _UPSERT_DEFAULT_TASKS_SQL,
+        {
+            "names": [row[0] for row in rows],
+            "templates": [row[1] for row in rows],
+            "inputs": [row[2] for row in rows],
+            "outputs": [row[3] for row in rows],
+            "orders": [row[4] for row in rows],
+        },
+    )
+    row = cursor.fetchone()
     if row is None:
-        return None
-    if isinstance(row, dict):
-        return row.get("name")
-    return row[0]
+        return 0
+    return int(row[0])
 
 
 def ensure_default_tasks_seeded() -> int:
-    # 共通タスク（user_id IS NULL）に不足分のみ追加し、追加件数を返す
-    # Seed only missing shared tasks (user_id IS NULL) and return inserted count.
+    # JSON のフィンガープリントが変わった時だけ共通タスク（user_id IS NULL）を一括反映し、件数を返す
+    # Apply shared tasks (user_id IS NULL) in bulk only when the JSON fingerprint changed.
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            SELECT name
-              FROM task_with_examples
-             WHERE user_id IS NULL
-            """
+        return run_fingerprinted_seed(
+            conn,
+            cursor,
+            DEFAULT_TASKS_SEED_NAME,
+            default_tasks_fingerprint(),
+            _upsert_default_tasks,
         )
-        existing_names = {
-            name
-            for name in (_extract_name(row) for row in cursor.fetchall())
-            if isinstance(name, str)
-        }
-
-        inserted = 0
-        for name, template, input_example, output_example, display_order in default_task_rows():
-            if name in existing_names:
-                continue
-
-            cursor.execute(
-                """
-                INSERT INTO task_with_examples
-                      (user_id, name, prompt_template, input_examples, output_examples, display_order)
-                VALUES (NULL, %s, %s, %s, %s, %s)
-                """,
-                (name, template, input_example, output_example, display_order),
-            )
-            inserted += 1
-
-        if inserted > 0:
-            conn.commit()
-
-        return inserted
     except Exception:
         conn.rollback()
         raise
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import json
+import time
 from datetime import datetime
 from typing import Optional
 
 from .cache import get_redis_client
 
+# ルームキーを有効期限時刻のスコアで保持するソート済みセット。件数取得を SCAN なしで行うための索引
+# Sorted set of room keys scored by expiry time; an index that lets room_count avoid SCAN.
+ROOM_INDEX_KEY = "ephemeral_room_index"
+
 
 class EphemeralChatStore:
     # 未ログインユーザーの一時チャットを Redis またはメモリで保持するストア
@@ -15,6 +20,10 @@ class EphemeralChatStore:
         self._memory = {}
         self._redis = get_redis_client()
 
+    @property
+    def backend(self) -> str:
+        return "redis" if self._redis is not None else "memory"
+
     def _key(self, sid: str, room_id: str) -> str:
         return f"ephemeral:{sid}:{room_id}"
 
@@ -80,6 +89,7 @@ class EphemeralChatStore:
         if self._redis is not None:
             key = self._key(sid, room_id)
             self._redis.set(key, self._encode(room), ex=self.expiration_seconds)
+            self._redis.zadd(ROOM_INDEX_KEY, {key: time.time() + self.expiration_seconds})
             return
 
         self._memory.setdefault(sid, {})[room_id] = {
@@ -98,7 +108,7 @@ class EphemeralChatStore:
                 return None
             room = self._decode(payload)
             if self._is_expired(room):
-                self._redis.delete(key)
+                self._delete_redis_key(key)
                 return None
             return room
 
@@ -114,7 +124,7 @@ class EphemeralChatStore:
             key = self._key(sid, room_id)
             ttl = self._remaining_ttl(room)
             if ttl <= 0:
-                self._redis.delete(key)
+                self._delete_redis_key(key)
                 return False
             self._redis.set(key, self._encode(room), ex=ttl)
             return True
@@ -122,9 +132,13 @@ class EphemeralChatStore:
         self._memory.setdefault(sid, {})[room_id] = room
         return True
 
+    def _delete_redis_key(self, key: str) -> bool:
+        self._redis.zrem(ROOM_INDEX_KEY, key)
+        return self._redis.delete(key) > 0
+
     def delete_room(self, sid: str, room_id: str) -> bool:
         if self._redis is not None:
-            return self._redis.delete(self._key(sid, room_id)) > 0
+            return self._delete_redis_key(self._key(sid, room_id))
 
         rooms = self._memory.get(sid)
         if not rooms or room_id not in rooms:
@@ -152,6 +166,14 @@ class EphemeralChatStore:
         room["messages"] = messages
         return self._save_room(sid, room_id, room)
 
+    def room_count(self) -> int:
+        # メトリクス用。Redis では期限切れの索引エントリを落としてから ZCARD で数える（SCAN しない）
+        # For metrics. In Redis mode, drop expired index entries and count with ZCARD instead of SCAN.
+        if self._redis is not None:
+            self._redis.zremrangebyscore(ROOM_INDEX_KEY, "-inf", time.time())
+            return self._redis.zcard(ROOM_INDEX_KEY)
+        return sum(len(rooms) for rooms in list(self._memory.values()))
+
     def get_messages(self, sid: str, room_id: str) -> list:
         room = self.get_room(sid, room_id)
         if not room:
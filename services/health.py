@@ -1,55 +1,217 @@
 from __future__ import annotations
 
-from typing import Any
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable
 
-from services.cache import get_redis_client, is_redis_configured
+from services import llm, metrics
+from services.cache import get_redis_client, is_redis_configured, mark_redis_unavailable
 from services.db import get_db_connection
+from services.db_pool import PoolTimeoutError
+
+DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS = 5.0
+DEFAULT_LLM_CHECK_INTERVAL_SECONDS = 60.0
+DEFAULT_LLM_CHECK_TIMEOUT_SECONDS = 5.0
+DEFAULT_DB_SLOW_MS = 1000.0
+DEFAULT_DB_CHECKOUT_TIMEOUT_SECONDS = 0.5
+
+logger = logging.getLogger(__name__)
+
+_health_check_seconds = metrics.histogram(
+    "chatcore_health_check_duration_seconds",
+    "Latency of background health checks by component.",
+    ("component",),
+)
+
+# コンポーネント名 -> 直近のチェック結果（checked_at_monotonic を含む）
+# Component name -> latest check result (including checked_at_monotonic).
+_results_lock = threading.Lock()
+_results: dict[str, dict[str, Any]] = {}
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def is_llm_health_check_enabled() -> bool:
+    return os.getenv("HEALTH_CHECK_LLM", "0").strip().lower() in ("1", "true", "yes")
+
+
+def _stale_after_seconds(component: str) -> float:
+    # 既定では確認間隔の3倍を過ぎた結果を古いとみなす
+    # By default a result is stale after three check intervals.
+    if component.startswith("llm."):
+        interval = _float_env("HEALTH_LLM_CHECK_INTERVAL_SECONDS", DEFAULT_LLM_CHECK_INTERVAL_SECONDS)
+    else:
+        interval = _float_env("HEALTH_CHECK_INTERVAL_SECONDS", DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS)
+    return _float_env("HEALTH_STALE_AFTER_SECONDS", max(interval * 3, 15.0))
 
 
 def get_liveness_status() -> dict[str, Any]:
     return {"status": "ok"}
 
 
-def get_readiness_status() -> tuple[dict[str, Any], int]:
-    components: dict[str, dict[str, Any]] = {}
-    overall_ok = True
-    degraded = False
+def _timed_check(component: str, required: bool, check: Callable[[], str | None]) -> dict[str, Any]:
+    # check() は正常なら None、劣化なら理由の文字列を返し、失敗なら例外を送出する
+    # check() returns None when healthy, a reason string when degraded, and raises on failure.
+    start = time.perf_counter()
+    result: dict[str, Any] = {"required": required}
+    try:
+        reason = check()
+    except Exception as exc:
+        result["status"] = "error"
+        result["detail"] = exc.__class__.__name__
+    else:
+        result["status"] = "ok" if reason is None else "degraded"
+        if reason is not None:
+            result["detail"] = reason
+    elapsed = time.perf_counter() - start
+    _health_check_seconds.observe(elapsed, component)
+    result["latency_ms"] = round(elapsed * 1000, 2)
+    result["checked_at"] = datetime.now().isoformat(timespec="seconds")
+    result["checked_at_monotonic"] = time.monotonic()
+    return result
+
 
+def _check_database() -> str | None:
+    # プールが埋まっているのは DB の障害ではないので、短く待って取れなければ劣化として報告する
+    # A saturated pool is not a database outage: wait briefly and report degraded if none frees up.
+    checkout_timeout = _float_env(
+        "HEALTH_DB_CHECKOUT_TIMEOUT_SECONDS", DEFAULT_DB_CHECKOUT_TIMEOUT_SECONDS
+    )
+    start = time.perf_counter()
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-            finally:
-                cursor.close()
-        components["database"] = {"status": "ok", "required": True}
+        conn = get_db_connection(checkout_timeout=checkout_timeout)
+    except PoolTimeoutError:
+        return f"pool saturated (no connection within {checkout_timeout:g} s)"
+    with conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    slow_ms = _float_env("HEALTH_DB_SLOW_MS", DEFAULT_DB_SLOW_MS)
+    if elapsed_ms > slow_ms:
+        return f"slow ({elapsed_ms:.0f} ms > {slow_ms:.0f} ms)"
+    return None
+
+
+def _check_redis() -> str | None:
+    redis_client = get_redis_client()
+    if redis_client is None:
+        return "unavailable"
+    try:
+        redis_client.ping()
     except Exception as exc:
-        overall_ok = False
-        components["database"] = {
-            "status": "error",
-            "required": True,
-            "detail": exc.__class__.__name__,
-        }
+        mark_redis_unavailable(exc)
+        raise
+    return None
+
+
+def _llm_clients() -> dict[str, Any]:
+    return {"llm.groq": llm.groq_client, "llm.gemini": llm.gemini_client}
+
+
+def _check_llm(client: Any) -> str | None:
+    # モデル一覧の取得はトークンを消費しない最も軽い疎通確認
+    # Listing models is the lightest round trip that consumes no tokens.
+    timeout = _float_env("HEALTH_LLM_CHECK_TIMEOUT_SECONDS", DEFAULT_LLM_CHECK_TIMEOUT_SECONDS)
+    client.with_options(timeout=timeout, max_retries=0).models.list()
+    return None
 
+
+def run_health_checks(*, include_llm: bool = False) -> None:
+    results = {"database": _timed_check("database", True, _check_database)}
     if is_redis_configured():
-        redis_client = get_redis_client()
-        if redis_client is None:
-            degraded = True
-            components["redis"] = {
-                "status": "degraded",
-                "required": False,
-            }
-        else:
-            components["redis"] = {"status": "ok", "required": False}
+        results["redis"] = _timed_check("redis", False, _check_redis)
     else:
-        components["redis"] = {
+        results["redis"] = {
             "status": "disabled",
             "required": False,
+            "checked_at_monotonic": time.monotonic(),
         }
+    if include_llm:
+        for component, client in _llm_clients().items():
+            if client is not None:
+                results[component] = _timed_check(
+                    component, False, lambda client=client: _check_llm(client)
+                )
+    with _results_lock:
+        _results.update(results)
+
+
+def run_health_prober(stop_event: threading.Event) -> None:
+    # DB・Redis を一定間隔で確認し、結果をキャッシュする。LLM は有効時のみ、より長い間隔で確認する。
+    # /readyz はこのキャッシュを返すだけなので、遅い依存先がイベントループを止めることはない
+    # Check DB and Redis on an interval and cache the results; LLM providers only when enabled, on a
+    # longer interval. /readyz only reads this cache, so a slow dependency never stalls the event loop.
+    interval = _float_env("HEALTH_CHECK_INTERVAL_SECONDS", DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS)
+    llm_interval = _float_env("HEALTH_LLM_CHECK_INTERVAL_SECONDS", DEFAULT_LLM_CHECK_INTERVAL_SECONDS)
+    llm_enabled = is_llm_health_check_enabled()
+    next_llm_check = 0.0
+    while not stop_event.is_set():
+        include_llm = llm_enabled and time.monotonic() >= next_llm_check
+        if include_llm:
+            next_llm_check = time.monotonic() + llm_interval
+        try:
+            run_health_checks(include_llm=include_llm)
+        except Exception:
+            logger.exception("Health check run failed.")
+        stop_event.wait(timeout=interval)
+
+
+def reset_health_results() -> None:
+    with _results_lock:
+        _results.clear()
+
+
+def get_readiness_status() -> tuple[dict[str, Any], int]:
+    # キャッシュ済みの結果から即座に応答する。古い結果は必須なら error、任意なら degraded として扱う
+    # Answer immediately from cached results. Stale results count as error when required,
+    # otherwise as degraded.
+    now = time.monotonic()
+    with _results_lock:
+        results = {name: dict(result) for name, result in _results.items()}
+
+    if "database" not in results:
+        return {
+            "status": "starting",
+            "components": {},
+            "reasons": ["no health check has completed yet"],
+        }, 503
+
+    components: dict[str, dict[str, Any]] = {}
+    reasons: list[str] = []
+    overall_ok = True
+    degraded = False
+    for name, result in sorted(results.items()):
+        age = now - result.pop("checked_at_monotonic")
+        result["age_seconds"] = round(age, 1)
+        status = result["status"]
+        if status != "disabled" and age > _stale_after_seconds(name):
+            status = result["status"] = "error" if result["required"] else "degraded"
+            result["stale"] = True
+            reasons.append(f"{name}: stale (last checked {age:.1f}s ago)")
+        elif status in ("error", "degraded"):
+            detail = result.get("detail")
+            reasons.append(f"{name}: {status}" + (f" ({detail})" if detail else ""))
+        if status == "error" and result["required"]:
+            overall_ok = False
+        elif status in ("error", "degraded"):
+            degraded = True
+        components[name] = result
 
-    if overall_ok:
-        if degraded:
-            return {"status": "degraded", "components": components}, 200
-        return {"status": "ok", "components": components}, 200
-    return {"status": "error", "components": components}, 503
+    payload = {"components": components, "reasons": reasons}
+    if not overall_ok:
+        return {"status": "error", **payload}, 503
+    if degraded:
+        return {"status": "degraded", **payload}, 200
+    return {"status": "ok", **payload}, 200
@@ -2,10 +2,16 @@
 
 import logging
 import os
+import time
 from collections.abc import Iterator
+from typing import Any
 
 from openai import OpenAI
 
+from services import metrics
+from services.llm_telemetry import record_llm_call
+from services.request_context import record_span
+
 
 def _get_positive_int_env(name: str, default: int) -> int:
     raw = os.environ.get(name)
@@ -21,8 +27,13 @@ GROQ_MODEL = os.environ.get("GROQ_MODEL", "openai/gpt-oss-20b")
 GEMINI_DEFAULT_MODEL = os.environ.get("GEMINI_DEFAULT_MODEL", "gemini-2.5-flash")
 LLM_MAX_TOKENS = _get_positive_int_env("LLM_MAX_TOKENS", 4096)
 
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai"
+# 負荷試験ではローカルのスタブサーバーへ向けられるよう、接続先を環境変数で上書きできる
+# Base URLs can be overridden so load tests can point both providers at a local stub server.
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or "https://api.groq.com/openai/v1"
+GEMINI_BASE_URL = (
+    os.environ.get("GEMINI_BASE_URL")
+    or "https://generativelanguage.googleapis.com/v1beta/openai"
+)
 
 # Valid model names
 VALID_GEMINI_MODELS = {
@@ -46,6 +57,137 @@ gemini_client = (
 logger = logging.getLogger(__name__)
 ConversationMessages = list[dict[str, str]]
 
+_llm_ttft_seconds = metrics.histogram(
+    "chatcore_llm_time_to_first_token_seconds",
+    "Time from the streaming request to the first content delta, by model.",
+    ("model",),
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0),
+)
+_llm_tokens_per_second = metrics.histogram(
+    "chatcore_llm_tokens_per_second",
+    "Output token rate after the first token for completed streams, by model.",
+    ("model",),
+    buckets=(5.0, 10.0, 20.0, 40.0, 60.0, 100.0, 150.0, 250.0, 500.0, 1000.0),
+)
+_llm_completion_tokens_total = metrics.counter(
+    "chatcore_llm_completion_tokens_total",
+    "Completion tokens (provider usage, or estimated when absent), by model.",
+    ("model",),
+)
+_llm_calls_total = metrics.counter(
+    "chatcore_llm_calls_total",
+    "LLM calls by model and outcome (ok, error, cancelled).",
+    ("model", "outcome"),
+)
+
+_llm_calls_in_flight = metrics.in_flight_gauge(
+    "chatcore_llm_calls_in_flight",
+    "LLM provider calls (streamed or not) currently open in this process.",
+)
+
+
+def get_llm_calls_in_flight() -> int:
+    return _llm_calls_in_flight.current
+
+
+def estimate_tokens(text: str) -> int:
+    # usage が返らない場合の概算。英数字は約4文字、日本語などの非ASCII文字は約1文字で1トークン
+    # Rough fallback when usage is missing: ~4 ASCII chars or ~1 non-ASCII char (e.g. Japanese) per token.
+    if not text:
+        return 0
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    ascii_count = len(text) - non_ascii
+    return non_ascii + (ascii_count + 3) // 4
+
+
+def _usage_value(usage: Any, name: str) -> int | None:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else None
+
+
+class _LlmCallTracker:
+    # 1回の LLM 呼び出しの計測値を集め、終了時にメトリクスとテレメトリへ送る
+    # Collect measurements for one LLM call and emit metrics and telemetry when it ends.
+    def __init__(
+        self,
+        *,
+        model_name: str,
+        provider: str,
+        streamed: bool,
+        conversation_messages: ConversationMessages,
+        call_context: dict[str, Any] | None,
+    ) -> None:
+        self.model_name = model_name
+        self.provider = provider
+        self.streamed = streamed
+        self.conversation_messages = conversation_messages
+        self.call_context = call_context or {}
+        self.start = time.perf_counter()
+        self.first_token_at: float | None = None
+        self.chunk_count = 0
+        self.estimated_completion_tokens = 0
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        _llm_calls_in_flight.inc()
+
+    def on_content(self, content: str) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            record_span("llm_ttft", self.first_token_at - self.start)
+        self.chunk_count += 1
+        self.estimated_completion_tokens += estimate_tokens(content)
+
+    def on_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        self.prompt_tokens = _usage_value(usage, "prompt_tokens")
+        self.completion_tokens = _usage_value(usage, "completion_tokens")
+
+    def finish(self, outcome: str) -> None:
+        _llm_calls_in_flight.dec()
+        finished_at = time.perf_counter()
+        record_span("llm", finished_at - self.start)
+        tokens_estimated = self.prompt_tokens is None or self.completion_tokens is None
+        prompt_tokens = self.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(
+                estimate_tokens(message.get("content") or "")
+                for message in self.conversation_messages
+            )
+        completion_tokens = self.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = self.estimated_completion_tokens
+
+        _llm_calls_total.inc(self.model_name, outcome)
+        if completion_tokens:
+            _llm_completion_tokens_total.inc(self.model_name, amount=completion_tokens)
+        ttft_ms = None
+        if self.streamed and self.first_token_at is not None:
+            _llm_ttft_seconds.observe(self.first_token_at - self.start, self.model_name)
+            ttft_ms = int((self.first_token_at - self.start) * 1000)
+            generation_seconds = finished_at - self.first_token_at
+            if outcome == "ok" and completion_tokens > 1 and generation_seconds > 0:
+                _llm_tokens_per_second.observe(
+                    (completion_tokens - 1) / generation_seconds, self.model_name
+                )
+
+        record_llm_call(
+            {
+                "model": self.model_name,
+                "provider": self.provider,
+                "streamed": self.streamed,
+                "outcome": outcome,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "tokens_estimated": tokens_estimated,
+                "ttft_ms": ttft_ms,
+                "duration_ms": int((finished_at - self.start) * 1000),
+                "chunk_count": self.chunk_count,
+                "chat_room_id": self.call_context.get("chat_room_id"),
+                "user_id": self.call_context.get("user_id"),
+            }
+        )
+
 
 class LlmServiceError(RuntimeError):
     # LLM連携で発生する例外の基底クラス
@@ -84,110 +226,179 @@ def _raise_invalid_model_error(model_name: str) -> None:
     )
 
 
-def get_groq_response(
-    conversation_messages: ConversationMessages, model_name: str
+def _get_openai_compatible_response(
+    *,
+    client: OpenAI | None,
+    provider: str,
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    missing_key_message: str,
+    provider_error_message: str,
+    call_context: dict[str, Any] | None,
 ) -> str | None:
-    # Groq 向けクライアントを使ってチャット補完を実行する
-    # Run chat completion through the Groq client.
-    """Groq API呼び出し (via OpenAI client)"""
-    if groq_client is None:
-        raise LlmConfigurationError("GROQ_API_KEY が未設定です。")
+    # OpenAI互換APIで一括応答を取得し、所要時間とトークン使用量を記録する
+    # Fetch a complete response from an OpenAI-compatible API and record duration and usage.
+    if client is None:
+        raise LlmConfigurationError(missing_key_message)
 
+    tracker = _LlmCallTracker(
+        model_name=model_name,
+        provider=provider,
+        streamed=False,
+        conversation_messages=conversation_messages,
+        call_context=call_context,
+    )
     try:
-        response = groq_client.chat.completions.create(
+        response = client.chat.completions.create(
             model=model_name,
             messages=conversation_messages,
             max_tokens=LLM_MAX_TOKENS,
         )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
     except Exception as exc:
-        logger.exception("Groq API call failed.")
-        raise LlmProviderError("Groq API call failed.") from exc
+        tracker.finish("error")
+        logger.exception(provider_error_message)
+        raise LlmProviderError(provider_error_message) from exc
+
+    tracker.on_usage(getattr(response, "usage", None))
+    if content:
+        tracker.on_content(content)
+    tracker.finish("ok")
+    return content
+
+
+def get_groq_response(
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    call_context: dict[str, Any] | None = None,
+) -> str | None:
+    # Groq 向けクライアントを使ってチャット補完を実行する
+    # Run chat completion through the Groq client.
+    """Groq API呼び出し (via OpenAI client)"""
+    return _get_openai_compatible_response(
+        client=groq_client,
+        provider="groq",
+        conversation_messages=conversation_messages,
+        model_name=model_name,
+        missing_key_message="GROQ_API_KEY が未設定です。",
+        provider_error_message="Groq API call failed.",
+        call_context=call_context,
+    )
 
 
 def _get_openai_compatible_response_stream(
     *,
     client: OpenAI | None,
+    provider: str,
     conversation_messages: ConversationMessages,
     model_name: str,
     missing_key_message: str,
     provider_error_message: str,
+    call_context: dict[str, Any] | None,
 ) -> Iterator[str]:
     # OpenAI互換APIのストリーム断片を順次返し、最後に確実に close する
     # Yield OpenAI-compatible stream deltas and always close the stream.
     if client is None:
         raise LlmConfigurationError(missing_key_message)
 
+    tracker = _LlmCallTracker(
+        model_name=model_name,
+        provider=provider,
+        streamed=True,
+        conversation_messages=conversation_messages,
+        call_context=call_context,
+    )
+    outcome = "cancelled"
     stream = None
     try:
+        # include_usage で最後のチャンクにトークン使用量を載せてもらう
+        # include_usage asks the provider to attach token usage to the final chunk.
         stream = client.chat.completions.create(
             model=model_name,
             messages=conversation_messages,
             max_tokens=LLM_MAX_TOKENS,
             stream=True,
+            stream_options={"include_usage": True},
         )
         for chunk in stream:
+            tracker.on_usage(getattr(chunk, "usage", None))
             if not chunk.choices:
                 continue
             delta = getattr(chunk.choices[0], "delta", None)
             content = getattr(delta, "content", None)
             if content:
+                tracker.on_content(content)
                 yield content
+        outcome = "ok"
     except Exception as exc:
+        outcome = "error"
         logger.exception(provider_error_message)
         raise LlmProviderError(provider_error_message) from exc
     finally:
+        # クライアント切断で途中終了した場合は cancelled として記録する
+        # A stream abandoned by a disconnecting client is recorded as cancelled.
+        tracker.finish(outcome)
         close = getattr(stream, "close", None)
         if callable(close):
             close()
 
 
 def get_groq_response_stream(
-    conversation_messages: ConversationMessages, model_name: str
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    call_context: dict[str, Any] | None = None,
 ) -> Iterator[str]:
     # Groq のストリーム応答を逐次テキスト片として返す
     # Yield Groq response chunks incrementally.
     return _get_openai_compatible_response_stream(
         client=groq_client,
+        provider="groq",
         conversation_messages=conversation_messages,
         model_name=model_name,
         missing_key_message="GROQ_API_KEY が未設定です。",
         provider_error_message="Groq streaming API call failed.",
+        call_context=call_context,
     )
 
 
 def get_gemini_response(
-    conversation_messages: ConversationMessages, model_name: str
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    call_context: dict[str, Any] | None = None,
 ) -> str | None:
     # Gemini 向けクライアントを使ってチャット補完を実行する
     # Run chat completion through the Gemini client.
     """Google Gemini API呼び出し (via OpenAI client)"""
-    if gemini_client is None:
-        raise LlmConfigurationError("Gemini_API_KEY が未設定です。")
-
-    try:
-        response = gemini_client.chat.completions.create(
-            model=model_name,
-            messages=conversation_messages,
-            max_tokens=LLM_MAX_TOKENS,
-        )
-        return response.choices[0].message.content
-    except Exception as exc:
-        logger.exception("Google Gemini API call failed.")
-        raise LlmProviderError("Google Gemini API call failed.") from exc
+    return _get_openai_compatible_response(
+        client=gemini_client,
+        provider="gemini",
+        conversation_messages=conversation_messages,
+        model_name=model_name,
+        missing_key_message="Gemini_API_KEY が未設定です。",
+        provider_error_message="Google Gemini API call failed.",
+        call_context=call_context,
+    )
 
 
 def get_gemini_response_stream(
-    conversation_messages: ConversationMessages, model_name: str
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    call_context: dict[str, Any] | None = None,
 ) -> Iterator[str]:
     # Gemini のストリーム応答を逐次テキスト片として返す
     # Yield Gemini response chunks incrementally.
     return _get_openai_compatible_response_stream(
         client=gemini_client,
+        provider="gemini",
         conversation_messages=conversation_messages,
         model_name=model_name,
         missing_key_message="Gemini_API_KEY が未設定です。",
         provider_error_message="Google Gemini streaming API call failed.",
+        call_context=call_context,
     )
 
 
@@ -209,27 +420,45 @@ def is_streaming_model(model_name: str) -> bool:
     return is_gemini_model(model_name) or is_groq_model(model_name)
 
 
+def _build_call_context(chat_room_id: str | None, user_id: int | None) -> dict[str, Any]:
+    return {"chat_room_id": chat_room_id, "user_id": user_id}
+
+
 def get_llm_response(
-    conversation_messages: ConversationMessages, model_name: str
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    chat_room_id: str | None = None,
+    user_id: int | None = None,
 ) -> str | None:
     # 指定モデル名でプロバイダを振り分け、不正モデルは例外として扱う
     # Route provider by model name and raise on invalid models.
+    call_context = _build_call_context(chat_room_id, user_id)
     if is_gemini_model(model_name):
-        return get_gemini_response(conversation_messages, model_name)
+        return get_gemini_response(conversation_messages, model_name, call_context=call_context)
     if is_groq_model(model_name):
-        return get_groq_response(conversation_messages, model_name)
+        return get_groq_response(conversation_messages, model_name, call_context=call_context)
 
     _raise_invalid_model_error(model_name)
 
 
 def get_llm_response_stream(
-    conversation_messages: ConversationMessages, model_name: str
+    conversation_messages: ConversationMessages,
+    model_name: str,
+    *,
+    chat_room_id: str | None = None,
+    user_id: int | None = None,
 ) -> Iterator[str]:
     # 指定モデル名でストリーム可能なプロバイダを振り分ける
     # Route streaming providers by model name and raise on invalid models.
+    call_context = _build_call_context(chat_room_id, user_id)
     if is_gemini_model(model_name):
-        return get_gemini_response_stream(conversation_messages, model_name)
+        return get_gemini_response_stream(
+            conversation_messages, model_name, call_context=call_context
+        )
     if is_groq_model(model_name):
-        return get_groq_response_stream(conversation_messages, model_name)
+        return get_groq_response_stream(
+            conversation_messages, model_name, call_context=call_context
+        )
 
     _raise_invalid_model_error(model_name)
@@ -4,6 +4,7 @@ from datetime import date, datetime, timedelta
 from threading import Lock
 from typing import Any
 
+from services import metrics
 from services.cache import get_redis_client
 
 
@@ -129,6 +130,52 @@ def _consume_daily_quota(
     return allowed, remaining, daily_limit
 
 
+def _peek_daily_remaining(key_prefix: str, env_name: str, default_limit: int) -> int:
+    # 消費せずに本日の残量を読む。Redis 読み取りに失敗した場合はメモリ側の値を返す
+    # Read today's remaining quota without consuming it; fall back to memory if Redis fails.
+    daily_limit = _get_daily_limit(env_name, default_limit)
+    today = date.today().isoformat()
+    quota_key = f"{key_prefix}:{today}"
+
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            return max(daily_limit - int(redis_client.get(quota_key) or 0), 0)
+        except Exception:
+            logger.warning("Failed to read quota usage from Redis.", exc_info=True)
+
+    with _in_memory_lock:
+        current = _in_memory_daily_counts.get(quota_key, 0)
+    return max(daily_limit - current, 0)
+
+
+def _collect_quota_remaining() -> list[tuple[tuple[str, ...], float]]:
+    return [
+        (
+            ("llm_daily",),
+            _peek_daily_remaining(
+                _LLM_DAILY_COUNT_KEY_PREFIX, LLM_DAILY_API_LIMIT_ENV, DEFAULT_LLM_DAILY_API_LIMIT
+            ),
+        ),
+        (
+            ("auth_email_daily",),
+            _peek_daily_remaining(
+                _AUTH_EMAIL_DAILY_COUNT_KEY_PREFIX,
+                AUTH_EMAIL_DAILY_SEND_LIMIT_ENV,
+                DEFAULT_AUTH_EMAIL_DAILY_SEND_LIMIT,
+            ),
+        ),
+    ]
+
+
+metrics.gauge_function(
+    "chatcore_quota_remaining",
+    "Remaining units of each daily quota for today.",
+    ("quota",),
+    _collect_quota_remaining,
+)
+
+
 def get_llm_daily_api_limit() -> int:
     return _get_daily_limit(LLM_DAILY_API_LIMIT_ENV, DEFAULT_LLM_DAILY_API_LIMIT)
 
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from . import metrics
+from .db import get_db_connection
+
+DEFAULT_TELEMETRY_BATCH_SIZE = 200
+DEFAULT_TELEMETRY_FLUSH_SECONDS = 2.0
+DEFAULT_TELEMETRY_QUEUE_SIZE = 10000
+MAX_REPORT_DAYS = 90
+
+# 列名と unnest 用の配列要素型
+# Column names with the element type used for the unnest arrays.
+_TELEMETRY_COLUMNS = (
+    ("created_at", "timestamp"),
+    ("model", "text"),
+    ("provider", "text"),
+    ("streamed", "boolean"),
+    ("outcome", "text"),
+    ("prompt_tokens", "int"),
+    ("completion_tokens", "int"),
+    ("tokens_estimated", "boolean"),
+    ("ttft_ms", "int"),
+    ("duration_ms", "int"),
+    ("chunk_count", "int"),
+    ("chat_room_id", "text"),
+    ("user_id", "int"),
+)
+
+# 列ごとの配列を unnest して、1バッチを1文で挿入する
+# Unnest one array per column so a whole batch is inserted in one statement.
+_INSERT_BATCH_SQL = """
+    INSERT INTO llm_call_telemetry ({columns})
+    SELECT * FROM unnest({arrays})
+""".format(
+    columns=", ".join(name for name, _ in _TELEMETRY_COLUMNS),
+    arrays=", ".join(f"%({name})s::{sql_type}[]" for name, sql_type in _TELEMETRY_COLUMNS),
+)
+
+logger = logging.getLogger(__name__)
+
+_records_dropped_total = metrics.counter(
+    "chatcore_llm_telemetry_dropped_total",
+    "LLM telemetry records dropped, by reason (queue_full, write_failed).",
+    ("reason",),
+)
+_records_written_total = metrics.counter(
+    "chatcore_llm_telemetry_written_total",
+    "LLM telemetry records written to llm_call_telemetry.",
+)
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def is_telemetry_enabled() -> bool:
+    return os.getenv("LLM_TELEMETRY_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+_queue: queue.Queue[dict[str, Any]] = queue.Queue(
+    maxsize=_int_env("LLM_TELEMETRY_QUEUE_SIZE", DEFAULT_TELEMETRY_QUEUE_SIZE)
+)
+
+metrics.gauge_function(
+    "chatcore_llm_telemetry_queue_depth",
+    "LLM telemetry records waiting for the batch writer.",
+    (),
+    lambda: [((), _queue.qsize())],
+)
+
+
+def record_llm_call(record: dict[str, Any]) -> None:
+    # 呼び出し側（LLM 応答スレッド）は DB を待たず、キューへ積むだけにする。満杯なら捨てる
+    # Callers (LLM response threads) never wait on the DB: enqueue only, and drop when full.
+    if not is_telemetry_enabled():
+        return
+    record.setdefault("created_at", datetime.now())
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        _records_dropped_total.inc("queue_full")
+
+
+def write_telemetry_batch(records: list[dict[str, Any]]) -> int:
+    if not records:
+        return 0
+    params = {
+        name: [record.get(name) for record in records] for name, _ in _TELEMETRY_COLUMNS
+    }
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(_INSERT_BATCH_SQL, params)
+        conn.commit()
+        return len(records)
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def _drain(limit: int) -> list[dict[str, Any]]:
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _flush(batch: list[dict[str, Any]]) -> None:
+    try:
+        written = write_telemetry_batch(batch)
+    except Exception:
+        # テレメトリはベストエフォート。書き込み失敗でチャット処理を止めない
+        # Telemetry is best-effort; a failed write must never affect chat handling.
+        logger.exception("Failed to write LLM telemetry batch.", extra={"records": len(batch)})
+        _records_dropped_total.inc("write_failed", amount=len(batch))
+        return
+    _records_written_total.inc(amount=written)
+
+
+def run_llm_telemetry_writer(
+    stop_event: threading.Event,
+    *,
+    batch_size: int | None = None,
+    flush_seconds: float = DEFAULT_TELEMETRY_FLUSH_SECONDS,
+) -> None:
+    # batch_size 件たまるか flush_seconds 経過したらまとめて書き込む。停止時は残りを書き切る
+    # Write when batch_size records are queued or flush_seconds pass; drain the rest on stop.
+    size = batch_size or _int_env("LLM_TELEMETRY_BATCH_SIZE", DEFAULT_TELEMETRY_BATCH_SIZE)
+    while not stop_event.is_set():
+        try:
+            first = _queue.get(timeout=flush_seconds)
+        except queue.Empty:
+            continue
+        batch = [first]
+        deadline = time.monotonic() + flush_seconds
+        while len(batch) < size and not stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _flush(batch)
+
+    while True:
+        batch = _drain(size)
+        if not batch:
+            return
+        _flush(batch)
+
+
+def _clamp_days(days: int) -> int:
+    return min(max(days, 1), MAX_REPORT_DAYS)
+
+
+def fetch_model_latency_percentiles(days: int) -> list[dict[str, Any]]:
+    # モデルごとの TTFT・所要時間の分位点と、初回トークン以降の生成速度の中央値を返す
+    # Per-model TTFT and duration percentiles plus the median generation rate after the first token.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT model,
+                   COUNT(*) AS calls,
+                   COUNT(*) FILTER (WHERE outcome <> 'ok') AS failed_calls,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY ttft_ms) AS ttft_p50_ms,
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY ttft_ms) AS ttft_p95_ms,
+                   percentile_cont(0.99) WITHIN GROUP (ORDER BY ttft_ms) AS ttft_p99_ms,
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS duration_p50_ms,
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS duration_p95_ms,
+                   percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_ms) AS duration_p99_ms,
+                   percentile_cont(0.5) WITHIN GROUP (
+                       ORDER BY completion_tokens * 1000.0
+                                / NULLIF(duration_ms - COALESCE(ttft_ms, 0), 0)
+                   ) AS tokens_per_second_p50
+              FROM llm_call_telemetry
+             WHERE created_at >= CURRENT_TIMESTAMP - make_interval(days => %(days)s)
+             GROUP BY model
+             ORDER BY calls DESC, model
+            """,
+            {"days": _clamp_days(days)},
+        )
+        return cursor.fetchall()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def fetch_daily_rollups(days: int) -> list[dict[str, Any]]:
+    # 日付×モデル単位の呼び出し数・失敗数・トークン合計（コスト試算用）を返す
+    # Calls, failures and token totals (for cost estimates) per day and model.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT created_at::date AS day,
+                   model,
+                   COUNT(*) AS calls,
+                   COUNT(*) FILTER (WHERE outcome <> 'ok') AS failed_calls,
+                   COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+                   COALESCE(SUM(completion_tokens), 0) AS completion_tokens,
+                   COUNT(*) FILTER (WHERE tokens_estimated) AS estimated_calls,
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS duration_p95_ms
+              FROM llm_call_telemetry
+             WHERE created_at >= CURRENT_DATE - make_interval(days => %(days)s - 1)
+             GROUP BY day, model
+             ORDER BY day DESC, model
+            """,
+            {"days": _clamp_days(days)},
+        )
+        return cursor.fetchall()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services import metrics
+from services.db import get_db_pool_stats
+from services.llm import get_llm_calls_in_flight
+from services.loop_monitor import get_recent_loop_lag
+from services.web import jsonify
+
+DEFAULT_LOOP_LAG_MS = 500.0
+DEFAULT_MAX_IN_FLIGHT = 200
+DEFAULT_DB_POOL_WAIT_MS = 1000.0
+DEFAULT_MAX_LLM_IN_FLIGHT = 32
+DEFAULT_CRITICAL_FACTOR = 2.0
+DEFAULT_RETRY_AFTER_SECONDS = 2
+DEFAULT_SAMPLE_INTERVAL_MS = 100.0
+DEFAULT_EXEMPT_PATHS = ("/healthz", "/readyz", "/metrics")
+
+# ログイン済みユーザーのこれらのチャット API は、過負荷の初期段階でも受け付ける
+# Chat APIs from signed-in users stay admitted through the first stage of overload.
+PRIORITY_CHAT_PATHS = frozenset(
+    {
+        "/api/chat",
+        "/api/get_chat_history",
+        "/api/get_chat_rooms",
+        "/api/new_chat_room",
+    }
+)
+
+NORMAL = 0
+OVERLOADED = 1
+CRITICAL = 2
+
+logger = logging.getLogger(__name__)
+
+_shed_total = metrics.counter(
+    "chatcore_load_shed_total",
+    "Requests refused with 503 by the load shedder, by priority and the signal that tripped.",
+    ("priority", "reason"),
+)
+_http_in_flight = metrics.in_flight_gauge(
+    "chatcore_http_requests_in_flight",
+    "HTTP requests (including open streams) admitted by the load shedder and not yet finished.",
+)
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def is_load_shedding_enabled() -> bool:
+    return os.getenv("LOAD_SHED_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _max_db_pool_wait() -> float:
+    stats = get_db_pool_stats()
+    return max((pool["oldest_wait_seconds"] for pool in stats.values()), default=0.0)
+
+
+def _loop_lag() -> float:
+    lag = get_recent_loop_lag()
+    return lag if lag is not None else 0.0
+
+
+class LoadSheddingMiddleware:
+    # イベントループの遅延・処理中リクエスト数・DB プールの待ち時間・LLM 呼び出し数を見て、
+    # いずれかが閾値を超えたら新しい低優先リクエストを 503 + Retry-After で即座に断る。
+    # 閾値の CRITICAL_FACTOR 倍を超えたらログイン済みチャットも断る。ヘルスチェックは常に通し、
+    # 判定は受付時だけなので、開始済みのストリームが途中で切られることはない。
+    # セッションを読むため、セッションミドルウェアより内側に置くこと
+    # Watch event loop lag, in-flight requests, DB pool wait and open LLM calls. When any passes its
+    # threshold, refuse new low-priority requests right away with 503 and Retry-After; past
+    # CRITICAL_FACTOR times the threshold, refuse signed-in chat as well. Health checks always pass,
+    # and the decision is made only on admission, so streams already started are never cut off.
+    # Reads the session, so it must sit inside the session middleware.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.retry_after = str(
+            max(int(_float_env("LOAD_SHED_RETRY_AFTER_SECONDS", DEFAULT_RETRY_AFTER_SECONDS)), 1)
+        )
+        self.critical_factor = max(
+            _float_env("LOAD_SHED_CRITICAL_FACTOR", DEFAULT_CRITICAL_FACTOR), 1.0
+        )
+        self.sample_interval = (
+            _float_env("LOAD_SHED_SAMPLE_INTERVAL_MS", DEFAULT_SAMPLE_INTERVAL_MS) / 1000
+        )
+        exempt = os.getenv("LOAD_SHED_EXEMPT_PATHS", ",".join(DEFAULT_EXEMPT_PATHS))
+        self.exempt_paths = frozenset(path.strip() for path in exempt.split(",") if path.strip())
+        # (名前, 現在値の取得関数, 閾値)。閾値が 0 以下のシグナルは使わない
+        # (name, reader, threshold). Signals with a threshold of 0 or less are ignored.
+        signals: list[tuple[str, Callable[[], float], float]] = [
+            ("loop_lag", _loop_lag, _float_env("LOAD_SHED_LOOP_LAG_MS", DEFAULT_LOOP_LAG_MS) / 1000),
+            (
+                "in_flight",
+                lambda: _http_in_flight.current,
+                _float_env("LOAD_SHED_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+            ),
+            (
+                "db_pool_wait",
+                _max_db_pool_wait,
+                _float_env("LOAD_SHED_DB_POOL_WAIT_MS", DEFAULT_DB_POOL_WAIT_MS) / 1000,
+            ),
+            (
+                "llm_in_flight",
+                get_llm_calls_in_flight,
+                _float_env("LOAD_SHED_MAX_LLM_IN_FLIGHT", DEFAULT_MAX_LLM_IN_FLIGHT),
+            ),
+        ]
+        self.signals = [signal for signal in signals if signal[2] > 0]
+        self._lock = threading.Lock()
+        self._sampled_at = float("-inf")
+        self._state: tuple[int, str] = (NORMAL, "")
+
+    def _evaluate(self) -> tuple[int, str]:
+        level, reason = NORMAL, ""
+        for name, read, threshold in self.signals:
+            try:
+                value = read()
+            except Exception:
+                logger.warning("Load shedding signal %s failed.", name, exc_info=True)
+                continue
+            if value >= threshold * self.critical_factor:
+                return CRITICAL, name
+            if value >= threshold and level == NORMAL:
+                level, reason = OVERLOADED, name
+        return level, reason
+
+    def current_state(self) -> tuple[int, str]:
+        # シグナルの読み取りはロックを伴うため、sample_interval ごとに1回だけ評価する
+        # Reading signals takes locks, so evaluate at most once per sample_interval.
+        now = time.monotonic()
+        with self._lock:
+            if now - self._sampled_at < self.sample_interval:
+                return self._state
+            self._sampled_at = now
+        state = self._evaluate()
+        with self._lock:
+            self._state = state
+        return state
+
+    def _priority(self, scope: Scope) -> str:
+        session = scope.get("session") or {}
+        if scope.get("path") in PRIORITY_CHAT_PATHS and session.get("user_id"):
+            return "chat"
+        return "default"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        level, reason = self.current_state()
+        if level != NORMAL:
+            priority = self._priority(scope)
+            if level == CRITICAL or priority != "chat":
+                _shed_total.inc(priority, reason)
+                response = jsonify(
+                    {"error": "Server is busy. Please try again shortly."}, status_code=503
+                )
+                response.headers["Retry-After"] = self.retry_after
+                await response(scope, receive, send)
+                return
+
+        _http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _http_in_flight.dec()
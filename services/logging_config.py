@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import atexit
+import copy
 import json
 import logging
 import os
+import queue
+import random
+import threading
 from datetime import datetime, timezone
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
+from services import metrics
 from services.request_context import RequestContextFilter
 
 DEFAULT_LOG_LEVEL = "INFO"
@@ -17,14 +23,42 @@ DEFAULT_ERROR_LOG_FILE = "error.log"
 DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
 DEFAULT_LOG_BACKUP_COUNT = 10
 DEFAULT_LOG_OUTPUT = "json"
+DEFAULT_LOG_QUEUE_SIZE = 10000
+DEFAULT_ACCESS_LOG_SAMPLE_RATE = 1.0
 
 APP_LOG_HANDLER_NAME = "chatcore_app_file"
 ERROR_LOG_HANDLER_NAME = "chatcore_error_file"
 CONSOLE_HANDLER_NAME = "chatcore_console"
+QUEUE_HANDLER_NAME = "chatcore_log_queue"
 LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
 
 logger = logging.getLogger(__name__)
 
+_log_records_dropped_total = metrics.counter(
+    "chatcore_log_records_dropped_total",
+    "Log records dropped because the log queue was full, by level.",
+    ("level",),
+)
+_access_logs_sampled_out_total = metrics.counter(
+    "chatcore_access_logs_sampled_out_total",
+    "Successful http_request access logs skipped by sampling.",
+)
+
+# 現在のキューとリスナー。configure_logging で差し替え、stop_logging で停止する
+# The active queue and listener; replaced by configure_logging and stopped by stop_logging.
+_pipeline_lock = threading.Lock()
+_log_queue: queue.Queue[logging.LogRecord] | None = None
+_listener: QueueListener | None = None
+_listener_handlers: list[logging.Handler] = []
+_atexit_registered = False
+
+metrics.gauge_function(
+    "chatcore_log_queue_depth",
+    "Log records waiting for the background log writer.",
+    (),
+    lambda: [((), _log_queue.qsize() if _log_queue is not None else 0)],
+)
+
 
 class JsonLogFormatter(logging.Formatter):
     RESERVED_KEYS = {
@@ -81,6 +115,63 @@ class JsonLogFormatter(logging.Formatter):
         return json.dumps(payload, ensure_ascii=False)
 
 
+class AccessLogSampler(logging.Filter):
+    # 成功した http_request アクセスログだけを rate の確率で残す。エラー応答と他のログは常に残す
+    # Keep successful http_request access logs with probability rate; errors and other logs always pass.
+    def __init__(self, rate: float, random_func: Callable[[], float] = random.random) -> None:
+        super().__init__()
+        self.rate = rate
+        self._random = random_func
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or getattr(record, "event", None) != "http_request":
+            return True
+        if getattr(record, "status_code", 500) >= 400:
+            return True
+        if self._random() < self.rate:
+            # 集計側で件数を復元できるよう採用率を付ける
+            # Attach the rate so log consumers can scale counts back up.
+            record.sample_rate = self.rate
+            return True
+        _access_logs_sampled_out_total.inc()
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    # 呼び出し側スレッド（多くはイベントループ）ではレコードを積むだけにし、
+    # フォーマットとファイル書き込みはリスナースレッドで行う。キュー満杯時は待たずに捨てて数える
+    # The calling thread (often the event loop) only enqueues; formatting and file I/O happen
+    # on the listener thread. When the queue is full the record is dropped and counted, never waited on.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数は後で変更されうるため、ここでメッセージへ展開しておく。例外情報は残して整形を任せる
+        # Merge args now since they may be mutated later; exc_info is kept for the formatter.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _log_records_dropped_total.inc(record.levelname)
+
+
+def _parse_sample_rate_env(env_name: str, default_value: float) -> float:
+    raw_value = os.getenv(env_name, str(default_value))
+    try:
+        parsed_value = float(raw_value)
+    except (TypeError, ValueError):
+        logger.warning(
+            "Invalid %s value '%s'. Falling back to %s.",
+            env_name,
+            raw_value,
+            default_value,
+        )
+        return default_value
+    return min(max(parsed_value, 0.0), 1.0)
+
+
 def _parse_positive_int_env(env_name: str, default_value: int) -> int:
     raw_value = os.getenv(env_name, str(default_value))
     try:
@@ -135,7 +226,6 @@ def _build_rotating_handler(
     )
     handler.setLevel(level)
     handler.setFormatter(formatter)
-    handler.addFilter(RequestContextFilter())
     handler.name = handler_name
     return handler
 
@@ -148,7 +238,6 @@ def _build_console_handler(
     handler = logging.StreamHandler()
     handler.setLevel(level)
     handler.setFormatter(formatter)
-    handler.addFilter(RequestContextFilter())
     handler.name = CONSOLE_HANDLER_NAME
     return handler
 
@@ -174,13 +263,22 @@ def configure_logging() -> None:
     error_log_file = log_dir / os.getenv("ERROR_LOG_FILE", DEFAULT_ERROR_LOG_FILE)
     formatter = _build_formatter(log_output)
 
-    for handler_name in (CONSOLE_HANDLER_NAME, APP_LOG_HANDLER_NAME, ERROR_LOG_HANDLER_NAME):
+    queue_size = _parse_positive_int_env("LOG_QUEUE_SIZE", DEFAULT_LOG_QUEUE_SIZE)
+    sample_rate = _parse_sample_rate_env(
+        "LOG_ACCESS_SAMPLE_RATE", DEFAULT_ACCESS_LOG_SAMPLE_RATE
+    )
+
+    stop_logging()
+    for handler_name in (
+        CONSOLE_HANDLER_NAME,
+        APP_LOG_HANDLER_NAME,
+        ERROR_LOG_HANDLER_NAME,
+        QUEUE_HANDLER_NAME,
+    ):
         _replace_named_handler(root_logger, handler_name)
 
-    root_logger.addHandler(
-        _build_console_handler(level=resolved_log_level, formatter=formatter)
-    )
-    root_logger.addHandler(
+    handlers: list[logging.Handler] = [
+        _build_console_handler(level=resolved_log_level, formatter=formatter),
         _build_rotating_handler(
             file_path=app_log_file,
             level=resolved_log_level,
@@ -188,9 +286,7 @@ def configure_logging() -> None:
             backup_count=backup_count,
             handler_name=APP_LOG_HANDLER_NAME,
             formatter=formatter,
-        )
-    )
-    root_logger.addHandler(
+        ),
         _build_rotating_handler(
             file_path=error_log_file,
             level=logging.ERROR,
@@ -198,5 +294,45 @@ def configure_logging() -> None:
             backup_count=backup_count,
             handler_name=ERROR_LOG_HANDLER_NAME,
             formatter=formatter,
-        )
-    )
+        ),
+    ]
+
+    # リクエスト情報は contextvars にあるため、キューへ積む前（呼び出し側スレッド）で付与する。
+    # サンプリングも先に行い、捨てるレコードにはコピーのコストもかけない
+    # Request context lives in contextvars, so attach it on the calling thread before enqueueing.
+    # Sampling runs first so dropped records are never copied.
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.name = QUEUE_HANDLER_NAME
+    queue_handler.addFilter(AccessLogSampler(sample_rate))
+    queue_handler.addFilter(RequestContextFilter())
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    global _log_queue, _listener, _listener_handlers, _atexit_registered
+    with _pipeline_lock:
+        _log_queue = log_queue
+        _listener = listener
+        _listener_handlers = handlers
+        if not _atexit_registered:
+            atexit.register(stop_logging)
+            _atexit_registered = True
+    listener.start()
+    root_logger.addHandler(queue_handler)
+
+
+def stop_logging() -> None:
+    # キューに残ったレコードを書き切ってリスナーを止める。以降のログは同じハンドラへ同期的に出力する
+    # Flush queued records and stop the listener; later log calls go to the same handlers synchronously.
+    global _log_queue, _listener, _listener_handlers
+    with _pipeline_lock:
+        listener, handlers = _listener, _listener_handlers
+        _log_queue, _listener, _listener_handlers = None, None, []
+    if listener is None:
+        return
+
+    root_logger = logging.getLogger()
+    _replace_named_handler(root_logger, QUEUE_HANDLER_NAME)
+    listener.stop()
+    for handler in handlers:
+        handler.addFilter(RequestContextFilter())
+        root_logger.addHandler(handler)
@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+from threading import Lock
+from typing import Any
+
+from services import metrics
+from services.cache import get_redis_client
+
+DEFAULT_ADMIN_LOGIN_MAX_ATTEMPTS = 5
+DEFAULT_ADMIN_LOGIN_WINDOW_SECONDS = 300
+_ADMIN_LOGIN_KEY_PREFIX = "admin_login:attempts"
+
+_in_memory_lock = Lock()
+# キー -> (試行回数, ウィンドウ終了時刻 monotonic)
+# Key -> (attempt count, window end as monotonic time).
+_in_memory_attempts: dict[str, tuple[int, float]] = {}
+logger = logging.getLogger(__name__)
+
+_throttled_total = metrics.counter(
+    "chatcore_admin_login_throttled_total",
+    "Admin login attempts refused because the client IP exceeded its attempt budget.",
+)
+
+# INCR と初回の EXPIRE を原子的に行い、回数と残り TTL を返す
+# Atomically INCR and set the expiry on the first hit; return the count and remaining TTL.
+_ATTEMPT_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+  redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+local ttl = redis.call('TTL', KEYS[1])
+return {current, ttl}
+"""
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(int(os.getenv(name, str(default))), 1)
+    except ValueError:
+        return default
+
+
+def _attempt_key(client_ip: str) -> str:
+    return f"{_ADMIN_LOGIN_KEY_PREFIX}:{client_ip}"
+
+
+def _consume_with_redis(redis_client: Any, key: str, window: int) -> tuple[int, int] | None:
+    try:
+        current, ttl = redis_client.eval(_ATTEMPT_SCRIPT, 1, key, window)
+        return int(current), max(int(ttl), 1)
+    except Exception:
+        logger.exception("Redis login throttling failed; falling back to in-memory.")
+        return None
+
+
+def _consume_with_in_memory(key: str, window: int) -> tuple[int, int]:
+    now = time.monotonic()
+    with _in_memory_lock:
+        # 期限切れのキーを都度掃除する
+        # Prune expired keys on each call.
+        expired = [name for name, (_, ends_at) in _in_memory_attempts.items() if ends_at <= now]
+        for name in expired:
+            _in_memory_attempts.pop(name, None)
+
+        count, ends_at = _in_memory_attempts.get(key, (0, now + window))
+        count += 1
+        _in_memory_attempts[key] = (count, ends_at)
+        return count, max(int(ends_at - now + 0.999), 1)
+
+
+def consume_admin_login_attempt(client_ip: str) -> tuple[bool, int]:
+    # IP ごとの固定ウィンドウで試行回数を数え、上限を超えたら (False, 再試行までの秒数) を返す。
+    # ハッシュ計算より前に呼ぶので、上限超過の試行は CPU を消費しない
+    # Count attempts per IP in a fixed window; past the limit return (False, seconds until retry).
+    # Called before hashing, so throttled attempts cost no CPU.
+    max_attempts = _int_env("ADMIN_LOGIN_MAX_ATTEMPTS", DEFAULT_ADMIN_LOGIN_MAX_ATTEMPTS)
+    window = _int_env("ADMIN_LOGIN_WINDOW_SECONDS", DEFAULT_ADMIN_LOGIN_WINDOW_SECONDS)
+    key = _attempt_key(client_ip)
+
+    result = None
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        result = _consume_with_redis(redis_client, key, window)
+    if result is None:
+        result = _consume_with_in_memory(key, window)
+
+    count, retry_after = result
+    if count > max_attempts:
+        _throttled_total.inc()
+        return False, retry_after
+    return True, 0
+
+
+def reset_admin_login_attempts(client_ip: str) -> None:
+    # ログイン成功時にその IP の試行回数を消す
+    # Clear the IP's attempts after a successful login.
+    key = _attempt_key(client_ip)
+    redis_client = get_redis_client()
+    if redis_client is not None:
+        try:
+            redis_client.delete(key)
+        except Exception:
+            logger.warning("Failed to reset login attempts in Redis.", exc_info=True)
+    with _in_memory_lock:
+        _in_memory_attempts.pop(key, None)
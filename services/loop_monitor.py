@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Awaitable, TypeVar
+
+from . import metrics
+
+DEFAULT_LAG_INTERVAL_MS = 100.0
+DEFAULT_BLOCK_THRESHOLD_MS = 200.0
+DEFAULT_LAG_WINDOW = 600
+_QUANTILES = (0.5, 0.9, 0.99)
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_loop_lag_seconds = metrics.histogram(
+    "chatcore_event_loop_lag_seconds",
+    "Delay between when the event loop heartbeat was due and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+_loop_blocked_total = metrics.counter(
+    "chatcore_event_loop_blocked_total",
+    "Times a callback held the event loop past EVENT_LOOP_BLOCK_THRESHOLD_MS.",
+)
+
+_active_monitor: EventLoopMonitor | None = None
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def is_loop_monitor_enabled() -> bool:
+    return os.getenv("EVENT_LOOP_MONITOR_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    # 最近傍順位法 / nearest-rank
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class EventLoopMonitor:
+    # ループ上で interval ごとに心拍コールバックを予約し、予定より遅れた分をラグとして記録する。
+    # 別スレッドの見張りは心拍が threshold を超えて途絶えたらループスレッドのスタックを取得する。
+    # その時点でループを握っているコードがそのまま写るので、ブロッキング箇所を特定できる
+    # Schedule a heartbeat callback every interval and record how late it ran as lag. A watchdog
+    # thread grabs the loop thread's stack when the heartbeat stalls past threshold; the stack shows
+    # exactly which code is holding the loop.
+    def __init__(
+        self,
+        *,
+        interval_seconds: float,
+        threshold_seconds: float,
+        window: int = DEFAULT_LAG_WINDOW,
+        record_metrics: bool = True,
+    ) -> None:
+        self.interval_seconds = interval_seconds
+        self.threshold_seconds = threshold_seconds
+        self.record_metrics = record_metrics
+        self.blocked: list[dict[str, Any]] = []
+        self._lags: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._expected_at = 0.0
+        self._last_beat = 0.0
+        self._reported_beat = 0.0
+        self._stop_event = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        # ループのスレッド上から呼ぶこと
+        # Must be called from the loop's own thread.
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._expected_at = loop.time() + self.interval_seconds
+        self._handle = loop.call_at(self._expected_at, self._beat)
+        self._watchdog = threading.Thread(
+            target=self._watch, daemon=True, name="event-loop-watchdog"
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._handle is not None:
+            self._handle.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+    def _beat(self) -> None:
+        loop = self._loop
+        now = loop.time()
+        lag = max(0.0, now - self._expected_at)
+        with self._lock:
+            self._lags.append(lag)
+        if self.record_metrics:
+            _loop_lag_seconds.observe(lag)
+        self._last_beat = time.monotonic()
+        self._expected_at = now + self.interval_seconds
+        if not self._stop_event.is_set():
+            self._handle = loop.call_at(self._expected_at, self._beat)
+
+    def _watch(self) -> None:
+        poll = max(min(self.threshold_seconds / 4, 0.05), 0.001)
+        while not self._stop_event.wait(poll):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - self.interval_seconds
+            # 同じ停止は1回だけ報告する
+            # Report each stall only once.
+            if stalled < self.threshold_seconds or last_beat == self._reported_beat:
+                continue
+            self._reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self._report_block(stalled, stack)
+
+    def _report_block(self, stalled_seconds: float, stack: str) -> None:
+        event = {"blocked_ms": round(stalled_seconds * 1000, 1), "stack": stack}
+        with self._lock:
+            self.blocked.append(event)
+        if not self.record_metrics:
+            return
+        _loop_blocked_total.inc()
+        logger.warning(
+            "Event loop blocked for at least %.0f ms.",
+            stalled_seconds * 1000,
+            extra={"event": "event_loop_blocked", **event},
+        )
+
+    def recent_lag(self, samples: int = 10) -> float:
+        # 直近の心拍の最大ラグ。心拍が遅れている最中ならその遅れも含める（負荷制御用の即時値）
+        # Worst lag over the last few heartbeats, including an overdue beat (a live load signal).
+        with self._lock:
+            recent = list(self._lags)[-samples:]
+        overdue = time.monotonic() - self._last_beat - self.interval_seconds
+        return max([overdue, *recent, 0.0])
+
+    def lag_percentiles(self) -> dict[str, float]:
+        with self._lock:
+            lags = sorted(self._lags)
+        if not lags:
+            return {}
+        summary = {f"p{int(q * 100)}": _percentile(lags, q) for q in _QUANTILES}
+        summary["max"] = lags[-1]
+        return summary
+
+
+def _collect_lag_quantiles() -> list[tuple[tuple[str, ...], float]]:
+    monitor = _active_monitor
+    if monitor is None:
+        return []
+    return [((name,), value) for name, value in monitor.lag_percentiles().items()]
+
+
+metrics.gauge_function(
+    "chatcore_event_loop_lag_recent_seconds",
+    "Event loop lag percentiles over the recent heartbeat window (p50, p90, p99, max).",
+    ("quantile",),
+    _collect_lag_quantiles,
+)
+
+
+def start_loop_monitor() -> EventLoopMonitor | None:
+    # lifespan から呼び、サーバーのイベントループを監視する
+    # Called from the lifespan to watch the server's event loop.
+    global _active_monitor
+    if not is_loop_monitor_enabled():
+        return None
+    monitor = EventLoopMonitor(
+        interval_seconds=_float_env("EVENT_LOOP_LAG_INTERVAL_MS", DEFAULT_LAG_INTERVAL_MS) / 1000,
+        threshold_seconds=_float_env("EVENT_LOOP_BLOCK_THRESHOLD_MS", DEFAULT_BLOCK_THRESHOLD_MS) / 1000,
+        window=int(_float_env("EVENT_LOOP_LAG_WINDOW", DEFAULT_LAG_WINDOW)),
+    )
+    monitor.start(asyncio.get_running_loop())
+    _active_monitor = monitor
+    return monitor
+
+
+def get_recent_loop_lag() -> float | None:
+    # 監視が動いていなければ None
+    # None when the monitor is not running.
+    monitor = _active_monitor
+    return monitor.recent_lag() if monitor is not None else None
+
+
+def stop_loop_monitor() -> None:
+    global _active_monitor
+    monitor = _active_monitor
+    _active_monitor = None
+    if monitor is not None:
+        monitor.stop()
+
+
+class EventLoopBlockedError(AssertionError):
+    pass
+
+
+def run_without_blocking(awaitable: Awaitable[T], *, threshold_ms: float = 50.0) -> T:
+    # テスト用: asyncio.run と同様に実行し、途中でループが threshold_ms 以上止まったら
+    # 止めていたコードのスタック付きで EventLoopBlockedError を送出する
+    # Test helper: run like asyncio.run and raise EventLoopBlockedError, with the stack of the
+    # blocking code, if the loop stalls for threshold_ms or longer along the way.
+    threshold = threshold_ms / 1000
+    monitor = EventLoopMonitor(
+        interval_seconds=min(threshold / 2, 0.01),
+        threshold_seconds=threshold,
+        record_metrics=False,
+    )
+
+    async def runner() -> T:
+        monitor.start(asyncio.get_running_loop())
+        try:
+            return await awaitable
+        finally:
+            monitor.stop()
+
+    result = asyncio.run(runner())
+    if monitor.blocked:
+        worst = max(monitor.blocked, key=lambda event: event["blocked_ms"])
+        raise EventLoopBlockedError(
+            f"Event loop was blocked for at least {worst['blocked_ms']} ms "
+            f"(threshold {threshold_ms} ms):\n{worst['stack']}"
+        )
+    return result
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import itertools
+import logging
+import math
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Any, Callable, Iterable
+
+# Prometheus テキスト形式 (0.0.4) の Content-Type
+# Content-Type of the Prometheus text exposition format (0.0.4).
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+LabelValues = tuple[str, ...]
+GaugeSamples = Iterable[tuple[LabelValues, float]]
+
+logger = logging.getLogger(__name__)
+
+
+class _ShardedStore:
+    # 値はスレッドごとのシャードに書き込み、ホットパスではロックを取らない。
+    # 集計時にだけ全シャードを合算し、終了したスレッドの値は retired へ畳み込む
+    # Writers only touch their own thread's shard, so the hot path never takes a lock.
+    # Scrapes sum every shard; shards of finished threads are folded into a retired total.
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._live: dict[int, dict[Any, Any]] = {}
+        self._retired: dict[Any, Any] = {}
+
+    def shard(self) -> dict[Any, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            return self._register_thread()
+
+    def _register_thread(self) -> dict[Any, Any]:
+        # スレッドごとに1回だけ実行される。スレッド終了で local が破棄されると retire が呼ばれる
+        # Runs once per thread; retire fires when the thread-local state is torn down.
+        shard_id = next(self._ids)
+        values: dict[Any, Any] = {}
+        sentinel = _ShardSentinel()
+        weakref.finalize(sentinel, self._retire, shard_id)
+        with self._lock:
+            self._live[shard_id] = values
+        self._local.values = values
+        self._local.sentinel = sentinel
+        return values
+
+    def _retire(self, shard_id: int) -> None:
+        with self._lock:
+            values = self._live.pop(shard_id, None)
+            if values:
+                _merge_into(self._retired, values)
+
+    def snapshot(self) -> dict[Any, Any]:
+        with self._lock:
+            merged: dict[Any, Any] = {}
+            _merge_into(merged, self._retired)
+            for values in self._live.values():
+                # dict.copy() は GIL 下で原子的なので、書き込み中のシャードも安全に読める
+                # dict.copy() is atomic under the GIL, so a shard being written is safe to read.
+                _merge_into(merged, values.copy())
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            self._retired.clear()
+            for values in self._live.values():
+                values.clear()
+
+
+class _ShardSentinel:
+    __slots__ = ("__weakref__",)
+
+
+def _merge_into(target: dict[Any, Any], source: dict[Any, Any]) -> None:
+    for key, value in source.items():
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for index, item in enumerate(value):
+                    current[index] += item
+        else:
+            target[key] = target.get(key, 0.0) + value
+
+
+_store = _ShardedStore()
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = _store.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _samples(self, snapshot: dict[Any, Any]) -> list[str]:
+        lines = []
+        for (name, labels), value in sorted(
+            (key, value) for key, value in snapshot.items() if key[0] == self.name
+        ):
+            lines.append(f"{name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        # [バケットごとの件数..., +Inf, 合計, 件数] を1つのリストで持つ
+        # One list per label set: [per-bucket counts..., +Inf, sum, count].
+        shard = _store.shard()
+        key = (self.name, labels)
+        cells = shard.get(key)
+        if cells is None:
+            cells = [0] * (len(self.buckets) + 3)
+            shard[key] = cells
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    def _samples(self, snapshot: dict[Any, Any]) -> list[str]:
+        lines = []
+        for (name, labels), cells in sorted(
+            (key, value) for key, value in snapshot.items() if key[0] == self.name
+        ):
+            cumulative = 0
+            bounds = [*map(_format_value, self.buckets), "+Inf"]
+            for bound, count in zip(bounds, cells[:-2]):
+                cumulative += count
+                bucket_labels = _format_labels((*self.labelnames, "le"), (*labels, bound))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{name}_sum{label_text} {_format_value(cells[-2])}")
+            lines.append(f"{name}_count{label_text} {cells[-1]}")
+        return lines
+
+
+class GaugeFunction:
+    # 現在値はスクレイプ時にコールバックで読む（ホットパスでの更新コストなし）
+    # Current values are read by a callback at scrape time, costing nothing on the hot path.
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        callback: Callable[[], GaugeSamples],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def _samples(self, _: dict[Any, Any]) -> list[str]:
+        try:
+            samples = list(self.callback())
+        except Exception:
+            logger.exception("Failed to collect gauge %s.", self.name)
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in samples
+        ]
+
+
+class InFlightGauge:
+    # 同時実行数とプロセス内の最大値を保持する。開始・終了時にだけ短いロックを取る
+    # Track current concurrency and the per-process peak; a short lock is taken only on enter/exit.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def inc(self) -> None:
+        with self._lock:
+            self.current += 1
+            if self.current > self.peak:
+                self.peak = self.current
+
+    def dec(self) -> None:
+        with self._lock:
+            self.current -= 1
+
+
+_registry: dict[str, Counter | Histogram | GaugeFunction] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: Any) -> Any:
+    # 同名の再登録（モジュール再読み込みなど）は後勝ちで置き換える
+    # Re-registering a name (e.g. on module reload) replaces the previous metric.
+    with _registry_lock:
+        _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return _register(Counter(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+) -> Histogram:
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge_function(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...],
+    callback: Callable[[], GaugeSamples],
+) -> GaugeFunction:
+    return _register(GaugeFunction(name, documentation, labelnames, callback))
+
+
+def in_flight_gauge(name: str, documentation: str) -> InFlightGauge:
+    # 現在値 (name) と最大値 (name_peak) を pid 付きで公開する（複数ワーカーの系列を区別するため）
+    # Expose the current value (name) and peak (name_peak) with a pid label to tell workers apart.
+    gauge = InFlightGauge()
+    pid = (str(os.getpid()),)
+    gauge_function(name, documentation, ("pid",), lambda: [(pid, gauge.current)])
+    gauge_function(
+        f"{name}_peak",
+        f"Highest value of {name} since this process started.",
+        ("pid",),
+        lambda: [(pid, gauge.peak)],
+    )
+    return gauge
+
+
+def _metric_type(metric: Any) -> str:
+    if isinstance(metric, Counter):
+        return "counter"
+    if isinstance(metric, Histogram):
+        return "histogram"
+    return "gauge"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value)
+
+
+def render_metrics() -> bytes:
+    # 全メトリクスを Prometheus テキスト形式で出力する。ゲージのコールバックは I/O を伴う場合がある
+    # Render every metric in Prometheus text format; gauge callbacks may perform I/O.
+    snapshot = _store.snapshot()
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {_metric_type(metric)}")
+        lines.extend(metric._samples(snapshot))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _is_loopback(host: str | None) -> bool:
+    try:
+        return ipaddress.ip_address(host or "").is_loopback
+    except ValueError:
+        return False
+
+
+def is_scrape_authorized(authorization: str | None, client_host: str | None = None) -> bool:
+    # METRICS_BEARER_TOKEN が未設定なら同一ホスト（ループバック）からのスクレイプだけを許可する
+    # Without METRICS_BEARER_TOKEN only loopback peers may scrape; otherwise a bearer token is required.
+    expected = os.getenv("METRICS_BEARER_TOKEN")
+    if not expected:
+        return _is_loopback(client_host)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.strip().encode("utf-8"), expected.encode("utf-8"))
+
+
+def reset_metrics() -> None:
+    # テスト用: 蓄積したカウンタ・ヒストグラムを消去する（登録は残す）
+    # For tests: clear accumulated counters and histograms while keeping registrations.
+    _store.reset()
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "__profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+DEFAULT_PROFILE_DIR = "logs/profiles"
+DEFAULT_PROFILE_INTERVAL_MS = 5.0
+DEFAULT_PROFILE_MAX_SECONDS = 30.0
+DEFAULT_PROFILE_MAX_STORED = 50
+_PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{12}$")
+_PROFILE_HEADER_KEY = PROFILE_HEADER.lower().encode("latin-1")
+
+_active_profile_var: ContextVar["RequestProfile | None"] = ContextVar(
+    "active_profile", default=None
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def is_profiling_enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+
+def get_profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", DEFAULT_PROFILE_DIR))
+
+
+def current_profile() -> RequestProfile | None:
+    return _active_profile_var.get()
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    # sys._current_frames() を一定間隔で読み、対象スレッドのスタックを折りたたみ形式で数える統計プロファイラ。
+    # 対象はイベントループのスレッドと、プロファイル中に run_blocking で起動したスレッド
+    # Statistical profiler: read sys._current_frames() at a fixed interval and count the target
+    # threads' stacks in folded form. Targets are the event loop thread plus run_blocking threads
+    # started while the profile is active.
+    def __init__(
+        self,
+        *,
+        method: str,
+        path: str,
+        interval_seconds: float,
+        max_seconds: float,
+    ) -> None:
+        self.profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:12]}"
+        self.method = method
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.max_seconds = max_seconds
+        self.created_at = datetime.now()
+        self.stacks: dict[str, int] = {}
+        self.samples = 0
+        self.duration_seconds = 0.0
+        self._thread_ids: set[int] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def add_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._thread_ids.discard(thread_id)
+
+    def start(self) -> None:
+        self.add_thread(threading.get_ident())
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, daemon=True, name=f"profiler-{self.profile_id}"
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        self.duration_seconds = time.perf_counter() - self._started_at
+
+    def _run(self) -> None:
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop_event.wait(self.interval_seconds):
+            if time.perf_counter() >= deadline:
+                return
+            self._sample()
+
+    def _sample(self) -> None:
+        with self._lock:
+            thread_ids = tuple(self._thread_ids)
+        frames = sys._current_frames()
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(f"thread-{thread_id}")
+            stack = ";".join(reversed(labels))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.profile_id,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.duration_seconds * 1000, 2),
+            "interval_ms": round(self.interval_seconds * 1000, 3),
+            "samples": self.samples,
+            "stacks": self.stacks,
+        }
+
+
+def _top_functions(stacks: dict[str, int], limit: int = 30) -> list[dict[str, Any]]:
+    # 呼び出しツリーの要約: 関数ごとの自己時間 (self) と包含時間 (total) のサンプル数
+    # Call-tree summary: self and inclusive (total) sample counts per function.
+    self_counts: dict[str, int] = {}
+    total_counts: dict[str, int] = {}
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + count
+        for frame in set(frames):
+            total_counts[frame] = total_counts.get(frame, 0) + count
+    # 自己時間の多い順（ホットスポット）に並べる
+    # Rank by self samples, i.e. where the time was actually spent.
+    ranked = sorted(
+        total_counts, key=lambda name: (-self_counts.get(name, 0), -total_counts[name], name)
+    )[:limit]
+    return [
+        {"function": name, "total_samples": total_counts[name], "self_samples": self_counts.get(name, 0)}
+        for name in ranked
+    ]
+
+
+def store_profile(profile: RequestProfile) -> Path:
+    # 1プロファイル1ファイルで保存し、保存数の上限を超えた古いものから削除する
+    # Store one file per profile and delete the oldest beyond the retention limit.
+    directory = get_profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    payload = profile.to_dict()
+    payload["top_functions"] = _top_functions(profile.stacks)
+    path = directory / f"{profile.profile_id}.json"
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    temp_path.replace(path)
+
+    max_stored = max(1, int(_float_env("PROFILE_MAX_STORED", DEFAULT_PROFILE_MAX_STORED)))
+    stored = sorted(directory.glob("*.json"))
+    for old_path in stored[:-max_stored]:
+        try:
+            old_path.unlink()
+        except OSError:
+            pass
+    return path
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    directory = get_profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        payload.pop("stacks", None)
+        payload.pop("top_functions", None)
+        profiles.append(payload)
+    return profiles
+
+
+def load_profile(profile_id: str) -> dict[str, Any] | None:
+    # ID の形式を検証してからパスを組み立て、ディレクトリ外を読めないようにする
+    # Validate the id format before building a path so nothing outside the directory is readable.
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = get_profile_dir() / f"{profile_id}.json"
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def render_folded(profile: dict[str, Any]) -> str:
+    # flamegraph.pl / speedscope が読める折りたたみスタック形式
+    # Folded-stack format readable by flamegraph.pl and speedscope.
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items()))
+
+
+def _is_profile_requested(scope: Scope) -> bool:
+    for key, value in scope.get("headers") or []:
+        if key == _PROFILE_HEADER_KEY and value.strip() in (b"1", b"true"):
+            return True
+    query = scope.get("query_string") or b""
+    return f"{PROFILE_QUERY_PARAM}=1".encode("latin-1") in query.split(b"&")
+
+
+class ProfilingMiddleware:
+    # PROFILING_ENABLED のときだけ app.py で組み込む（無効時はミドルウェア自体が存在しない）。
+    # セッションを読むため、セッションミドルウェアより内側に置く
+    # Installed by app.py only when PROFILING_ENABLED is set, so it does not exist when disabled.
+    # It reads the session, so it must sit inside the session middleware.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.sample_rate = min(max(_float_env("PROFILE_SAMPLE_RATE", 1.0), 0.0), 1.0)
+        self.interval_seconds = max(
+            _float_env("PROFILE_INTERVAL_MS", DEFAULT_PROFILE_INTERVAL_MS), 1.0
+        ) / 1000
+        self.max_seconds = _float_env("PROFILE_MAX_SECONDS", DEFAULT_PROFILE_MAX_SECONDS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _is_profile_requested(scope):
+            return await self.app(scope, receive, send)
+        session = scope.get("session") or {}
+        if not session.get("is_admin") or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(
+            method=scope.get("method") or "-",
+            path=scope.get("path") or "-",
+            interval_seconds=self.interval_seconds,
+            max_seconds=self.max_seconds,
+        )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile.profile_id
+            await send(message)
+
+        token = _active_profile_var.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            _active_profile_var.reset(token)
+            # 保存はファイル I/O を伴うため、専用スレッドで行いイベントループを止めない
+            # Storing does file I/O, so hand it to a thread instead of blocking the event loop.
+            threading.Thread(
+                target=_store_profile_safely, args=(profile,), daemon=True
+            ).start()
+
+
+def _store_profile_safely(profile: RequestProfile) -> None:
+    try:
+        path = store_profile(profile)
+    except Exception:
+        logger.exception("Failed to store request profile.", extra={"profile_id": profile.profile_id})
+        return
+    logger.info(
+        "Stored request profile.",
+        extra={"profile_id": profile.profile_id, "samples": profile.samples, "file": str(path)},
+    )
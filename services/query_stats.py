@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable
+
+from . import metrics
+from .request_context import get_request_context
+
+DEFAULT_SLOW_QUERY_MS = 200.0
+DEFAULT_EXPLAIN_SAMPLE_RATE = 0.1
+DEFAULT_EXPLAIN_MIN_INTERVAL_SECONDS = 300.0
+DEFAULT_EXPLAIN_TIMEOUT_MS = 5000
+DEFAULT_MAX_TRACKED_STATEMENTS = 500
+MAX_CALLERS_PER_STATEMENT = 5
+_EXPLAIN_QUEUE_SIZE = 100
+_OTHER_STATEMENTS_KEY = "<other statements>"
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s")
+_NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+_LOCKING_RE = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b|\bpg_\w*advisory",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+_slow_queries_total = metrics.counter(
+    "chatcore_db_slow_queries_total",
+    "Queries slower than DB_SLOW_QUERY_MS.",
+)
+_explains_total = metrics.counter(
+    "chatcore_db_explains_total",
+    "Sampled EXPLAIN (ANALYZE, BUFFERS) captures by outcome (ok, failed, dropped).",
+    ("outcome",),
+)
+
+_stats_lock = threading.Lock()
+_statements: dict[str, dict[str, Any]] = {}
+_last_explained: dict[str, float] = {}
+_explain_queue: queue.Queue[tuple[str, str, Any]] = queue.Queue(maxsize=_EXPLAIN_QUEUE_SIZE)
+# EXPLAIN 実行スレッド自身のクエリは集計しない
+# Queries issued by the EXPLAIN worker itself are not recorded.
+_local = threading.local()
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def is_query_stats_enabled() -> bool:
+    return os.getenv("DB_QUERY_STATS_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    # リテラルとプレースホルダを ? に置き換え、IN リストと空白を畳んで同種のクエリを1つにまとめる。
+    # クエリ文字列はほぼ定数なのでキャッシュが効く
+    # Replace literals and placeholders with ?, collapse IN lists and whitespace so variants group
+    # together. Query strings are mostly constants, so the cache hits almost always.
+    text = _STRING_LITERAL_RE.sub("?", sql)
+    text = _PLACEHOLDER_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(...)", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def caller_label(frame: Any) -> str:
+    # DB ヘルパー（services.db）の内側を飛ばし、最初のアプリ側の関数名を返す
+    # Skip frames inside the DB helpers (services.db) and return the first application function.
+    while frame is not None and frame.f_globals.get("__name__") == "services.db":
+        frame = frame.f_back
+    if frame is None:
+        return "-"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def _sql_text(query: Any, cursor: Any) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    # psycopg2.sql.Composed などはカーソルを使って文字列化する
+    # psycopg2.sql.Composed and friends are rendered with the cursor.
+    try:
+        return query.as_string(cursor)
+    except Exception:
+        return repr(query)
+
+
+def record_query(
+    cursor: Any, query: Any, params: Any, seconds: float, caller: str
+) -> None:
+    if getattr(_local, "suppressed", False) or not is_query_stats_enabled():
+        return
+    sql = _sql_text(query, cursor)
+    normalized = normalize_sql(sql)
+    with _stats_lock:
+        entry = _statements.get(normalized)
+        if entry is None:
+            # 件数の上限を超えた新しい文は1つにまとめ、メモリを抑える
+            # Past the cap, new statements share one bucket to bound memory.
+            key = normalized
+            if len(_statements) >= int(
+                _float_env("DB_QUERY_STATS_MAX_STATEMENTS", DEFAULT_MAX_TRACKED_STATEMENTS)
+            ):
+                key = _OTHER_STATEMENTS_KEY
+            entry = _statements.setdefault(
+                key,
+                {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0, "callers": {}, "slow_calls": 0},
+            )
+        entry["calls"] += 1
+        entry["total_seconds"] += seconds
+        if seconds > entry["max_seconds"]:
+            entry["max_seconds"] = seconds
+        callers = entry["callers"]
+        if caller in callers or len(callers) < MAX_CALLERS_PER_STATEMENT:
+            callers[caller] = callers.get(caller, 0) + 1
+
+    duration_ms = seconds * 1000
+    if duration_ms < _float_env("DB_SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS):
+        return
+
+    request_id = get_request_context()["request_id"] or "-"
+    _slow_queries_total.inc()
+    with _stats_lock:
+        entry["slow_calls"] += 1
+        entry["last_slow"] = {
+            "duration_ms": round(duration_ms, 2),
+            "caller": caller,
+            "request_id": request_id,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+    logger.warning(
+        "Slow query.",
+        extra={
+            "event": "slow_query",
+            "sql": normalized,
+            "duration_ms": round(duration_ms, 2),
+            "caller": caller,
+        },
+    )
+    _maybe_queue_explain(normalized, sql, params)
+
+
+def _maybe_queue_explain(normalized: str, sql: str, params: Any) -> None:
+    # EXPLAIN ANALYZE は文を実際に実行するため、行ロックや勧告的ロックを取らない SELECT のみを対象にし、
+    # 同じ文は一定間隔に1回だけ取る
+    # EXPLAIN ANALYZE really runs the statement, so only SELECTs that take no row or advisory
+    # locks qualify, at most once per interval. The literal-free form is checked so strings can't match.
+    if not sql.lstrip().upper().startswith("SELECT") or _LOCKING_RE.search(normalized):
+        return
+    if random.random() >= _float_env("DB_EXPLAIN_SAMPLE_RATE", DEFAULT_EXPLAIN_SAMPLE_RATE):
+        return
+    now = time.monotonic()
+    interval = _float_env("DB_EXPLAIN_MIN_INTERVAL_SECONDS", DEFAULT_EXPLAIN_MIN_INTERVAL_SECONDS)
+    with _stats_lock:
+        last = _last_explained.get(normalized)
+        if last is not None and now - last < interval:
+            return
+        _last_explained[normalized] = now
+    try:
+        _explain_queue.put_nowait((normalized, sql, params))
+    except queue.Full:
+        _explains_total.inc("dropped")
+
+
+def capture_explain(connect: Callable[[], Any], sql: str, params: Any) -> Any:
+    conn = connect()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        timeout_ms = int(_float_env("DB_EXPLAIN_TIMEOUT_MS", DEFAULT_EXPLAIN_TIMEOUT_MS))
+        cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        row = cursor.fetchone()
+        plan = row[0] if row else None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan
+    finally:
+        # 読み取り専用でも副作用を残さないよう必ずロールバックする
+        # Always roll back so nothing the statement did is kept.
+        conn.rollback()
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+def run_explain_worker(
+    stop_event: threading.Event, connect: Callable[[], Any], *, poll_seconds: float = 1.0
+) -> None:
+    # 遅いクエリの EXPLAIN を専用スレッドで取得する。リクエスト処理は待たない
+    # Capture EXPLAINs for slow queries on a dedicated thread; request handling never waits on it.
+    _local.suppressed = True
+    while not stop_event.is_set():
+        try:
+            normalized, sql, params = _explain_queue.get(timeout=poll_seconds)
+        except queue.Empty:
+            continue
+        try:
+            plan = capture_explain(connect, sql, params)
+        except Exception:
+            logger.warning("Failed to capture EXPLAIN for slow query.", exc_info=True)
+            _explains_total.inc("failed")
+            continue
+        _explains_total.inc("ok")
+        with _stats_lock:
+            entry = _statements.get(normalized)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["plan_captured_at"] = datetime.now().isoformat(timespec="seconds")
+
+
+def get_top_queries(
+    limit: int = 20, order_by: str = "total", include_plans: bool = False
+) -> list[dict[str, Any]]:
+    sort_keys = {
+        "total": lambda item: item["total_ms"],
+        "mean": lambda item: item["mean_ms"],
+        "max": lambda item: item["max_ms"],
+        "calls": lambda item: item["calls"],
+    }
+    with _stats_lock:
+        rows = []
+        for sql, entry in _statements.items():
+            row = {
+                "sql": sql,
+                "calls": entry["calls"],
+                "total_ms": round(entry["total_seconds"] * 1000, 2),
+                "mean_ms": round(entry["total_seconds"] * 1000 / entry["calls"], 3),
+                "max_ms": round(entry["max_seconds"] * 1000, 2),
+                "slow_calls": entry["slow_calls"],
+                "callers": dict(entry["callers"]),
+                "last_slow": entry.get("last_slow"),
+                "plan_captured_at": entry.get("plan_captured_at"),
+            }
+            if include_plans:
+                row["plan"] = entry.get("plan")
+            rows.append(row)
+    rows.sort(key=sort_keys[order_by], reverse=True)
+    return rows[:limit]
+
+
+def reset_query_stats() -> None:
+    with _stats_lock:
+        _statements.clear()
+        _last_explained.clear()
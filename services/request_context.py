@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+import os
+import threading
 import time
 import uuid
 from contextvars import ContextVar
@@ -8,14 +10,81 @@ from contextvars import ContextVar
 from starlette.datastructures import MutableHeaders
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from services import metrics
+
 REQUEST_ID_HEADER = "X-Request-ID"
+SERVER_TIMING_HEADER = "Server-Timing"
 
 _request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
 _request_method_var: ContextVar[str | None] = ContextVar("request_method", default=None)
 _request_path_var: ContextVar[str | None] = ContextVar("request_path", default=None)
+_request_spans_var: ContextVar["RequestSpans | None"] = ContextVar("request_spans", default=None)
 
 logger = logging.getLogger("chatcore.request")
 
+_http_request_seconds = metrics.histogram(
+    "chatcore_http_request_duration_seconds",
+    "HTTP request latency by route template, including streamed bodies.",
+    ("method", "route"),
+)
+_http_requests_total = metrics.counter(
+    "chatcore_http_requests_total",
+    "HTTP responses by route template and status code.",
+    ("method", "route", "status"),
+)
+
+
+class RequestSpans:
+    # リクエスト内の処理時間を区分（db, redis, queue_wait, llm_ttft など）ごとに合計する。
+    # run_blocking のスレッドやストリーミング生成スレッドからも書き込まれるため短いロックで守る
+    # Sum time per category (db, redis, queue_wait, llm_ttft, ...) within one request.
+    # Worker threads (run_blocking, streaming iterators) write too, so a short lock guards updates.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: dict[str, list[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._totals.get(name)
+            if entry is None:
+                self._totals[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {"ms": round(total * 1000, 2), "count": int(count)}
+                for name, (total, count) in self._totals.items()
+            }
+
+    def server_timing(self, app_seconds: float) -> str:
+        # 例: db;dur=12.3;desc="4", redis;dur=0.8;desc="2", app;dur=25.1
+        # e.g. db;dur=12.3;desc="4", redis;dur=0.8;desc="2", app;dur=25.1
+        entries = [
+            f'{name};dur={values["ms"]};desc="{values["count"]}"'
+            for name, values in sorted(self.snapshot().items())
+        ]
+        entries.append(f"app;dur={round(app_seconds * 1000, 2)}")
+        return ", ".join(entries)
+
+
+def current_spans() -> RequestSpans | None:
+    return _request_spans_var.get()
+
+
+def record_span(name: str, seconds: float) -> None:
+    # リクエスト外（バックグラウンドスレッド等）では何もしない
+    # No-op outside a request (e.g. background threads).
+    spans = _request_spans_var.get()
+    if spans is not None:
+        spans.add(name, seconds)
+
+
+def is_server_timing_enabled() -> bool:
+    return os.getenv("SERVER_TIMING_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
 
 def get_request_context() -> dict[str, str | None]:
     return {
@@ -48,9 +117,12 @@ class RequestContextMiddleware:
         method = scope.get("method") or "-"
         path = scope.get("path") or "-"
 
+        spans = RequestSpans()
         request_id_token = _request_id_var.set(request_id)
         method_token = _request_method_var.set(method)
         path_token = _request_path_var.set(path)
+        spans_token = _request_spans_var.set(spans)
+        server_timing = is_server_timing_enabled()
 
         status_code = 500
 
@@ -60,25 +132,46 @@ class RequestContextMiddleware:
                 status_code = int(message["status"])
                 headers = MutableHeaders(scope=message)
                 headers[REQUEST_ID_HEADER] = request_id
+                # ヘッダー送信時点までの内訳。ストリーミングの LLM 時間はアクセスログ側にだけ載る
+                # Breakdown up to the moment headers go out; streamed LLM time only reaches the access log.
+                if server_timing:
+                    headers[SERVER_TIMING_HEADER] = spans.server_timing(
+                        time.perf_counter() - start_time
+                    )
             await send(message)
 
         try:
             await self.app(scope, receive, send_wrapper)
         finally:
-            duration_ms = round((time.perf_counter() - start_time) * 1000, 2)
+            elapsed = time.perf_counter() - start_time
+            duration_ms = round(elapsed * 1000, 2)
+            route = _route_template(scope)
+            _http_request_seconds.observe(elapsed, method, route)
+            _http_requests_total.inc(method, route, str(status_code))
             logger.info(
                 "request completed",
                 extra={
                     "event": "http_request",
                     "status_code": status_code,
                     "duration_ms": duration_ms,
+                    "spans": spans.snapshot(),
                 },
             )
+            _request_spans_var.reset(spans_token)
             _request_id_var.reset(request_id_token)
             _request_method_var.reset(method_token)
             _request_path_var.reset(path_token)
 
 
+def _route_template(scope: Scope) -> str:
+    # 実パスではなくルート定義のテンプレートを使い、ラベルのカーディナリティを抑える
+    # Label by the route template rather than the raw path to keep label cardinality bounded.
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    return getattr(route, "path_format", None) or getattr(route, "path", "unmatched")
+
+
 def _extract_request_id(scope: Scope) -> str | None:
     headers = scope.get("headers") or []
     for key, value in headers:
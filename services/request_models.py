@@ -51,6 +51,13 @@ class UpdateTasksOrderRequest(RequestPayloadModel):
     order: list[NonEmptyStr] = Field(min_length=1)
 
 
+class MoveTaskRequest(RequestPayloadModel):
+    # task を before_task の直前へ移動する（before_task 未指定なら末尾）
+    # Move `task` right before `before_task` (append to the end when omitted).
+    task: NonEmptyStr
+    before_task: NonEmptyStr | None = None
+
+
 class DeleteTaskRequest(RequestPayloadModel):
     task: NonEmptyStr
 
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from .db import get_db_connection
+
+DEFAULT_PURGE_BATCH_SIZE = 1000
+DEFAULT_PURGE_IDLE_SECONDS = 30.0
+DEFAULT_PURGE_PAUSE_SECONDS = 0.05
+
+logger = logging.getLogger(__name__)
+
+# 削除リクエスト直後にワーカーを起こすためのイベント
+# Event used to wake the worker right after a room is soft-deleted.
+_purge_wakeup = threading.Event()
+_stats_lock = threading.Lock()
+_stats: dict[str, Any] = {
+    "rooms_purged": 0,
+    "messages_purged": 0,
+    "current_room_id": None,
+    "current_room_messages_purged": 0,
+    "last_batch_at": None,
+}
+
+
+def get_purge_batch_size() -> int:
+    try:
+        return max(1, int(os.getenv("ROOM_PURGE_BATCH_SIZE", str(DEFAULT_PURGE_BATCH_SIZE))))
+    except ValueError:
+        return DEFAULT_PURGE_BATCH_SIZE
+
+
+def request_room_purge() -> None:
+    _purge_wakeup.set()
+
+
+def purge_next_batch(batch_size: int) -> dict[str, Any] | None:
+    # 論理削除済みルームを1件ロックし、履歴を最大 batch_size 件だけ削除する。
+    # 残りが無くなったらルーム行も削除する。進捗は DB の残件そのものなので再起動後も続きから再開できる
+    # Lock one soft-deleted room and delete at most batch_size history rows; drop the room once empty.
+    # Progress is the remaining rows themselves, so a restart simply resumes where it stopped.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # SKIP LOCKED で複数ワーカーが同じルームを奪い合わないようにする
+        # SKIP LOCKED keeps several workers from contending for the same room.
+        cursor.execute(
+            """
+            SELECT id, created_at
+              FROM chat_rooms
+             WHERE deleted_at IS NOT NULL
+             ORDER BY deleted_at, id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+            """
+        )
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+
+        room_id, room_created_at = row
+        # パーティションキーを外側・内側の両方に渡し、削除対象を1パーティションに限定する
+        # Pass the partition key to both the outer and inner scans so only one partition is touched.
+        cursor.execute(
+            """
+            DELETE FROM chat_history
+             WHERE room_created_at = %(room_created_at)s
+               AND id IN (
+                   SELECT id
+                     FROM chat_history
+                    WHERE chat_room_id = %(room_id)s
+                      AND room_created_at = %(room_created_at)s
+                    ORDER BY id
+                    LIMIT %(batch_size)s
+               )
+            """,
+            {"room_id": room_id, "room_created_at": room_created_at, "batch_size": batch_size},
+        )
+        messages_deleted = max(cursor.rowcount or 0, 0)
+        room_finished = messages_deleted < batch_size
+        if room_finished:
+            cursor.execute(
+                "DELETE FROM chat_rooms WHERE id = %s AND deleted_at IS NOT NULL",
+                (room_id,),
+            )
+        conn.commit()
+        return {
+            "room_id": room_id,
+            "messages_deleted": messages_deleted,
+            "room_finished": room_finished,
+        }
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+
+def _record_batch(result: dict[str, Any]) -> None:
+    with _stats_lock:
+        if _stats["current_room_id"] != result["room_id"]:
+            _stats["current_room_id"] = result["room_id"]
+            _stats["current_room_messages_purged"] = 0
+        _stats["messages_purged"] += result["messages_deleted"]
+        _stats["current_room_messages_purged"] += result["messages_deleted"]
+        _stats["last_batch_at"] = time.time()
+        room_total = _stats["current_room_messages_purged"]
+        if result["room_finished"]:
+            _stats["rooms_purged"] += 1
+            _stats["current_room_id"] = None
+            _stats["current_room_messages_purged"] = 0
+
+    if result["room_finished"]:
+        logger.info(
+            "Purged soft-deleted chat room.",
+            extra={"room_id": result["room_id"], "messages_purged": room_total},
+        )
+    else:
+        logger.debug(
+            "Purged chat history batch.",
+            extra={"room_id": result["room_id"], "messages_purged": room_total},
+        )
+
+
+def run_room_purge_loop(
+    stop_event: threading.Event,
+    *,
+    batch_size: int | None = None,
+    idle_seconds: float = DEFAULT_PURGE_IDLE_SECONDS,
+    pause_seconds: float = DEFAULT_PURGE_PAUSE_SECONDS,
+) -> None:
+    # 対象がある間は小休止を挟みながらバッチを繰り返し、無ければ起床要求かタイムアウトまで待つ
+    # Repeat batches with a short pause while work remains; otherwise sleep until woken or timed out.
+    size = batch_size or get_purge_batch_size()
+    while not stop_event.is_set():
+        try:
+            result = purge_next_batch(size)
+        except Exception:
+            logger.exception("Failed to purge soft-deleted chat rooms.")
+            result = None
+
+        if result is None:
+            _purge_wakeup.wait(timeout=idle_seconds)
+            _purge_wakeup.clear()
+            continue
+
+        _record_batch(result)
+        stop_event.wait(timeout=pause_seconds)
+
+
+def get_room_purge_status() -> dict[str, Any]:
+    # 残件は DB から、処理実績はこのプロセスのカウンタから返す
+    # Pending work comes from the DB; throughput counters are per process.
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*), MIN(deleted_at)
+              FROM chat_rooms
+             WHERE deleted_at IS NOT NULL
+            """
+        )
+        pending_rooms, oldest_deleted_at = cursor.fetchone()
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+              FROM chat_history h
+              JOIN chat_rooms r
+                ON r.id = h.chat_room_id
+               AND r.created_at = h.room_created_at
+             WHERE r.deleted_at IS NOT NULL
+            """
+        )
+        pending_messages = cursor.fetchone()[0]
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+
+    with _stats_lock:
+        process_stats = dict(_stats)
+    return {
+        "pending_rooms": pending_rooms,
+        "pending_messages": pending_messages,
+        "oldest_deleted_at": oldest_deleted_at,
+        "process": process_stats,
+    }
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Callable
+
+# 内容ハッシュを含めて投入ロジックの変更時にも再投入させるためのバージョン
+# Bump to force a reseed when the seeding logic changes without content changes.
+SEED_FORMAT_VERSION = 1
+_ADVISORY_LOCK_PREFIX = "chatcore:seed:"
+
+
+def compute_seed_fingerprint(payload: Any) -> str:
+    # キー順を固定した JSON から SHA-256 を計算し、内容が同じなら常に同じ値を返す
+    # Hash canonical JSON so identical content always yields the same fingerprint.
+    canonical = json.dumps(
+        {"version": SEED_FORMAT_VERSION, "payload": payload},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _stored_fingerprint(cursor: Any) -> str | None:
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row.get("fingerprint")
+    return row[0]
+
+
+def is_seed_current(cursor: Any, seed_name: str, fingerprint: str) -> bool:
+    # 保存済みフィンガープリントと一致すれば投入済みとみなす
+    # Treat the seed as applied when the stored fingerprint matches.
+    cursor.execute(
+        "SELECT fingerprint FROM app_seed_state WHERE name = %s",
+        (seed_name,),
+    )
+    return _stored_fingerprint(cursor) == fingerprint
+
+
+def run_fingerprinted_seed(
+    conn: Any,
+    cursor: Any,
+    seed_name: str,
+    fingerprint: str,
+    apply_seed: Callable[[Any], int],
+) -> int:
+    # 一致時は SELECT 1 回で終了し、不一致時のみ advisory lock 下で1ワーカーだけが投入する
+    # Return after one SELECT when current; otherwise only one worker applies under an advisory lock.
+    if is_seed_current(cursor, seed_name, fingerprint):
+        return 0
+
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock(hashtext(%s))",
+        (f"{_ADVISORY_LOCK_PREFIX}{seed_name}",),
+    )
+    # ロック待ちの間に別ワーカーが投入済みなら何もしない
+    # Another worker may have finished while we waited for the lock.
+    if is_seed_current(cursor, seed_name, fingerprint):
+        conn.rollback()
+        return 0
+
+    applied = apply_seed(cursor)
+    cursor.execute(
+        """
+        INSERT INTO app_seed_state (name, fingerprint, updated_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE
+           SET fingerprint = EXCLUDED.fingerprint,
+               updated_at = EXCLUDED.updated_at
+        """,
+        (seed_name, fingerprint),
+    )
+    conn.commit()
+    return applied
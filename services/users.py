@@ -1,51 +1,6 @@
 from typing import Any
 
 from .db import get_db_connection
-from .default_tasks import default_task_rows
-
-
-def copy_default_tasks_for_user(user_id: int) -> None:
-    # 共有タスクをユーザー専用タスクとして重複なく複製する
-    # Copy shared default tasks into user-owned rows without duplicates.
-    """user_id IS NULL の共通タスクを指定ユーザーに複製"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT name, prompt_template, input_examples,
-               output_examples, display_order
-          FROM task_with_examples
-         WHERE user_id IS NULL
-        """
-    )
-    defaults = cursor.fetchall()
-    if not defaults:
-        defaults = default_task_rows()
-
-    for name, tmpl, inp, out, disp in defaults:
-        cursor.execute(
-            """
-            SELECT 1 FROM task_with_examples
-             WHERE user_id = %s AND name = %s
-            """,
-            (user_id, name)
-        )
-        if cursor.fetchone():
-            continue
-        cursor.execute(
-            """
-            INSERT INTO task_with_examples
-                  (user_id, name, prompt_template,
-                   input_examples, output_examples, display_order)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (user_id, name, tmpl, inp, out, disp)
-        )
-
-    conn.commit()
-    cursor.close()
-    conn.close()
 
 
 def get_user_by_email(email: str) -> dict[str, Any] | None:
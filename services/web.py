@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 from typing import Any, Dict, List, Tuple, TypeVar
@@ -8,12 +10,25 @@ from urllib.parse import urlencode, urlsplit
 from fastapi import Request
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, ValidationError
-from starlette.responses import JSONResponse, RedirectResponse
+from starlette.responses import JSONResponse, RedirectResponse, Response
+
+# orjson が無い環境では jsonable_encoder + 標準 json にフォールバックする
+# Fall back to jsonable_encoder + stdlib json when orjson is unavailable.
+try:
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - optional for test envs
+    orjson = None
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_INTERNAL_ERROR_MESSAGE = "内部エラーが発生しました。"
 ModelT = TypeVar("ModelT", bound=BaseModel)
+# ペイロード形式を変えたときに既存の ETag を一斉に無効化するためのバージョン
+# Bump to invalidate every issued ETag when a payload format changes.
+ETAG_FORMAT_VERSION = 1
+# セッションごとに内容が異なるため共有キャッシュには載せず、毎回再検証させる
+# Bodies are per-session, so forbid shared caches and always revalidate.
+ETAG_CACHE_CONTROL = "private, no-cache"
 
 
 async def get_json(request: Request) -> Any | None:
@@ -25,10 +40,70 @@ async def get_json(request: Request) -> Any | None:
         return None
 
 
-def jsonify(payload: Any, status_code: int = 200) -> JSONResponse:
-    # FastAPI 互換のJSONエンコードを通してレスポンスを返す
-    # Build a JSON response via FastAPI-compatible jsonable encoding.
-    return JSONResponse(content=jsonable_encoder(payload), status_code=status_code)
+def dumps_json(payload: Any) -> bytes:
+    # dict/list/datetime/UUID と RealDictRow（dict サブクラス）は orjson がネイティブに直列化し、
+    # Decimal や Pydantic モデル等の残りだけ jsonable_encoder に委ねて出力形式を揃える
+    # orjson natively handles dicts (incl. RealDictRow), lists, datetimes and UUIDs; only the
+    # remaining types (Decimal, Pydantic models, ...) go through jsonable_encoder for identical output.
+    if orjson is not None:
+        return orjson.dumps(payload, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    # jsonable_encoder による再帰的な前処理を省き、DB 行から直接バイト列へ直列化する
+    # Skip the recursive jsonable_encoder pass and serialize DB rows straight to bytes.
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def jsonify(payload: Any, status_code: int = 200, *, etag: str | None = None) -> JSONResponse:
+    # 高速 JSON エンコーダでレスポンスを返す
+    # Build a JSON response with the fast encoder.
+    response = FastJSONResponse(content=payload, status_code=status_code)
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return response
+
+
+def compute_etag(scope: str, *validators: Any) -> str:
+    # 本文ではなく安価な検証値（件数・更新時刻・行バージョン等）から強い ETag を作る
+    # Build a strong ETag from cheap validators (counts, timestamps, row versions) instead of the body.
+    material = repr((ETAG_FORMAT_VERSION, scope, validators)).encode("utf-8")
+    return f'"{hashlib.sha256(material).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match は弱い比較で判定する（RFC 9110 13.1.2）
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2).
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    # 304 は本文を持たず、検証に必要なヘッダーだけを返す
+    # A 304 carries no body, only the headers needed for revalidation.
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL},
+    )
 
 
 def log_and_internal_server_error(
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import fnmatch
+import time
+from typing import Any, Iterator
+
+
+class FakeRedis:
+    # ベンチマーク対象が使う Redis コマンドだけを dict で再現し、通信なしで CPU コストを測る。
+    # decode_responses=True のクライアントと同じく文字列を返す
+    # Reproduce only the Redis commands the benchmarked code uses, so CPU cost is measured
+    # without network round trips. Returns str like a decode_responses=True client.
+    def __init__(self) -> None:
+        self._data: dict[str, str] = {}
+        self._expires_at: dict[str, float] = {}
+        self._sorted_sets: dict[str, dict[str, float]] = {}
+
+    def _purge_if_expired(self, key: str) -> None:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires_at.pop(key, None)
+
+    def get(self, key: str) -> str | None:
+        self._purge_if_expired(key)
+        return self._data.get(key)
+
+    def set(self, key: str, value: Any, ex: int | None = None) -> bool:
+        self._data[key] = str(value)
+        if ex is not None:
+            self._expires_at[key] = time.monotonic() + ex
+        else:
+            self._expires_at.pop(key, None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            self._purge_if_expired(key)
+            if self._data.pop(key, None) is not None:
+                deleted += 1
+            self._expires_at.pop(key, None)
+        return deleted
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        value = int(self.get(key) or 0) + amount
+        self._data[key] = str(value)
+        return value
+
+    def expire(self, key: str, seconds: int) -> bool:
+        if key not in self._data:
+            return False
+        self._expires_at[key] = time.monotonic() + seconds
+        return True
+
+    def eval(self, script: str, numkeys: int, *args: Any) -> list[int]:
+        # 対応するのは日次クォータの Lua スクリプト（GET/上限判定/INCR/EXPIRE）のみ
+        # Only the daily-quota Lua script (GET, limit check, INCR, EXPIRE) is supported.
+        if "INCR" not in script or numkeys != 1:
+            raise NotImplementedError("FakeRedis.eval only supports the daily quota script.")
+        key, limit, ttl = args[0], int(args[1]), int(args[2])
+        current = int(self.get(key) or 0)
+        if current >= limit:
+            return [0, current]
+        current = self.incr(key)
+        if current == 1:
+            self.expire(key, ttl)
+        return [1, current]
+
+    def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        scores = self._sorted_sets.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in scores)
+        scores.update(mapping)
+        return added
+
+    def zrem(self, key: str, *members: str) -> int:
+        scores = self._sorted_sets.get(key, {})
+        return sum(1 for member in members if scores.pop(member, None) is not None)
+
+    def zremrangebyscore(self, key: str, min_score: Any, max_score: Any) -> int:
+        low, high = float(min_score), float(max_score)
+        scores = self._sorted_sets.get(key, {})
+        expired = [member for member, score in scores.items() if low <= score <= high]
+        for member in expired:
+            del scores[member]
+        return len(expired)
+
+    def zcard(self, key: str) -> int:
+        return len(self._sorted_sets.get(key, {}))
+
+    def scan_iter(self, match: str | None = None, count: int | None = None) -> Iterator[str]:
+        for key in list(self._data):
+            self._purge_if_expired(key)
+            if key in self._data and (match is None or fnmatch.fnmatchcase(key, match)):
+                yield key
+
+
+class FakeCursor:
+    # 固定の行を返すだけのカーソル。実行したクエリは直近の1件だけ保持する（反復実行でメモリを増やさない）
+    # A cursor that returns canned rows. Only the last query is kept so repeated runs don't grow memory.
+    def __init__(self, rows: list[tuple[Any, ...]] | None = None) -> None:
+        self.rows = list(rows or [])
+        self.last_query: tuple[str, Any] | None = None
+        self.rowcount = len(self.rows)
+
+    def execute(self, query: str, params: Any = None) -> None:
+        self.last_query = (query, params)
+
+    def fetchall(self) -> list[tuple[Any, ...]]:
+        return list(self.rows)
+
+    def fetchone(self) -> tuple[Any, ...] | None:
+        return self.rows[0] if self.rows else None
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,173 @@
+"""Run the microbenchmarks, store baselines and compare against them.
+
+    python -m tests.benchmarks                     # run and print timings
+    python -m tests.benchmarks --save              # run and update the stored baselines
+    python -m tests.benchmarks --compare --threshold 20
+                                                   # exit 1 if any benchmark is >20% slower
+
+Baselines are machine-specific: regenerate them with ``--save`` on the machine
+that runs ``--compare`` (or point both at a per-machine file with ``--baseline``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Any
+
+from tests.benchmarks.suite import BENCHMARKS, Benchmark
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD_PERCENT = 25.0
+BASELINE_FORMAT_VERSION = 1
+
+
+def measure(bench: Benchmark, repeat: int = DEFAULT_REPEAT, loops: int | None = None) -> dict[str, Any]:
+    # autorange で1試行 0.2 秒程度になる反復回数を決め、repeat 回の1回あたり時間を記録する。
+    # 比較には最小値を使う（他プロセス等のノイズは遅くする方向にしか働かないため）
+    # autorange picks a loop count giving ~0.2s per trial; record per-op time for each of repeat trials.
+    # Comparisons use the minimum, since outside noise can only make a trial slower.
+    with bench.setup() as operation:
+        timer = timeit.Timer(operation)
+        if loops is None:
+            loops, _ = timer.autorange()
+        samples = [elapsed / loops for elapsed in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "min_seconds": min(samples),
+        "median_seconds": statistics.median(samples),
+        "loops": loops,
+    }
+
+
+def run_benchmarks(
+    names: list[str], repeat: int = DEFAULT_REPEAT, loops: int | None = None
+) -> dict[str, dict[str, Any]]:
+    return {name: measure(BENCHMARKS[name], repeat, loops) for name in names}
+
+
+def select_benchmarks(patterns: list[str] | None) -> list[str]:
+    names = sorted(BENCHMARKS)
+    if not patterns:
+        return names
+    return [name for name in names if any(pattern in name for pattern in patterns)]
+
+
+def load_baseline(path: str) -> dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    except FileNotFoundError:
+        return {"version": BASELINE_FORMAT_VERSION, "benchmarks": {}}
+    if baseline.get("version") != BASELINE_FORMAT_VERSION:
+        raise SystemExit(f"Unsupported baseline format in {path}; regenerate it with --save.")
+    return baseline
+
+
+def save_baseline(path: str, results: dict[str, dict[str, Any]]) -> None:
+    # 今回実行した分だけを上書きし、フィルタで除外したベンチマークの基準値は残す
+    # Overwrite only the benchmarks that ran; baselines of filtered-out ones are kept.
+    baseline = load_baseline(path)
+    baseline["benchmarks"].update(results)
+    baseline["python"] = platform.python_version()
+    baseline["machine"] = platform.machine()
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(baseline, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def compare_results(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, Any],
+    threshold_percent: float,
+) -> list[dict[str, Any]]:
+    rows = []
+    for name, result in sorted(results.items()):
+        current = result["min_seconds"]
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference is None:
+            rows.append({"name": name, "current": current, "baseline": None, "change": None, "status": "new"})
+            continue
+        base = reference["min_seconds"]
+        change = (current - base) / base * 100 if base > 0 else 0.0
+        status = "regressed" if change > threshold_percent else "ok"
+        rows.append({"name": name, "current": current, "baseline": base, "change": change, "status": status})
+    return rows
+
+
+def _format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f}ms"
+    return f"{seconds * 1e6:.2f}us"
+
+
+def print_results(results: dict[str, dict[str, Any]]) -> None:
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}} {'min':>11} {'median':>11} {'loops':>9}")
+    for name, result in sorted(results.items()):
+        print(
+            f"{name:<{width}} {_format_duration(result['min_seconds']):>11} "
+            f"{_format_duration(result['median_seconds']):>11} {result['loops']:>9}"
+        )
+
+
+def print_comparison(rows: list[dict[str, Any]], threshold_percent: float) -> None:
+    width = max(len(row["name"]) for row in rows)
+    print(f"\nComparison against baseline (fails above +{threshold_percent:g}%):")
+    print(f"{'benchmark':<{width}} {'baseline':>11} {'current':>11} {'change':>9}  status")
+    for row in rows:
+        change = "-" if row["change"] is None else f"{row['change']:+.1f}%"
+        print(
+            f"{row['name']:<{width}} {_format_duration(row['baseline']):>11} "
+            f"{_format_duration(row['current']):>11} {change:>9}  {row['status']}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmarks", description="Run the microbenchmark suite."
+    )
+    parser.add_argument("-k", "--filter", action="append", help="Run benchmarks whose name contains this text.")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--compare", action="store_true", help="Fail when slower than the baseline.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCHMARK_REGRESSION_THRESHOLD", DEFAULT_THRESHOLD_PERCENT)),
+        help="Allowed slowdown in percent before --compare fails.",
+    )
+    args = parser.parse_args(argv)
+
+    names = select_benchmarks(args.filter)
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        print("No benchmarks matched.", file=sys.stderr)
+        return 2
+
+    results = run_benchmarks(names, repeat=args.repeat)
+    print_results(results)
+
+    exit_code = 0
+    if args.compare:
+        rows = compare_results(results, load_baseline(args.baseline), args.threshold)
+        print_comparison(rows, args.threshold)
+        regressed = [row["name"] for row in rows if row["status"] == "regressed"]
+        if regressed:
+            print(f"\n{len(regressed)} benchmark(s) regressed: {', '.join(regressed)}", file=sys.stderr)
+            exit_code = 1
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"\nSaved baseline to {args.baseline}")
+    return exit_code
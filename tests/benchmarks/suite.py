@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, ContextManager, Iterator
+from unittest.mock import patch
+
+from starlette.datastructures import MutableHeaders
+
+from tests.benchmarks.fixtures import FakeCursor, FakeRedis
+from tests.helpers.db_helpers import TransactionTrackingConnection
+
+Operation = Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    # with で入ると計測対象の関数を返し、抜けるとパッチ等を元に戻す
+    # Entering yields the operation to time; exiting undoes patches and other setup.
+    setup: Callable[[], ContextManager[Operation]]
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Iterator[Operation]]], Callable[[], Iterator[Operation]]]:
+    def decorator(func: Callable[[], Iterator[Operation]]) -> Callable[[], Iterator[Operation]]:
+        BENCHMARKS[name] = Benchmark(name, contextmanager(func))
+        return func
+
+    return decorator
+
+
+def _sample_messages(count: int) -> list[dict[str, str]]:
+    return [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": "日本語と English が混在するメッセージ本文です。" * 4,
+        }
+        for index in range(count)
+    ]
+
+
+@contextmanager
+def _ephemeral_store(redis_client: FakeRedis | None) -> Iterator[Any]:
+    from services.ephemeral_store import EphemeralChatStore
+
+    with patch("services.ephemeral_store.get_redis_client", return_value=redis_client):
+        store = EphemeralChatStore(expiration_seconds=3600)
+    store.create_room("bench-sid", "bench-room", "ベンチマーク")
+    room = store.get_room("bench-sid", "bench-room")
+    room["messages"] = _sample_messages(20)
+    store._save_room("bench-sid", "bench-room", room)
+    yield store
+
+
+@benchmark("ephemeral_store.append_message[memory]")
+def bench_ephemeral_append_memory() -> Iterator[Operation]:
+    with _ephemeral_store(None) as store:
+        messages = store._memory["bench-sid"]["bench-room"]["messages"]
+
+        def op() -> None:
+            store.append_message("bench-sid", "bench-room", "user", "追加のメッセージ")
+            # 反復でルームが伸び続けないよう追加分を戻す
+            # Undo the append so the room does not grow across iterations.
+            messages.pop()
+
+        yield op
+
+
+@benchmark("ephemeral_store.append_message[redis]")
+def bench_ephemeral_append_redis() -> Iterator[Operation]:
+    redis_client = FakeRedis()
+    with _ephemeral_store(redis_client) as store:
+        key = store._key("bench-sid", "bench-room")
+        original = redis_client.get(key)
+
+        def op() -> None:
+            store.append_message("bench-sid", "bench-room", "user", "追加のメッセージ")
+            redis_client.set(key, original, ex=3600)
+
+        yield op
+
+
+@benchmark("ephemeral_store.get_messages[redis]")
+def bench_ephemeral_get_messages_redis() -> Iterator[Operation]:
+    with _ephemeral_store(FakeRedis()) as store:
+        yield lambda: store.get_messages("bench-sid", "bench-room")
+
+
+def _session_middleware() -> Any:
+    from services.session_middleware import HybridSessionMiddleware
+
+    return HybridSessionMiddleware(None, secret_key="benchmark-secret", max_age=3600)
+
+
+def _session_data() -> dict[str, Any]:
+    return {
+        "user_id": 42,
+        "user_email": "bench@example.com",
+        "csrf_token": "c" * 43,
+        "free_chats_count": 3,
+        "free_chats_date": "2026-01-01",
+        "_permanent": True,
+    }
+
+
+def _cookie_scope(cookie_value: str) -> dict[str, Any]:
+    return {
+        "type": "http",
+        "headers": [(b"cookie", f"theme=dark; session={cookie_value}".encode("latin-1"))],
+    }
+
+
+def _commit_once(middleware: Any, session: dict[str, Any], session_id: str | None) -> None:
+    scope = {"session": session, "session_id": session_id}
+    headers = MutableHeaders(scope={"type": "http.response.start", "headers": []})
+    middleware._commit_session(scope, headers)
+
+
+@benchmark("session_middleware.restore[cookie]")
+def bench_session_restore_cookie() -> Iterator[Operation]:
+    middleware = _session_middleware()
+    scope = _cookie_scope(
+        middleware.serializer.dumps({"backend": "cookie", "data": _session_data()})
+    )
+    with patch("services.session_middleware.get_redis_client", return_value=None):
+        yield lambda: middleware._restore_session(middleware._load_cookie_state(scope))
+
+
+@benchmark("session_middleware.restore[redis]")
+def bench_session_restore_redis() -> Iterator[Operation]:
+    middleware = _session_middleware()
+    redis_client = FakeRedis()
+    with patch("services.session_middleware.get_redis_client", return_value=redis_client):
+        _commit_once(middleware, _session_data(), "bench-session")
+        scope = _cookie_scope(middleware.serializer.dumps({"backend": "redis", "id": "bench-session"}))
+        yield lambda: middleware._restore_session(middleware._load_cookie_state(scope))
+
+
+@benchmark("session_middleware.commit[cookie]")
+def bench_session_commit_cookie() -> Iterator[Operation]:
+    middleware = _session_middleware()
+    session = _session_data()
+    with patch("services.session_middleware.get_redis_client", return_value=None):
+        yield lambda: _commit_once(middleware, session, None)
+
+
+@benchmark("session_middleware.commit[redis]")
+def bench_session_commit_redis() -> Iterator[Operation]:
+    middleware = _session_middleware()
+    session = _session_data()
+    with patch("services.session_middleware.get_redis_client", return_value=FakeRedis()):
+        yield lambda: _commit_once(middleware, session, "bench-session")
+
+
+def _consume_quota() -> Any:
+    from services.llm_daily_limit import _consume_daily_quota
+
+    # 上限に達すると早期リターンの経路だけを測ることになるため、実質無制限の上限を使う
+    # Use an effectively unlimited cap; hitting it would time only the early-return path.
+    return _consume_daily_quota(
+        key_prefix="bench:daily_quota",
+        env_name="BENCHMARK_DAILY_LIMIT_UNSET",
+        default_limit=10**15,
+    )
+
+
+@benchmark("llm_daily_limit.consume[memory]")
+def bench_quota_memory() -> Iterator[Operation]:
+    with patch("services.llm_daily_limit.get_redis_client", return_value=None):
+        yield _consume_quota
+
+
+@benchmark("llm_daily_limit.consume[redis]")
+def bench_quota_redis() -> Iterator[Operation]:
+    with patch("services.llm_daily_limit.get_redis_client", return_value=FakeRedis()):
+        yield _consume_quota
+
+
+@benchmark("logging.json_formatter.format")
+def bench_json_log_format() -> Iterator[Operation]:
+    from services.logging_config import JsonLogFormatter
+
+    formatter = JsonLogFormatter()
+    record = logging.LogRecord(
+        "services.request_context", logging.INFO, __file__, 1, "http_request", None, None
+    )
+    record.request_id = "0123456789abcdef"
+    record.request_method = "GET"
+    record.request_path = "/api/get_chat_history"
+    record.status_code = 200
+    record.duration_ms = 12.34
+    record.client_ip = "203.0.113.10"
+    record.user_agent = "Mozilla/5.0 (X11; Linux x86_64)"
+    yield lambda: formatter.format(record)
+
+
+@benchmark("chat.sse_event")
+def bench_sse_event() -> Iterator[Operation]:
+    from blueprints.chat.messages import _sse_event
+
+    payload = {"text": "こんにちは、ご質問について説明します。"}
+    yield lambda: _sse_event("chunk", payload)
+
+
+@benchmark("web.jsonify[room_list]")
+def bench_jsonify_room_list() -> Iterator[Operation]:
+    from services.web import jsonify
+
+    payload = {
+        "rooms": [
+            {
+                "id": f"room-{index}",
+                "title": f"チャット {index}",
+                "created_at": "2026-01-01 09:00:00",
+                "last_message_at": "2026-01-02 10:30:00",
+                "last_message": {"sender": "bot", "preview": "最後のメッセージのプレビュー" * 3},
+            }
+            for index in range(50)
+        ],
+        "next_cursor": "MjAyNi0wMS0wMlQxMDozMDowMHxyb29tLTQ5",
+    }
+    yield lambda: jsonify(payload)
+
+
+@benchmark("chat.fetch_chat_history[200_rows]")
+def bench_fetch_chat_history() -> Iterator[Operation]:
+    from blueprints.chat.messages import _fetch_chat_history
+
+    started = datetime(2026, 1, 1, 9, 0, 0)
+    cursor = FakeCursor(
+        [
+            ("メッセージ本文 " * 10, "user" if index % 2 == 0 else "bot", started + timedelta(seconds=index))
+            for index in range(200)
+        ]
+    )
+    with patch(
+        "blueprints.chat.messages.get_db_connection",
+        side_effect=lambda **_: TransactionTrackingConnection(cursor),
+    ):
+        yield lambda: _fetch_chat_history("bench-room")
+
+
+@benchmark("chat.fetch_user_rooms[50_rows]")
+def bench_fetch_user_rooms() -> Iterator[Operation]:
+    from blueprints.chat.rooms import _fetch_user_rooms
+
+    started = datetime(2026, 1, 1, 9, 0, 0)
+    cursor = FakeCursor(
+        [
+            (
+                f"room-{index}",
+                f"チャット {index}",
+                started,
+                started + timedelta(minutes=index),
+                "bot",
+                "最後のメッセージのプレビュー",
+            )
+            for index in range(51)
+        ]
+    )
+    conn = TransactionTrackingConnection(cursor)
+    yield lambda: _fetch_user_rooms(conn, 42, limit=50)
@@ -0,0 +1,495 @@
+"""End-to-end load test for the chat API.
+
+Boots the bundled OpenAI-compatible stub provider and the FastAPI app (or uses
+an already running app via ``--target``), then drives a weighted mix of
+streaming chat, history, room list and prompt feed traffic from authenticated
+and guest virtual users. Reports RPS, latency percentiles per scenario, stream
+time-to-first-chunk and the maximum number of concurrent streams, both as seen
+by the client and per app worker (from ``/metrics``).
+
+The app still needs a reachable Postgres (``POSTGRES_*``); Redis is optional.
+Load-test users are upserted as ``loadtest+N@example.invalid``::
+
+    python -m tests.load.run_load_test --workers 2 --users 50 --duration 60 \\
+        --mix chat=3,history=4,rooms=2,prompts=3 --ttft-ms 400 --tokens-per-second 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from tests.load.stub_llm_server import add_stub_arguments
+
+DEFAULT_MIX = "chat=3,history=4,rooms=2,prompts=3"
+GUEST_SCENARIOS = {"chat", "history", "prompts"}
+# ゲストは新規ルーム作成とチャットの合計が1日10回までなので、上限前にセッションを作り直す
+# Guests get 10 room creations + chats per day, so rotate the session before hitting the cap.
+GUEST_CHATS_PER_SESSION = 4
+_PEAK_LINE_RE = re.compile(r'^chatcore_llm_streams_in_flight_peak\{pid="(\d+)"\} (\d+)', re.M)
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    # 最近順位法 (nearest-rank) で分位点を求める
+    # Nearest-rank percentile over an already sorted list.
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(raw: str) -> dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in {"chat", "history", "rooms", "prompts"}:
+            raise argparse.ArgumentTypeError(f"Unknown scenario in mix: {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_worker_peaks(metrics_text: str) -> dict[str, int]:
+    return {pid: int(value) for pid, value in _PEAK_LINE_RE.findall(metrics_text)}
+
+
+@dataclass
+class LoadStats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    first_chunk: list[float] = field(default_factory=list)
+    active_streams: int = 0
+    max_active_streams: int = 0
+
+    def record(self, scenario: str, seconds: float, ok: bool) -> None:
+        self.latencies[scenario].append(seconds)
+        if not ok:
+            self.errors[scenario] += 1
+
+    def stream_started(self) -> None:
+        self.active_streams += 1
+        self.max_active_streams = max(self.max_active_streams, self.active_streams)
+
+    def stream_finished(self) -> None:
+        self.active_streams -= 1
+
+    def summary(self, elapsed: float, worker_peaks: dict[str, int]) -> dict[str, Any]:
+        scenarios = {}
+        total = 0
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            total += len(ordered)
+            scenarios[name] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(ordered) / elapsed, 2),
+                **{
+                    f"p{int(q * 100)}_ms": _ms(percentile(ordered, q))
+                    for q in (0.5, 0.95, 0.99)
+                },
+                "max_ms": _ms(ordered[-1]) if ordered else None,
+            }
+        first_chunk = sorted(self.first_chunk)
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "scenarios": scenarios,
+            "stream_first_chunk": {
+                f"p{int(q * 100)}_ms": _ms(percentile(first_chunk, q)) for q in (0.5, 0.95, 0.99)
+            },
+            "max_concurrent_streams_client": self.max_active_streams,
+            "max_concurrent_streams_per_worker": worker_peaks,
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        stats: LoadStats,
+        *,
+        model: str,
+        user_id: int | None,
+        session_cookie: str | None,
+    ) -> None:
+        self.client = client
+        self.stats = stats
+        self.model = model
+        self.user_id = user_id
+        self.session_cookie = session_cookie
+        self.csrf_token = ""
+        self.room_id: str | None = None
+        self.guest_chats = 0
+
+    @property
+    def is_guest(self) -> bool:
+        return self.user_id is None
+
+    async def start_session(self) -> None:
+        self.client.cookies.clear()
+        if self.session_cookie is not None:
+            self.client.cookies.set("session", self.session_cookie)
+        response = await self.client.get("/api/csrf-token")
+        response.raise_for_status()
+        self.csrf_token = response.json()["csrf_token"]
+        self.guest_chats = 0
+        await self._new_room()
+
+    async def _new_room(self) -> None:
+        room_id = f"load-{uuid.uuid4().hex[:16]}"
+        response = await self.client.post(
+            "/api/new_chat_room",
+            json={"id": room_id, "title": "負荷試験"},
+            headers={"X-CSRF-Token": self.csrf_token},
+        )
+        response.raise_for_status()
+        self.room_id = room_id
+
+    async def run(self, scenario: str) -> None:
+        started = time.perf_counter()
+        ok = False
+        try:
+            ok = await getattr(self, f"_scenario_{scenario}")()
+        except httpx.HTTPError:
+            ok = False
+        finally:
+            self.stats.record(scenario, time.perf_counter() - started, ok)
+
+    async def _scenario_chat(self) -> bool:
+        if self.is_guest and self.guest_chats >= GUEST_CHATS_PER_SESSION:
+            await self.start_session()
+        self.guest_chats += 1
+        started = time.perf_counter()
+        self.stats.stream_started()
+        try:
+            async with self.client.stream(
+                "POST",
+                "/api/chat",
+                json={
+                    "message": "負荷試験のメッセージです。",
+                    "chat_room_id": self.room_id,
+                    "model": self.model,
+                },
+                headers={"X-CSRF-Token": self.csrf_token},
+            ) as response:
+                if response.status_code != 200:
+                    return False
+                first_chunk_seen = False
+                done = False
+                async for line in response.aiter_lines():
+                    if line == "event: chunk" and not first_chunk_seen:
+                        first_chunk_seen = True
+                        self.stats.first_chunk.append(time.perf_counter() - started)
+                    elif line == "event: done":
+                        done = True
+                    elif line == "event: error":
+                        return False
+                return done
+        finally:
+            self.stats.stream_finished()
+
+    async def _scenario_history(self) -> bool:
+        response = await self.client.get(
+            "/api/get_chat_history", params={"room_id": self.room_id}
+        )
+        return response.status_code == 200
+
+    async def _scenario_rooms(self) -> bool:
+        response = await self.client.get("/api/get_chat_rooms", params={"limit": 50})
+        return response.status_code in (200, 304)
+
+    async def _scenario_prompts(self) -> bool:
+        response = await self.client.get("/prompt_share/api/prompts")
+        return response.status_code in (200, 304)
+
+
+async def _user_loop(
+    user: VirtualUser,
+    mix: dict[str, float],
+    deadline: float,
+    think_time: float,
+) -> None:
+    scenarios = [name for name in mix if not user.is_guest or name in GUEST_SCENARIOS]
+    weights = [mix[name] for name in scenarios]
+    await user.start_session()
+    while time.monotonic() < deadline:
+        await user.run(random.choices(scenarios, weights)[0])
+        if think_time > 0:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+
+def ensure_load_test_users(count: int) -> list[int]:
+    # アプリと同じ DB 設定で負荷試験用ユーザーを用意し、その ID を返す
+    # Upsert load-test users with the app's DB settings and return their ids.
+    from services.db import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO users (email, username, is_verified)
+            SELECT 'loadtest+' || n || '@example.invalid', 'loadtest' || n, TRUE
+              FROM generate_series(1, %s) AS n
+            ON CONFLICT (email) DO UPDATE SET is_verified = TRUE
+            RETURNING id
+            """,
+            (count,),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        return ids
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def mint_session_cookie(secret_key: str, user_id: int) -> str:
+    # セッションミドルウェアと同じシリアライザで Cookie 保存型のログイン済みセッションを作る
+    # Build a logged-in cookie-backed session with the session middleware's own serializer.
+    from services.session_middleware import COOKIE_BACKEND, HybridSessionMiddleware
+
+    serializer = HybridSessionMiddleware(None, secret_key=secret_key).serializer
+    return serializer.dumps({"backend": COOKIE_BACKEND, "data": {"user_id": user_id}})
+
+
+async def scrape_worker_peaks(base_url: str, scrapes: int) -> dict[str, int]:
+    # 各スクレイプはいずれかのワーカーに届くため、複数回取得して全ワーカー分を集める
+    # Each scrape lands on one worker, so scrape repeatedly to collect every worker's peak.
+    headers = {}
+    token = os.getenv("METRICS_BEARER_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    peaks: dict[str, int] = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+        for _ in range(scrapes):
+            try:
+                response = await client.get("/metrics", headers=headers)
+            except httpx.HTTPError:
+                continue
+            if response.status_code == 200:
+                for pid, value in parse_worker_peaks(response.text).items():
+                    peaks[pid] = max(peaks.get(pid, 0), value)
+    return peaks
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_healthy(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited early while waiting for {url}.")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}.")
+
+
+def _start_stub(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "tests.load.stub_llm_server",
+        "--port", str(port),
+        "--ttft-ms", str(args.ttft_ms),
+        "--ttft-jitter-ms", str(args.ttft_jitter_ms),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens),
+        "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+    ]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    process = subprocess.Popen(command, cwd=_REPO_ROOT)
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_until_healthy(f"{base_url}/healthz", process, timeout=15)
+    return process, base_url
+
+
+def _start_app(args: argparse.Namespace, stub_url: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "GROQ_BASE_URL": stub_url,
+            "GEMINI_BASE_URL": stub_url,
+            "GROQ_API_KEY": env.get("LOADTEST_GROQ_API_KEY", "stub-key"),
+            "Gemini_API_KEY": env.get("LOADTEST_GEMINI_API_KEY", "stub-key"),
+            "LLM_DAILY_API_LIMIT": str(10**9),
+        }
+    )
+    command = [
+        sys.executable, "-m", "uvicorn", "app:app",
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(args.workers),
+        "--no-access-log",
+        "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=_REPO_ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_until_healthy(f"{base_url}/healthz", process, timeout=60)
+    return process, base_url
+
+
+async def run_load(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    mix = parse_mix(args.mix)
+    guest_count = int(round(args.users * args.guest_ratio))
+    auth_count = args.users - guest_count
+    secret_key = os.getenv("FASTAPI_SECRET_KEY") or os.getenv("FLASK_SECRET_KEY")
+    if auth_count and not secret_key:
+        raise SystemExit("FASTAPI_SECRET_KEY is required to mint authenticated sessions.")
+    user_ids = ensure_load_test_users(auth_count) if auth_count else []
+
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.request_timeout)
+    clients = [
+        httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout)
+        for _ in range(args.users)
+    ]
+    users = [
+        VirtualUser(
+            client,
+            stats,
+            model=args.model,
+            user_id=user_ids[index] if index < auth_count else None,
+            session_cookie=(
+                mint_session_cookie(secret_key, user_ids[index]) if index < auth_count else None
+            ),
+        )
+        for index, client in enumerate(clients)
+    ]
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    try:
+        results = await asyncio.gather(
+            *(_user_loop(user, mix, deadline, args.think_time_ms / 1000) for user in users),
+            return_exceptions=True,
+        )
+    finally:
+        for client in clients:
+            await client.aclose()
+    elapsed = time.monotonic() - started
+    setup_failures = [result for result in results if isinstance(result, Exception)]
+    for failure in setup_failures[:3]:
+        print(f"virtual user failed: {failure!r}", file=sys.stderr)
+
+    worker_peaks = await scrape_worker_peaks(base_url, args.metrics_scrapes or args.workers * 10)
+    summary = stats.summary(elapsed, worker_peaks)
+    summary["users"] = {"authenticated": auth_count, "guest": guest_count}
+    summary["failed_virtual_users"] = len(setup_failures)
+    return summary
+
+
+def print_report(summary: dict[str, Any]) -> None:
+    print(
+        f"\n{summary['requests']} requests in {summary['elapsed_seconds']}s "
+        f"({summary['rps']} req/s)"
+    )
+    header = f"{'scenario':<10} {'reqs':>7} {'errors':>7} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in summary["scenarios"].items():
+        print(
+            f"{name:<10} {row['requests']:>7} {row['errors']:>7} {row['rps']:>8} "
+            f"{_fmt(row['p50_ms']):>9} {_fmt(row['p95_ms']):>9} {_fmt(row['p99_ms']):>9} "
+            f"{_fmt(row['max_ms']):>9}"
+        )
+    first_chunk = summary["stream_first_chunk"]
+    print(
+        "\nstream first chunk: "
+        f"p50 {_fmt(first_chunk['p50_ms'])}  p95 {_fmt(first_chunk['p95_ms'])}  "
+        f"p99 {_fmt(first_chunk['p99_ms'])}"
+    )
+    print(f"max concurrent streams (client): {summary['max_concurrent_streams_client']}")
+    per_worker = summary["max_concurrent_streams_per_worker"]
+    if per_worker:
+        for pid, peak in sorted(per_worker.items()):
+            print(f"max concurrent streams (worker pid {pid}): {peak}")
+    else:
+        print("max concurrent streams per worker: unavailable (/metrics not reachable)")
+
+
+def _fmt(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}ms"
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", help="Base URL of a running app; skips booting app and stub.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the booted app.")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users.")
+    parser.add_argument("--guest-ratio", type=float, default=0.2)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+    parser.add_argument("--think-time-ms", type=float, default=200.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. chat=3,history=4.")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--metrics-scrapes", type=int, default=0)
+    parser.add_argument("--json-out", help="Write the summary as JSON to this path.")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    parse_mix(args.mix)
+
+    # アプリと同じ .env を読み、DB 接続とセッション署名キーを共有する
+    # Load the app's .env so the DB settings and session secret are shared.
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(_REPO_ROOT, ".env"))
+
+    processes: list[subprocess.Popen] = []
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            stub_process, stub_url = _start_stub(args)
+            processes.append(stub_process)
+            app_process, base_url = _start_app(args, stub_url)
+            processes.append(app_process)
+        summary = asyncio.run(run_load(args, base_url))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(summary)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
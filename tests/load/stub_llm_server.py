@@ -0,0 +1,199 @@
+"""OpenAI-compatible stub provider for load tests.
+
+Implements ``POST /chat/completions`` (streaming and non-streaming) with a
+configurable time-to-first-token, token rate and error rate, so the app can be
+driven at full speed without calling Groq or Gemini. Point the app at it with
+``GROQ_BASE_URL`` / ``GEMINI_BASE_URL``::
+
+    python -m tests.load.stub_llm_server --port 9100 --ttft-ms 400 --tokens-per-second 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+# 日本語と英語が混在する応答を模した語彙
+# Vocabulary imitating mixed Japanese/English replies.
+_VOCABULARY = (
+    "こんにちは", "。", "ご質問", "について", "説明", "します", "、", "まず", "結論",
+    "として", "The", " answer", " is", " simple", ".", "\n", "### ", "ポイント", "1", ":",
+)
+
+
+@dataclass
+class StubConfig:
+    ttft_ms: float = 300.0
+    ttft_jitter_ms: float = 100.0
+    tokens_per_second: float = 80.0
+    completion_tokens: int = 120
+    error_rate: float = 0.0
+    error_status: int = 503
+    seed: int | None = None
+
+
+def _chunk(completion_id: str, model: str, created: int, delta: dict[str, Any], finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _sse(payload: Any) -> bytes:
+    return b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+def _prompt_tokens(messages: list[dict[str, Any]]) -> int:
+    return sum(max(1, len(str(message.get("content") or "")) // 2) for message in messages)
+
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.stub_config = config
+
+    async def _wait_first_token() -> None:
+        jitter = rng.uniform(-config.ttft_jitter_ms, config.ttft_jitter_ms)
+        await asyncio.sleep(max(0.0, config.ttft_ms + jitter) / 1000)
+
+    def _tokens() -> list[str]:
+        return [rng.choice(_VOCABULARY) for _ in range(config.completion_tokens)]
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub-model")
+        messages = body.get("messages") or []
+
+        if rng.random() < config.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Injected stub failure.", "type": "server_error"}},
+                status_code=config.error_status,
+            )
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        tokens = _tokens()
+        usage = {
+            "prompt_tokens": _prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": _prompt_tokens(messages) + len(tokens),
+        }
+
+        if not body.get("stream"):
+            await _wait_first_token()
+            await asyncio.sleep(len(tokens) / config.tokens_per_second)
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events() -> AsyncIterator[bytes]:
+            await _wait_first_token()
+            yield _sse(_chunk(completion_id, model, created, {"role": "assistant", "content": ""}))
+            # tokens_per_second <= 0 はペーシングなし（最大速度）
+            # tokens_per_second <= 0 disables pacing (stream as fast as possible).
+            interval = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+            for token in tokens:
+                yield _sse(_chunk(completion_id, model, created, {"content": token}))
+                await asyncio.sleep(interval)
+            yield _sse(_chunk(completion_id, model, created, {}, finish_reason="stop"))
+            if include_usage:
+                yield _sse(
+                    {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage,
+                    }
+                )
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    defaults = StubConfig()
+    parser.add_argument(f"--{prefix}ttft-ms", type=float, default=defaults.ttft_ms)
+    parser.add_argument(f"--{prefix}ttft-jitter-ms", type=float, default=defaults.ttft_jitter_ms)
+    parser.add_argument(
+        f"--{prefix}tokens-per-second", type=float, default=defaults.tokens_per_second
+    )
+    parser.add_argument(
+        f"--{prefix}completion-tokens", type=int, default=defaults.completion_tokens
+    )
+    parser.add_argument(
+        f"--{prefix}error-rate",
+        type=float,
+        default=defaults.error_rate,
+        help="Fraction of requests answered with --error-status (0.0-1.0).",
+    )
+    parser.add_argument(f"--{prefix}error-status", type=int, default=defaults.error_status)
+    parser.add_argument(f"--{prefix}seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace, prefix: str = "") -> StubConfig:
+    attr = prefix.replace("-", "_")
+    return StubConfig(
+        ttft_ms=getattr(args, f"{attr}ttft_ms"),
+        ttft_jitter_ms=getattr(args, f"{attr}ttft_jitter_ms"),
+        tokens_per_second=getattr(args, f"{attr}tokens_per_second"),
+        completion_tokens=getattr(args, f"{attr}completion_tokens"),
+        error_rate=getattr(args, f"{attr}error_rate"),
+        error_status=getattr(args, f"{attr}error_status"),
+        seed=getattr(args, f"{attr}seed"),
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+    uvicorn.run(
+        create_stub_app(config_from_args(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
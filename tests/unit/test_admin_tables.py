@@ -0,0 +1,240 @@
+import asyncio
+import csv
+import io
+import json
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from blueprints.admin import tables as admin_tables
+from tests.helpers.request_helpers import build_request
+
+ADMIN_SESSION = {"is_admin": True}
+
+# (name, type, not null, primary key, reltuples)
+USERS_METADATA = [
+    ("id", "integer", True, True, 1234.0),
+    ("name", "text", False, False, 1234.0),
+    ("created_at", "timestamp with time zone", True, False, 1234.0),
+]
+USERS_ROWS = [
+    (3, "carol", datetime(2024, 1, 3, tzinfo=timezone.utc)),
+    (2, "bob", datetime(2024, 1, 2, tzinfo=timezone.utc)),
+    (1, None, datetime(2024, 1, 1, tzinfo=timezone.utc)),
+]
+
+
+class FakeCursor:
+    def __init__(self, database, name=None):
+        self.database = database
+        self.name = name
+        self.description = None
+        self._rows = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.database.executed.append((query, params, self.name))
+        if isinstance(query, str) and "pg_catalog.pg_class" in query:
+            self._rows = list(self.database.metadata)
+            self.description = None
+            return
+        self._rows = list(self.database.rows)
+        if params and not self.name:
+            self._rows = self._rows[: params[-2]]
+        self.description = [(column,) for column in ("id", "name", "created_at")]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        self.database.fetches.append(len(rows))
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.closed = False
+
+    def cursor(self, name=None):
+        return FakeCursor(self.database, name=name)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase:
+    def __init__(self, metadata=USERS_METADATA, rows=USERS_ROWS):
+        self.metadata = metadata
+        self.rows = rows
+        self.executed = []
+        self.fetches = []
+        self.connections = []
+
+    def connect(self, read_only=False):
+        connection = FakeConnection(self)
+        self.connections.append((connection, read_only))
+        return connection
+
+
+class AdminTableRowsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = FakeDatabase()
+        db_patch = patch.object(admin_tables, "get_db_connection", side_effect=self.database.connect)
+        db_patch.start()
+        self.addCleanup(db_patch.stop)
+
+    def _rows(self, query_string, session=ADMIN_SESSION):
+        request = build_request(
+            method="GET",
+            path="/admin/api/tables/users/rows",
+            session=dict(session),
+            query_string=query_string,
+        )
+        response = asyncio.run(admin_tables.api_table_rows(request, "users"))
+        return response, json.loads(response.body.decode())
+
+    def test_requires_admin(self):
+        response, _ = self._rows(b"", session={})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_keyset_page_returns_cursor_and_approximate_count(self):
+        response, payload = self._rows(b"sort=created_at&order=desc&limit=2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(payload["paging"], "keyset")
+        self.assertEqual(payload["approximate_count"], 1234)
+        self.assertEqual([row[0] for row in payload["rows"]], [3, 2])
+        self.assertIsNotNone(payload["next_cursor"])
+        self.assertTrue(all(read_only for _, read_only in self.database.connections))
+
+        cursor = payload["next_cursor"].encode()
+        response, payload = self._rows(b"sort=created_at&order=desc&limit=2&cursor=" + cursor)
+
+        self.assertEqual(response.status_code, 200)
+        query, params, _ = self.database.executed[-1]
+        self.assertEqual(params, ["2024-01-02T00:00:00+00:00", "2", 3, 0])
+        self.assertIn("SQL(' < ')", repr(query))
+        self.assertIn("Identifier('created_at'), SQL(' DESC')", repr(query))
+
+    def test_bytea_keys_round_trip_through_the_cursor_as_hex(self):
+        self.database.metadata = [("id", "bytea", True, True, 2.0)] + USERS_METADATA[1:]
+        self.database.rows = [
+            (memoryview(b"\x00\xff"), "carol", USERS_ROWS[0][2]),
+            (memoryview(b"\x01\x02"), "bob", USERS_ROWS[1][2]),
+            (memoryview(b"\x03"), None, USERS_ROWS[2][2]),
+        ]
+        first_page = admin_tables._fetch_rows_page("users", sort=None, descending=False, limit=2)
+        admin_tables._fetch_rows_page(
+            "users",
+            sort=None,
+            descending=False,
+            limit=2,
+            cursor_token=first_page["next_cursor"],
+        )
+
+        query, params, _ = self.database.executed[-1]
+        self.assertEqual(params, ["0102", 3, 0])
+        self.assertIn("SQL(\"decode(%s, 'hex')\")", repr(query))
+        self.assertNotIn("bytea", repr(query))
+
+    def test_nullable_sort_column_falls_back_to_offset(self):
+        response, payload = self._rows(b"sort=name&limit=2&offset=4")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(payload["paging"], "offset")
+        self.assertIsNone(payload["next_cursor"])
+        self.assertEqual(payload["next_offset"], 6)
+        query, params, _ = self.database.executed[-1]
+        self.assertEqual(params, [3, 4])
+        self.assertIn("Identifier('ctid')", repr(query))
+
+    def test_rejects_unknown_sort_and_foreign_cursor(self):
+        response, payload = self._rows(b"sort=password")
+        self.assertEqual(response.status_code, 400)
+
+        _, first_page = self._rows(b"sort=created_at&limit=2")
+        response, payload = self._rows(
+            b"sort=id&limit=2&cursor=" + first_page["next_cursor"].encode()
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(payload["error"], "cursor does not match the requested sort order")
+
+    def test_missing_table_returns_404(self):
+        self.database.metadata = []
+
+        response, _ = self._rows(b"")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class AdminTableExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.database = FakeDatabase()
+        db_patch = patch.object(admin_tables, "get_db_connection", side_effect=self.database.connect)
+        db_patch.start()
+        self.addCleanup(db_patch.stop)
+        batch_patch = patch.object(admin_tables, "EXPORT_BATCH_SIZE", 2)
+        batch_patch.start()
+        self.addCleanup(batch_patch.stop)
+
+    def _export(self, query_string):
+        request = build_request(
+            method="GET",
+            path="/admin/api/tables/users/export",
+            session=dict(ADMIN_SESSION),
+            query_string=query_string,
+        )
+
+        async def scenario():
+            response = await admin_tables.api_table_export(request, "users")
+            if response.status_code != 200:
+                return response, b""
+            chunks = [chunk async for chunk in response.body_iterator]
+            return response, chunks
+
+        return asyncio.run(scenario())
+
+    def test_csv_export_streams_batches_from_a_named_cursor(self):
+        response, chunks = self._export(b"format=csv")
+
+        self.assertEqual(response.headers["content-type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="users.csv"', response.headers["content-disposition"])
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(rows[0], ["id", "name", "created_at"])
+        self.assertEqual([row[0] for row in rows[1:]], ["3", "2", "1"])
+        self.assertEqual(rows[3][1], "")
+        # ヘッダー + 2 行 + 1 行 / header + a batch of 2 + a batch of 1
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(self.database.fetches, [2, 1, 0])
+
+        query, _, cursor_name = self.database.executed[-1]
+        self.assertTrue(cursor_name.startswith("admin_export_"))
+        self.assertNotIn("ORDER BY", repr(query))
+        self.assertNotIn("LIMIT", repr(query))
+        self.assertTrue(all(connection.closed for connection, _ in self.database.connections))
+
+    def test_ndjson_export_orders_by_requested_column(self):
+        response, chunks = self._export(b"format=ndjson&sort=created_at&order=desc")
+
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])["name"], "carol")
+        self.assertEqual(len(lines), 3)
+        query, _, _ = self.database.executed[-1]
+        self.assertIn("Identifier('created_at'), SQL(' DESC')", repr(query))
+
+    def test_rejects_unknown_format(self):
+        response, _ = self._export(b"format=xlsx")
+
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
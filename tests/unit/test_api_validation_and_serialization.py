@@ -121,6 +121,9 @@ class ApiValidationAndSerializationTestCase(unittest.TestCase):
         ]
 
         with patch(
+            "blueprints.prompt_share.prompt_manage_api._fetch_manage_list_version",
+            return_value=(1, 100),
+        ), patch(
             "blueprints.prompt_share.prompt_manage_api._fetch_my_prompts",
             return_value=sample_prompts,
         ):
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+
+from tests.benchmarks.fixtures import FakeRedis
+from tests.benchmarks.runner import (
+    compare_results,
+    load_baseline,
+    main,
+    run_benchmarks,
+    save_baseline,
+    select_benchmarks,
+)
+from tests.benchmarks.suite import BENCHMARKS
+
+
+class FakeRedisTestCase(unittest.TestCase):
+    def test_quota_script_counts_until_limit(self):
+        redis_client = FakeRedis()
+        results = [redis_client.eval("... INCR ...", 1, "quota", 2, 60) for _ in range(3)]
+
+        self.assertEqual(results, [[1, 1], [1, 2], [0, 2]])
+
+    def test_scan_iter_and_delete(self):
+        redis_client = FakeRedis()
+        redis_client.set("ephemeral:a:1", "{}", ex=60)
+        redis_client.set("session:x", "{}")
+
+        self.assertEqual(list(redis_client.scan_iter(match="ephemeral:*")), ["ephemeral:a:1"])
+        self.assertEqual(redis_client.delete("ephemeral:a:1", "missing"), 1)
+        self.assertIsNone(redis_client.get("ephemeral:a:1"))
+
+
+class BenchmarkRunnerTestCase(unittest.TestCase):
+    def test_every_benchmark_runs(self):
+        results = run_benchmarks(sorted(BENCHMARKS), repeat=1, loops=3)
+
+        self.assertEqual(set(results), set(BENCHMARKS))
+        for result in results.values():
+            self.assertGreater(result["min_seconds"], 0)
+
+    def test_compare_flags_slowdowns_past_threshold(self):
+        baseline = {
+            "benchmarks": {
+                "fast": {"min_seconds": 1.0},
+                "slow": {"min_seconds": 1.0},
+            }
+        }
+        results = {
+            "fast": {"min_seconds": 1.1},
+            "slow": {"min_seconds": 1.3},
+            "added": {"min_seconds": 1.0},
+        }
+
+        rows = {row["name"]: row for row in compare_results(results, baseline, 20.0)}
+
+        self.assertEqual(rows["fast"]["status"], "ok")
+        self.assertEqual(rows["slow"]["status"], "regressed")
+        self.assertAlmostEqual(rows["slow"]["change"], 30.0)
+        self.assertEqual(rows["added"]["status"], "new")
+
+    def test_save_keeps_baselines_of_benchmarks_not_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "baselines.json")
+            save_baseline(path, {"a": {"min_seconds": 1.0, "median_seconds": 1.0, "loops": 1}})
+            save_baseline(path, {"b": {"min_seconds": 2.0, "median_seconds": 2.0, "loops": 1}})
+
+            self.assertEqual(set(load_baseline(path)["benchmarks"]), {"a", "b"})
+
+    def test_compare_mode_exits_nonzero_on_regression(self):
+        name = "chat.sse_event"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "baselines.json")
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(
+                    {"version": 1, "benchmarks": {name: {"min_seconds": 1e-12}}}, handle
+                )
+
+            exit_code = main(["--compare", "-k", name, "--repeat", "1", "--baseline", path])
+
+        self.assertEqual(exit_code, 1)
+
+    def test_filter_selects_by_substring(self):
+        self.assertTrue(select_benchmarks(["session_middleware"]))
+        self.assertTrue(all("session" in name for name in select_benchmarks(["session"])))
+
+
+if __name__ == "__main__":
+    unittest.main()
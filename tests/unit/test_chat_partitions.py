@@ -0,0 +1,219 @@
+import asyncio
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from blueprints.chat.messages import _fetch_chat_history, chat
+from services.chat_partitions import (
+    archive_old_chat_history_partitions,
+    ensure_chat_history_partitions,
+    parse_partition_month,
+    partition_name,
+)
+from services.chat_service import get_chat_room_messages
+from tests.helpers.db_helpers import TransactionTrackingConnection
+from tests.helpers.request_helpers import build_request
+
+
+class FakeCursor:
+    def __init__(self, *, relkind="p", partitions=None):
+        self.relkind = relkind
+        self.partitions = list(partitions or [])
+        self.executed = []
+        self._fetchone_result = None
+        self._fetchall_result = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        self.executed.append((normalized, params))
+        if normalized.startswith("SELECT c.relkind"):
+            self._fetchone_result = (self.relkind,) if self.relkind else None
+        elif "FROM pg_inherits" in normalized:
+            self._fetchall_result = [(name,) for name in self.partitions]
+        else:
+            self._fetchall_result = []
+
+    def fetchone(self):
+        result = self._fetchone_result
+        self._fetchone_result = None
+        return result
+
+    def fetchall(self):
+        return self._fetchall_result
+
+    def close(self):
+        self.closed = True
+
+
+class RoomsCursor(FakeCursor):
+    # chat_rooms の最小限のモデル / A minimal model of chat_rooms.
+    def __init__(self, rooms, **kwargs):
+        super().__init__(**kwargs)
+        self.rooms = rooms
+
+    def execute(self, query, params=None):
+        super().execute(query, params)
+        normalized = " ".join(query.split())
+        if "FROM chat_rooms WHERE created_at >=" in normalized:
+            start = datetime.combine(params["start"], datetime.min.time())
+            end = datetime.combine(params["end"], datetime.min.time())
+            cutoff = datetime.combine(params["cutoff"], datetime.min.time())
+            self._fetchall_result = [
+                (room_id, room["last_message_at"] >= cutoff)
+                for room_id, room in self.rooms.items()
+                if start <= room["created_at"] < end and not room["deleted"]
+            ]
+        elif normalized.startswith("UPDATE chat_rooms SET deleted_at"):
+            for room_id in params[0]:
+                self.rooms[room_id]["deleted"] = True
+        elif "FROM pg_constraint" in normalized:
+            self._fetchall_result = [("fk_chat_history_room",)]
+        elif normalized.startswith("SELECT user_id FROM chat_rooms"):
+            room = self.rooms.get(params[0])
+            self._fetchone_result = (
+                (room["user_id"],) if room is not None and not room["deleted"] else None
+            )
+
+
+def run_with(fake_cursor, func, *args, **kwargs):
+    fake_conn = TransactionTrackingConnection(fake_cursor)
+    with patch("services.chat_partitions.get_db_connection", return_value=fake_conn):
+        return func(*args, **kwargs), fake_conn
+
+
+class ChatPartitionMaintenanceTestCase(unittest.TestCase):
+    def test_partition_names_round_trip(self):
+        self.assertEqual(partition_name(date(2026, 3, 1)), "chat_history_p202603")
+        self.assertEqual(parse_partition_month("chat_history_p202603"), date(2026, 3, 1))
+        self.assertIsNone(parse_partition_month("chat_history_archive_202603"))
+
+    def test_creates_only_missing_upcoming_partitions_under_lock(self):
+        fake_cursor = FakeCursor(partitions=["chat_history_p202611"])
+
+        created, fake_conn = run_with(
+            fake_cursor, ensure_chat_history_partitions, today=date(2026, 11, 20), months_ahead=2
+        )
+
+        self.assertEqual(created, ["chat_history_p202612", "chat_history_p202701"])
+        creates = [
+            (query, params) for query, params in fake_cursor.executed
+            if query.startswith("CREATE TABLE")
+        ]
+        self.assertIn("PARTITION OF chat_history", creates[0][0])
+        self.assertEqual(creates[1][1], (date(2027, 1, 1), date(2027, 2, 1)))
+        self.assertTrue(any("pg_advisory_xact_lock" in query for query, _ in fake_cursor.executed))
+        self.assertTrue(fake_conn.committed)
+
+    def test_skips_when_chat_history_is_not_partitioned(self):
+        fake_cursor = FakeCursor(relkind="r")
+
+        created, fake_conn = run_with(fake_cursor, ensure_chat_history_partitions)
+
+        self.assertEqual(created, [])
+        self.assertEqual(len(fake_cursor.executed), 1)
+        self.assertFalse(fake_conn.committed)
+
+    def test_archives_partitions_older_than_retention(self):
+        fake_cursor = FakeCursor(
+            partitions=["chat_history_p202509", "chat_history_p202510", "chat_history_p202603"]
+        )
+
+        archived, fake_conn = run_with(
+            fake_cursor, archive_old_chat_history_partitions, 6, today=date(2026, 4, 2)
+        )
+
+        self.assertEqual(archived, ["chat_history_archive_202509"])
+        queries = [query for query, _ in fake_cursor.executed]
+        self.assertIn("ALTER TABLE chat_history DETACH PARTITION chat_history_p202509", queries)
+        self.assertIn(
+            "ALTER TABLE chat_history_p202509 RENAME TO chat_history_archive_202509", queries
+        )
+        self.assertTrue(fake_conn.committed)
+
+    def test_keeps_partitions_with_recently_active_rooms(self):
+        rooms = {
+            "old-quiet": {
+                "created_at": datetime(2025, 9, 3),
+                "last_message_at": datetime(2025, 9, 30),
+                "deleted": False,
+                "user_id": 1,
+            },
+            "old-busy": {
+                "created_at": datetime(2025, 10, 5),
+                "last_message_at": datetime(2026, 3, 28),
+                "deleted": False,
+                "user_id": 1,
+            },
+        }
+        fake_cursor = RoomsCursor(
+            rooms, partitions=["chat_history_p202509", "chat_history_p202510"]
+        )
+
+        archived, _ = run_with(
+            fake_cursor, archive_old_chat_history_partitions, 6, today=date(2026, 4, 2)
+        )
+
+        self.assertEqual(archived, ["chat_history_archive_202509"])
+        self.assertTrue(rooms["old-quiet"]["deleted"])
+        self.assertFalse(rooms["old-busy"]["deleted"])
+        queries = [query for query, _ in fake_cursor.executed]
+        self.assertNotIn("ALTER TABLE chat_history DETACH PARTITION chat_history_p202510", queries)
+        self.assertIn(
+            'ALTER TABLE chat_history_archive_202509 DROP CONSTRAINT "fk_chat_history_room"',
+            queries,
+        )
+
+    def test_posting_to_a_room_in_an_archived_month_returns_404(self):
+        rooms = {
+            "old-room": {
+                "created_at": datetime(2025, 9, 3),
+                "last_message_at": datetime(2025, 9, 30),
+                "deleted": False,
+                "user_id": 1,
+            },
+        }
+        fake_cursor = RoomsCursor(rooms, partitions=["chat_history_p202509"])
+        run_with(fake_cursor, archive_old_chat_history_partitions, 6, today=date(2026, 4, 2))
+
+        request = build_request(
+            method="POST",
+            path="/api/chat",
+            json_body={"message": "hello", "chat_room_id": "old-room"},
+            session={"user_id": 1},
+        )
+        with patch("blueprints.chat.messages.cleanup_ephemeral_chats"), patch(
+            "services.chat_service.get_db_connection",
+            return_value=TransactionTrackingConnection(fake_cursor),
+        ), patch("blueprints.chat.messages.save_message_to_db") as save_message:
+            response = asyncio.run(chat(request))
+
+        self.assertEqual(response.status_code, 404)
+        save_message.assert_not_called()
+
+    def test_retention_disabled_by_default(self):
+        self.assertEqual(archive_old_chat_history_partitions(0), [])
+
+
+class RoomHistoryPruningTestCase(unittest.TestCase):
+    def test_history_queries_filter_by_partition_key(self):
+        for module, func in (
+            ("blueprints.chat.messages", _fetch_chat_history),
+            ("services.chat_service", get_chat_room_messages),
+        ):
+            with self.subTest(module=module):
+                fake_cursor = FakeCursor()
+                fake_conn = TransactionTrackingConnection(fake_cursor)
+                with patch(f"{module}.get_db_connection", return_value=fake_conn):
+                    func("room-1")
+
+                query, params = fake_cursor.executed[0]
+                self.assertIn(
+                    "room_created_at = (SELECT created_at FROM chat_rooms WHERE id = %(room_id)s)",
+                    query,
+                )
+                self.assertEqual(params, {"room_id": "room-1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
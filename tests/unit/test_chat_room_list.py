@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from blueprints.chat.rooms import (
+    _decode_room_cursor,
+    _encode_room_cursor,
+    _fetch_user_rooms,
+    get_chat_rooms,
+)
+from services.chat_service import save_message_to_db
+from tests.helpers.db_helpers import TransactionTrackingConnection
+from tests.helpers.request_helpers import build_request
+
+
+class FakeCursor:
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+        self.executed = []
+        self.rowcount = 1
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        self.closed = True
+
+
+def room_row(index, *, with_message=True):
+    return (
+        f"room-{index}",
+        f"Room {index}",
+        datetime(2026, 1, 1, 9, 0, 0),
+        datetime(2026, 1, 2, 9, 0, index, 500),
+        "assistant" if with_message else None,
+        f"preview {index}" if with_message else None,
+    )
+
+
+class ChatRoomListTestCase(unittest.TestCase):
+    def test_first_page_uses_single_lateral_query_and_returns_next_cursor(self):
+        fake_cursor = FakeCursor(rows=[room_row(3), room_row(2, with_message=False), room_row(1)])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        rooms, next_cursor = _fetch_user_rooms(fake_conn, 7, limit=2)
+
+        self.assertEqual(len(fake_cursor.executed), 1)
+        query, params = fake_cursor.executed[0]
+        self.assertIn("LEFT JOIN LATERAL", query)
+        self.assertIn("h.room_created_at = r.created_at", query)
+        self.assertIn("ORDER BY r.last_message_at DESC, r.id DESC", query)
+        self.assertNotIn("%(cursor_at)s", query)
+        self.assertEqual(params["limit"], 3)
+        self.assertEqual([room["id"] for room in rooms], ["room-3", "room-2"])
+        self.assertEqual(rooms[0]["last_message"], {"sender": "assistant", "preview": "preview 3"})
+        self.assertIsNone(rooms[1]["last_message"])
+        self.assertEqual(_decode_room_cursor(next_cursor), (room_row(2)[3], "room-2"))
+        self.assertTrue(fake_cursor.closed)
+
+    def test_next_page_applies_keyset_condition_and_ends_without_cursor(self):
+        fake_cursor = FakeCursor(rows=[room_row(1)])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+        page_cursor = (datetime(2026, 1, 2, 9, 0, 2, 500), "room-2")
+
+        rooms, next_cursor = _fetch_user_rooms(fake_conn, 7, limit=2, cursor=page_cursor)
+
+        query, params = fake_cursor.executed[0]
+        self.assertIn("(r.last_message_at, r.id) < (%(cursor_at)s, %(cursor_id)s)", query)
+        self.assertEqual((params["cursor_at"], params["cursor_id"]), page_cursor)
+        self.assertEqual(len(rooms), 1)
+        self.assertIsNone(next_cursor)
+
+    def test_cursor_round_trip_keeps_microseconds(self):
+        timestamp = datetime(2026, 3, 1, 12, 30, 45, 123456)
+
+        self.assertEqual(
+            _decode_room_cursor(_encode_room_cursor(timestamp, "abc|def")),
+            (timestamp, "abc|def"),
+        )
+
+    def test_endpoint_rejects_malformed_cursor(self):
+        request = build_request(
+            method="GET",
+            path="/api/get_chat_rooms",
+            query_string=b"cursor=not-a-cursor",
+            session={"user_id": 7},
+        )
+
+        with patch("blueprints.chat.rooms.cleanup_ephemeral_chats"):
+            response = asyncio.run(get_chat_rooms(request))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_saving_message_advances_room_activity_in_same_statement(self):
+        fake_cursor = FakeCursor()
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("services.chat_service.get_db_connection", return_value=fake_conn):
+            save_message_to_db("room-1", "hello", "user")
+
+        self.assertEqual(len(fake_cursor.executed), 1)
+        query, params = fake_cursor.executed[0]
+        self.assertIn("INSERT INTO chat_history", query)
+        self.assertIn("UPDATE chat_rooms r SET last_message_at", query)
+        self.assertIn("SELECT r.id, r.created_at", query)
+        self.assertEqual(params, {"room_id": "room-1", "message": "hello", "sender": "user"})
+        self.assertTrue(fake_conn.committed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -79,9 +79,9 @@ class ChatStreamingTestCase(unittest.TestCase):
                 ).decode("utf-8")
 
         self.assertIn("event: chunk", body)
-        self.assertIn('"text": "こん"', body)
+        self.assertIn('data: {"text":"こん"}', body)
         self.assertIn("event: done", body)
-        self.assertIn('"response": "こんにちは"', body)
+        self.assertIn('data: {"response":"こんにちは"}', body)
         self.assertEqual(
             mock_append.call_args_list,
             [call("sid-1", "default", "assistant", "こんにちは")],
@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import json
+import unittest
+import zlib
+
+import httpx
+from fastapi import FastAPI
+from starlette.responses import PlainTextResponse, StreamingResponse
+
+from services.compression import CompressionMiddleware, select_encoding
+from services.web import jsonify
+
+
+def build_app(**middleware_kwargs):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"], **middleware_kwargs)
+
+    @app.get("/large")
+    async def large():
+        return jsonify({"items": ["x" * 50] * 100}, etag='"v1"')
+
+    @app.get("/small")
+    async def small():
+        return jsonify({"ok": True})
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("y" * 5000, media_type="image/png")
+
+    @app.get("/sse")
+    async def sse():
+        async def events():
+            for index in range(3):
+                yield f"data: {index}\n\n".encode("utf-8") * 200
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/ndjson")
+    async def ndjson():
+        async def rows():
+            for index in range(3):
+                yield (json.dumps({"row": index}) + "\n").encode("utf-8")
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    return app
+
+
+def fetch(app, path, accept_encoding="gzip"):
+    async def scenario():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://testserver"
+        ) as client:
+            request = client.build_request("GET", path, headers={"Accept-Encoding": accept_encoding})
+            response = await client.send(request, stream=True)
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            await response.aclose()
+            return response, raw
+
+    return asyncio.run(scenario())
+
+
+class CompressionMiddlewareTestCase(unittest.TestCase):
+    def test_large_json_is_gzipped_with_weak_etag_and_vary(self):
+        response, raw = fetch(build_app(), "/large")
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["etag"], 'W/"v1"')
+        self.assertEqual(int(response.headers["content-length"]), len(raw))
+        self.assertEqual(json.loads(gzip.decompress(raw))["items"][0], "x" * 50)
+
+    def test_small_and_non_allowlisted_bodies_pass_through(self):
+        small, small_raw = fetch(build_app(), "/small")
+        binary, _ = fetch(build_app(), "/text")
+
+        self.assertNotIn("content-encoding", small.headers)
+        self.assertEqual(json.loads(small_raw), {"ok": True})
+        self.assertNotIn("content-encoding", binary.headers)
+
+    def test_event_stream_is_never_compressed(self):
+        response, raw = fetch(build_app(), "/sse")
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertTrue(raw.startswith(b"data: 0"))
+
+    def test_streamed_body_is_compressed_with_per_chunk_flush(self):
+        response, raw = fetch(build_app(minimum_size=1), "/ndjson")
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        lines = gzip.decompress(raw).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["row"] for line in lines], [0, 1, 2])
+
+    def test_client_without_supported_encoding_gets_identity(self):
+        response, raw = fetch(build_app(), "/large", accept_encoding="identity")
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["etag"], '"v1"')
+        self.assertEqual(len(json.loads(raw)["items"]), 100)
+
+
+class SelectEncodingTestCase(unittest.TestCase):
+    def test_honours_q_values_and_server_preference(self):
+        supported = ["zstd", "br", "gzip"]
+
+        self.assertEqual(select_encoding("gzip, br", supported), "br")
+        self.assertEqual(select_encoding("br;q=0.5, gzip", supported), "gzip")
+        self.assertEqual(select_encoding("gzip;q=0, *;q=0.1", supported), "zstd")
+        self.assertIsNone(select_encoding("identity", supported))
+        self.assertIsNone(select_encoding("", supported))
+
+
+class SyncFlushTestCase(unittest.TestCase):
+    def test_each_flushed_chunk_is_decodable_immediately(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        decompressor = zlib.decompressobj(31)
+
+        first = compressor.compress(b"hello ") + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        self.assertEqual(decompressor.decompress(first), b"hello ")
+
+
+if __name__ == "__main__":
+    unittest.main()
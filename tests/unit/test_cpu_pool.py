@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+from blueprints.admin import views as admin_views
+from services import cpu_pool, login_throttle
+from services.cpu_pool import CpuPoolBusyError, run_cpu_bound
+from services.loop_monitor import run_without_blocking
+from services.security import hash_password
+from tests.helpers.request_helpers import build_request
+
+
+class CpuPoolTestCase(unittest.TestCase):
+    def test_runs_on_a_separate_process(self):
+        with patch.dict(os.environ, {"CPU_POOL_WORKERS": "1"}):
+            pid = asyncio.run(run_cpu_bound(os.getpid))
+
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_rejects_work_beyond_the_concurrency_cap(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(2)
+            return "held"
+
+        async def scenario():
+            first = asyncio.create_task(run_cpu_bound(hold))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 2)
+            with self.assertRaises(CpuPoolBusyError):
+                await run_cpu_bound(hold)
+            release.set()
+            return await first
+
+        env = {"CPU_POOL_WORKERS": "0", "CPU_POOL_MAX_PENDING": "1"}
+        with patch.dict(os.environ, env):
+            self.assertEqual(asyncio.run(scenario()), "held")
+
+
+class AdminLoginThrottleTestCase(unittest.TestCase):
+    def setUp(self):
+        login_throttle.reset_admin_login_attempts("testclient")
+        self.addCleanup(login_throttle.reset_admin_login_attempts, "testclient")
+        hash_patch = patch.object(admin_views, "ADMIN_PASSWORD_HASH", hash_password("correct-password"))
+        hash_patch.start()
+        self.addCleanup(hash_patch.stop)
+
+    def _login(self, password):
+        request = build_request(
+            method="POST", path="/admin/api/login", json_body={"password": password}
+        )
+        return run_without_blocking(admin_views.api_login(request), threshold_ms=100)
+
+    def test_login_does_not_block_the_event_loop(self):
+        response = self._login("correct-password")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_failures_are_throttled_per_ip(self):
+        with patch.dict(os.environ, {"ADMIN_LOGIN_MAX_ATTEMPTS": "2"}):
+            statuses = [self._login("wrong-password").status_code for _ in range(2)]
+            with patch.object(
+                admin_views, "run_cpu_bound", side_effect=AssertionError("hashed while throttled")
+            ):
+                throttled = self._login("correct-password")
+
+        self.assertEqual(statuses, [401, 401])
+        self.assertEqual(throttled.status_code, 429)
+        self.assertGreater(int(throttled.headers["Retry-After"]), 0)
+        self.assertEqual(json.loads(throttled.body.decode())["status"], "fail")
+
+    def test_successful_login_resets_attempts(self):
+        with patch.dict(os.environ, {"ADMIN_LOGIN_MAX_ATTEMPTS": "2"}):
+            self._login("wrong-password")
+            self._login("correct-password")
+            self.assertEqual(self._login("wrong-password").status_code, 401)
+
+    def test_busy_pool_answers_503(self):
+        with patch.object(admin_views, "run_cpu_bound", side_effect=CpuPoolBusyError()):
+            response = self._login("correct-password")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+def tearDownModule():
+    cpu_pool.shutdown_cpu_pool()
+
+
+if __name__ == "__main__":
+    unittest.main()
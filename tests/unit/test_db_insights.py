@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from blueprints.admin import views as admin_views
+from services import db_insights
+from tests.helpers.request_helpers import build_request
+
+
+class FakeProgrammingError(Exception):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.database.executed.append((" ".join(query.split()), params))
+        if "FROM pg_extension" in query:
+            self._result = [self.database.extension] if self.database.extension else []
+        elif "FROM pg_stat_statements" in query:
+            if self.database.statements_error:
+                raise FakeProgrammingError(
+                    "pg_stat_statements must be loaded via shared_preload_libraries\nHINT: ..."
+                )
+            self._result = [{"queryid": 1, "query": "SELECT 1", "calls": 5, "total_ms": 12.5}]
+        elif "pg_blocking_pids" in query:
+            self._result = [{"waiting_pid": 11, "blocking_pid": 10}]
+        elif "FROM pg_stat_activity" in query:
+            self._result = [{"pid": 10, "transaction_seconds": 120.0}]
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        return None
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.database)
+
+    def close(self):
+        return None
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.extension = {"extversion": "1.10", "server_version_num": 160002}
+        self.statements_error = False
+        self.executed = []
+        self.connections = 0
+        self.delay = 0.0
+
+    def connect(self):
+        self.connections += 1
+        time.sleep(self.delay)
+        return FakeConnection(self)
+
+
+class DbInsightsTestCase(unittest.TestCase):
+    def setUp(self):
+        db_insights.reset_db_insights_cache()
+        self.addCleanup(db_insights.reset_db_insights_cache)
+        self.database = FakeDatabase()
+        patches = [
+            patch.object(db_insights, "get_db_connection", side_effect=self.database.connect),
+            patch.object(db_insights, "Error", FakeProgrammingError),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+    def _statement_sql(self):
+        return next(sql for sql, _ in self.database.executed if "FROM pg_stat_statements" in sql)
+
+    def test_statements_report_missing_extension(self):
+        self.database.extension = None
+
+        report, _ = db_insights.fetch_statement_stats()
+
+        self.assertFalse(report["available"])
+        self.assertIn("not installed", report["reason"])
+
+    def test_statements_use_version_specific_columns(self):
+        report, _ = db_insights.fetch_statement_stats(order_by="mean", limit=5)
+
+        self.assertTrue(report["available"])
+        self.assertEqual(report["statements"][0]["calls"], 5)
+        self.assertIn("ORDER BY mean_exec_time DESC", self._statement_sql())
+
+        db_insights.reset_db_insights_cache()
+        self.database.executed.clear()
+        self.database.extension = {"extversion": "1.8", "server_version_num": 120015}
+        db_insights.fetch_statement_stats(order_by="max", limit=5)
+        self.assertIn("ORDER BY max_time DESC", self._statement_sql())
+
+    def test_statements_not_preloaded_rolls_back_to_savepoint(self):
+        self.database.statements_error = True
+
+        with self.assertLogs("services.db_insights", "WARNING"):
+            report, _ = db_insights.fetch_statement_stats()
+
+        self.assertFalse(report["available"])
+        self.assertEqual(
+            report["reason"], "pg_stat_statements must be loaded via shared_preload_libraries"
+        )
+        executed = [sql for sql, _ in self.database.executed]
+        self.assertIn("ROLLBACK TO SAVEPOINT db_insights_statements", executed)
+
+    def test_reports_run_under_statement_timeout(self):
+        with patch.dict(os.environ, {"DB_INSIGHTS_TIMEOUT_MS": "1500"}):
+            db_insights.fetch_index_usage()
+
+        self.assertEqual(self.database.executed[0][0], "SET LOCAL statement_timeout = 1500")
+
+    def test_results_are_cached_until_ttl(self):
+        first, first_age = db_insights.fetch_activity(min_seconds=30)
+        second, second_age = db_insights.fetch_activity(min_seconds=30)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.database.connections, 1)
+        self.assertLessEqual(first_age, second_age)
+        self.assertEqual(first["lock_waits"], [{"waiting_pid": 11, "blocking_pid": 10}])
+        self.assertEqual(first["long_transactions"][0]["pid"], 10)
+
+        with patch.dict(os.environ, {"DB_INSIGHTS_ACTIVITY_CACHE_SECONDS": "0"}):
+            db_insights.fetch_activity(min_seconds=30)
+        self.assertEqual(self.database.connections, 2)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.database.delay = 0.1
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(db_insights.fetch_bloat_estimates()))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(self.database.connections, 1)
+
+
+class DbInsightsApiTestCase(unittest.TestCase):
+    def _get(self, handler, query_string=b"", session=None):
+        request = build_request(
+            method="GET",
+            path="/admin/api/db-insights",
+            session={"is_admin": True} if session is None else session,
+            query_string=query_string,
+        )
+        response = asyncio.run(handler(request))
+        return response, json.loads(response.body.decode())
+
+    def test_requires_admin(self):
+        response, _ = self._get(admin_views.api_db_cache_hit, session={})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_validates_parameters(self):
+        response, _ = self._get(admin_views.api_db_statements, b"order=rows")
+        self.assertEqual(response.status_code, 400)
+        response, _ = self._get(admin_views.api_db_indexes, b"limit=0")
+        self.assertEqual(response.status_code, 400)
+        response, _ = self._get(admin_views.api_db_activity, b"min_seconds=nan")
+        self.assertEqual(response.status_code, 400)
+
+    def test_returns_report_with_cache_age(self):
+        report = {"database_hit_percent": 99.5, "tables": []}
+        with patch.object(
+            admin_views, "fetch_cache_hit_ratio", return_value=(report, 3.14)
+        ) as fetch:
+            response, payload = self._get(admin_views.api_db_cache_hit, b"limit=500")
+
+        self.assertEqual(response.status_code, 200)
+        fetch.assert_called_once_with(200)
+        self.assertEqual(payload["age_seconds"], 3.1)
+        self.assertEqual(payload["database_hit_percent"], 99.5)
+
+    def test_database_failure_returns_500(self):
+        with patch.object(admin_views, "fetch_activity", side_effect=RuntimeError("boom")):
+            with self.assertLogs("blueprints.admin.views", "ERROR"):
+                response, payload = self._get(admin_views.api_db_activity)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(payload["status"], "fail")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import threading
+import time
+import unittest
+
+from services.db_pool import ManagedConnectionPool, PoolClosedError, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionFactory:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+
+class ManagedConnectionPoolTestCase(unittest.TestCase):
+    def build_pool(self, minconn=1, maxconn=2, **kwargs):
+        self.factory = ConnectionFactory()
+        self.clock = FakeClock()
+        kwargs.setdefault("ping", lambda connection: None)
+        pool = ManagedConnectionPool(minconn, maxconn, self.factory, clock=self.clock, **kwargs)
+        pool.fill()
+        self.addCleanup(pool.closeall)
+        return pool
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = self.build_pool(maxconn=1)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn(timeout=0.01)
+
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        self.assertEqual(pool.stats()["waiting"], 0)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        pool = self.build_pool(maxconn=1)
+        held = pool.getconn()
+        served = []
+
+        def wait_for_connection(name):
+            connection = pool.getconn(timeout=2)
+            served.append(name)
+            pool.putconn(connection)
+
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=wait_for_connection, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # 次のスレッドより先に待ち行列へ入るのを待つ
+            # Make sure this thread is queued before starting the next one.
+            while pool.stats()["waiting"] < len(threads):
+                time.sleep(0.001)
+
+        pool.putconn(held)
+        for thread in threads:
+            thread.join(timeout=2)
+
+        self.assertEqual(served, ["first", "second", "third"])
+        self.assertEqual(len(self.factory.opened), 1)
+        self.assertEqual(pool.stats()["waits"], 3)
+
+    def test_expired_connection_is_replaced_on_checkout(self):
+        pool = self.build_pool(max_lifetime=60)
+        self.clock.now += 61
+
+        connection = pool.getconn()
+
+        self.assertEqual(connection.number, 1)
+        self.assertTrue(self.factory.opened[0].closed)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+    def test_returning_a_broken_connection_frees_its_slot(self):
+        pool = self.build_pool(maxconn=1)
+        connection = pool.getconn()
+        pool.putconn(connection, close=True)
+
+        replacement = pool.getconn(timeout=0.01)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(replacement, connection)
+
+    def test_maintain_recycles_idle_connections_above_minimum_and_refills(self):
+        pool = self.build_pool(minconn=1, maxconn=3, max_idle=60, max_lifetime=0)
+        connections = [pool.getconn(), pool.getconn(), pool.getconn()]
+        for connection in connections:
+            pool.putconn(connection)
+        self.clock.now += 61
+
+        pool.maintain()
+
+        stats = pool.stats()
+        self.assertEqual(stats["idle"], 1)
+        self.assertEqual(sum(connection.closed for connection in connections), 2)
+
+    def test_maintain_discards_connections_failing_liveness_check(self):
+        failing = set()
+
+        def ping(connection):
+            if connection.number in failing:
+                raise OSError("server closed the connection")
+
+        pool = self.build_pool(minconn=2, maxconn=2, ping=ping, liveness_interval=10, max_idle=0)
+        failing.add(0)
+        self.clock.now += 11
+
+        with self.assertLogs("services.db_pool", "WARNING"):
+            pool.maintain()
+
+        self.assertTrue(self.factory.opened[0].closed)
+        # 閉じた分は minconn まで補充される
+        # The discarded connection is replaced to keep minconn.
+        self.assertEqual(pool.stats()["idle"], 2)
+        self.assertEqual(len(self.factory.opened), 3)
+
+    def test_closeall_wakes_waiters(self):
+        pool = self.build_pool(maxconn=1)
+        pool.getconn()
+        errors = []
+
+        def wait_for_connection():
+            try:
+                pool.getconn(timeout=2)
+            except PoolClosedError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=wait_for_connection)
+        thread.start()
+        while pool.stats()["waiting"] < 1:
+            time.sleep(0.001)
+        pool.closeall()
+        thread.join(timeout=2)
+
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,36 +24,16 @@ class DummyConnection:
         self.closed = 1
 
 
-class DummyThreadedConnectionPool:
-    def __init__(self, connection, minconn, maxconn, kwargs):
-        self._connection = connection
-        self.minconn = minconn
-        self.maxconn = maxconn
-        self.kwargs = kwargs
-        self.getconn_calls = 0
-        self.putconn_calls = []
-        self.closeall_calls = 0
-
-    def getconn(self):
-        self.getconn_calls += 1
-        return self._connection
-
-    def putconn(self, connection, close=False):
-        self.putconn_calls.append((connection, close))
-
-    def closeall(self):
-        self.closeall_calls += 1
-
-
-class DummyPoolFactory:
-    def __init__(self, connection):
-        self._connection = connection
-        self.instances = []
+class DummyPsycopg2:
+    def __init__(self):
+        self.connections = []
+        self.connect_kwargs = []
 
-    def __call__(self, minconn, maxconn, **kwargs):
-        pool = DummyThreadedConnectionPool(self._connection, minconn, maxconn, kwargs)
-        self.instances.append(pool)
-        return pool
+    def connect(self, **kwargs):
+        self.connect_kwargs.append(kwargs)
+        connection = DummyConnection()
+        self.connections.append(connection)
+        return connection
 
 
 class DummyExtras:
@@ -69,8 +49,7 @@ class DBConfigTestCase(unittest.TestCase):
         db.close_db_pool()
 
     def test_get_db_connection_uses_postgres_env_with_pool(self):
-        connection = DummyConnection()
-        pool_factory = DummyPoolFactory(connection)
+        fake_psycopg2 = DummyPsycopg2()
         env = {
             "POSTGRES_HOST": "pg-host",
             "POSTGRES_USER": "pg-user",
@@ -81,30 +60,32 @@ class DBConfigTestCase(unittest.TestCase):
             "DB_POOL_MAX_CONN": "8",
         }
         with patch.dict(os.environ, env, clear=True), patch.object(
-            db, "ThreadedConnectionPool", pool_factory
-        ), patch.object(db, "psycopg2", object()), patch.object(db, "extras", DummyExtras):
+            db, "psycopg2", fake_psycopg2
+        ), patch.object(db, "extras", DummyExtras):
             proxy = db.get_db_connection()
             cursor = proxy.cursor(dictionary=True)
             proxy.close()
-
-        self.assertEqual(cursor, "cursor")
-        self.assertEqual(len(pool_factory.instances), 1)
-        pool = pool_factory.instances[0]
-        self.assertEqual(pool.kwargs["host"], "pg-host")
-        self.assertEqual(pool.kwargs["user"], "pg-user")
-        self.assertEqual(pool.kwargs["password"], "pg-pass")
-        self.assertEqual(pool.kwargs["dbname"], "pg-db")
-        self.assertEqual(pool.kwargs["port"], 5555)
+            pool = db._connection_pool
+
+        self.assertEqual(cursor._cursor, "cursor")
+        # 最小接続数まで先に開く
+        # The minimum number of connections is opened up front.
+        self.assertEqual(len(fake_psycopg2.connections), 2)
+        kwargs = fake_psycopg2.connect_kwargs[0]
+        self.assertEqual(kwargs["host"], "pg-host")
+        self.assertEqual(kwargs["user"], "pg-user")
+        self.assertEqual(kwargs["password"], "pg-pass")
+        self.assertEqual(kwargs["dbname"], "pg-db")
+        self.assertEqual(kwargs["port"], 5555)
         self.assertEqual(pool.minconn, 2)
         self.assertEqual(pool.maxconn, 8)
+        connection = fake_psycopg2.connections[1]
         self.assertEqual(connection.cursor_kwargs["cursor_factory"], DummyExtras.RealDictCursor)
         self.assertTrue(connection.rollback_called)
-        self.assertEqual(len(pool.putconn_calls), 2)
-        self.assertFalse(pool.putconn_calls[-1][1])
+        self.assertEqual(pool.stats()["idle"], 2)
 
     def test_get_db_connection_falls_back_to_mysql_env(self):
-        connection = DummyConnection()
-        pool_factory = DummyPoolFactory(connection)
+        fake_psycopg2 = DummyPsycopg2()
         env = {
             "MYSQL_HOST": "mysql-host",
             "MYSQL_USER": "mysql-user",
@@ -113,22 +94,21 @@ class DBConfigTestCase(unittest.TestCase):
             "MYSQL_PORT": "15432",
         }
         with patch.dict(os.environ, env, clear=True), patch.object(
-            db, "ThreadedConnectionPool", pool_factory
-        ), patch.object(db, "psycopg2", object()), patch.object(db, "extras", DummyExtras):
+            db, "psycopg2", fake_psycopg2
+        ), patch.object(db, "extras", DummyExtras):
             proxy = db.get_db_connection()
             proxy.close()
 
-        self.assertEqual(len(pool_factory.instances), 1)
-        pool = pool_factory.instances[0]
-        self.assertEqual(pool.kwargs["host"], "mysql-host")
-        self.assertEqual(pool.kwargs["user"], "mysql-user")
-        self.assertEqual(pool.kwargs["password"], "mysql-pass")
-        self.assertEqual(pool.kwargs["dbname"], "mysql-db")
-        self.assertEqual(pool.kwargs["port"], 15432)
+        self.assertEqual(len(fake_psycopg2.connections), 1)
+        kwargs = fake_psycopg2.connect_kwargs[0]
+        self.assertEqual(kwargs["host"], "mysql-host")
+        self.assertEqual(kwargs["user"], "mysql-user")
+        self.assertEqual(kwargs["password"], "mysql-pass")
+        self.assertEqual(kwargs["dbname"], "mysql-db")
+        self.assertEqual(kwargs["port"], 15432)
 
-    def test_get_db_connection_reuses_existing_pool(self):
-        connection = DummyConnection()
-        pool_factory = DummyPoolFactory(connection)
+    def test_get_db_connection_reuses_existing_pool_without_rereading_env(self):
+        fake_psycopg2 = DummyPsycopg2()
         env = {
             "POSTGRES_HOST": "pg-host",
             "POSTGRES_USER": "pg-user",
@@ -137,17 +117,18 @@ class DBConfigTestCase(unittest.TestCase):
             "POSTGRES_PORT": "5432",
         }
         with patch.dict(os.environ, env, clear=True), patch.object(
-            db, "ThreadedConnectionPool", pool_factory
-        ), patch.object(db, "psycopg2", object()), patch.object(db, "extras", DummyExtras):
+            db, "psycopg2", fake_psycopg2
+        ), patch.object(db, "extras", DummyExtras):
             conn1 = db.get_db_connection()
             conn1.close()
-            conn2 = db.get_db_connection()
-            conn2.close()
-
-        self.assertEqual(len(pool_factory.instances), 1)
-        pool = pool_factory.instances[0]
-        self.assertEqual(pool.getconn_calls, 3)
-        self.assertEqual(len(pool.putconn_calls), 3)
+            pool = db._connection_pool
+            with patch.object(db, "_get_db_config", side_effect=AssertionError("re-read")):
+                conn2 = db.get_db_connection()
+                conn2.close()
+
+        self.assertIs(db._connection_pool, pool)
+        self.assertEqual(len(fake_psycopg2.connections), 1)
+        self.assertEqual(pool.stats()["checkouts"], 2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+import services.db as db
+from services.async_utils import run_blocking
+
+
+class LagCursor:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def execute(self, query, params=None):
+        self._connection.executed.append(query)
+
+    def fetchone(self):
+        return (self._connection.lag,)
+
+    def close(self):
+        pass
+
+
+class DummyConnection:
+    def __init__(self, name, lag=0.0):
+        self.name = name
+        self.lag = lag
+        self.executed = []
+        self.commits = 0
+        self.closed = 0
+
+    def cursor(self, *args, **kwargs):
+        return LagCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class DummyPool:
+    def __init__(self, connection):
+        self.connection = connection
+        self.getconn_calls = 0
+        self.putconn_calls = 0
+
+    def getconn(self, timeout=None):
+        self.getconn_calls += 1
+        return self.connection
+
+    def putconn(self, connection, close=False):
+        self.putconn_calls += 1
+
+    def closeall(self):
+        pass
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        db.close_db_pool()
+        self.addCleanup(db.close_db_pool)
+        self.primary = DummyPool(DummyConnection("primary"))
+        self.replica = DummyPool(DummyConnection("replica"))
+        env = patch.dict(
+            os.environ,
+            {"POSTGRES_REPLICA_HOST": "db-replica", "DB_REPLICA_MAX_LAG_SECONDS": "5"},
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        for patcher in (
+            patch.object(db, "psycopg2", object()),
+            patch.object(db, "_get_connection_pool", return_value=self.primary),
+            patch.object(db, "_get_replica_pool", return_value=self.replica),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _read_target(self):
+        proxy = db.get_db_connection(read_only=True)
+        try:
+            return proxy.name, proxy.replica
+        finally:
+            proxy.close()
+
+    def test_read_only_uses_replica_and_writes_use_primary(self):
+        self.assertEqual(self._read_target(), ("replica", True))
+        self.assertEqual(self.replica.putconn_calls, 1)
+        write_connection = db.get_db_connection()
+        self.assertEqual(write_connection.name, "primary")
+        write_connection.close()
+
+    def test_without_replica_reads_use_primary(self):
+        with patch.dict(os.environ, {"POSTGRES_REPLICA_HOST": ""}):
+            db.close_db_pool()
+            self.assertEqual(self._read_target(), ("primary", False))
+        self.assertEqual(self.replica.getconn_calls, 0)
+
+    def test_lagging_replica_falls_back_and_lag_is_cached(self):
+        self.replica.connection.lag = 12.5
+
+        self.assertEqual(self._read_target(), ("primary", False))
+        self.assertEqual(self._read_target(), ("primary", False))
+        # 計測は間隔内に1回だけ
+        # Lag is measured once per interval.
+        self.assertEqual(len(self.replica.connection.executed), 1)
+        self.assertEqual(self.replica.putconn_calls, 2)
+
+    def test_unreachable_replica_is_skipped_until_retry(self):
+        with patch.object(db, "_get_replica_pool", side_effect=OSError("down")) as get_pool:
+            with self.assertLogs("services.db", "WARNING"):
+                self.assertEqual(self._read_target(), ("primary", False))
+            self.assertEqual(self._read_target(), ("primary", False))
+
+        self.assertEqual(get_pool.call_count, 1)
+
+    def test_commit_in_request_keeps_following_reads_on_primary(self):
+        token = db._write_state_var.set({"recent": False, "wrote": False})
+        self.addCleanup(db._write_state_var.reset, token)
+        self.assertEqual(self._read_target(), ("replica", True))
+
+        connection = db.get_db_connection()
+        connection.commit()
+        connection.close()
+
+        self.assertTrue(db.has_recent_write())
+        self.assertEqual(self._read_target(), ("primary", False))
+
+
+class _SessionInjector:
+    def __init__(self, app, session):
+        self.app = app
+        self.session = session
+
+    async def __call__(self, scope, receive, send):
+        scope["session"] = self.session
+        await self.app(scope, receive, send)
+
+
+class ReadYourWritesMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = {"user_id": 1}
+        self.seen = []
+        app = FastAPI()
+
+        def save():
+            connection = db._ConnectionProxy(DummyConnection("primary"), DummyPool(None))
+            connection.commit()
+            connection.close()
+
+        @app.post("/write")
+        async def write():
+            await run_blocking(save)
+            return {"status": "ok"}
+
+        @app.get("/read")
+        async def read():
+            self.seen.append(db.has_recent_write())
+            return {"status": "ok"}
+
+        app.add_middleware(db.ReadYourWritesMiddleware)
+        app.add_middleware(_SessionInjector, session=self.session)
+        self.app = app
+
+    def _request(self, method, path):
+        async def scenario():
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=self.app), base_url="http://testserver"
+            ) as client:
+                return await client.request(method, path)
+
+        return asyncio.run(scenario())
+
+    def test_write_stamps_session_and_reads_stick_within_window(self):
+        self._request("GET", "/read")
+        self.assertNotIn(db.LAST_WRITE_SESSION_KEY, self.session)
+
+        self._request("POST", "/write")
+        self.assertIn(db.LAST_WRITE_SESSION_KEY, self.session)
+
+        self._request("GET", "/read")
+        self.session[db.LAST_WRITE_SESSION_KEY] -= db.DEFAULT_READ_YOUR_WRITES_SECONDS + 1
+        self._request("GET", "/read")
+
+        self.assertEqual(self.seen, [False, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,16 +3,17 @@ from unittest.mock import patch
 
 from services.default_shared_prompts import (
     DEFAULT_SHARED_PROMPTS,
+    SAMPLE_PROMPT_OWNER_EMAIL,
+    default_shared_prompts_fingerprint,
     ensure_default_shared_prompts,
 )
 from tests.helpers.db_helpers import TransactionTrackingConnection
 
 
 class FakeCursor:
-    def __init__(self, *, owner_id=None, existing_prompt_titles=None):
-        self.owner_id = owner_id
-        self.existing_prompt_titles = set(existing_prompt_titles or [])
-        self.inserted_prompts = []
+    def __init__(self, *, stored_fingerprint=None, applied_count=0):
+        self.stored_fingerprint = stored_fingerprint
+        self.applied_count = applied_count
         self.executed_queries = []
         self._fetchone_result = None
         self.closed = False
@@ -20,29 +21,19 @@ class FakeCursor:
     def execute(self, query, params=None):
         normalized = " ".join(query.split())
         self.executed_queries.append((normalized, params))
+        self._fetchone_result = None
 
-        if "SELECT id FROM users WHERE email = %s" in normalized:
-            self._fetchone_result = (self.owner_id,) if self.owner_id is not None else None
-            return
-
-        if "INSERT INTO users" in normalized and "RETURNING id" in normalized:
-            self.owner_id = 999
-            self._fetchone_result = (self.owner_id,)
-            return
-
-        if "SELECT 1 FROM prompts" in normalized and "title = %s" in normalized:
-            title = params[1]
-            self._fetchone_result = (1,) if title in self.existing_prompt_titles else None
+        if normalized.startswith("SELECT fingerprint FROM app_seed_state"):
+            if self.stored_fingerprint is not None:
+                self._fetchone_result = (self.stored_fingerprint,)
             return
 
-        if "INSERT INTO prompts" in normalized:
-            title = params[1]
-            self.inserted_prompts.append(title)
-            self.existing_prompt_titles.add(title)
-            self._fetchone_result = None
+        if "INSERT INTO app_seed_state" in normalized:
+            self.stored_fingerprint = params[1]
             return
 
-        self._fetchone_result = None
+        if normalized.startswith("WITH owner AS"):
+            self._fetchone_result = (self.applied_count,)
 
     def fetchone(self):
         result = self._fetchone_result
@@ -54,35 +45,40 @@ class FakeCursor:
 
 
 class DefaultSharedPromptsTestCase(unittest.TestCase):
-    def test_inserts_samples_when_they_are_missing(self):
-        fake_cursor = FakeCursor()
+    def test_applies_samples_in_one_statement_when_fingerprint_is_missing(self):
+        fake_cursor = FakeCursor(applied_count=len(DEFAULT_SHARED_PROMPTS))
         fake_conn = TransactionTrackingConnection(fake_cursor)
 
         with patch("services.default_shared_prompts.get_db_connection", return_value=fake_conn):
-            inserted = ensure_default_shared_prompts()
+            applied = ensure_default_shared_prompts()
 
-        self.assertEqual(inserted, len(DEFAULT_SHARED_PROMPTS))
+        self.assertEqual(applied, len(DEFAULT_SHARED_PROMPTS))
         self.assertTrue(fake_conn.committed)
         self.assertFalse(fake_conn.rolled_back)
         self.assertTrue(fake_conn.closed)
         self.assertTrue(fake_cursor.closed)
-        self.assertEqual(len(fake_cursor.inserted_prompts), len(DEFAULT_SHARED_PROMPTS))
-        self.assertIsNotNone(fake_cursor.owner_id)
-
-    def test_skips_when_all_samples_already_exist(self):
-        existing_titles = {prompt["title"] for prompt in DEFAULT_SHARED_PROMPTS}
-        fake_cursor = FakeCursor(owner_id=999, existing_prompt_titles=existing_titles)
+        upserts = [
+            params for query, params in fake_cursor.executed_queries
+            if query.startswith("WITH owner AS")
+        ]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(upserts[0]["owner_email"], SAMPLE_PROMPT_OWNER_EMAIL)
+        self.assertEqual(len(upserts[0]["titles"]), len(DEFAULT_SHARED_PROMPTS))
+        self.assertEqual(fake_cursor.stored_fingerprint, default_shared_prompts_fingerprint())
+
+    def test_skips_when_fingerprint_matches(self):
+        fake_cursor = FakeCursor(stored_fingerprint=default_shared_prompts_fingerprint())
         fake_conn = TransactionTrackingConnection(fake_cursor)
 
         with patch("services.default_shared_prompts.get_db_connection", return_value=fake_conn):
-            inserted = ensure_default_shared_prompts()
+            applied = ensure_default_shared_prompts()
 
-        self.assertEqual(inserted, 0)
+        self.assertEqual(applied, 0)
         self.assertFalse(fake_conn.committed)
         self.assertFalse(fake_conn.rolled_back)
         self.assertTrue(fake_conn.closed)
         self.assertTrue(fake_cursor.closed)
-        self.assertEqual(fake_cursor.inserted_prompts, [])
+        self.assertEqual(len(fake_cursor.executed_queries), 1)
         self.assertFalse(
             any("INSERT INTO users" in query for query, _ in fake_cursor.executed_queries)
         )
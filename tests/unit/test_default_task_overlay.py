@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+
+from blueprints.chat.tasks import (
+    _delete_task_for_user,
+    _edit_task_for_user,
+    _fetch_tasks_from_db,
+)
+from tests.helpers.db_helpers import TransactionTrackingConnection
+
+
+class FakeCursor:
+    def __init__(self, *, owned_names=None, materialized=True):
+        self.owned_names = set(owned_names or [])
+        self.materialized = materialized
+        self.executed = []
+        self._fetchone_result = None
+        self.closed = False
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        self.executed.append((normalized, params))
+        if normalized.startswith("SELECT 1 FROM task_with_examples"):
+            self._fetchone_result = (1,) if params[0] in self.owned_names else None
+        elif "RETURNING id" in normalized:
+            self._fetchone_result = (99,) if self.materialized else None
+
+    def fetchone(self):
+        result = self._fetchone_result
+        self._fetchone_result = None
+        return result
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+class DictCursorConnection(TransactionTrackingConnection):
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+
+class DefaultTaskOverlayTestCase(unittest.TestCase):
+    def test_user_task_list_overlays_defaults_with_user_state(self):
+        fake_cursor = FakeCursor()
+        fake_conn = DictCursorConnection(fake_cursor)
+
+        _fetch_tasks_from_db(fake_conn, 7)
+
+        query, params = fake_cursor.executed[0]
+        self.assertIn("UNION ALL", query)
+        self.assertIn("LEFT JOIN user_default_task_states s", query)
+        self.assertIn("NOT COALESCE(s.is_hidden, FALSE)", query)
+        self.assertEqual(params, {"user_id": 7})
+
+    def test_delete_hides_default_for_user(self):
+        fake_cursor = FakeCursor()
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            _delete_task_for_user(7, "📄 要約")
+
+        self.assertEqual(len(fake_cursor.executed), 1)
+        query, params = fake_cursor.executed[0]
+        self.assertIn("DELETE FROM task_with_examples", query)
+        self.assertIn("SET is_hidden = TRUE", query)
+        self.assertEqual(params, {"name": "📄 要約", "user_id": 7})
+        self.assertTrue(fake_conn.committed)
+
+    def test_first_edit_of_default_materializes_user_row(self):
+        fake_cursor = FakeCursor(owned_names=[])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            updated = _edit_task_for_user(7, "📄 要約", "要約(改)", "Prompt", "in", "out")
+
+        self.assertTrue(updated)
+        query, params = fake_cursor.executed[1]
+        self.assertIn("INSERT INTO task_with_examples", query)
+        self.assertIn("INSERT INTO user_default_task_states", query)
+        self.assertEqual(params["old_task"], "📄 要約")
+        self.assertEqual(params["new_task"], "要約(改)")
+        self.assertTrue(fake_conn.committed)
+
+    def test_edit_returns_false_when_task_is_neither_owned_nor_default(self):
+        fake_cursor = FakeCursor(owned_names=[], materialized=False)
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            updated = _edit_task_for_user(7, "missing", "new", None, None, None)
+
+        self.assertFalse(updated)
+        self.assertFalse(fake_conn.committed)
+        self.assertTrue(fake_conn.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
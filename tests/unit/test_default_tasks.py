@@ -4,36 +4,44 @@ from unittest.mock import patch
 from services.default_tasks import (
     default_task_payloads,
     default_task_rows,
+    default_tasks_fingerprint,
     ensure_default_tasks_seeded,
     load_default_tasks,
 )
 from tests.helpers.db_helpers import TransactionTrackingConnection
 
 
-class FakeCursor:
-    def __init__(self, *, existing_names=None):
-        self.existing_names = set(existing_names or [])
-        self.inserted_names = []
+class FakeSeedCursor:
+    def __init__(self, *, stored_fingerprints=None, applied_count=0):
+        # 1回目・2回目の fingerprint 参照結果を順に返す
+        # Return stored fingerprints in order for the pre-lock and post-lock checks.
+        self.stored_fingerprints = list(stored_fingerprints or [None, None])
+        self.applied_count = applied_count
         self.executed_queries = []
-        self._fetchall_result = []
+        self.recorded_fingerprint = None
+        self._fetchone_result = None
         self.closed = False
 
     def execute(self, query, params=None):
         normalized = " ".join(query.split())
         self.executed_queries.append((normalized, params))
+        self._fetchone_result = None
 
-        if "SELECT name FROM task_with_examples WHERE user_id IS NULL" in normalized:
-            self._fetchall_result = [(name,) for name in sorted(self.existing_names)]
+        if normalized.startswith("SELECT fingerprint FROM app_seed_state"):
+            stored = self.stored_fingerprints.pop(0) if self.stored_fingerprints else None
+            self._fetchone_result = (stored,) if stored is not None else None
             return
 
-        if "INSERT INTO task_with_examples" in normalized:
-            name = params[0]
-            self.inserted_names.append(name)
-            self.existing_names.add(name)
+        if "INSERT INTO app_seed_state" in normalized:
+            self.recorded_fingerprint = params[1]
+            return
+
+        if normalized.startswith("WITH incoming AS"):
+            self._fetchone_result = (self.applied_count,)
 
-    def fetchall(self):
-        result = self._fetchall_result
-        self._fetchall_result = []
+    def fetchone(self):
+        result = self._fetchone_result
+        self._fetchone_result = None
         return result
 
     def close(self):
@@ -69,39 +77,77 @@ class DefaultTasksTestCase(unittest.TestCase):
         self.assertEqual(payloads[0]["name"], "Task A")
         self.assertEqual(rows[0], ("Task A", "Prompt A", "Input A", "Output A", 0))
 
-    def test_seed_inserts_missing_default_tasks(self):
-        fake_cursor = FakeCursor(existing_names=[])
+    def test_seed_applies_bulk_upsert_when_fingerprint_changed(self):
+        fake_cursor = FakeSeedCursor(stored_fingerprints=["stale", "stale"], applied_count=2)
         fake_conn = TransactionTrackingConnection(fake_cursor)
 
         with patch("services.default_tasks.get_db_connection", return_value=fake_conn), patch(
             "services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS
         ):
-            inserted = ensure_default_tasks_seeded()
-
-        self.assertEqual(inserted, len(SAMPLE_TASKS))
-        self.assertEqual(fake_cursor.inserted_names, ["Task A", "Task B"])
+            applied = ensure_default_tasks_seeded()
+            expected_fingerprint = default_tasks_fingerprint()
+
+        self.assertEqual(applied, 2)
+        queries = [query for query, _ in fake_cursor.executed_queries]
+        self.assertTrue(any("pg_advisory_xact_lock" in query for query in queries))
+        upserts = [
+            params for query, params in fake_cursor.executed_queries
+            if query.startswith("WITH incoming AS")
+        ]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(upserts[0]["names"], ["Task A", "Task B"])
+        self.assertEqual(upserts[0]["orders"], [0, 1])
+        self.assertEqual(fake_cursor.recorded_fingerprint, expected_fingerprint)
         self.assertTrue(fake_conn.committed)
         self.assertFalse(fake_conn.rolled_back)
         self.assertTrue(fake_cursor.closed)
         self.assertTrue(fake_conn.closed)
 
-    def test_seed_skips_when_default_tasks_already_exist(self):
-        existing_names = {task["name"] for task in SAMPLE_TASKS}
-        fake_cursor = FakeCursor(existing_names=existing_names)
+    def test_seed_skips_all_work_when_fingerprint_matches(self):
+        with patch("services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS):
+            current = default_tasks_fingerprint()
+        fake_cursor = FakeSeedCursor(stored_fingerprints=[current])
         fake_conn = TransactionTrackingConnection(fake_cursor)
 
         with patch("services.default_tasks.get_db_connection", return_value=fake_conn), patch(
             "services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS
         ):
-            inserted = ensure_default_tasks_seeded()
+            applied = ensure_default_tasks_seeded()
 
-        self.assertEqual(inserted, 0)
-        self.assertEqual(fake_cursor.inserted_names, [])
+        self.assertEqual(applied, 0)
+        self.assertEqual(len(fake_cursor.executed_queries), 1)
         self.assertFalse(fake_conn.committed)
         self.assertFalse(fake_conn.rolled_back)
         self.assertTrue(fake_cursor.closed)
         self.assertTrue(fake_conn.closed)
 
+    def test_seed_skips_when_another_worker_applied_it_while_waiting_for_lock(self):
+        with patch("services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS):
+            current = default_tasks_fingerprint()
+        fake_cursor = FakeSeedCursor(stored_fingerprints=["stale", current])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("services.default_tasks.get_db_connection", return_value=fake_conn), patch(
+            "services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS
+        ):
+            applied = ensure_default_tasks_seeded()
+
+        self.assertEqual(applied, 0)
+        self.assertFalse(
+            any(query.startswith("WITH incoming AS") for query, _ in fake_cursor.executed_queries)
+        )
+        self.assertFalse(fake_conn.committed)
+
+    def test_fingerprint_changes_with_task_content(self):
+        changed = [dict(SAMPLE_TASKS[0], prompt_template="Prompt A2"), SAMPLE_TASKS[1]]
+        with patch("services.default_tasks.load_default_tasks", return_value=SAMPLE_TASKS):
+            original = default_tasks_fingerprint()
+        with patch("services.default_tasks.load_default_tasks", return_value=changed):
+            updated = default_tasks_fingerprint()
+
+        self.assertNotEqual(original, updated)
+        self.assertEqual(len(original), 64)
+
     def test_repository_default_tasks_include_full_seed_set(self):
         expected_names = {
             "📧 メール作成",
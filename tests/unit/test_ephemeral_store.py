@@ -2,7 +2,8 @@ import unittest
 from datetime import datetime, timedelta
 from unittest.mock import patch
 
-from services.ephemeral_store import EphemeralChatStore
+from services.ephemeral_store import ROOM_INDEX_KEY, EphemeralChatStore
+from tests.benchmarks.fixtures import FakeRedis
 
 
 class EphemeralChatStoreMemoryTest(unittest.TestCase):
@@ -36,5 +37,23 @@ class EphemeralChatStoreMemoryTest(unittest.TestCase):
             self.assertFalse(store.room_exists("sid", "room"))
 
 
+class EphemeralChatStoreRedisTest(unittest.TestCase):
+    def test_room_count_uses_index_instead_of_scan(self):
+        redis_client = FakeRedis()
+        with patch("services.ephemeral_store.get_redis_client", return_value=redis_client):
+            store = EphemeralChatStore(expiration_seconds=60)
+        store.create_room("sid", "a", "title")
+        store.create_room("sid", "b", "title")
+        store.create_room("other", "c", "title")
+
+        self.assertTrue(store.delete_room("sid", "b"))
+        # TTL で消えたキーの索引エントリは有効期限スコアで落ちる
+        # Index entries for keys that expired via TTL drop out by their expiry score.
+        redis_client.zadd(ROOM_INDEX_KEY, {store._key("other", "c"): 0})
+
+        with patch.object(redis_client, "scan_iter", side_effect=AssertionError("SCAN")):
+            self.assertEqual(store.room_count(), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+
+from blueprints.chat.rooms import get_chat_rooms
+from blueprints.chat.tasks import get_tasks
+from blueprints.prompt_share.prompt_manage_api import get_saved_prompts
+from services.web import compute_etag, etag_matches, jsonify
+from tests.helpers.request_helpers import build_request
+
+
+def make_request(path, *, session=None, if_none_match=None):
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode("utf-8")))
+    return build_request(method="GET", path=path, session=session, headers=headers)
+
+
+class ETagHelpersTestCase(unittest.TestCase):
+    def test_etag_is_strong_and_depends_on_scope_and_validators(self):
+        etag = compute_etag("tasks", 1, (3, 900))
+
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertEqual(etag, compute_etag("tasks", 1, (3, 900)))
+        self.assertNotEqual(etag, compute_etag("tasks", 1, (3, 901)))
+        self.assertNotEqual(etag, compute_etag("tasks", 2, (3, 900)))
+        self.assertNotEqual(etag, compute_etag("chat_rooms", 1, (3, 900)))
+
+    def test_if_none_match_uses_weak_comparison_and_lists(self):
+        etag = compute_etag("tasks", 1, (3, 900))
+
+        self.assertTrue(etag_matches(make_request("/", if_none_match=etag), etag))
+        self.assertTrue(etag_matches(make_request("/", if_none_match=f"W/{etag}"), etag))
+        self.assertTrue(etag_matches(make_request("/", if_none_match=f'"other", {etag}'), etag))
+        self.assertTrue(etag_matches(make_request("/", if_none_match="*"), etag))
+        self.assertFalse(etag_matches(make_request("/", if_none_match='"other"'), etag))
+        self.assertFalse(etag_matches(make_request("/"), etag))
+
+    def test_jsonify_sets_validator_headers_only_when_etag_given(self):
+        plain = jsonify({"ok": True})
+        tagged = jsonify({"ok": True}, etag='"abc"')
+
+        self.assertNotIn("etag", plain.headers)
+        self.assertEqual(tagged.headers["etag"], '"abc"')
+        self.assertEqual(tagged.headers["cache-control"], "private, no-cache")
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+
+    def execute(self, query, params=None):
+        if self.server.fail:
+            raise RuntimeError("db down")
+        self.server.queries.append("validator" if "COUNT(*)" in query else "body")
+
+    def fetchone(self):
+        return self.server.version
+
+    def fetchall(self):
+        return list(self.server.rows)
+
+    def close(self):
+        return None
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.server)
+
+    def rollback(self):
+        return None
+
+    def close(self):
+        return None
+
+
+class FakeServer:
+    def __init__(self, version, rows=(), fail=False):
+        self.version = version
+        self.rows = list(rows)
+        self.fail = fail
+        self.queries = []
+
+
+class ConditionalGetRoutesTestCase(unittest.TestCase):
+    def _serve(self, primary, replica=None):
+        # read_only=True の読み取りだけレプリカへ回す / Only read_only reads go to the replica.
+        def connect(read_only=False):
+            return FakeConnection(replica if read_only and replica is not None else primary)
+
+        return patch("services.db.get_db_connection", side_effect=connect)
+
+    def test_tasks_returns_304_without_loading_body(self):
+        etag = compute_etag("tasks", 5, (4, 1234, 1, 77))
+        request = make_request("/api/tasks", session={"user_id": 5}, if_none_match=etag)
+        server = FakeServer((4, 1234, 1, 77))
+
+        with self._serve(server):
+            response = asyncio.run(get_tasks(request))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(response.headers["etag"], etag)
+        self.assertEqual(server.queries, ["validator"])
+
+    def test_tasks_returns_body_with_etag_when_validators_changed(self):
+        request = make_request(
+            "/api/tasks", session={"user_id": 5}, if_none_match='"stale"'
+        )
+        tasks = [{"name": "A", "prompt_template": "p", "is_default": False}]
+        server = FakeServer((4, 1234, 1, 77), tasks)
+
+        with self._serve(server):
+            response = asyncio.run(get_tasks(request))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], compute_etag("tasks", 5, (4, 1234, 1, 77)))
+        self.assertEqual(json.loads(response.body)["tasks"], tasks)
+        self.assertEqual(server.queries, ["validator", "body"])
+
+    def test_lagging_replica_pairs_its_own_etag_with_its_body(self):
+        old_tasks = [{"name": "A", "prompt_template": "old", "is_default": False}]
+        new_tasks = [{"name": "A", "prompt_template": "new", "is_default": False}]
+        primary = FakeServer((1, 900, 1, 50), new_tasks)
+        replica = FakeServer((1, 800, 1, 50), old_tasks)
+        request = make_request("/api/tasks", session={"user_id": 5})
+
+        with self._serve(primary, replica):
+            response = asyncio.run(get_tasks(request))
+
+        # 古い本文には古い ETag が付き、レプリカが追いつけば次回は 200 になる
+        # The old body carries the old ETag, so the next request gets a 200 once the replica catches up.
+        self.assertEqual(json.loads(response.body)["tasks"], old_tasks)
+        self.assertEqual(response.headers["etag"], compute_etag("tasks", 5, (1, 800, 1, 50)))
+        self.assertEqual(primary.queries, [])
+
+        request = make_request(
+            "/api/tasks", session={"user_id": 5}, if_none_match=response.headers["etag"]
+        )
+        replica.version, replica.rows = primary.version, primary.rows
+        with self._serve(primary, replica):
+            response = asyncio.run(get_tasks(request))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.body)["tasks"], new_tasks)
+
+    def test_guest_tasks_fallback_to_bundled_defaults_has_no_etag(self):
+        request = make_request("/api/tasks")
+
+        with self._serve(FakeServer((0, 0), fail=True)):
+            response = asyncio.run(get_tasks(request))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("etag", response.headers)
+
+    def test_chat_rooms_returns_304_without_loading_rooms(self):
+        etag = compute_etag("chat_rooms", 5, 50, None, (2, 555))
+        request = make_request(
+            "/api/get_chat_rooms", session={"user_id": 5}, if_none_match=etag
+        )
+        replica = FakeServer((2, 555))
+
+        with patch("blueprints.chat.rooms.cleanup_ephemeral_chats"), self._serve(
+            FakeServer((3, 999)), replica
+        ):
+            response = asyncio.run(get_chat_rooms(request))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(replica.queries, ["validator"])
+
+    def test_manage_list_returns_304_without_loading_list(self):
+        etag = compute_etag("saved_prompts", 5, (0, 0))
+        request = make_request(
+            "/prompt_manage/api/saved_prompts", session={"user_id": 5}, if_none_match=etag
+        )
+
+        with patch(
+            "blueprints.prompt_share.prompt_manage_api._fetch_manage_list_version",
+            return_value=(0, 0),
+        ), patch(
+            "blueprints.prompt_share.prompt_manage_api._fetch_saved_prompts"
+        ) as fetch_saved:
+            response = asyncio.run(get_saved_prompts(request))
+
+        self.assertEqual(response.status_code, 304)
+        fetch_saved.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
+import os
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from services.health import get_liveness_status, get_readiness_status
+from services import health
+from services.db_pool import PoolTimeoutError
+from services.health import get_liveness_status, get_readiness_status, run_health_checks
 
 
 class DummyCursor:
@@ -30,39 +35,119 @@ class DummyConnection:
         return False
 
 
+class DummyRedis:
+    def ping(self):
+        return True
+
+
 class HealthServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        health.reset_health_results()
+        self.addCleanup(health.reset_health_results)
+
     def test_liveness_status_is_ok(self):
         self.assertEqual(get_liveness_status(), {"status": "ok"})
 
+    def test_readiness_is_starting_before_first_check(self):
+        payload, status_code = get_readiness_status()
+
+        self.assertEqual(status_code, 503)
+        self.assertEqual(payload["status"], "starting")
+
     def test_readiness_is_ok_when_dependencies_are_available(self):
         with patch("services.health.get_db_connection", return_value=DummyConnection()):
             with patch("services.health.is_redis_configured", return_value=True):
-                with patch("services.health.get_redis_client", return_value=object()):
-                    payload, status_code = get_readiness_status()
+                with patch("services.health.get_redis_client", return_value=DummyRedis()):
+                    run_health_checks()
+
+        # キャッシュを返すだけなので、依存先を外しても同じ結果になる
+        # Readiness only reads the cache, so it answers without touching dependencies.
+        with patch("services.health.get_db_connection", side_effect=AssertionError("live probe")):
+            payload, status_code = get_readiness_status()
 
         self.assertEqual(status_code, 200)
         self.assertEqual(payload["status"], "ok")
+        self.assertEqual(payload["reasons"], [])
         self.assertEqual(payload["components"]["database"]["status"], "ok")
+        self.assertIn("latency_ms", payload["components"]["database"])
         self.assertEqual(payload["components"]["redis"]["status"], "ok")
 
     def test_readiness_is_degraded_when_optional_redis_is_unavailable(self):
         with patch("services.health.get_db_connection", return_value=DummyConnection()):
             with patch("services.health.is_redis_configured", return_value=True):
                 with patch("services.health.get_redis_client", return_value=None):
-                    payload, status_code = get_readiness_status()
+                    run_health_checks()
+        payload, status_code = get_readiness_status()
 
         self.assertEqual(status_code, 200)
         self.assertEqual(payload["status"], "degraded")
         self.assertEqual(payload["components"]["redis"]["status"], "degraded")
+        self.assertEqual(payload["reasons"], ["redis: degraded (unavailable)"])
 
     def test_readiness_is_error_when_database_is_unavailable(self):
         with patch("services.health.get_db_connection", side_effect=RuntimeError("db down")):
             with patch("services.health.is_redis_configured", return_value=False):
-                payload, status_code = get_readiness_status()
+                run_health_checks()
+        payload, status_code = get_readiness_status()
 
         self.assertEqual(status_code, 503)
         self.assertEqual(payload["status"], "error")
         self.assertEqual(payload["components"]["database"]["status"], "error")
+        self.assertEqual(payload["reasons"], ["database: error (RuntimeError)"])
+
+    def test_saturated_pool_only_degrades_with_short_checkout(self):
+        with patch(
+            "services.health.get_db_connection", side_effect=PoolTimeoutError("busy")
+        ) as get_connection, patch.dict(
+            os.environ, {"HEALTH_DB_CHECKOUT_TIMEOUT_SECONDS": "0.25"}
+        ), patch("services.health.is_redis_configured", return_value=False):
+            run_health_checks()
+        payload, status_code = get_readiness_status()
+
+        get_connection.assert_called_once_with(checkout_timeout=0.25)
+        self.assertEqual(status_code, 200)
+        self.assertEqual(payload["status"], "degraded")
+        self.assertEqual(
+            payload["reasons"],
+            ["database: degraded (pool saturated (no connection within 0.25 s))"],
+        )
+
+    def test_stale_database_result_fails_readiness(self):
+        with patch("services.health.get_db_connection", return_value=DummyConnection()):
+            with patch("services.health.is_redis_configured", return_value=False):
+                run_health_checks()
+
+        with patch.dict(os.environ, {"HEALTH_STALE_AFTER_SECONDS": "10"}), patch(
+            "services.health.time.monotonic", return_value=time.monotonic() + 11
+        ):
+            payload, status_code = get_readiness_status()
+
+        self.assertEqual(status_code, 503)
+        self.assertTrue(payload["components"]["database"]["stale"])
+        self.assertTrue(payload["reasons"][0].startswith("database: stale"))
+
+    def test_failing_llm_provider_only_degrades(self):
+        client = MagicMock()
+        client.with_options.return_value.models.list.side_effect = TimeoutError()
+        with patch("services.health.get_db_connection", return_value=DummyConnection()), patch(
+            "services.health.is_redis_configured", return_value=False
+        ), patch.object(health.llm, "groq_client", client), patch.object(
+            health.llm, "gemini_client", None
+        ):
+            run_health_checks(include_llm=True)
+        payload, status_code = get_readiness_status()
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(payload["status"], "degraded")
+        self.assertEqual(payload["components"]["llm.groq"]["status"], "error")
+        self.assertNotIn("llm.gemini", payload["components"])
+
+    def test_prober_runs_until_stopped(self):
+        stop_event = threading.Event()
+        with patch("services.health.run_health_checks", side_effect=lambda **_: stop_event.set()) as checks:
+            health.run_health_prober(stop_event)
+
+        checks.assert_called_once_with(include_llm=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import json
+import unittest
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import RealDictRow
+
+from blueprints.chat.messages import _sse_event
+from services.request_models import MoveTaskRequest
+from services.web import dumps_json, jsonify
+
+
+def make_row(**values):
+    row = RealDictRow()
+    row.update(values)
+    return row
+
+
+class FastJsonEncodingTestCase(unittest.TestCase):
+    def test_output_matches_jsonable_encoder_for_db_rows(self):
+        rows = [
+            make_row(
+                id=1,
+                title="タイトル",
+                created_at=datetime(2024, 1, 2, 3, 4, 5, 123456),
+                updated_at=datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+                day=date(2024, 1, 2),
+                price=Decimal("12.50"),
+                count=Decimal("3"),
+                token=uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            )
+        ]
+
+        self.assertEqual(json.loads(dumps_json({"rows": rows})), jsonable_encoder({"rows": rows}))
+
+    def test_falls_back_to_jsonable_encoder_for_models_and_sets(self):
+        payload = {"model": MoveTaskRequest(task="A"), "tags": {"x"}, 7: "int-key"}
+
+        self.assertEqual(
+            json.loads(dumps_json(payload)),
+            {"model": {"task": "A", "before_task": None}, "tags": ["x"], "7": "int-key"},
+        )
+
+    def test_jsonify_renders_utf8_bytes_without_escaping(self):
+        response = jsonify({"message": "こんにちは"})
+
+        self.assertEqual(response.body, '{"message":"こんにちは"}'.encode("utf-8"))
+        self.assertEqual(response.headers["content-type"], "application/json")
+
+    def test_sse_event_uses_fast_encoder(self):
+        self.assertEqual(
+            _sse_event("chunk", {"text": "こん"}),
+            'event: chunk\ndata: {"text":"こん"}\n\n'.encode("utf-8"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
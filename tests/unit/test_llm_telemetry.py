@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from blueprints.admin import views as admin_views
+from services import llm, llm_telemetry
+from tests.helpers.db_helpers import TransactionTrackingConnection
+from tests.helpers.request_helpers import build_request
+
+
+def _chunk(text, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.executed = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+
+    def close(self):
+        self.closed = True
+
+
+class LlmCallTelemetryTestCase(unittest.TestCase):
+    def stream(self, chunks, **kwargs):
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value = iter(chunks)
+        with patch.object(llm, "groq_client", mock_client):
+            with patch("services.llm.record_llm_call") as mock_record:
+                output = list(
+                    llm.get_llm_response_stream(
+                        [{"role": "user", "content": "こんにちは"}],
+                        llm.GROQ_MODEL,
+                        **kwargs,
+                    )
+                )
+        return output, mock_record, mock_client
+
+    def test_stream_records_provider_usage_and_timings(self):
+        usage = SimpleNamespace(prompt_tokens=12, completion_tokens=7)
+        output, mock_record, mock_client = self.stream(
+            [_chunk("こん"), _chunk("にちは"), _chunk(None, usage=usage)],
+            chat_room_id="room-1",
+            user_id=5,
+        )
+
+        self.assertEqual(output, ["こん", "にちは"])
+        create_kwargs = mock_client.chat.completions.create.call_args.kwargs
+        self.assertEqual(create_kwargs["stream_options"], {"include_usage": True})
+        record = mock_record.call_args.args[0]
+        self.assertEqual(record["outcome"], "ok")
+        self.assertEqual(record["provider"], "groq")
+        self.assertTrue(record["streamed"])
+        self.assertEqual((record["prompt_tokens"], record["completion_tokens"]), (12, 7))
+        self.assertFalse(record["tokens_estimated"])
+        self.assertEqual(record["chunk_count"], 2)
+        self.assertIsNotNone(record["ttft_ms"])
+        self.assertEqual((record["chat_room_id"], record["user_id"]), ("room-1", 5))
+
+    def test_stream_estimates_tokens_without_usage(self):
+        _, mock_record, _ = self.stream([_chunk("hello world"), _chunk("です")])
+
+        record = mock_record.call_args.args[0]
+        self.assertTrue(record["tokens_estimated"])
+        self.assertEqual(record["completion_tokens"], llm.estimate_tokens("hello world") + 2)
+        self.assertEqual(record["prompt_tokens"], 5)
+
+    def test_abandoned_stream_is_recorded_as_cancelled(self):
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.return_value = iter([_chunk("a"), _chunk("b")])
+        with patch.object(llm, "groq_client", mock_client):
+            with patch("services.llm.record_llm_call") as mock_record:
+                stream = llm.get_groq_response_stream([], llm.GROQ_MODEL)
+                next(stream)
+                stream.close()
+
+        self.assertEqual(mock_record.call_args.args[0]["outcome"], "cancelled")
+
+    def test_provider_failure_is_recorded_as_error(self):
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = RuntimeError("down")
+        with patch.object(llm, "gemini_client", mock_client):
+            with patch("services.llm.record_llm_call") as mock_record:
+                with self.assertRaises(llm.LlmProviderError):
+                    llm.get_llm_response([], "gemini-2.5-flash")
+
+        record = mock_record.call_args.args[0]
+        self.assertEqual(record["outcome"], "error")
+        self.assertFalse(record["streamed"])
+        self.assertIsNone(record["ttft_ms"])
+
+
+class TelemetryWriterTestCase(unittest.TestCase):
+    def test_batch_is_inserted_in_one_statement(self):
+        cursor = RecordingCursor()
+        conn = TransactionTrackingConnection(cursor)
+        records = [
+            {"model": "m1", "provider": "groq", "outcome": "ok", "duration_ms": 10},
+            {"model": "m2", "provider": "gemini", "outcome": "error", "duration_ms": 20},
+        ]
+
+        with patch("services.llm_telemetry.get_db_connection", return_value=conn):
+            written = llm_telemetry.write_telemetry_batch(records)
+
+        self.assertEqual(written, 2)
+        self.assertEqual(len(cursor.executed), 1)
+        query, params = cursor.executed[0]
+        self.assertIn("SELECT * FROM unnest(", query)
+        self.assertEqual(params["model"], ["m1", "m2"])
+        self.assertEqual(params["user_id"], [None, None])
+        self.assertTrue(conn.committed)
+
+    def test_writer_flushes_queued_records_and_drains_on_stop(self):
+        stop_event = threading.Event()
+        batches = []
+
+        def write(batch):
+            batches.append([record["model"] for record in batch])
+            stop_event.set()
+            return len(batch)
+
+        with patch.object(llm_telemetry, "_queue", llm_telemetry.queue.Queue()):
+            llm_telemetry.record_llm_call({"model": "m1"})
+            llm_telemetry.record_llm_call({"model": "m2"})
+            with patch("services.llm_telemetry.write_telemetry_batch", side_effect=write):
+                llm_telemetry.run_llm_telemetry_writer(
+                    stop_event, batch_size=1, flush_seconds=0.01
+                )
+
+        self.assertEqual(batches, [["m1"], ["m2"]])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        with patch.object(llm_telemetry, "_queue", llm_telemetry.queue.Queue(maxsize=1)):
+            llm_telemetry.record_llm_call({"model": "m1"})
+            llm_telemetry.record_llm_call({"model": "m2"})
+            self.assertEqual(llm_telemetry._queue.qsize(), 1)
+
+
+class AdminLlmTelemetryApiTestCase(unittest.TestCase):
+    def test_latency_requires_admin(self):
+        request = build_request(method="GET", path="/admin/api/llm-latency", session={})
+        response = asyncio.run(admin_views.api_llm_latency(request))
+        self.assertEqual(response.status_code, 401)
+
+    def test_latency_rejects_invalid_days(self):
+        request = build_request(
+            method="GET",
+            path="/admin/api/llm-latency",
+            session={"is_admin": True},
+            query_string=b"days=abc",
+        )
+        response = asyncio.run(admin_views.api_llm_latency(request))
+        self.assertEqual(response.status_code, 400)
+
+    def test_daily_usage_returns_rollups(self):
+        rollups = [{"day": "2026-03-01", "model": "m1", "calls": 3}]
+        request = build_request(
+            method="GET",
+            path="/admin/api/llm-usage-daily",
+            session={"is_admin": True},
+            query_string=b"days=14",
+        )
+        with patch.object(admin_views, "fetch_daily_rollups", return_value=rollups) as mock_fetch:
+            response = asyncio.run(admin_views.api_llm_usage_daily(request))
+
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.body.decode())
+        self.assertEqual(payload["rollups"], rollups)
+        mock_fetch.assert_called_once_with(14)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from services import metrics
+from tests.load.run_load_test import LoadStats, parse_worker_peaks, percentile
+from tests.load.stub_llm_server import StubConfig, create_stub_app
+
+
+def _post(app, body):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+            return await client.post("/chat/completions", json=body)
+
+    return asyncio.run(run())
+
+
+class StubLlmServerTestCase(unittest.TestCase):
+    def test_stream_emits_tokens_usage_and_done(self):
+        app = create_stub_app(
+            StubConfig(ttft_ms=0, ttft_jitter_ms=0, tokens_per_second=0, completion_tokens=5, seed=1)
+        )
+        response = _post(
+            app,
+            {
+                "model": "gemini-2.5-flash",
+                "messages": [{"role": "user", "content": "hello"}],
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        frames = [line[len("data: "):] for line in response.text.splitlines() if line]
+        self.assertEqual(frames[-1], "[DONE]")
+        chunks = [json.loads(frame) for frame in frames[:-1]]
+        contents = [
+            chunk["choices"][0]["delta"].get("content")
+            for chunk in chunks
+            if chunk.get("choices")
+        ]
+        self.assertEqual(len([text for text in contents if text]), 5)
+        self.assertEqual(chunks[-1]["usage"]["completion_tokens"], 5)
+
+    def test_error_rate_injects_provider_errors(self):
+        app = create_stub_app(StubConfig(ttft_ms=0, error_rate=1.0, error_status=429))
+        response = _post(app, {"model": "m", "messages": [], "stream": True})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("error", response.json())
+
+
+class LoadReportTestCase(unittest.TestCase):
+    def test_percentile_uses_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 50.0)
+        self.assertEqual(percentile(values, 0.99), 99.0)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summary_tracks_client_stream_concurrency(self):
+        stats = LoadStats()
+        stats.stream_started()
+        stats.stream_started()
+        stats.stream_finished()
+        stats.stream_started()
+        stats.record("chat", 0.2, True)
+        stats.record("chat", 0.4, False)
+
+        summary = stats.summary(2.0, {"101": 3})
+
+        self.assertEqual(summary["max_concurrent_streams_client"], 2)
+        self.assertEqual(summary["scenarios"]["chat"]["errors"], 1)
+        self.assertEqual(summary["scenarios"]["chat"]["rps"], 1.0)
+        self.assertEqual(summary["max_concurrent_streams_per_worker"], {"101": 3})
+
+    def test_worker_peaks_are_parsed_from_in_flight_gauge(self):
+        gauge = metrics.in_flight_gauge("test_harness_streams_in_flight", "Streams in flight.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        text = metrics.render_metrics().decode("utf-8")
+        text = text.replace("test_harness_streams_in_flight", "chatcore_llm_streams_in_flight")
+
+        peaks = parse_worker_peaks(text)
+
+        self.assertIn(2, peaks.values())
+
+
+if __name__ == "__main__":
+    unittest.main()
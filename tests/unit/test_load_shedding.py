@@ -0,0 +1,151 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+from starlette.responses import StreamingResponse
+
+from services import load_shedding
+from services.load_shedding import LoadSheddingMiddleware
+
+
+class _SessionInjector:
+    def __init__(self, app, session):
+        self.app = app
+        self.session = session
+
+    async def __call__(self, scope, receive, send):
+        scope["session"] = self.session
+        await self.app(scope, receive, send)
+
+
+class LoadSheddingMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = {}
+        self.lag = 0.0
+        self.pool_wait = 0.0
+        self.llm_calls = 0
+        patches = [
+            patch.object(load_shedding, "get_recent_loop_lag", side_effect=lambda: self.lag),
+            patch.object(
+                load_shedding,
+                "get_db_pool_stats",
+                side_effect=lambda: {"primary": {"oldest_wait_seconds": self.pool_wait}},
+            ),
+            patch.object(load_shedding, "get_llm_calls_in_flight", side_effect=lambda: self.llm_calls),
+            patch.dict(
+                os.environ,
+                {
+                    "LOAD_SHED_SAMPLE_INTERVAL_MS": "0",
+                    "LOAD_SHED_LOOP_LAG_MS": "100",
+                    "LOAD_SHED_DB_POOL_WAIT_MS": "500",
+                    "LOAD_SHED_MAX_LLM_IN_FLIGHT": "4",
+                    "LOAD_SHED_MAX_IN_FLIGHT": "2",
+                    "LOAD_SHED_RETRY_AFTER_SECONDS": "3",
+                },
+            ),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+        self.stream_started = None
+        self.stream_release = None
+        app = FastAPI()
+
+        @app.get("/healthz")
+        async def healthz():
+            return {"status": "ok"}
+
+        @app.post("/api/chat")
+        async def chat():
+            return {"response": "hi"}
+
+        @app.get("/prompt_share")
+        async def prompt_share():
+            return {"prompts": []}
+
+        @app.get("/stream")
+        async def stream():
+            async def body():
+                yield b"first"
+                self.stream_started.set()
+                await self.stream_release.wait()
+                yield b"second"
+
+            return StreamingResponse(body())
+
+        app.add_middleware(LoadSheddingMiddleware)
+        app.add_middleware(_SessionInjector, session=self.session)
+        self.app = app
+
+    def _request(self, method, path):
+        async def scenario():
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=self.app), base_url="http://testserver"
+            ) as client:
+                return await client.request(method, path)
+
+        return asyncio.run(scenario())
+
+    def test_admits_everything_when_healthy(self):
+        self.assertEqual(self._request("GET", "/prompt_share").status_code, 200)
+        self.assertEqual(self._request("POST", "/api/chat").status_code, 200)
+
+    def test_overload_sheds_guests_but_admits_signed_in_chat_and_health(self):
+        self.lag = 0.15
+
+        shed = self._request("POST", "/api/chat")
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(shed.headers["Retry-After"], "3")
+        self.assertEqual(self._request("GET", "/healthz").status_code, 200)
+
+        self.session["user_id"] = 1
+        self.assertEqual(self._request("POST", "/api/chat").status_code, 200)
+        self.assertEqual(self._request("GET", "/prompt_share").status_code, 503)
+
+    def test_critical_overload_sheds_signed_in_chat_too(self):
+        self.session["user_id"] = 1
+        self.pool_wait = 1.0
+
+        self.assertEqual(self._request("POST", "/api/chat").status_code, 503)
+        self.assertEqual(self._request("GET", "/healthz").status_code, 200)
+
+    def test_llm_backlog_trips_shedding(self):
+        self.llm_calls = 4
+
+        self.assertEqual(self._request("GET", "/prompt_share").status_code, 503)
+
+    def test_in_flight_limit_does_not_cut_open_streams(self):
+        async def scenario():
+            self.stream_started = asyncio.Event()
+            self.stream_release = asyncio.Event()
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=self.app), base_url="http://testserver"
+            ) as client:
+                streams = [asyncio.create_task(client.get("/stream")) for _ in range(2)]
+                while load_shedding._http_in_flight.current < 2:
+                    await asyncio.sleep(0.01)
+                shed = await client.get("/prompt_share")
+                self.stream_release.set()
+                return shed, await asyncio.gather(*streams)
+
+        shed, streams = asyncio.run(scenario())
+
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual([response.text for response in streams], ["firstsecond"] * 2)
+        self.assertEqual(load_shedding._http_in_flight.current, 0)
+
+    def test_sampling_reuses_recent_decision(self):
+        middleware = LoadSheddingMiddleware(self.app)
+        middleware.sample_interval = 60
+
+        self.assertEqual(middleware.current_state(), (load_shedding.NORMAL, ""))
+        self.lag = 1.0
+        self.assertEqual(middleware.current_state(), (load_shedding.NORMAL, ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,40 +1,54 @@
 import logging
+import queue
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
+from services import metrics
 from services.logging_config import (
     APP_LOG_HANDLER_NAME,
     CONSOLE_HANDLER_NAME,
     ERROR_LOG_HANDLER_NAME,
+    QUEUE_HANDLER_NAME,
+    AccessLogSampler,
+    BoundedQueueHandler,
     configure_logging,
+    stop_logging,
 )
 
+MANAGED_HANDLER_NAMES = {
+    CONSOLE_HANDLER_NAME,
+    APP_LOG_HANDLER_NAME,
+    ERROR_LOG_HANDLER_NAME,
+    QUEUE_HANDLER_NAME,
+}
+
+
+def _access_record(status_code):
+    record = logging.LogRecord("chatcore.request", logging.INFO, __file__, 1, "request completed", None, None)
+    record.event = "http_request"
+    record.status_code = status_code
+    return record
+
 
 class LoggingConfigTestCase(unittest.TestCase):
     def setUp(self):
         self.root_logger = logging.getLogger()
         self.original_level = self.root_logger.level
 
+        stop_logging()
         for handler in list(self.root_logger.handlers):
-            if getattr(handler, "name", "") in {
-                CONSOLE_HANDLER_NAME,
-                APP_LOG_HANDLER_NAME,
-                ERROR_LOG_HANDLER_NAME,
-            }:
+            if getattr(handler, "name", "") in MANAGED_HANDLER_NAMES:
                 self.root_logger.removeHandler(handler)
                 handler.close()
 
         self.original_handlers = list(self.root_logger.handlers)
 
     def tearDown(self):
+        stop_logging()
         for handler in list(self.root_logger.handlers):
-            if getattr(handler, "name", "") in {
-                CONSOLE_HANDLER_NAME,
-                APP_LOG_HANDLER_NAME,
-                ERROR_LOG_HANDLER_NAME,
-            }:
+            if getattr(handler, "name", "") in MANAGED_HANDLER_NAMES:
                 self.root_logger.removeHandler(handler)
                 handler.close()
 
@@ -56,17 +70,18 @@ class LoggingConfigTestCase(unittest.TestCase):
                 configure_logging()
                 configure_logging()
 
-                named_handlers = [
+                # ルートにはキューハンドラだけが付き、ファイル出力はリスナースレッドが行う
+                # Only the queue handler sits on the root; the listener thread does the file output.
+                queue_handlers = [
                     handler
                     for handler in self.root_logger.handlers
-                    if getattr(handler, "name", "")
-                    in {APP_LOG_HANDLER_NAME, ERROR_LOG_HANDLER_NAME}
+                    if getattr(handler, "name", "") in MANAGED_HANDLER_NAMES
                 ]
-                self.assertEqual(len(named_handlers), 2)
+                self.assertEqual(len(queue_handlers), 1)
+                self.assertEqual(queue_handlers[0].name, QUEUE_HANDLER_NAME)
 
                 logging.getLogger("tests.logging_config").error("file logging smoke test")
-                for handler in named_handlers:
-                    handler.flush()
+                stop_logging()
 
             app_log = Path(temp_dir) / "app.log"
             error_log = Path(temp_dir) / "error.log"
@@ -75,6 +90,60 @@ class LoggingConfigTestCase(unittest.TestCase):
             self.assertIn("file logging smoke test", app_log.read_text(encoding="utf-8"))
             self.assertIn("file logging smoke test", error_log.read_text(encoding="utf-8"))
 
+    def test_access_log_keeps_request_context_from_calling_thread(self):
+        from services import request_context
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.dict("os.environ", {"LOG_DIR": temp_dir, "LOG_LEVEL": "INFO"}, clear=False):
+                configure_logging()
+                token = request_context._request_id_var.set("req-123")
+                try:
+                    logging.getLogger("tests.logging_config").info("context check")
+                finally:
+                    request_context._request_id_var.reset(token)
+                stop_logging()
+
+            app_log = (Path(temp_dir) / "app.log").read_text(encoding="utf-8")
+            self.assertIn('"request_id": "req-123"', app_log)
+
+
+class AccessLogSamplerTestCase(unittest.TestCase):
+    def test_samples_only_successful_access_logs(self):
+        sampler = AccessLogSampler(0.1, random_func=lambda: 0.5)
+
+        self.assertFalse(sampler.filter(_access_record(200)))
+        self.assertTrue(sampler.filter(_access_record(500)))
+        other = logging.LogRecord("app", logging.INFO, __file__, 1, "other", None, None)
+        self.assertTrue(sampler.filter(other))
+
+    def test_kept_records_carry_sample_rate(self):
+        sampler = AccessLogSampler(0.25, random_func=lambda: 0.1)
+        record = _access_record(200)
+
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.sample_rate, 0.25)
+
+
+class BoundedQueueHandlerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+
+    def test_full_queue_drops_and_counts_records(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+        record = logging.LogRecord("app", logging.WARNING, __file__, 1, "value=%s", ({"a": 1},), None)
+
+        handler.handle(record)
+        handler.handle(record)
+
+        self.assertEqual(handler.queue.qsize(), 1)
+        queued = handler.queue.get_nowait()
+        self.assertEqual(queued.getMessage(), "value={'a': 1}")
+        self.assertIsNone(queued.args)
+        self.assertIn(
+            'chatcore_log_records_dropped_total{level="WARNING"} 1',
+            metrics.render_metrics().decode("utf-8"),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
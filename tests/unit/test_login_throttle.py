@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from blueprints.admin import views as admin_views
+from services import login_throttle
+from services.login_throttle import consume_admin_login_attempt, reset_admin_login_attempts
+from tests.helpers.request_helpers import build_request
+
+THROTTLE_ENV = {"ADMIN_LOGIN_MAX_ATTEMPTS": "2", "ADMIN_LOGIN_WINDOW_SECONDS": "60"}
+
+
+class LoginThrottleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patches = [
+            patch.dict(os.environ, THROTTLE_ENV),
+            patch.object(login_throttle, "get_redis_client", return_value=None),
+            patch.object(login_throttle.time, "monotonic", side_effect=lambda: self.now),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.addCleanup(login_throttle._in_memory_attempts.clear)
+
+    def test_budget_is_per_ip_and_reopens_after_the_window(self):
+        results = [consume_admin_login_attempt("203.0.113.9") for _ in range(3)]
+
+        self.assertEqual(results[:2], [(True, 0), (True, 0)])
+        self.assertEqual(results[2], (False, 60))
+        self.assertEqual(consume_admin_login_attempt("198.51.100.1"), (True, 0))
+
+        self.now += 45
+        self.assertEqual(consume_admin_login_attempt("203.0.113.9"), (False, 15))
+        self.now += 15
+        self.assertEqual(consume_admin_login_attempt("203.0.113.9"), (True, 0))
+
+    def test_reset_clears_the_ip(self):
+        for _ in range(3):
+            consume_admin_login_attempt("203.0.113.9")
+
+        reset_admin_login_attempts("203.0.113.9")
+
+        self.assertEqual(consume_admin_login_attempt("203.0.113.9"), (True, 0))
+
+    def test_redis_counts_and_reports_its_ttl(self):
+        redis_client = MagicMock()
+        redis_client.eval.return_value = [3, 42]
+
+        with patch.object(login_throttle, "get_redis_client", return_value=redis_client):
+            allowed = consume_admin_login_attempt("203.0.113.9")
+
+        self.assertEqual(allowed, (False, 42))
+        args = redis_client.eval.call_args.args
+        self.assertEqual(args[1:], (1, "admin_login:attempts:203.0.113.9", 60))
+        self.assertEqual(login_throttle._in_memory_attempts, {})
+
+    def test_redis_failure_falls_back_to_memory(self):
+        redis_client = MagicMock()
+        redis_client.eval.side_effect = ConnectionError("redis down")
+
+        with patch.object(login_throttle, "get_redis_client", return_value=redis_client):
+            with self.assertLogs("services.login_throttle", "ERROR"):
+                results = [consume_admin_login_attempt("203.0.113.9") for _ in range(3)]
+
+        self.assertEqual([allowed for allowed, _ in results], [True, True, False])
+        self.assertIn("admin_login:attempts:203.0.113.9", login_throttle._in_memory_attempts)
+
+
+class AdminLoginClientAddressTestCase(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            patch.dict(os.environ, THROTTLE_ENV),
+            patch.object(login_throttle, "get_redis_client", return_value=None),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.addCleanup(login_throttle._in_memory_attempts.clear)
+
+    def _client_seen_by_app(self, peer, forwarded_for, trusted_hosts="127.0.0.1"):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["client"] = scope["client"]
+
+        scope = {
+            "type": "http",
+            "scheme": "http",
+            "client": (peer, 50000),
+            "headers": [(b"x-forwarded-for", forwarded_for.encode())],
+        }
+        asyncio.run(ProxyHeadersMiddleware(app, trusted_hosts=trusted_hosts)(scope, None, None))
+        return seen["client"][0]
+
+    def test_forwarded_for_is_only_honoured_from_trusted_proxies(self):
+        self.assertEqual(self._client_seen_by_app("203.0.113.9", "198.51.100.1"), "203.0.113.9")
+        self.assertEqual(self._client_seen_by_app("127.0.0.1", "198.51.100.1"), "198.51.100.1")
+
+    def test_login_is_throttled_with_429_and_retry_after(self):
+        def login():
+            request = build_request(
+                method="POST",
+                path="/admin/api/login",
+                json_body={"password": "wrong"},
+                headers=[(b"x-forwarded-for", b"198.51.100.1")],
+            )
+            return asyncio.run(admin_views.api_login(request))
+
+        with patch.object(admin_views, "_verify_admin_password", return_value=False):
+            statuses = [login().status_code for _ in range(2)]
+            throttled = login()
+
+        self.assertEqual(statuses, [401, 401])
+        self.assertEqual(throttled.status_code, 429)
+        self.assertEqual(throttled.headers["Retry-After"], "60")
+        self.assertEqual(json.loads(throttled.body.decode())["status"], "fail")
+        # アプリはヘッダーではなく接続元で数える / The app counts by peer, not by the header.
+        self.assertEqual(
+            list(login_throttle._in_memory_attempts), ["admin_login:attempts:testclient"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
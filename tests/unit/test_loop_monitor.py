@@ -0,0 +1,78 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from blueprints.chat import views as chat_views
+from services import loop_monitor
+from services.loop_monitor import EventLoopBlockedError, EventLoopMonitor, run_without_blocking
+from tests.helpers.request_helpers import build_request
+
+
+def hold_the_loop(seconds):
+    time.sleep(seconds)
+
+
+async def blocking_handler():
+    hold_the_loop(0.15)
+    return "done"
+
+
+async def cooperative_handler():
+    await asyncio.sleep(0.05)
+    return "done"
+
+
+class RunWithoutBlockingTestCase(unittest.TestCase):
+    def test_cooperative_handler_passes(self):
+        self.assertEqual(run_without_blocking(cooperative_handler()), "done")
+
+    def test_blocking_handler_fails_with_stack(self):
+        with self.assertRaises(EventLoopBlockedError) as ctx:
+            run_without_blocking(blocking_handler(), threshold_ms=50)
+
+        self.assertIn("hold_the_loop", str(ctx.exception))
+        self.assertIn("blocking_handler", str(ctx.exception))
+
+    def test_chat_index_runs_cleanup_off_the_loop(self):
+        request = build_request(method="GET", path="/")
+        with patch.object(chat_views, "cleanup_ephemeral_chats", side_effect=lambda: time.sleep(0.15)):
+            response = run_without_blocking(chat_views.index(request), threshold_ms=50)
+
+        self.assertIn(response.status_code, (302, 307))
+
+
+class EventLoopMonitorTestCase(unittest.TestCase):
+    def test_monitor_logs_block_and_reports_lag_percentiles(self):
+        monitor = EventLoopMonitor(interval_seconds=0.01, threshold_seconds=0.05)
+
+        async def scenario():
+            monitor.start(asyncio.get_running_loop())
+            await asyncio.sleep(0.05)
+            hold_the_loop(0.2)
+            await asyncio.sleep(0.05)
+            monitor.stop()
+
+        with self.assertLogs("services.loop_monitor", "WARNING") as logs:
+            asyncio.run(scenario())
+
+        self.assertEqual(len(monitor.blocked), 1)
+        self.assertEqual(logs.records[0].event, "event_loop_blocked")
+        self.assertIn("hold_the_loop", logs.records[0].stack)
+        percentiles = monitor.lag_percentiles()
+        self.assertEqual(set(percentiles), {"p50", "p90", "p99", "max"})
+        self.assertGreaterEqual(percentiles["max"], 0.1)
+        self.assertLess(percentiles["p50"], 0.1)
+        self.assertLess(monitor.recent_lag(samples=1), 0.1)
+        self.assertGreaterEqual(monitor.recent_lag(samples=len(monitor._lags)), 0.1)
+
+    def test_start_respects_disable_flag(self):
+        async def scenario():
+            return loop_monitor.start_loop_monitor()
+
+        with patch.dict("os.environ", {"EVENT_LOOP_MONITOR_ENABLED": "0"}):
+            self.assertIsNone(asyncio.run(scenario()))
+
+
+if __name__ == "__main__":
+    unittest.main()
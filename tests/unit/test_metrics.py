@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+from fastapi import FastAPI
+
+from services import db, llm, metrics
+from services.db_pool import ManagedConnectionPool
+from services.request_context import RequestContextMiddleware
+from services.web import jsonify
+
+
+def scrape():
+    return metrics.render_metrics().decode("utf-8")
+
+
+def _mock_stream_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+
+    def test_counter_sums_shards_from_finished_threads(self):
+        requests_total = metrics.counter(
+            "test_shard_events_total", "Events recorded from several threads.", ("kind",)
+        )
+
+        def record():
+            for _ in range(100):
+                requests_total.inc("a")
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        requests_total.inc("a", amount=5)
+
+        output = scrape()
+        self.assertIn("# TYPE test_shard_events_total counter", output)
+        self.assertIn('test_shard_events_total{kind="a"} 405', output)
+
+    def test_histogram_renders_cumulative_buckets(self):
+        latency = metrics.histogram(
+            "test_latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)
+        )
+        latency.observe(0.05, "/x")
+        latency.observe(0.5, "/x")
+        latency.observe(3.0, "/x")
+
+        output = scrape()
+        self.assertIn('test_latency_seconds_bucket{route="/x",le="0.1"} 1', output)
+        self.assertIn('test_latency_seconds_bucket{route="/x",le="1"} 2', output)
+        self.assertIn('test_latency_seconds_bucket{route="/x",le="+Inf"} 3', output)
+        self.assertIn('test_latency_seconds_sum{route="/x"} 3.55', output)
+        self.assertIn('test_latency_seconds_count{route="/x"} 3', output)
+
+    def test_label_values_are_escaped(self):
+        metrics.counter("test_escape_total", "Escaping.", ("value",)).inc('a"b\\c')
+
+        self.assertIn('test_escape_total{value="a\\"b\\\\c"} 1', scrape())
+
+    def test_failing_gauge_callback_does_not_break_scrape(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        metrics.gauge_function("test_broken_gauge", "Broken.", (), broken)
+        with self.assertLogs("services.metrics", level="ERROR"):
+            output = scrape()
+
+        self.assertIn("# TYPE test_broken_gauge gauge", output)
+        self.assertIn("chatcore_http_requests_total", output)
+
+    def test_scrape_without_token_is_limited_to_loopback_peers(self):
+        with patch.dict("os.environ", {"METRICS_BEARER_TOKEN": ""}):
+            self.assertTrue(metrics.is_scrape_authorized(None, "127.0.0.1"))
+            self.assertTrue(metrics.is_scrape_authorized(None, "::1"))
+            self.assertFalse(metrics.is_scrape_authorized(None, "203.0.113.9"))
+            self.assertFalse(metrics.is_scrape_authorized("Bearer anything", "172.18.0.3"))
+            self.assertFalse(metrics.is_scrape_authorized(None, None))
+
+    def test_scrape_requires_bearer_token_when_configured(self):
+        with patch.dict("os.environ", {"METRICS_BEARER_TOKEN": "secret"}):
+            self.assertFalse(metrics.is_scrape_authorized(None))
+            self.assertFalse(metrics.is_scrape_authorized("Bearer wrong"))
+            self.assertTrue(metrics.is_scrape_authorized("Bearer secret"))
+
+
+class MetricsInstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+
+    def test_requests_are_labelled_by_route_template(self):
+        app = FastAPI()
+        app.add_middleware(RequestContextMiddleware)
+
+        @app.get("/api/items/{item_id}")
+        async def item(item_id: str):
+            return jsonify({"id": item_id})
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.get("/api/items/1")
+                await client.get("/api/items/2")
+                await client.get("/missing")
+
+        asyncio.run(run())
+
+        output = scrape()
+        self.assertIn(
+            'chatcore_http_requests_total{method="GET",route="/api/items/{item_id}",status="200"} 2',
+            output,
+        )
+        self.assertIn(
+            'chatcore_http_requests_total{method="GET",route="unmatched",status="404"} 1',
+            output,
+        )
+        self.assertIn(
+            'chatcore_http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}"} 2',
+            output,
+        )
+
+    def test_pool_gauge_reports_in_use_and_idle_connections(self):
+        pool = ManagedConnectionPool(3, 10, object)
+        pool.fill()
+        checked_out = [pool.getconn(), pool.getconn()]
+
+        with patch.object(db, "_connection_pool", pool):
+            output = scrape()
+
+        self.assertIn('chatcore_db_pool_connections{pool="primary",state="in_use"} 2', output)
+        self.assertIn('chatcore_db_pool_connections{pool="primary",state="idle"} 1', output)
+        self.assertIn('chatcore_db_pool_connections{pool="primary",state="max"} 10', output)
+        self.assertIn('chatcore_db_pool_utilization{pool="primary"} 0.2', output)
+        for connection in checked_out:
+            pool.putconn(connection)
+
+    def test_llm_stream_records_ttft_and_tokens_per_model(self):
+        mock_groq = MagicMock()
+        mock_groq.chat.completions.create.return_value = iter(
+            [_mock_stream_chunk("a"), _mock_stream_chunk("b"), _mock_stream_chunk("c")]
+        )
+
+        with patch.object(llm, "groq_client", mock_groq):
+            list(llm.get_groq_response_stream([{"role": "user", "content": "hi"}], "m1"))
+
+        output = scrape()
+        self.assertIn('chatcore_llm_time_to_first_token_seconds_count{model="m1"} 1', output)
+        self.assertIn('chatcore_llm_completion_tokens_total{model="m1"} 3', output)
+        self.assertIn('chatcore_llm_calls_total{model="m1",outcome="ok"} 1', output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from blueprints.admin import views as admin_views
+from services import profiling
+from services.async_utils import run_blocking
+from tests.helpers.request_helpers import build_request
+
+
+def busy_work(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += 1
+    return total
+
+
+class _SessionInjector:
+    def __init__(self, app, session):
+        self.app = app
+        self.session = session
+
+    async def __call__(self, scope, receive, send):
+        scope["session"] = dict(self.session)
+        await self.app(scope, receive, send)
+
+
+def build_app(session):
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await run_blocking(busy_work, 0.15)
+        return {"status": "ok"}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.add_middleware(_SessionInjector, session=session)
+    return app
+
+
+def request_slow(app, **kwargs):
+    async def scenario():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://testserver"
+        ) as client:
+            return await client.get("/slow", **kwargs)
+
+    return asyncio.run(scenario())
+
+
+class ProfilingMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(
+            os.environ,
+            {"PROFILE_DIR": self.temp_dir.name, "PROFILE_INTERVAL_MS": "2"},
+            clear=False,
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def _wait_for_profiles(self, count):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            profiles = profiling.list_profiles()
+            if len(profiles) >= count:
+                return profiles
+            time.sleep(0.02)
+        return profiling.list_profiles()
+
+    def test_admin_request_with_flag_stores_profile_including_worker_threads(self):
+        response = request_slow(build_app({"is_admin": True}), headers={"X-Profile": "1"})
+
+        profile_id = response.headers["X-Profile-Id"]
+        profiles = self._wait_for_profiles(1)
+        self.assertEqual([profile["id"] for profile in profiles], [profile_id])
+        stored = profiling.load_profile(profile_id)
+        self.assertGreater(stored["samples"], 0)
+        self.assertTrue(any("busy_work" in stack for stack in stored["stacks"]))
+        self.assertTrue(
+            any(entry["function"].startswith("busy_work") for entry in stored["top_functions"])
+        )
+
+    def test_flag_is_ignored_without_admin_session(self):
+        response = request_slow(build_app({}), params={"__profile": "1"})
+
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_admin_request_without_flag_is_not_profiled(self):
+        response = request_slow(build_app({"is_admin": True}))
+
+        self.assertNotIn("X-Profile-Id", response.headers)
+
+    def test_sample_rate_zero_skips_flagged_requests(self):
+        with patch.dict(os.environ, {"PROFILE_SAMPLE_RATE": "0"}):
+            response = request_slow(build_app({"is_admin": True}), headers={"X-Profile": "1"})
+
+        self.assertNotIn("X-Profile-Id", response.headers)
+
+    def test_old_profiles_are_pruned(self):
+        with patch.dict(os.environ, {"PROFILE_MAX_STORED": "2"}):
+            for index in range(3):
+                profile = profiling.RequestProfile(
+                    method="GET", path="/", interval_seconds=0.01, max_seconds=1
+                )
+                profile.profile_id = f"20260101T00000{index}-{'a' * 12}"
+                profiling.store_profile(profile)
+
+        self.assertEqual(
+            [profile["id"] for profile in profiling.list_profiles()],
+            ["20260101T000002-aaaaaaaaaaaa", "20260101T000001-aaaaaaaaaaaa"],
+        )
+
+
+class AdminProfileApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"PROFILE_DIR": self.temp_dir.name}, clear=False)
+        env.start()
+        self.addCleanup(env.stop)
+        profile = profiling.RequestProfile(
+            method="POST", path="/api/chat", interval_seconds=0.005, max_seconds=1
+        )
+        profile.stacks = {"thread-1;main (app.py:1);handler (views.py:10)": 3}
+        profile.samples = 3
+        profiling.store_profile(profile)
+        self.profile_id = profile.profile_id
+
+    def test_list_requires_admin(self):
+        request = build_request(method="GET", path="/admin/api/profiles", session={})
+        response = asyncio.run(admin_views.api_profiles(request))
+        self.assertEqual(response.status_code, 401)
+
+    def test_list_and_download_folded(self):
+        session = {"is_admin": True}
+        listing = asyncio.run(
+            admin_views.api_profiles(build_request(method="GET", path="/admin/api/profiles", session=session))
+        )
+        payload = json.loads(listing.body.decode())
+        self.assertEqual(payload["profiles"][0]["id"], self.profile_id)
+        self.assertNotIn("stacks", payload["profiles"][0])
+
+        download = asyncio.run(
+            admin_views.api_profile_download(
+                build_request(method="GET", path=f"/admin/api/profiles/{self.profile_id}", session=session),
+                self.profile_id,
+            )
+        )
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(
+            download.body.decode(), "thread-1;main (app.py:1);handler (views.py:10) 3\n"
+        )
+
+    def test_download_rejects_unknown_or_malformed_ids(self):
+        session = {"is_admin": True}
+        for profile_id in ("../../etc/passwd", "20260101T000000-000000000000"):
+            with self.subTest(profile_id=profile_id):
+                response = asyncio.run(
+                    admin_views.api_profile_download(
+                        build_request(method="GET", path="/admin/api/profiles/x", session=session),
+                        profile_id,
+                    )
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+from blueprints.admin import views as admin_views
+from services import db, query_stats
+from tests.helpers.request_helpers import build_request
+
+
+class RecordingCursor:
+    def __init__(self, rows=None):
+        self.executed = []
+        self.rows = rows or []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rolled_back = False
+        self.closed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+def load_room(cursor):
+    cursor.execute("SELECT * FROM chat_rooms WHERE id = %s", ("room-1",))
+
+
+class NormalizeSqlTestCase(unittest.TestCase):
+    def test_literals_placeholders_and_in_lists_collapse(self):
+        self.assertEqual(
+            query_stats.normalize_sql(
+                "SELECT id\n  FROM t WHERE name = 'o''brien' AND id IN (%s, %s, 3) LIMIT 10"
+            ),
+            "SELECT id FROM t WHERE name = ? AND id IN (...) LIMIT ?",
+        )
+        self.assertEqual(
+            query_stats.normalize_sql("SELECT * FROM chat_history_p202601 WHERE a = %(room_id)s"),
+            "SELECT * FROM chat_history_p202601 WHERE a = ?",
+        )
+
+
+class QueryStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        query_stats.reset_query_stats()
+        self.addCleanup(query_stats.reset_query_stats)
+        while not query_stats._explain_queue.empty():
+            query_stats._explain_queue.get_nowait()
+
+    def test_instrumented_cursor_records_caller_and_totals(self):
+        cursor = db._InstrumentedCursor(RecordingCursor())
+        load_room(cursor)
+        load_room(cursor)
+
+        top = query_stats.get_top_queries()
+
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0]["sql"], "SELECT * FROM chat_rooms WHERE id = ?")
+        self.assertEqual(top[0]["calls"], 2)
+        self.assertEqual(top[0]["callers"], {f"{__name__}.load_room": 2})
+
+    def test_slow_select_is_logged_and_queued_for_explain(self):
+        env = {"DB_SLOW_QUERY_MS": "0", "DB_EXPLAIN_SAMPLE_RATE": "1"}
+        with patch.dict(os.environ, env), self.assertLogs("services.query_stats", "WARNING") as logs:
+            query_stats.record_query(None, "SELECT 1 FROM t WHERE id = %s", (5,), 0.3, "tests.caller")
+            query_stats.record_query(None, "SELECT 1 FROM t WHERE id = %s", (6,), 0.3, "tests.caller")
+            query_stats.record_query(None, "DELETE FROM t WHERE id = %s", (5,), 0.3, "tests.caller")
+
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(logs.records[0].sql, "SELECT ? FROM t WHERE id = ?")
+        self.assertEqual(logs.records[0].caller, "tests.caller")
+        # 同じ文は間隔内に1回だけ、DELETE は対象外
+        # Same statement only once per interval; DELETE never qualifies.
+        self.assertEqual(query_stats._explain_queue.qsize(), 1)
+        self.assertEqual(query_stats.get_top_queries(order_by="calls")[0]["slow_calls"], 2)
+
+    def test_locking_selects_are_never_queued_for_explain(self):
+        statements = [
+            "SELECT pg_advisory_xact_lock(hashtext('task_order'), %(user_id)s)",
+            "SELECT pg_try_advisory_lock(%s)",
+            "SELECT id FROM chat_rooms WHERE id = %s FOR UPDATE",
+            "SELECT id FROM chat_rooms ORDER BY id LIMIT 10 for update skip locked",
+            "SELECT id FROM chat_rooms WHERE id = %s FOR NO KEY UPDATE",
+            "SELECT id FROM chat_rooms WHERE id = %s FOR SHARE",
+            "SELECT id FROM chat_rooms WHERE id = %s FOR KEY SHARE NOWAIT",
+        ]
+        env = {"DB_SLOW_QUERY_MS": "0", "DB_EXPLAIN_SAMPLE_RATE": "1"}
+        with patch.dict(os.environ, env), self.assertLogs("services.query_stats", "WARNING"):
+            for sql in statements:
+                query_stats.record_query(None, sql, (5,), 0.3, "tests.caller")
+            # 文字列リテラル内の語句はロックではない / Words inside a literal are not a lock.
+            query_stats.record_query(
+                None, "SELECT id FROM memos WHERE body = 'for update'", None, 0.3, "tests.caller"
+            )
+
+        self.assertEqual(query_stats._explain_queue.qsize(), 1)
+
+    def test_explain_worker_stores_plan_and_rolls_back(self):
+        plan = [{"Plan": {"Node Type": "Seq Scan"}}]
+        cursor = RecordingCursor(rows=[(plan,)])
+        connection = RecordingConnection(cursor)
+        with patch.dict(os.environ, {"DB_SLOW_QUERY_MS": "0", "DB_EXPLAIN_SAMPLE_RATE": "1"}):
+            query_stats.record_query(None, "SELECT * FROM t WHERE id = %s", (1,), 0.5, "tests.caller")
+
+        stop_event = threading.Event()
+        worker = threading.Thread(
+            target=query_stats.run_explain_worker,
+            args=(stop_event, lambda: connection),
+            kwargs={"poll_seconds": 0.01},
+        )
+        worker.start()
+        for _ in range(200):
+            if query_stats.get_top_queries()[0]["plan_captured_at"]:
+                break
+            threading.Event().wait(0.01)
+        stop_event.set()
+        worker.join()
+
+        self.assertEqual(query_stats.get_top_queries(include_plans=True)[0]["plan"], plan)
+        self.assertTrue(
+            cursor.executed[1][0].startswith("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT")
+        )
+        self.assertEqual(cursor.executed[1][1], (1,))
+        self.assertTrue(connection.rolled_back)
+        self.assertTrue(connection.closed)
+
+    def test_admin_top_queries_endpoint(self):
+        query_stats.record_query(None, "SELECT 1", None, 0.01, "tests.caller")
+        query_stats.record_query(None, "SELECT 2", None, 0.02, "tests.caller")
+
+        unauthorized = asyncio.run(
+            admin_views.api_top_queries(build_request(method="GET", path="/admin/api/top-queries", session={}))
+        )
+        self.assertEqual(unauthorized.status_code, 401)
+
+        response = asyncio.run(
+            admin_views.api_top_queries(
+                build_request(
+                    method="GET",
+                    path="/admin/api/top-queries",
+                    session={"is_admin": True},
+                    query_string=b"order=max&limit=1",
+                )
+            )
+        )
+        payload = json.loads(response.body.decode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["sql"] for row in payload["queries"]], ["SELECT ?"])
+        self.assertEqual(payload["queries"][0]["max_ms"], 20.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,9 @@ import unittest
 import httpx
 from fastapi import FastAPI
 
-from services.request_context import RequestContextFilter, RequestContextMiddleware
+from services import request_context
+from services.async_utils import run_blocking
+from services.request_context import RequestContextFilter, RequestContextMiddleware, record_span
 
 
 class RequestContextMiddlewareTestCase(unittest.TestCase):
@@ -54,6 +56,53 @@ class RequestContextMiddlewareTestCase(unittest.TestCase):
 
         self.assertIn("req-123 GET /ping inside route", self.stream.getvalue())
 
+    def test_spans_from_worker_threads_reach_header_and_access_log(self):
+        app = FastAPI()
+        app.add_middleware(RequestContextMiddleware)
+        access_records = []
+
+        class Capture(logging.Handler):
+            def emit(self, record):
+                access_records.append(record)
+
+        capture = Capture()
+        request_context.logger.addHandler(capture)
+        self.addCleanup(request_context.logger.removeHandler, capture)
+        self.addCleanup(request_context.logger.setLevel, request_context.logger.level)
+        request_context.logger.setLevel(logging.INFO)
+
+        def query_db():
+            record_span("db", 0.012)
+            record_span("db", 0.003)
+            return request_context.get_request_context()["request_id"]
+
+        @app.get("/work")
+        async def work():
+            request_id = await run_blocking(query_db)
+            return {"request_id": request_id}
+
+        async def scenario():
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app),
+                base_url="http://testserver",
+            ) as client:
+                return await client.get("/work", headers={"X-Request-ID": "req-spans"})
+
+        response = asyncio.run(scenario())
+
+        self.assertEqual(response.json(), {"request_id": "req-spans"})
+        server_timing = response.headers["Server-Timing"]
+        self.assertIn('db;dur=15.0;desc="2"', server_timing)
+        self.assertIn("queue_wait;dur=", server_timing)
+        self.assertIn("app;dur=", server_timing)
+        spans = access_records[-1].spans
+        self.assertEqual(spans["db"], {"ms": 15.0, "count": 2})
+        self.assertEqual(spans["queue_wait"]["count"], 1)
+
+    def test_record_span_outside_request_is_noop(self):
+        record_span("db", 1.0)
+        self.assertIsNone(request_context.current_spans())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime
+import unittest
+from unittest.mock import patch
+
+from blueprints.chat.rooms import _delete_room_for_user
+from services import room_purge
+from services.room_purge import purge_next_batch, run_room_purge_loop
+from tests.helpers.db_helpers import TransactionTrackingConnection
+
+ROOM_CREATED_AT = datetime(2026, 2, 14, 8, 30)
+
+
+class FakeCursor:
+    def __init__(self, *, pending_room=None, remaining_messages=0, owner_id=7):
+        self.pending_room = pending_room
+        self.remaining_messages = remaining_messages
+        self.owner_id = owner_id
+        self.executed = []
+        self.rowcount = 0
+        self._fetchone_result = None
+        self.closed = False
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        self.executed.append((normalized, params))
+        self._fetchone_result = None
+        if normalized.startswith("SELECT id, created_at FROM chat_rooms"):
+            self._fetchone_result = (
+                (self.pending_room, ROOM_CREATED_AT) if self.pending_room else None
+            )
+        elif normalized.startswith("SELECT user_id FROM chat_rooms"):
+            self._fetchone_result = (self.owner_id,)
+        elif normalized.startswith("DELETE FROM chat_history"):
+            self.rowcount = min(params["batch_size"], self.remaining_messages)
+            self.remaining_messages -= self.rowcount
+
+    def fetchone(self):
+        result = self._fetchone_result
+        self._fetchone_result = None
+        return result
+
+    def close(self):
+        self.closed = True
+
+
+def run_batch(fake_cursor, batch_size):
+    fake_conn = TransactionTrackingConnection(fake_cursor)
+    with patch("services.room_purge.get_db_connection", return_value=fake_conn):
+        return purge_next_batch(batch_size), fake_conn
+
+
+class RoomPurgeTestCase(unittest.TestCase):
+    def test_delete_only_soft_deletes_room(self):
+        fake_cursor = FakeCursor()
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.rooms.get_db_connection", return_value=fake_conn):
+            payload, status_code = _delete_room_for_user("room-1", 7)
+
+        self.assertEqual(status_code, 200)
+        queries = [query for query, _ in fake_cursor.executed]
+        self.assertIn("AND deleted_at IS NULL", queries[0])
+        self.assertTrue(queries[1].startswith("UPDATE chat_rooms SET deleted_at = CURRENT_TIMESTAMP"))
+        self.assertFalse(any(query.startswith("DELETE") for query in queries))
+        self.assertTrue(fake_conn.committed)
+
+    def test_batch_keeps_room_while_history_remains(self):
+        fake_cursor = FakeCursor(pending_room="room-1", remaining_messages=2500)
+
+        result, fake_conn = run_batch(fake_cursor, 1000)
+
+        self.assertEqual(
+            result, {"room_id": "room-1", "messages_deleted": 1000, "room_finished": False}
+        )
+        self.assertIn("FOR UPDATE SKIP LOCKED", fake_cursor.executed[0][0])
+        delete_query, delete_params = fake_cursor.executed[1]
+        self.assertEqual(delete_query.count("room_created_at = %(room_created_at)s"), 2)
+        self.assertEqual(delete_params["room_created_at"], ROOM_CREATED_AT)
+        self.assertFalse(
+            any(query.startswith("DELETE FROM chat_rooms") for query, _ in fake_cursor.executed)
+        )
+        self.assertTrue(fake_conn.committed)
+
+    def test_last_batch_removes_room_row(self):
+        fake_cursor = FakeCursor(pending_room="room-1", remaining_messages=10)
+
+        result, fake_conn = run_batch(fake_cursor, 1000)
+
+        self.assertTrue(result["room_finished"])
+        self.assertEqual(fake_cursor.executed[-1][1], ("room-1",))
+        self.assertTrue(fake_cursor.executed[-1][0].startswith("DELETE FROM chat_rooms"))
+        self.assertTrue(fake_conn.committed)
+
+    def test_no_pending_room_returns_none(self):
+        result, fake_conn = run_batch(FakeCursor(), 1000)
+
+        self.assertIsNone(result)
+        self.assertTrue(fake_conn.rolled_back)
+        self.assertFalse(fake_conn.committed)
+
+    def test_loop_drains_room_in_bounded_batches_and_records_progress(self):
+        stop_event = threading.Event()
+        results = [
+            {"room_id": "room-9", "messages_deleted": 2, "room_finished": False},
+            {"room_id": "room-9", "messages_deleted": 1, "room_finished": True},
+        ]
+
+        def fake_batch(batch_size):
+            self.assertEqual(batch_size, 2)
+            if results:
+                return results.pop(0)
+            stop_event.set()
+            return None
+
+        before = dict(room_purge._stats)
+        with patch("services.room_purge.purge_next_batch", side_effect=fake_batch):
+            run_room_purge_loop(stop_event, batch_size=2, idle_seconds=0, pause_seconds=0)
+
+        self.assertEqual(room_purge._stats["rooms_purged"], before["rooms_purged"] + 1)
+        self.assertEqual(room_purge._stats["messages_purged"], before["messages_purged"] + 3)
+        self.assertIsNone(room_purge._stats["current_room_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()
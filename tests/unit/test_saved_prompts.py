@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+
+from blueprints.prompt_share import prompt_manage_api
+from tests.helpers.db_helpers import TransactionTrackingConnection
+
+
+class FakeCursor:
+    def __init__(self, rows=None, deleted_name=None, hidden_rowcount=0):
+        self.rows = list(rows or [])
+        self.deleted_name = deleted_name
+        self.hidden_rowcount = hidden_rowcount
+        self.executed = []
+        self.rowcount = 0
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+        if query.lstrip().startswith("INSERT"):
+            self.rowcount = self.hidden_rowcount
+
+    def fetchone(self):
+        return (self.deleted_name,) if self.deleted_name else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+class SavedPromptsTestCase(unittest.TestCase):
+    def _connection(self, cursor):
+        conn = TransactionTrackingConnection(cursor)
+        conn.cursor = lambda dictionary=False: cursor
+        return conn
+
+    def test_list_is_built_from_the_task_overlay(self):
+        rows = [{"id": 1, "name": "要約", "is_default": True}]
+        cursor = FakeCursor(rows=rows)
+
+        with patch.object(
+            prompt_manage_api, "get_db_connection", return_value=self._connection(cursor)
+        ):
+            prompts = prompt_manage_api._fetch_saved_prompts(7)
+
+        self.assertEqual(prompts, rows)
+        query, params = cursor.executed[0]
+        self.assertIn("LEFT JOIN user_default_task_states s", query)
+        self.assertIn("d.user_id IS NULL", query)
+        self.assertIn("is_shared AS is_default", query)
+        self.assertEqual(params, {"user_id": 7})
+
+    def test_list_version_covers_defaults_and_state_rows(self):
+        with patch.object(
+            prompt_manage_api, "fetch_validator_row", return_value=(1, 2, 3, 4)
+        ) as fetch_validator:
+            version = prompt_manage_api._fetch_manage_list_version("saved_prompts", 7)
+
+        self.assertEqual(version, (1, 2, 3, 4))
+        query, params = fetch_validator.call_args.args
+        self.assertIn("user_id IS NULL", query)
+        self.assertIn("FROM user_default_task_states", query)
+        self.assertEqual(params, {"user_id": 7})
+
+    def test_deleting_a_default_hides_it_for_the_user(self):
+        cursor = FakeCursor(hidden_rowcount=1)
+        conn = self._connection(cursor)
+
+        with patch.object(prompt_manage_api, "get_db_connection", return_value=conn):
+            deleted = prompt_manage_api._delete_saved_prompt_for_user(7, 3)
+
+        self.assertEqual(deleted, 1)
+        hide_query, hide_params = cursor.executed[1]
+        self.assertIn("INSERT INTO user_default_task_states", hide_query)
+        self.assertEqual(hide_params, {"id": 3, "name": None, "user_id": 7})
+        self.assertTrue(conn.committed)
+
+    def test_deleting_an_own_row_also_hides_its_default(self):
+        cursor = FakeCursor(deleted_name="要約")
+
+        with patch.object(
+            prompt_manage_api, "get_db_connection", return_value=self._connection(cursor)
+        ):
+            deleted = prompt_manage_api._delete_saved_prompt_for_user(7, 42)
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(cursor.executed[1][1], {"id": 42, "name": "要約", "user_id": 7})
+
+    def test_deleting_an_unknown_prompt_reports_nothing_deleted(self):
+        cursor = FakeCursor(hidden_rowcount=0)
+
+        with patch.object(
+            prompt_manage_api, "get_db_connection", return_value=self._connection(cursor)
+        ):
+            deleted = prompt_manage_api._delete_saved_prompt_for_user(7, 999)
+
+        self.assertEqual(deleted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
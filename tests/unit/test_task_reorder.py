@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from blueprints.chat.tasks import (
+    _move_task_for_user,
+    _update_tasks_order_for_user,
+    move_task,
+)
+from tests.helpers.db_helpers import TransactionTrackingConnection
+from tests.helpers.request_helpers import build_request
+
+
+class FakeCursor:
+    def __init__(self, names=None):
+        self.names = list(names or [])
+        self.executed = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.executed.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return [(name,) for name in self.names]
+
+    def close(self):
+        self.closed = True
+
+
+class TaskReorderTestCase(unittest.TestCase):
+    def test_update_order_uses_single_set_based_statement(self):
+        fake_cursor = FakeCursor()
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+        order = [f"task-{index}" for index in range(200)]
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            _update_tasks_order_for_user(7, order)
+
+        self.assertEqual(len(fake_cursor.executed), 2)
+        self.assertIn("pg_advisory_xact_lock", fake_cursor.executed[0][0])
+        query, params = fake_cursor.executed[1]
+        self.assertIn("unnest(%(names)s::text[]) WITH ORDINALITY", query)
+        self.assertIn("IS DISTINCT FROM", query)
+        self.assertIn("INSERT INTO user_default_task_states", query)
+        self.assertEqual(params, {"names": order, "user_id": 7})
+        self.assertTrue(fake_conn.committed)
+        self.assertTrue(fake_conn.closed)
+
+    def test_move_task_places_task_before_target(self):
+        fake_cursor = FakeCursor(names=["A", "B", "C", "D"])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            moved = _move_task_for_user(7, "D", "B")
+
+        self.assertTrue(moved)
+        self.assertEqual(
+            fake_cursor.executed[2][1], {"names": ["A", "D", "B", "C"], "user_id": 7}
+        )
+        self.assertTrue(fake_conn.committed)
+
+    def test_move_task_locks_user_order_before_reading(self):
+        fake_cursor = FakeCursor(names=["A", "B"])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            _move_task_for_user(7, "B", "A")
+
+        lock_query, lock_params = fake_cursor.executed[0]
+        self.assertIn("pg_advisory_xact_lock(hashtext('task_order')", lock_query)
+        self.assertEqual(lock_params, {"user_id": 7})
+        self.assertIn("user_default_task_states", fake_cursor.executed[1][0])
+
+    def test_move_task_appends_when_before_is_omitted(self):
+        fake_cursor = FakeCursor(names=["A", "B", "C"])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            moved = _move_task_for_user(7, "A", None)
+
+        self.assertTrue(moved)
+        self.assertEqual(fake_cursor.executed[2][1], {"names": ["B", "C", "A"], "user_id": 7})
+
+    def test_move_task_returns_false_for_unknown_task(self):
+        fake_cursor = FakeCursor(names=["A", "B"])
+        fake_conn = TransactionTrackingConnection(fake_cursor)
+
+        with patch("blueprints.chat.tasks.get_db_connection", return_value=fake_conn):
+            moved = _move_task_for_user(7, "Z", "A")
+
+        self.assertFalse(moved)
+        self.assertEqual(len(fake_cursor.executed), 2)
+        self.assertFalse(fake_conn.committed)
+        self.assertTrue(fake_conn.closed)
+
+    def test_move_task_endpoint_returns_404_when_task_is_missing(self):
+        request = build_request(
+            method="POST",
+            path="/api/move_task",
+            json_body={"task": "Z", "before_task": "A"},
+            session={"user_id": 7},
+        )
+
+        with patch("blueprints.chat.tasks._move_task_for_user", return_value=False) as move:
+            response = asyncio.run(move_task(request))
+
+        self.assertEqual(response.status_code, 404)
+        move.assert_called_once_with(7, "Z", "A")
+
+
+if __name__ == "__main__":
+    unittest.main()